@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+"""
+Record / replay stand-in for the OrcaBus, filemanager and ICAv2 APIs the handlers call, see interceptor
+"""
+
+from .faults import FaultInjector, StandInHTTPError
+from .fixtures import FixtureStore, FixtureNotFoundError
+from .interceptor import (
+    RECORD_MODE,
+    REPLAY_MODE,
+    install,
+    install_from_env,
+    uninstall,
+)
+
+__all__ = [
+    "FaultInjector",
+    "StandInHTTPError",
+    "FixtureStore",
+    "FixtureNotFoundError",
+    "RECORD_MODE",
+    "REPLAY_MODE",
+    "install",
+    "install_from_env",
+    "uninstall",
+]
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+"""
+Put this directory on the PYTHONPATH to install the API stand-in (when API_STAND_IN_MODE is set)
+before any handler is imported, i.e
+
+    PYTHONPATH=app/api_stand_in/bootstrap API_STAND_IN_MODE=replay python app/lambdas/get_libraries_py/get_libraries.py
+"""
+
+# Standard imports
+import sys
+from pathlib import Path
+
+# The app directory
+sys.path.append(str(Path(__file__).absolute().parent.parent.parent))
+
+from api_stand_in import install_from_env  # noqa: E402
+
+install_from_env()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Latency, error and throttling injection for the API stand-in
+
+Every stand-in call is first delayed by the latency model, then fails with a throttling (429) error at the
+throttle rate, or with a server (503) error at the error rate.
+Errors are raised as the API client would raise them, so the handlers' own error handling runs:
+  * requests.HTTPError (with a response status code) for the orcabus_api_tools APIs
+  * libica ApiException (with a status) for wrapica
+When the client package is not installed, the error is raised as the replayed client's error class (see synthesized).
+"""
+
+# Standard imports
+import random
+from threading import Lock
+from types import SimpleNamespace
+from typing import Optional, Dict, Any
+
+# Local imports
+from local_sfn.latency_models import LatencyModel, NoLatencyModel
+from .fixtures import import_class
+
+# Globals
+REQUESTS_CLIENT = "requests"
+LIBICA_CLIENT = "libica"
+
+THROTTLED_STATUS = 429
+THROTTLED_REASON = "Too Many Requests"
+SERVER_ERROR_STATUS = 503
+SERVER_ERROR_REASON = "Service Unavailable"
+
+
+class StandInHTTPError(Exception):
+    """
+    Raised in place of a client error class that cannot be imported,
+    has both the libica (status) and requests (response.status_code) status attributes
+    """
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"{status} {reason}")
+        self.status = status
+        self.reason = reason
+        self.response = SimpleNamespace(status_code=status, reason=reason)
+
+
+class SynthesizedError(Exception):
+    """
+    The base of the error classes of API packages that are replayed without being installed (see synthesized),
+    HTTP errors have both the libica (status) and requests (response.status_code) status attributes
+    """
+    status: Optional[int] = None
+    reason: Optional[str] = None
+    response: Optional[SimpleNamespace] = None
+
+    @classmethod
+    def from_status(cls, status: int, reason: str, message: Optional[str] = None) -> "SynthesizedError":
+        error = cls(message or f"{status} {reason}")
+        error.status = status
+        error.reason = reason
+        error.response = SimpleNamespace(status_code=status, reason=reason)
+        return error
+
+
+def get_client_error(client_name: str, status: int, reason: str, message: Optional[str] = None) -> Exception:
+    """
+    Build the error an API client raises for an HTTP status
+    :param client_name: 'requests' or 'libica'
+    :param status:
+    :param reason:
+    :param message:
+    :return:
+    """
+    if client_name == LIBICA_CLIENT:
+        api_exception_class = import_class("libica.openapi.v3.ApiException")
+        if api_exception_class is not None and issubclass(api_exception_class, SynthesizedError):
+            return api_exception_class.from_status(status, reason, message)
+        if api_exception_class is not None:
+            return api_exception_class(status=status, reason=reason)
+        return StandInHTTPError(status, reason)
+
+    http_error_class = import_class("requests.HTTPError")
+    if http_error_class is not None and issubclass(http_error_class, SynthesizedError):
+        return http_error_class.from_status(status, reason, message)
+    response_class = import_class("requests.Response")
+    if http_error_class is None or response_class is None:
+        return StandInHTTPError(status, reason)
+    response = response_class()
+    response.status_code = status
+    response.reason = reason
+    return http_error_class(
+        message or f"{status} {'Client' if status < 500 else 'Server'} Error: {reason}",
+        response=response
+    )
+
+
+def get_recorded_error(client_name: str, recorded_error: Dict[str, Any]) -> Exception:
+    """
+    Rebuild a recorded error, HTTP errors are rebuilt with their status
+    :param client_name:
+    :param recorded_error:
+    :return:
+    """
+    error_class = import_class(recorded_error['type'])
+
+    if recorded_error.get("status", None) is not None and (
+        error_class is None or
+        error_class.__name__ in ("HTTPError", "ApiException") or
+        any(map(lambda base_iter_: base_iter_.__name__ in ("HTTPError", "ApiException"), error_class.__mro__))
+    ):
+        return get_client_error(
+            client_name,
+            recorded_error['status'],
+            recorded_error.get("reason", None) or "",
+            message=recorded_error.get("message", None)
+        )
+
+    if error_class is not None:
+        try:
+            return error_class(*recorded_error.get("args", []))
+        except Exception:
+            pass
+
+    return RuntimeError(f"{recorded_error['type']}: {recorded_error.get('message', '')}")
+
+
+class FaultInjector:
+    def __init__(
+            self,
+            latency_model: Optional[LatencyModel] = None,
+            use_recorded_latency: bool = False,
+            error_rate: float = 0.0,
+            throttle_rate: float = 0.0,
+            seed: Optional[int] = None,
+    ):
+        """
+        :param latency_model: The latency of each call, by call key ('<api_name>:<function_name>')
+        :param use_recorded_latency: Replay the latency measured when the call was recorded instead
+        :param error_rate: The fraction of calls that fail with a 503
+        :param throttle_rate: The fraction of calls that fail with a 429
+        :param seed:
+        """
+        self.latency_model = latency_model or NoLatencyModel()
+        self.use_recorded_latency = use_recorded_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._random_lock = Lock()
+
+    def get_latency_seconds(self, call_key: str, recorded_duration_seconds: Optional[float] = None) -> float:
+        if self.use_recorded_latency and recorded_duration_seconds is not None:
+            return recorded_duration_seconds
+        return self.latency_model.sample(call_key)
+
+    def get_injected_error(self, client_name: str) -> Optional[Exception]:
+        """
+        Draw whether this call fails
+        :param client_name:
+        :return: The error to raise, or None
+        """
+        if self.throttle_rate <= 0 and self.error_rate <= 0:
+            return None
+
+        with self._random_lock:
+            draw = self._random.random()
+
+        if draw < self.throttle_rate:
+            return get_client_error(client_name, THROTTLED_STATUS, THROTTLED_REASON)
+        if draw < self.throttle_rate + self.error_rate:
+            return get_client_error(client_name, SERVER_ERROR_STATUS, SERVER_ERROR_REASON)
+        return None
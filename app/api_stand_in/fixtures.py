@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+"""
+Fixture files for the API stand-in
+
+Each API function has one fixture file, <fixtures_dir>/<api_name>/<function_name>.json,
+a JSON object of recorded calls keyed by the request key (the sha256 of the function's bound arguments):
+
+    {
+        "3f2a...": {
+            "arguments": {"portal_run_id": "20250101abcdef12"},
+            "response": {...},
+            "error": null,
+            "durationSeconds": 0.231,
+            "parameters": [{"name": "portal_run_id", "kind": "POSITIONAL_OR_KEYWORD"}]
+        }
+    }
+
+Responses are stored as JSON, API model objects (i.e the libica models wrapica returns) are stored with their class,
+and rebuilt from their dict on replay.
+Errors are stored with their class, arguments and HTTP status (if any), and are raised again on replay.
+Recording the same call again replaces the previous recording.
+The parameters of the function are stored with each recording, so calls can be replayed
+without the API package installed (see interceptor).
+"""
+
+# Standard imports
+import hashlib
+import importlib
+import inspect
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Any, Callable, Optional, Tuple, List
+
+# Globals
+STAND_IN_TYPE_KEY = "__standInType__"
+STAND_IN_VALUE_KEY = "value"
+
+
+class FixtureNotFoundError(LookupError):
+    """
+    A call was replayed that was never recorded
+    """
+    def __init__(self, fixture_path: Path, request_key: str, arguments: Dict[str, Any]):
+        super().__init__(
+            f"No recorded response in {fixture_path} for request {request_key} with arguments {json.dumps(arguments, default=str)}, "
+            "record it with API_STAND_IN_MODE=record"
+        )
+        self.fixture_path = fixture_path
+        self.request_key = request_key
+        self.arguments = arguments
+
+
+class RecordedObject(dict):
+    """
+    A recorded API model object whose class could not be rebuilt,
+    attributes are read from the recorded dict by their snake case or camel case name
+    """
+    def __getattr__(self, name: str) -> Any:
+        camel_case_name = name.split("_")[0] + "".join(map(lambda part_iter_: part_iter_.title(), name.split("_")[1:]))
+        for key in (name, camel_case_name):
+            if key in self:
+                return self[key]
+        raise AttributeError(name)
+
+
+def get_class_path(obj_type: type) -> str:
+    return f"{obj_type.__module__}.{obj_type.__qualname__}"
+
+
+def import_class(class_path: str) -> Optional[type]:
+    module_name, _, class_name = class_path.rpartition(".")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError):
+        return None
+
+
+def serialize_value(value: Any) -> Any:
+    """
+    Convert a response (or argument) to JSON, keeping the class of API model objects
+    :param value:
+    :return:
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return list(map(serialize_value, value))
+    if isinstance(value, dict):
+        return dict(map(
+            lambda kv_iter_: (str(kv_iter_[0]), serialize_value(kv_iter_[1])),
+            value.items()
+        ))
+    if isinstance(value, Enum):
+        return serialize_value(value.value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "to_dict"):
+        return {
+            STAND_IN_TYPE_KEY: get_class_path(type(value)),
+            STAND_IN_VALUE_KEY: serialize_value(value.to_dict()),
+        }
+    return str(value)
+
+
+def deserialize_value(value: Any) -> Any:
+    """
+    Rebuild a recorded response, API model objects are rebuilt with their class' from_dict if it can be imported
+    :param value:
+    :return:
+    """
+    if isinstance(value, list):
+        return list(map(deserialize_value, value))
+    if not isinstance(value, dict):
+        return value
+    if STAND_IN_TYPE_KEY not in value:
+        return dict(map(
+            lambda kv_iter_: (kv_iter_[0], deserialize_value(kv_iter_[1])),
+            value.items()
+        ))
+
+    model_class = import_class(value[STAND_IN_TYPE_KEY])
+    if model_class is not None and hasattr(model_class, "from_dict"):
+        try:
+            return model_class.from_dict(value[STAND_IN_VALUE_KEY])
+        except Exception:
+            pass
+
+    return json.loads(json.dumps(value[STAND_IN_VALUE_KEY]), object_hook=RecordedObject)
+
+
+def serialize_error(error: Exception) -> Dict[str, Any]:
+    response = getattr(error, "response", None)
+    return {
+        "type": get_class_path(type(error)),
+        "args": serialize_value(list(error.args)),
+        "message": str(error),
+        "status": getattr(error, "status", None) or getattr(response, "status_code", None),
+        "reason": getattr(error, "reason", None),
+    }
+
+
+def get_arguments(func: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bind the call arguments to the function's parameters (with defaults),
+    so f('a') and f(x='a') are the same request
+    :param func:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    try:
+        bound_arguments = inspect.signature(func).bind(*args, **kwargs)
+        bound_arguments.apply_defaults()
+        return serialize_value(dict(bound_arguments.arguments))
+    except (TypeError, ValueError):
+        return serialize_value({"args": list(args), "kwargs": kwargs})
+
+
+def get_parameters(func: Callable) -> Optional[List[Dict[str, Any]]]:
+    """
+    The parameters of the function, in order, with their kind and (serialised) default
+    :param func:
+    :return:
+    """
+    try:
+        parameter_list = list(inspect.signature(func).parameters.values())
+    except (TypeError, ValueError):
+        return None
+
+    return list(map(
+        lambda parameter_iter_: {
+            "name": parameter_iter_.name,
+            "kind": parameter_iter_.kind.name,
+            **(
+                {"default": serialize_value(parameter_iter_.default)}
+                if parameter_iter_.default is not inspect.Parameter.empty
+                else {}
+            ),
+        },
+        parameter_list
+    ))
+
+
+def get_signature_from_parameters(parameter_list: List[Dict[str, Any]]) -> inspect.Signature:
+    return inspect.Signature(list(map(
+        lambda parameter_iter_: inspect.Parameter(
+            parameter_iter_['name'],
+            getattr(inspect.Parameter, parameter_iter_['kind']),
+            default=parameter_iter_.get("default", inspect.Parameter.empty),
+        ),
+        parameter_list
+    )))
+
+
+def get_request_key(arguments: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(arguments, sort_keys=True).encode()).hexdigest()
+
+
+class FixtureStore:
+    def __init__(self, fixtures_dir: Path):
+        self.fixtures_dir = Path(fixtures_dir)
+        self._fixtures_by_path: Dict[Path, Dict[str, Dict[str, Any]]] = {}
+        self._lock = Lock()
+
+    def get_fixture_path(self, api_name: str, function_name: str) -> Path:
+        return self.fixtures_dir / api_name / f"{function_name}.json"
+
+    def _get_fixtures(self, fixture_path: Path) -> Dict[str, Dict[str, Any]]:
+        # Called with the lock held
+        if fixture_path not in self._fixtures_by_path:
+            self._fixtures_by_path[fixture_path] = (
+                json.loads(fixture_path.read_text()) if fixture_path.is_file() else {}
+            )
+        return self._fixtures_by_path[fixture_path]
+
+    def get_recording(self, api_name: str, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the recording of a call
+        :raises FixtureNotFoundError: The call was not recorded
+        """
+        fixture_path = self.get_fixture_path(api_name, function_name)
+        request_key = get_request_key(arguments)
+        with self._lock:
+            recording = self._get_fixtures(fixture_path).get(request_key, None)
+        if recording is None:
+            raise FixtureNotFoundError(fixture_path, request_key, arguments)
+        return recording
+
+    def get_signature(self, api_name: str, function_name: str) -> Optional[inspect.Signature]:
+        """
+        The signature of a recorded function, None if it has no recordings (or they predate the stored parameters)
+        """
+        fixture_path = self.get_fixture_path(api_name, function_name)
+        with self._lock:
+            recording_list = list(self._get_fixtures(fixture_path).values())
+        for recording in recording_list:
+            if recording.get("parameters", None) is not None:
+                return get_signature_from_parameters(recording['parameters'])
+        return None
+
+    def put_recording(
+            self,
+            api_name: str,
+            function_name: str,
+            arguments: Dict[str, Any],
+            duration_seconds: float,
+            response: Any = None,
+            error: Optional[Exception] = None,
+            parameter_list: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """
+        Record a call, the fixture file is rewritten (atomically) on every recording
+        """
+        fixture_path = self.get_fixture_path(api_name, function_name)
+        with self._lock:
+            fixtures = self._get_fixtures(fixture_path)
+            fixtures[get_request_key(arguments)] = {
+                "arguments": arguments,
+                "response": serialize_value(response) if error is None else None,
+                "error": serialize_error(error) if error is not None else None,
+                "durationSeconds": round(duration_seconds, 6),
+                "parameters": parameter_list,
+            }
+            fixture_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_fixture_path = fixture_path.with_suffix(f".json.{os.getpid()}.tmp")
+            tmp_fixture_path.write_text(json.dumps(fixtures, indent=2, sort_keys=True) + "\n")
+            os.replace(tmp_fixture_path, fixture_path)
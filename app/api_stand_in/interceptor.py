@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+
+"""
+Swap the API functions the handlers import for record / replay stand-ins
+
+An import hook wraps the public functions of the API client modules as they are imported,
+so the handlers run unmodified:
+  * orcabus_api_tools.workflow, .metadata, .fastq and .filemanager (the OrcaBus and filemanager APIs)
+  * wrapica.project, .project_data, .project_pipelines and .storage_configuration (the ICAv2 API)
+  * icav2_tools (the ICAv2 access token lookup)
+
+In record mode each call goes to the real API, and its response (or error) and duration are written to the fixture files.
+In replay mode each call is answered from the fixture files, after the injected latency, and may fail
+with an injected throttling or server error. A call that was not recorded raises FixtureNotFoundError.
+Calls the API functions make to each other are not recorded separately.
+In replay mode the API packages (and their requests / libica clients) need not be installed,
+missing packages are synthesized from the fixtures (see synthesized).
+
+Settings (environment variables):
+  * API_STAND_IN_MODE — 'record' or 'replay', the stand-in is not installed otherwise
+  * API_STAND_IN_FIXTURES_DIR — the fixture directory (default ./api-fixtures)
+  * API_STAND_IN_LATENCY — a latency model spec (see local_sfn.latency_models), or 'recorded' to replay the recorded durations
+  * API_STAND_IN_LATENCY_FOR — latency models per API or call, i.e 'workflow=lognormal:0.1,1;icav2:get_project_pipeline_obj=constant:0.5'
+  * API_STAND_IN_ERROR_RATE — the fraction of replayed calls that fail with a 503
+  * API_STAND_IN_THROTTLE_RATE — the fraction of replayed calls that fail with a 429
+  * API_STAND_IN_SEED — seed the latency models and error draws
+"""
+
+# Standard imports
+import importlib.abc
+import inspect
+import logging
+import sys
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from os import environ
+from pathlib import Path
+from time import sleep, perf_counter
+from types import ModuleType
+from typing import Callable, Dict, Optional, List
+
+# Local imports
+from local_sfn.latency_models import KeyedLatencyModel, parse_latency_model
+from .faults import FaultInjector, get_recorded_error, REQUESTS_CLIENT, LIBICA_CLIENT
+from .fixtures import FixtureStore, get_arguments, get_parameters, deserialize_value
+from .synthesized import (
+    SYNTHESIZED_PACKAGE_LIST,
+    can_synthesize_module,
+    get_synthesized_function,
+    get_synthesized_module_spec,
+    is_synthesized,
+)
+
+# Set logging
+logger = logging.getLogger(__name__)
+
+# Globals
+RECORD_MODE = "record"
+REPLAY_MODE = "replay"
+
+API_STAND_IN_MODE_ENV_VAR = "API_STAND_IN_MODE"
+API_STAND_IN_FIXTURES_DIR_ENV_VAR = "API_STAND_IN_FIXTURES_DIR"
+API_STAND_IN_LATENCY_ENV_VAR = "API_STAND_IN_LATENCY"
+API_STAND_IN_LATENCY_FOR_ENV_VAR = "API_STAND_IN_LATENCY_FOR"
+API_STAND_IN_ERROR_RATE_ENV_VAR = "API_STAND_IN_ERROR_RATE"
+API_STAND_IN_THROTTLE_RATE_ENV_VAR = "API_STAND_IN_THROTTLE_RATE"
+API_STAND_IN_SEED_ENV_VAR = "API_STAND_IN_SEED"
+
+DEFAULT_FIXTURES_DIR = "api-fixtures"
+RECORDED_LATENCY_SPEC = "recorded"
+
+STAND_IN_WRAPPED_ATTR = "__stand_in_wrapped__"
+
+# Set while a stand-in function calls the real function, so nested API calls are not recorded
+_IN_STAND_IN_CALL: ContextVar[bool] = ContextVar("in_stand_in_call", default=False)
+
+_STAND_IN_FINDER: Optional["StandInFinder"] = None
+
+
+@dataclass(frozen=True)
+class StandInApi:
+    module_name: str
+    api_name: str
+    client_name: str
+    inject_faults: bool = True
+
+
+STAND_IN_API_LIST: List[StandInApi] = [
+    StandInApi("orcabus_api_tools.workflow", "workflow", REQUESTS_CLIENT),
+    StandInApi("orcabus_api_tools.metadata", "metadata", REQUESTS_CLIENT),
+    StandInApi("orcabus_api_tools.fastq", "fastq", REQUESTS_CLIENT),
+    StandInApi("orcabus_api_tools.filemanager", "filemanager", REQUESTS_CLIENT),
+    StandInApi("wrapica.project", "icav2", LIBICA_CLIENT),
+    StandInApi("wrapica.project_data", "icav2", LIBICA_CLIENT),
+    StandInApi("wrapica.project_pipelines", "icav2", LIBICA_CLIENT),
+    StandInApi("wrapica.storage_configuration", "icav2", LIBICA_CLIENT),
+    # Only reads the access token from secrets manager, so is replayed but never fails
+    StandInApi("icav2_tools", "icav2_tools", REQUESTS_CLIENT, inject_faults=False),
+]
+
+
+def get_stand_in_function(func: Callable, function_name: str, stand_in_api: StandInApi) -> Callable:
+    """
+    Wrap an API function, the installed stand-in (mode, fixtures and faults) is read on every call,
+    so installing the stand-in again also applies to the handlers imported before
+    :param func:
+    :param function_name:
+    :param stand_in_api:
+    :return:
+    """
+    call_key = f"{stand_in_api.api_name}:{function_name}"
+
+    @wraps(func)
+    def stand_in_function(*args, **kwargs):
+        stand_in_finder = _STAND_IN_FINDER
+        if stand_in_finder is None or _IN_STAND_IN_CALL.get():
+            return func(*args, **kwargs)
+
+        fixture_store = stand_in_finder.fixture_store
+        fault_injector = stand_in_finder.fault_injector
+
+        # Replayed without the API package, the parameters come from the recordings
+        if is_synthesized(func):
+            func.__signature__ = fixture_store.get_signature(stand_in_api.api_name, function_name)
+
+        arguments = get_arguments(func, args, kwargs)
+
+        if stand_in_finder.mode == REPLAY_MODE:
+            recording = fixture_store.get_recording(stand_in_api.api_name, function_name, arguments)
+            sleep(fault_injector.get_latency_seconds(call_key, recording.get("durationSeconds", None)))
+            injected_error = fault_injector.get_injected_error(stand_in_api.client_name) if stand_in_api.inject_faults else None
+            if injected_error is not None:
+                raise injected_error
+            if recording.get("error", None) is not None:
+                raise get_recorded_error(stand_in_api.client_name, recording['error'])
+            return deserialize_value(recording['response'])
+
+        in_stand_in_call_token = _IN_STAND_IN_CALL.set(True)
+        started_at = perf_counter()
+        try:
+            response = func(*args, **kwargs)
+        except Exception as e:
+            fixture_store.put_recording(
+                stand_in_api.api_name, function_name, arguments,
+                duration_seconds=perf_counter() - started_at,
+                error=e,
+                parameter_list=get_parameters(func),
+            )
+            raise
+        finally:
+            _IN_STAND_IN_CALL.reset(in_stand_in_call_token)
+
+        fixture_store.put_recording(
+            stand_in_api.api_name, function_name, arguments,
+            duration_seconds=perf_counter() - started_at,
+            response=response,
+            parameter_list=get_parameters(func),
+        )
+        return response
+
+    setattr(stand_in_function, STAND_IN_WRAPPED_ATTR, func)
+    return stand_in_function
+
+
+class StandInLoader(importlib.abc.Loader):
+    """
+    Run the real loader, then swap the module's API functions for stand-ins
+    """
+    def __init__(self, loader: importlib.abc.Loader, on_exec_module: Callable[[ModuleType], None]):
+        self.loader = loader
+        self.on_exec_module = on_exec_module
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType):
+        self.loader.exec_module(module)
+        self.on_exec_module(module)
+
+
+class StandInFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, mode: str, fixture_store: FixtureStore, fault_injector: FaultInjector):
+        self.mode = mode
+        self.fixture_store = fixture_store
+        self.fault_injector = fault_injector
+        self.stand_in_api_by_module_name: Dict[str, StandInApi] = dict(map(
+            lambda stand_in_api_iter_: (stand_in_api_iter_.module_name, stand_in_api_iter_),
+            STAND_IN_API_LIST
+        ))
+
+    def find_spec(self, fullname, path, target=None):
+        package_name = fullname.split(".")[0]
+        if fullname not in self.stand_in_api_by_module_name and package_name not in SYNTHESIZED_PACKAGE_LIST:
+            return None
+        # The finders after this one find the module, so other import hooks (i.e lambda_tracing) still apply
+        for finder in sys.meta_path[sys.meta_path.index(self) + 1:]:
+            spec = finder.find_spec(fullname, path, target) if hasattr(finder, "find_spec") else None
+            if spec is not None:
+                break
+        else:
+            # Not installed, fixtures can still be replayed
+            if self.mode == REPLAY_MODE and can_synthesize_module(fullname):
+                return get_synthesized_module_spec(fullname, self.get_synthesized_function_factory(fullname))
+            return None
+        if spec.loader is None or fullname not in self.stand_in_api_by_module_name:
+            return spec
+        spec.loader = StandInLoader(spec.loader, self.patch_module)
+        return spec
+
+    def get_synthesized_function_factory(self, module_name: str) -> Optional[Callable[[str], Callable]]:
+        """
+        The public functions of a synthesized API module are stand-ins (that can only be replayed)
+        :param module_name:
+        :return:
+        """
+        if module_name not in self.stand_in_api_by_module_name:
+            return None
+        stand_in_api = self.stand_in_api_by_module_name[module_name]
+        return lambda function_name_iter_: get_stand_in_function(
+            get_synthesized_function(module_name, function_name_iter_),
+            function_name_iter_,
+            stand_in_api
+        )
+
+    def patch_module(self, module: ModuleType):
+        """
+        Swap the public functions of an API module (defined in the API package) for stand-ins
+        :param module:
+        :return:
+        """
+        stand_in_api = self.stand_in_api_by_module_name[module.__name__]
+        package_name = stand_in_api.module_name.split(".")[0]
+
+        for attr_name, attr in list(vars(module).items()):
+            if (
+                attr_name.startswith("_") or
+                not inspect.isfunction(attr) or
+                hasattr(attr, STAND_IN_WRAPPED_ATTR) or
+                not (attr.__module__ or "").startswith(package_name)
+            ):
+                continue
+            setattr(module, attr_name, get_stand_in_function(attr, attr_name, stand_in_api))
+
+
+def install(
+        mode: str,
+        fixtures_dir: Path = Path(DEFAULT_FIXTURES_DIR),
+        fault_injector: Optional[FaultInjector] = None,
+):
+    """
+    Install the stand-in, API modules imported from here on (and those already imported) are patched.
+    Handlers must be imported after the stand-in is installed, as they bind the API functions on import.
+    :param mode: 'record' or 'replay'
+    :param fixtures_dir:
+    :param fault_injector: The latency and errors for replayed calls
+    :return:
+    """
+    global _STAND_IN_FINDER
+
+    if mode not in (RECORD_MODE, REPLAY_MODE):
+        raise ValueError(f"Unknown API stand-in mode '{mode}', expected '{RECORD_MODE}' or '{REPLAY_MODE}'")
+
+    if _STAND_IN_FINDER is not None:
+        sys.meta_path.remove(_STAND_IN_FINDER)
+
+    _STAND_IN_FINDER = StandInFinder(mode, FixtureStore(fixtures_dir), fault_injector or FaultInjector())
+    sys.meta_path.insert(0, _STAND_IN_FINDER)
+
+    for module_name in _STAND_IN_FINDER.stand_in_api_by_module_name:
+        if module_name in sys.modules:
+            _STAND_IN_FINDER.patch_module(sys.modules[module_name])
+
+    logger.info(f"API stand-in installed in {mode} mode, fixtures at {fixtures_dir}")
+
+
+def uninstall():
+    """
+    Remove the stand-in, the patched API functions call the real functions again
+    (functions of synthesized modules raise, as there is no real function to call)
+    :return:
+    """
+    global _STAND_IN_FINDER
+
+    if _STAND_IN_FINDER is not None:
+        sys.meta_path.remove(_STAND_IN_FINDER)
+    _STAND_IN_FINDER = None
+
+
+def get_fault_injector_from_env() -> FaultInjector:
+    seed = int(environ[API_STAND_IN_SEED_ENV_VAR]) if environ.get(API_STAND_IN_SEED_ENV_VAR) else None
+    latency_spec = environ.get(API_STAND_IN_LATENCY_ENV_VAR, "none")
+    use_recorded_latency = latency_spec == RECORDED_LATENCY_SPEC
+
+    latency_model_by_key = dict(map(
+        lambda key_spec_iter_: (
+            key_spec_iter_.split("=", 1)[0].strip(),
+            parse_latency_model(key_spec_iter_.split("=", 1)[1].strip(), seed=seed)
+        ),
+        filter(None, environ.get(API_STAND_IN_LATENCY_FOR_ENV_VAR, "").split(";"))
+    ))
+
+    return FaultInjector(
+        latency_model=KeyedLatencyModel(
+            latency_model_by_key,
+            default_latency_model=parse_latency_model("none" if use_recorded_latency else latency_spec, seed=seed)
+        ),
+        use_recorded_latency=use_recorded_latency,
+        error_rate=float(environ.get(API_STAND_IN_ERROR_RATE_ENV_VAR, 0)),
+        throttle_rate=float(environ.get(API_STAND_IN_THROTTLE_RATE_ENV_VAR, 0)),
+        seed=seed,
+    )
+
+
+def install_from_env() -> bool:
+    """
+    Install the stand-in if API_STAND_IN_MODE is set
+    :return: True if the stand-in was installed
+    """
+    if not environ.get(API_STAND_IN_MODE_ENV_VAR):
+        return False
+
+    install(
+        mode=environ[API_STAND_IN_MODE_ENV_VAR],
+        fixtures_dir=Path(environ.get(API_STAND_IN_FIXTURES_DIR_ENV_VAR, DEFAULT_FIXTURES_DIR)),
+        fault_injector=get_fault_injector_from_env(),
+    )
+    return True
+
+
+# if __name__ == "__main__":
+#     # Record, with the real API credentials
+#     # PYTHONPATH=app/api_stand_in/bootstrap \
+#     # API_STAND_IN_MODE=record API_STAND_IN_FIXTURES_DIR=fixtures \
+#     # python get_draft_payload.py
+#
+#     # Replay, with no network, a lognormal latency on every call and 5% of calls throttled
+#     # PYTHONPATH=app/api_stand_in/bootstrap \
+#     # API_STAND_IN_MODE=replay API_STAND_IN_FIXTURES_DIR=fixtures \
+#     # API_STAND_IN_LATENCY=lognormal:0.1,1 API_STAND_IN_THROTTLE_RATE=0.05 API_STAND_IN_SEED=1 \
+#     # python get_draft_payload.py
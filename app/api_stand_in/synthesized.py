@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+Synthesized API packages, so fixtures can be replayed where the API packages are not installed (i.e in the tests)
+
+A synthesized module answers any attribute the handlers import from it:
+  * Error / Exception class names are error classes (subclasses of SynthesizedError)
+  * Other class names (the API models, i.e WorkflowRunDetail) are dict classes, as the API returns dicts
+  * Function names of the stand-in API modules are stand-ins, their parameters are read from the fixture files
+
+Every synthesized module is a package, so its submodules (i.e orcabus_api_tools.workflow.models) are synthesized too.
+Submodules are only synthesized below a synthesized package, never below an installed one.
+"""
+
+# Standard imports
+import importlib.abc
+import importlib.machinery
+import sys
+from types import ModuleType
+from typing import Callable, Optional
+
+# Local imports
+from .faults import SynthesizedError
+
+# Globals
+SYNTHESIZED_PACKAGE_LIST = [
+    "orcabus_api_tools",
+    "wrapica",
+    "icav2_tools",
+    # The API clients, for their error classes
+    "requests",
+    "libica",
+]
+
+SYNTHESIZED_ATTR = "__stand_in_synthesized__"
+
+
+class SynthesizedModule(ModuleType):
+    def __init__(self, name: str, function_factory: Optional[Callable[[str], Callable]] = None):
+        super().__init__(name)
+        self.__path__ = []
+        self._function_factory = function_factory
+        setattr(self, SYNTHESIZED_ATTR, True)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        if name[0].isupper():
+            value = type(
+                name,
+                (SynthesizedError,) if name.endswith(("Error", "Exception")) else (dict,),
+                {"__module__": self.__name__}
+            )
+        elif self._function_factory is not None:
+            value = self._function_factory(name)
+        else:
+            raise AttributeError(f"Synthesized module '{self.__name__}' has no attribute '{name}'")
+
+        # Keep the same object for every import, so raised errors match the handlers' except clauses
+        setattr(self, name, value)
+        return value
+
+
+class SynthesizedModuleLoader(importlib.abc.Loader):
+    def __init__(self, function_factory: Optional[Callable[[str], Callable]] = None):
+        self.function_factory = function_factory
+
+    def create_module(self, spec):
+        return SynthesizedModule(spec.name, self.function_factory)
+
+    def exec_module(self, module: ModuleType):
+        pass
+
+
+def is_synthesized(obj) -> bool:
+    return getattr(obj, SYNTHESIZED_ATTR, False)
+
+
+def can_synthesize_module(module_name: str) -> bool:
+    """
+    Top level packages in the list can be synthesized, submodules only if their parent is synthesized
+    :param module_name:
+    :return:
+    """
+    parent_module_name, _, _ = module_name.rpartition(".")
+    if not parent_module_name:
+        return module_name in SYNTHESIZED_PACKAGE_LIST
+    return is_synthesized(sys.modules.get(parent_module_name, None))
+
+
+def get_synthesized_module_spec(
+        module_name: str,
+        function_factory: Optional[Callable[[str], Callable]] = None
+) -> importlib.machinery.ModuleSpec:
+    return importlib.machinery.ModuleSpec(
+        module_name,
+        SynthesizedModuleLoader(function_factory),
+        is_package=True
+    )
+
+
+def get_synthesized_function(module_name: str, function_name: str) -> Callable:
+    """
+    A function with no implementation, only its stand-in can be called (in replay mode)
+    :param module_name:
+    :param function_name:
+    :return:
+    """
+    def synthesized_function(*args, **kwargs):
+        raise NotImplementedError(
+            f"{module_name}.{function_name} is synthesized (the package is not installed), it can only be replayed"
+        )
+
+    synthesized_function.__name__ = function_name
+    synthesized_function.__qualname__ = function_name
+    synthesized_function.__module__ = module_name
+    setattr(synthesized_function, SYNTHESIZED_ATTR, True)
+    return synthesized_function
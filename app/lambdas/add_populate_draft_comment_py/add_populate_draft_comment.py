@@ -7,14 +7,39 @@ Provides commentary on state transitions during draft data population:
 - When tags or engine parameters change (requiring a new DRAFT event)
 - When inputs are being populated (which may take time)
 - When no change is detected (listing missing schema fields)
+
+The comment is added to the comment outbox (see flush_comment_outbox) rather than posted on the critical path.
+
+Parked drafts go through the populate loop again and again, so the updating_inputs and no_change_missing_fields
+comments are checked against the comment suppression index first. The index holds a hash of the content
+(comment type and set of missing fields) of the last comment of each type posted to the workflow run.
+Identical content is not posted again within COMMENT_SUPPRESSION_WINDOW_SECONDS, the suppressed checks are counted,
+and once the window rolls over a short 'still waiting (n checks)' comment is posted in its place.
+A window is only started once its comment has been added to the comment outbox,
+so a comment that could not be queued is posted by the next pass.
+
+The index is stored in DynamoDB if COMMENT_SUPPRESSION_INDEX_TABLE_NAME is set,
+otherwise if COMMENT_SUPPRESSION_INDEX_SQLITE_PATH is set, a local SQLite database is used instead (tests and benchmarking).
+Without either, every comment is posted.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
+import json
+import logging
+from hashlib import sha256
 from os import environ
-from typing import Dict, Any
+from time import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
 
 # Layer imports
-from orcabus_api_tools.workflow import add_comment_to_workflow_run
+from pipeline_manager_tools.aws_clients import get_dynamodb_client
+from pipeline_manager_tools.comment_outbox import enqueue_comments
+from pipeline_manager_tools.sqlite_stand_in import sqlite_transaction
 
 # Globals
 WORKFLOW_NAME_ENV_VAR = "WORKFLOW_NAME"
@@ -31,7 +56,255 @@ COMMENT_TEMPLATES = {
     "no_change_missing_fields": "Draft payload has not changed since last population attempt. The following required schema fields are still missing or incomplete:\n{missing_fields_list}\n\nTo resolve this, either:\nA) Wait for upstream processes to complete (FASTQ data availability, unarchiving)\nB) Manually provide the missing attributes via a WorkflowRunUpdate event\n\nFor details on upstream dependencies and manual submission, see: {repo_url}",
 }
 
+# Comment suppression index
+COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR = "COMMENT_SUPPRESSION_INDEX_TABLE_NAME"
+COMMENT_SUPPRESSION_INDEX_SQLITE_PATH_ENV_VAR = "COMMENT_SUPPRESSION_INDEX_SQLITE_PATH"
+COMMENT_SUPPRESSION_WINDOW_SECONDS_ENV_VAR = "COMMENT_SUPPRESSION_WINDOW_SECONDS"
+DEFAULT_COMMENT_SUPPRESSION_WINDOW_SECONDS = 6 * 60 * 60
+COMMENT_SUPPRESSION_INDEX_TABLE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# The populate loop repeats these comments on every pass that finds no change
+SUPPRESSIBLE_COMMENT_TYPES = [
+    "updating_inputs",
+    "no_change_missing_fields",
+]
+
+# Posted in place of a suppressed comment once its window has rolled over
+STILL_WAITING_COMMENT_TEMPLATES = {
+    "updating_inputs": "Still updating inputs (population checks since the last comment: {check_count}).",
+    "no_change_missing_fields": "Still waiting on the same missing schema fields (population checks since the last comment: {check_count}).",
+}
+
+COMMENT_SUPPRESSION_SQLITE_CREATE_TABLE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS comment_suppression_index (
+    workflow_run_id TEXT NOT NULL,
+    comment_type TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    window_started_at REAL NOT NULL,
+    suppressed_count INTEGER NOT NULL,
+    PRIMARY KEY (workflow_run_id, comment_type)
+)
+"""
+
+COMMENT_SUPPRESSION_SQLITE_SELECT_STATEMENT = """
+SELECT content_hash, window_started_at, suppressed_count
+FROM comment_suppression_index
+WHERE workflow_run_id = ? AND comment_type = ?
+"""
+
+COMMENT_SUPPRESSION_SQLITE_INSERT_STATEMENT = """
+INSERT OR IGNORE INTO comment_suppression_index
+    (workflow_run_id, comment_type, content_hash, window_started_at, suppressed_count)
+VALUES (?, ?, ?, ?, 0)
+"""
+
+COMMENT_SUPPRESSION_SQLITE_RESTART_STATEMENT = """
+UPDATE comment_suppression_index
+SET content_hash = ?, window_started_at = ?, suppressed_count = 0
+WHERE workflow_run_id = ? AND comment_type = ? AND window_started_at = ?
+"""
+
+COMMENT_SUPPRESSION_SQLITE_INCREMENT_STATEMENT = """
+UPDATE comment_suppression_index
+SET suppressed_count = suppressed_count + 1
+WHERE workflow_run_id = ? AND comment_type = ?
+"""
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def get_comment_content_hash(comment_type: str, missing_fields: List[str]) -> str:
+    """
+    The content of a populate comment is set by its type and the set of missing fields,
+    the execution arn footer differs on every pass so is not part of the content
+    :param comment_type:
+    :param missing_fields:
+    :return:
+    """
+    return sha256(json.dumps({
+        "commentType": comment_type,
+        "missingFields": sorted(set(missing_fields)),
+    }).encode()).hexdigest()
+
+
+def get_comment_suppression_state(workflow_run_id: str, comment_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the content hash of the last comment of this type posted to the workflow run,
+    when its suppression window started and how many checks have been suppressed since
+    :param workflow_run_id:
+    :param comment_type:
+    :return:
+    """
+    if environ.get(COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        comment_suppression_item = get_dynamodb_client().get_item(
+            TableName=environ[COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR],
+            Key={
+                "workflow_run_id": {"S": workflow_run_id},
+                "comment_type": {"S": comment_type},
+            },
+            ConsistentRead=True,
+        ).get("Item", None)
+
+        if comment_suppression_item is None:
+            return None
 
+        return {
+            "contentHash": comment_suppression_item['content_hash']['S'],
+            "windowStartedAt": float(comment_suppression_item['window_started_at']['N']),
+            "suppressedCount": int(comment_suppression_item['suppressed_count']['N']),
+        }
+
+    with sqlite_transaction(
+        environ[COMMENT_SUPPRESSION_INDEX_SQLITE_PATH_ENV_VAR], [COMMENT_SUPPRESSION_SQLITE_CREATE_TABLE_STATEMENT]
+    ) as connection:
+        comment_suppression_row = connection.execute(
+            COMMENT_SUPPRESSION_SQLITE_SELECT_STATEMENT,
+            (workflow_run_id, comment_type)
+        ).fetchone()
+
+    if comment_suppression_row is None:
+        return None
+
+    return {
+        "contentHash": comment_suppression_row[0],
+        "windowStartedAt": comment_suppression_row[1],
+        "suppressedCount": comment_suppression_row[2],
+    }
+
+
+def start_comment_suppression_window(
+        workflow_run_id: str,
+        comment_type: str,
+        content_hash: str,
+        previous_window_started_at: Optional[float]
+) -> bool:
+    """
+    Start a new suppression window for the comment, call once the comment has been added to the comment outbox.
+    Only if the window has not been restarted since it was read (a concurrent pass already queued the comment)
+    :param workflow_run_id:
+    :param comment_type:
+    :param content_hash:
+    :param previous_window_started_at: The start of the window that was read, None if there was no window
+    :return: False if a concurrent pass started the window first
+    """
+    window_started_at = time()
+
+    if environ.get(COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        try:
+            get_dynamodb_client().put_item(
+                TableName=environ[COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR],
+                Item={
+                    "workflow_run_id": {"S": workflow_run_id},
+                    "comment_type": {"S": comment_type},
+                    "content_hash": {"S": content_hash},
+                    "window_started_at": {"N": str(window_started_at)},
+                    "suppressed_count": {"N": "0"},
+                    "ttl": {"N": str(int(window_started_at) + COMMENT_SUPPRESSION_INDEX_TABLE_TTL_SECONDS)},
+                },
+                **(
+                    {
+                        "ConditionExpression": "attribute_not_exists(workflow_run_id)",
+                    }
+                    if previous_window_started_at is None else
+                    {
+                        "ConditionExpression": "window_started_at = :previous_window_started_at",
+                        "ExpressionAttributeValues": {
+                            ":previous_window_started_at": {"N": str(previous_window_started_at)},
+                        },
+                    }
+                )
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    with sqlite_transaction(
+        environ[COMMENT_SUPPRESSION_INDEX_SQLITE_PATH_ENV_VAR], [COMMENT_SUPPRESSION_SQLITE_CREATE_TABLE_STATEMENT]
+    ) as connection:
+        if previous_window_started_at is None:
+            cursor = connection.execute(
+                COMMENT_SUPPRESSION_SQLITE_INSERT_STATEMENT,
+                (workflow_run_id, comment_type, content_hash, window_started_at)
+            )
+        else:
+            cursor = connection.execute(
+                COMMENT_SUPPRESSION_SQLITE_RESTART_STATEMENT,
+                (content_hash, window_started_at, workflow_run_id, comment_type, previous_window_started_at)
+            )
+
+    return cursor.rowcount > 0
+
+
+def add_suppressed_check(workflow_run_id: str, comment_type: str):
+    if environ.get(COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        get_dynamodb_client().update_item(
+            TableName=environ[COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR],
+            Key={
+                "workflow_run_id": {"S": workflow_run_id},
+                "comment_type": {"S": comment_type},
+            },
+            UpdateExpression="ADD suppressed_count :one",
+            ExpressionAttributeValues={
+                ":one": {"N": "1"},
+            }
+        )
+        return
+
+    with sqlite_transaction(
+        environ[COMMENT_SUPPRESSION_INDEX_SQLITE_PATH_ENV_VAR], [COMMENT_SUPPRESSION_SQLITE_CREATE_TABLE_STATEMENT]
+    ) as connection:
+        connection.execute(
+            COMMENT_SUPPRESSION_SQLITE_INCREMENT_STATEMENT,
+            (workflow_run_id, comment_type)
+        )
+
+
+def get_suppressed_comment_body(
+        workflow_run_id: str,
+        comment_type: str,
+        missing_fields: List[str]
+) -> Tuple[bool, Optional[str], Optional[float]]:
+    """
+    Check the comment against the comment suppression index.
+    A comment to post does not start its window here, see start_comment_suppression_window
+    :param workflow_run_id:
+    :param comment_type:
+    :param missing_fields:
+    :return: (
+        is_suppressed,
+        the 'still waiting' body to post in place of the comment, if its window has rolled over,
+        the start of the window the posted comment replaces (None if there was no window)
+    )
+    """
+    content_hash = get_comment_content_hash(comment_type, missing_fields)
+    comment_suppression_state = get_comment_suppression_state(workflow_run_id, comment_type)
+
+    # New content, post it
+    if comment_suppression_state is None or comment_suppression_state['contentHash'] != content_hash:
+        return False, None, (
+            comment_suppression_state['windowStartedAt']
+            if comment_suppression_state is not None
+            else None
+        )
+
+    # Identical content within the window
+    window_seconds = int(environ.get(
+        COMMENT_SUPPRESSION_WINDOW_SECONDS_ENV_VAR, DEFAULT_COMMENT_SUPPRESSION_WINDOW_SECONDS
+    ))
+    if time() - comment_suppression_state['windowStartedAt'] < window_seconds:
+        add_suppressed_check(workflow_run_id, comment_type)
+        return True, None, None
+
+    # The window has rolled over, summarise the checks since the last comment (including this one)
+    return False, STILL_WAITING_COMMENT_TEMPLATES[comment_type].format(
+        check_count=comment_suppression_state['suppressedCount'] + 1
+    ), comment_suppression_state['windowStartedAt']
+
+
+@trace_invocation
 def handler(event: Dict[str, Any], context) -> Dict[str, bool]:
     """
     Add a comment to the workflow run indicating the current populate-draft-data stage.
@@ -46,7 +319,7 @@ def handler(event: Dict[str, Any], context) -> Dict[str, bool]:
 
     Returns:
     {
-        "commentAdded": true
+        "commentAdded": true  // false if the comment was suppressed
     }
     """
     workflow_run_id = event["workflowRunId"]
@@ -58,11 +331,27 @@ def handler(event: Dict[str, Any], context) -> Dict[str, bool]:
     author = COMMENT_AUTHOR.format(workflow_name=workflow_name)
     repo_url = environ.get(REPOSITORY_GITHUB_URL_ENV_VAR, "")
 
+    # Check repetitive comments against the comment suppression index
+    is_suppressible = comment_type in SUPPRESSIBLE_COMMENT_TYPES and (
+        environ.get(COMMENT_SUPPRESSION_INDEX_TABLE_NAME_ENV_VAR, None) is not None or
+        environ.get(COMMENT_SUPPRESSION_INDEX_SQLITE_PATH_ENV_VAR, None) is not None
+    )
+    still_waiting_body = None
+    previous_window_started_at = None
+    if is_suppressible:
+        is_suppressed, still_waiting_body, previous_window_started_at = get_suppressed_comment_body(
+            workflow_run_id, comment_type, missing_fields
+        )
+        if is_suppressed:
+            return {"commentAdded": False}
+
     # Build comment body
     body = COMMENT_TEMPLATES.get(comment_type, f"State update: {comment_type}")
 
     # Handle the no_change_missing_fields template specially
-    if comment_type == "no_change_missing_fields" and missing_fields:
+    if still_waiting_body is not None:
+        body = still_waiting_body
+    elif comment_type == "no_change_missing_fields" and missing_fields:
         missing_fields_list = "\n- ".join([""] + missing_fields)  # prefix each with \n-
         body = body.format(missing_fields_list=missing_fields_list, repo_url=repo_url)
     elif comment_type == "no_change_missing_fields":
@@ -78,10 +367,17 @@ def handler(event: Dict[str, Any], context) -> Dict[str, bool]:
         available = MAX_COMMENT_LENGTH - len(footer) - len(TRUNCATION_SUFFIX) - 1  # -1 for newline
         full_comment = f"{body[:available]}{TRUNCATION_SUFFIX}\n{footer}"
 
-    add_comment_to_workflow_run(
-        workflow_run_orcabus_id=workflow_run_id,
-        comment=full_comment,
+    enqueue_comments(
+        workflow_run_id=workflow_run_id,
         author=author,
+        comment_list=[full_comment],
     )
 
+    # Start the suppression window now the comment is queued
+    if is_suppressible and not start_comment_suppression_window(
+        workflow_run_id, comment_type, get_comment_content_hash(comment_type, missing_fields),
+        previous_window_started_at=previous_window_started_at
+    ):
+        logger.info(f"A concurrent pass started the {comment_type} suppression window of {workflow_run_id} first")
+
     return {"commentAdded": True}
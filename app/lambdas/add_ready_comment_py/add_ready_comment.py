@@ -5,14 +5,19 @@ Generate a workflow run comment when the readyEventToIcav2WesRequestEvent state
 
 Informs the user that the workflow run is transitioning from READY to SUBMITTED,
 providing the Step Functions execution ARN for traceability.
+
+The comment is added to the comment outbox (see flush_comment_outbox) rather than posted on the critical path.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
 from os import environ
 from typing import Dict, Any
 
 # Layer imports
-from orcabus_api_tools.workflow import add_comment_to_workflow_run
+from pipeline_manager_tools.comment_outbox import enqueue_comments
 
 # Globals
 WORKFLOW_NAME_ENV_VAR = "WORKFLOW_NAME"
@@ -21,6 +26,7 @@ MAX_COMMENT_LENGTH = 1024
 TRUNCATION_SUFFIX = "\n... [truncated, see execution ARN for full detail]"
 
 
+@trace_invocation
 def handler(event: Dict[str, Any], context) -> Dict[str, bool]:
     """
     Add a comment to the workflow run indicating the READY-to-SUBMITTED transition has started.
@@ -56,10 +62,10 @@ def handler(event: Dict[str, Any], context) -> Dict[str, bool]:
         available = MAX_COMMENT_LENGTH - len(footer) - len(TRUNCATION_SUFFIX) - 1
         full_comment = f"{body[:available]}{TRUNCATION_SUFFIX}\n{footer}"
 
-    add_comment_to_workflow_run(
-        workflow_run_orcabus_id=workflow_run_id,
-        comment=full_comment,
+    enqueue_comments(
+        workflow_run_id=workflow_run_id,
         author=author,
+        comment_list=[full_comment],
     )
 
     return {"commentAdded": True}
@@ -2,21 +2,30 @@
 
 """
 The ICA analysis has failed, we add a comment to the analysis
+
+The workflow run is read through the workflow run cache (invalidated by WorkflowRunStateChange events)
+
+The comment is added to the comment outbox (see flush_comment_outbox) rather than posted on the critical path
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
 from os import environ
 
 # Local imports
-from orcabus_api_tools.workflow import (
-    add_comment_to_workflow_run, get_workflow_run_from_portal_run_id
-)
+from pipeline_manager_tools.comment_outbox import enqueue_comments
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.workflow_run_cache import get_cached_workflow_run_from_portal_run_id
 
 # Globals
 WORKFLOW_NAME_ENV_VAR = "WORKFLOW_NAME"
 COMMENT_AUTHOR = "{WORKFLOW_NAME}-icav2-wes-event-service"
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context) -> dict:
     """
     Add a comment to the ICA analysis indicating failure.
@@ -30,7 +39,10 @@ def handler(event, context) -> dict:
     execution_arn = event.get("executionArn", "")
 
     # Get the workflow run id from the portal run id
-    workflow_run_id = get_workflow_run_from_portal_run_id(portal_run_id)["orcabusId"]
+    workflow_run_id = get_cached_workflow_run_from_portal_run_id(
+        portal_run_id,
+        consistent_read=event.get("consistentRead", False)
+    )["orcabusId"]
 
     # Construct the comment body
     body = f"The workflow has failed with error type '{error_type}', full traceback can be found at '{error_message_uri}'"
@@ -44,13 +56,13 @@ def handler(event, context) -> dict:
         available = max_length - len(footer) - len(truncation_suffix) - 1
         full_comment = f"{body[:available]}{truncation_suffix}\n{footer}"
 
-    # Construct the comment
-    add_comment_to_workflow_run(
-        workflow_run_orcabus_id=workflow_run_id,
-        comment=full_comment,
+    # Queue the comment
+    enqueue_comments(
+        workflow_run_id=workflow_run_id,
         author=COMMENT_AUTHOR.format(
             WORKFLOW_NAME=environ.get(WORKFLOW_NAME_ENV_VAR, "unknown")
-        )
+        ),
+        comment_list=[full_comment]
     )
 
     return {
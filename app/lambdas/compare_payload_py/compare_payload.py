@@ -7,9 +7,13 @@ We dont want to accidentally end up in an infinite loop, so we only want to push
 the payload has changed
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard library imports
 from deepdiff import DeepDiff
 
+@trace_invocation
 def handler(event, context):
     """
     Get the latest payload from the portal run id and compare it to the new object payload
@@ -5,34 +5,575 @@ Given the outputs of an icav2 wes event, convert to a wrsc event
 
 If the workflow has succeeded, we need to generate the dnaRnaOncoanalyserAnalysisRelPath
 which is just the groupId from the event inputs.
+
+The latest payload is read through the payload store (see pipeline_manager_tools.payload_store),
+only payload bodies we haven't stored yet are downloaded.
+
+If the run was an incremental reprocessing run, the prior output directory of each reused process
+(from the reusedProcesses tag of the WES request) is added to the outputs of the SUCCEEDED event.
+
+Once the WorkflowRunUpdate event has been published, the state machine hands the event back (through the
+publishedEvent input) to commit it: a SUCCEEDED result is added to the result reuse index under the input fingerprint
+(from the WES request tags), so a later READY event with identical inputs can link these outputs instead,
+a FAILED run is added with its cache uri, so a later READY event with identical inputs resumes from its cache,
+and the status ledger of the portal run is advanced.
+
+If the WES_STATE_CACHE_TABLE_NAME (or WES_STATUS_LEDGER_SQLITE_PATH) env var is set,
+intermediate (non-terminal) state changes are coalesced per portal run:
+  * The workflow run and latest payload are kept in the WES state cache on the first state change of the portal run,
+    non-terminal state changes are built from the cached copy without any workflow manager api calls
+  * Each non-terminal state change is registered as the latest state change of the portal run (coalesceId),
+    the state machine waits coalesceWindowSeconds and then asks (through the coalescedEvent input)
+    if it is still the latest, only the latest of a burst is emitted
+  * Terminal state changes are always built from the workflow run read with consistentRead
+    (the state machine sets it for terminal state changes) and emitted immediately,
+    any non-terminal state changes still waiting (or arriving late) are then dropped
+
+Each portal run has a status ledger holding the highest WES status published so far (statuses are ranked
+in their legal order, terminal statuses rank highest). A state change that does not rank above the ledger
+(a late RUNNING after SUCCEEDED, a redelivered FAILED) is dropped before any api call is made.
+The ledger is only advanced (with a conditional write) once the state change has been published,
+so a state change whose execution failed before it was published is not dropped when it is retried.
+
+The ledger check alone cannot stop two executions of the same terminal state change that run at once
+(both pass the check before either has published), so a terminal state change is first claimed
+for its execution with a conditional write, before any comment is added or event is emitted.
+Only the claiming execution (which may be retried or redriven, keeping its execution arn) goes on,
+the other executions are dropped. A claim older than TERMINAL_CLAIM_TIMEOUT_SECONDS can be taken over,
+so a terminal state change whose execution never published it is not lost.
+
+The coalescing state, ledger and claims are kept in the WES state cache table, or if WES_STATUS_LEDGER_SQLITE_PATH
+is set, in a local SQLite database instead (tests and benchmarking).
+
+Failure comments are added to the comment outbox (see flush_comment_outbox) rather than posted on the critical path.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
-from copy import deepcopy
+import gzip
+import json
+import uuid
 from datetime import datetime, timezone
 from os import environ
+from time import time
+from typing import Dict, Any, Optional, Tuple
+
+from botocore.exceptions import ClientError
 
 # Layer helpers
-from orcabus_api_tools.workflow import (
-    get_latest_payload_from_workflow_run,
-    get_workflow_run_from_portal_run_id, add_comment_to_workflow_run,
-)
+from orcabus_api_tools.workflow.models import WorkflowRunDetail
+from pipeline_manager_tools.aws_clients import get_dynamodb_client
+from pipeline_manager_tools.comment_outbox import enqueue_comments
+from pipeline_manager_tools.incremental_processes import get_group_outputs, get_prior_run, get_reused_process_outputs
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.result_reuse_index import put_failed_run_in_reuse_index, put_result_in_reuse_index
+from pipeline_manager_tools.sqlite_stand_in import sqlite_transaction
+from pipeline_manager_tools.workflow_run_cache import get_cached_workflow_run_from_portal_run_id
+from pipeline_manager_tools.payload_store import get_stored_latest_payload_from_workflow_run
 
 # Globals
 COMMENT_AUTHOR = "{WORKFLOW_NAME}-icav2-wes-translation-service"
 WORKFLOW_NAME_ENV_VAR = "WORKFLOW_NAME"
 
+# Incremental reprocessing
+REUSED_PROCESSES_TAG_KEY = "reusedProcesses"
+
+# WES state cache
+WES_STATE_CACHE_TABLE_NAME_ENV_VAR = "WES_STATE_CACHE_TABLE_NAME"
+WES_STATE_CACHE_TABLE_TTL_SECONDS = 7 * 24 * 60 * 60
+COALESCE_WINDOW_SECONDS = 30
+TERMINAL_STATUS_LIST = [
+    'SUCCEEDED',
+    'FAILED',
+    'ABORTED',
+]
+
+# WES status ledger
+WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR = "WES_STATUS_LEDGER_SQLITE_PATH"
+# Longer than an execution of the state machine (with its retries)
+TERMINAL_CLAIM_TIMEOUT_SECONDS = 15 * 60
+TERMINAL_STATUS_RANK = 9
+# The legal order of the WES statuses, unknown statuses are not checked against the ledger
+WES_STATUS_RANK_MAP: Dict[str, int] = {
+    'SUBMITTED': 0,
+    'REQUESTED': 0,
+    'PENDING': 1,
+    'QUEUED': 1,
+    'INITIALIZING': 2,
+    'PREPARING_INPUTS': 3,
+    'RUNNING': 4,
+    'IN_PROGRESS': 4,
+    'GENERATING_OUTPUTS': 5,
+    'ABORTING': 6,
+    **dict(map(
+        lambda status_iter_: (status_iter_, TERMINAL_STATUS_RANK),
+        TERMINAL_STATUS_LIST
+    )),
+}
+
+SQLITE_CREATE_TABLE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS wes_status_ledger (
+    portal_run_id TEXT NOT NULL PRIMARY KEY,
+    status TEXT NOT NULL,
+    status_rank INTEGER NOT NULL
+)
+"""
+
+SQLITE_CREATE_CLAIM_TABLE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS wes_terminal_claim (
+    portal_run_id TEXT NOT NULL PRIMARY KEY,
+    terminal_status TEXT NOT NULL,
+    claimed_by TEXT NOT NULL,
+    claimed_at REAL NOT NULL
+)
+"""
+
+SQLITE_CLAIM_STATEMENT = """
+INSERT INTO wes_terminal_claim (portal_run_id, terminal_status, claimed_by, claimed_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (portal_run_id) DO UPDATE SET
+    terminal_status = excluded.terminal_status,
+    claimed_by = excluded.claimed_by,
+    claimed_at = excluded.claimed_at
+WHERE wes_terminal_claim.claimed_by = excluded.claimed_by OR wes_terminal_claim.claimed_at < ?
+"""
+
+SQLITE_CREATE_WES_STATE_TABLE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS wes_state (
+    portal_run_id TEXT NOT NULL PRIMARY KEY,
+    workflow_run TEXT,
+    latest_payload TEXT,
+    latest_coalesce_id TEXT,
+    expires_at REAL NOT NULL
+)
+"""
+
+SQLITE_SELECT_WES_STATE_STATEMENT = """
+SELECT
+    wes_state.workflow_run, wes_state.latest_payload, wes_state.latest_coalesce_id,
+    wes_terminal_claim.terminal_status
+FROM (SELECT ? AS portal_run_id) AS portal_run
+LEFT JOIN wes_state
+    ON wes_state.portal_run_id = portal_run.portal_run_id AND wes_state.expires_at > ?
+LEFT JOIN wes_terminal_claim
+    ON wes_terminal_claim.portal_run_id = portal_run.portal_run_id
+"""
+
+SQLITE_REGISTER_NON_TERMINAL_STATEMENT = """
+INSERT INTO wes_state (portal_run_id, workflow_run, latest_payload, latest_coalesce_id, expires_at)
+SELECT ?, ?, ?, ?, ?
+WHERE NOT EXISTS (SELECT 1 FROM wes_terminal_claim WHERE portal_run_id = ?)
+ON CONFLICT (portal_run_id) DO UPDATE SET
+    workflow_run = COALESCE(excluded.workflow_run, wes_state.workflow_run),
+    latest_payload = COALESCE(excluded.latest_payload, wes_state.latest_payload),
+    latest_coalesce_id = excluded.latest_coalesce_id,
+    expires_at = excluded.expires_at
+"""
+
+SQLITE_ADVANCE_STATEMENT = """
+INSERT INTO wes_status_ledger (portal_run_id, status, status_rank)
+VALUES (?, ?, ?)
+ON CONFLICT (portal_run_id) DO UPDATE SET
+    status = excluded.status,
+    status_rank = excluded.status_rank
+WHERE excluded.status_rank > wes_status_ledger.status_rank
+"""
+
+
+def is_coalescing_enabled() -> bool:
+    """
+    Non-terminal state changes are coalesced if there is somewhere to keep the coalescing state
+    :return:
+    """
+    return (
+        environ.get(WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR, None) is not None or
+        environ.get(WES_STATE_CACHE_TABLE_NAME_ENV_VAR, None) is not None
+    )
+
+
+def get_wes_state(portal_run_id: str) -> Optional[Dict[str, Any]]:
+    if environ.get(WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR, None) is not None:
+        with sqlite_transaction(
+            environ[WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR],
+            [SQLITE_CREATE_WES_STATE_TABLE_STATEMENT, SQLITE_CREATE_CLAIM_TABLE_STATEMENT]
+        ) as connection:
+            wes_state_row = connection.execute(SQLITE_SELECT_WES_STATE_STATEMENT, (portal_run_id, time())).fetchone()
+
+        if all(map(lambda value_iter_: value_iter_ is None, wes_state_row)):
+            return None
+
+        return {
+            "workflowRun": json.loads(wes_state_row[0]) if wes_state_row[0] is not None else None,
+            "latestPayload": json.loads(wes_state_row[1]) if wes_state_row[1] is not None else None,
+            "latestCoalesceId": wes_state_row[2],
+            "terminalStatus": wes_state_row[3],
+        }
+
+    wes_state_item = get_dynamodb_client().get_item(
+        TableName=environ[WES_STATE_CACHE_TABLE_NAME_ENV_VAR],
+        Key={"portal_run_id": {"S": portal_run_id}}
+    ).get("Item", None)
+
+    if wes_state_item is None:
+        return None
+
+    return {
+        "workflowRun": (
+            json.loads(wes_state_item['workflow_run']['S'])
+            if "workflow_run" in wes_state_item
+            else None
+        ),
+        "latestPayload": (
+            json.loads(gzip.decompress(wes_state_item['latest_payload']['B']))
+            if "latest_payload" in wes_state_item
+            else None
+        ),
+        "latestCoalesceId": wes_state_item.get('latest_coalesce_id', {}).get('S', None),
+        "terminalStatus": wes_state_item.get('terminal_status', {}).get('S', None),
+    }
+
+
+def register_non_terminal_wes_state(
+        portal_run_id: str,
+        coalesce_id: str,
+        workflow_run: Optional[WorkflowRunDetail] = None,
+        latest_payload: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """
+    Register the state change as the latest non-terminal state change of the portal run,
+    along with the workflow run and latest payload if they are not yet cached.
+    Returns False if the portal run has already reached a terminal state.
+    :param portal_run_id:
+    :param coalesce_id:
+    :param workflow_run:
+    :param latest_payload:
+    :return:
+    """
+    is_caching = workflow_run is not None and latest_payload is not None
+
+    if environ.get(WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR, None) is not None:
+        with sqlite_transaction(
+            environ[WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR],
+            [SQLITE_CREATE_WES_STATE_TABLE_STATEMENT, SQLITE_CREATE_CLAIM_TABLE_STATEMENT]
+        ) as connection:
+            cursor = connection.execute(
+                SQLITE_REGISTER_NON_TERMINAL_STATEMENT,
+                (
+                    portal_run_id,
+                    json.dumps(workflow_run) if is_caching else None,
+                    json.dumps(latest_payload) if is_caching else None,
+                    coalesce_id,
+                    time() + WES_STATE_CACHE_TABLE_TTL_SECONDS,
+                    portal_run_id,
+                )
+            )
+        return cursor.rowcount > 0
+
+    update_expression_list = ["latest_coalesce_id = :coalesce_id", "#ttl = :ttl"]
+    expression_attribute_values = {
+        ":coalesce_id": {"S": coalesce_id},
+        ":ttl": {"N": str(int(time()) + WES_STATE_CACHE_TABLE_TTL_SECONDS)},
+    }
+
+    if is_caching:
+        update_expression_list.extend(["workflow_run = :workflow_run", "latest_payload = :latest_payload"])
+        expression_attribute_values.update({
+            ":workflow_run": {"S": json.dumps(workflow_run)},
+            ":latest_payload": {"B": gzip.compress(json.dumps(latest_payload).encode())},
+        })
+
+    try:
+        get_dynamodb_client().update_item(
+            TableName=environ[WES_STATE_CACHE_TABLE_NAME_ENV_VAR],
+            Key={"portal_run_id": {"S": portal_run_id}},
+            UpdateExpression="SET " + ", ".join(update_expression_list),
+            ConditionExpression="attribute_not_exists(terminal_status)",
+            ExpressionAttributeNames={"#ttl": "ttl"},
+            ExpressionAttributeValues=expression_attribute_values,
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+    return True
+
+
+def claim_terminal_wes_state(portal_run_id: str, status: str, execution_arn: str) -> bool:
+    """
+    Claim the terminal state change of the portal run for the execution, before any side effect.
+    Non-terminal state changes still waiting to be emitted are dropped.
+    Returns False if another execution holds the claim (and it has not timed out)
+    :param portal_run_id:
+    :param status:
+    :param execution_arn:
+    :return:
+    """
+    claimed_at = time()
+
+    if environ.get(WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR, None) is not None:
+        with sqlite_transaction(
+            environ[WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR], [SQLITE_CREATE_CLAIM_TABLE_STATEMENT]
+        ) as connection:
+            cursor = connection.execute(
+                SQLITE_CLAIM_STATEMENT,
+                (portal_run_id, status, execution_arn, claimed_at, claimed_at - TERMINAL_CLAIM_TIMEOUT_SECONDS)
+            )
+        return cursor.rowcount > 0
+
+    table_name = environ.get(WES_STATE_CACHE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return True
+
+    try:
+        get_dynamodb_client().update_item(
+            TableName=table_name,
+            Key={"portal_run_id": {"S": portal_run_id}},
+            UpdateExpression=(
+                "SET terminal_status = :terminal_status, claimed_by = :execution_arn, claimed_at = :claimed_at, "
+                "#ttl = :ttl "
+                "REMOVE latest_coalesce_id"
+            ),
+            ConditionExpression=(
+                "attribute_not_exists(terminal_status) OR "
+                "claimed_by = :execution_arn OR "
+                "claimed_at < :claim_expired_before"
+            ),
+            ExpressionAttributeNames={"#ttl": "ttl"},
+            ExpressionAttributeValues={
+                ":terminal_status": {"S": status},
+                ":execution_arn": {"S": execution_arn},
+                ":claimed_at": {"N": str(claimed_at)},
+                ":claim_expired_before": {"N": str(claimed_at - TERMINAL_CLAIM_TIMEOUT_SECONDS)},
+                ":ttl": {"N": str(int(claimed_at) + WES_STATE_CACHE_TABLE_TTL_SECONDS)},
+            },
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+    return True
+
+
+def get_non_terminal_workflow_run_and_payload(
+        portal_run_id: str,
+        coalesce_id: str,
+) -> Optional[Tuple[WorkflowRunDetail, Dict[str, Any]]]:
+    """
+    Get the workflow run and latest payload for a non-terminal state change from the WES state cache
+    (fetching and caching them on the first state change of the portal run),
+    and register the state change as the latest of the portal run.
+    Returns None if the portal run has already reached a terminal state.
+    :param portal_run_id:
+    :param coalesce_id:
+    :return:
+    """
+    wes_state = get_wes_state(portal_run_id)
+
+    if wes_state is not None and wes_state['terminalStatus'] is not None:
+        return None
+
+    if wes_state is not None and wes_state['workflowRun'] is not None and wes_state['latestPayload'] is not None:
+        if not register_non_terminal_wes_state(portal_run_id, coalesce_id):
+            return None
+        return wes_state['workflowRun'], wes_state['latestPayload']
+
+    workflow_run = get_cached_workflow_run_from_portal_run_id(portal_run_id)
+    latest_payload = get_stored_latest_payload_from_workflow_run(workflow_run)
+
+    if not register_non_terminal_wes_state(
+        portal_run_id, coalesce_id,
+        workflow_run=workflow_run,
+        latest_payload=latest_payload,
+    ):
+        return None
+
+    return workflow_run, latest_payload
+
+
+def get_ledger_status_rank(portal_run_id: str) -> Optional[int]:
+    """
+    Get the rank of the highest status published for the portal run (if any)
+    :param portal_run_id:
+    :return:
+    """
+    if environ.get(WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR, None) is not None:
+        with sqlite_transaction(
+            environ[WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR], [SQLITE_CREATE_TABLE_STATEMENT]
+        ) as connection:
+            ledger_row = connection.execute(
+                "SELECT status_rank FROM wes_status_ledger WHERE portal_run_id = ?",
+                (portal_run_id,)
+            ).fetchone()
+        return ledger_row[0] if ledger_row is not None else None
+
+    table_name = environ.get(WES_STATE_CACHE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return None
+
+    wes_state_item = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key={"portal_run_id": {"S": portal_run_id}},
+        ProjectionExpression="ledger_status_rank",
+    ).get("Item", None)
+
+    if wes_state_item is None or "ledger_status_rank" not in wes_state_item:
+        return None
+
+    return int(wes_state_item['ledger_status_rank']['N'])
+
+
+def advance_ledger_status(portal_run_id: str, status: str) -> bool:
+    """
+    Conditionally advance the ledger to the status, call once the state change has been published.
+    Returns False if the ledger already holds a status of the same or a higher rank
+    :param portal_run_id:
+    :param status:
+    :return:
+    """
+    status_rank = WES_STATUS_RANK_MAP.get(status, None)
+    if status_rank is None:
+        return True
+
+    if environ.get(WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR, None) is not None:
+        with sqlite_transaction(
+            environ[WES_STATUS_LEDGER_SQLITE_PATH_ENV_VAR], [SQLITE_CREATE_TABLE_STATEMENT]
+        ) as connection:
+            cursor = connection.execute(SQLITE_ADVANCE_STATEMENT, (portal_run_id, status, status_rank))
+        return cursor.rowcount > 0
+
+    table_name = environ.get(WES_STATE_CACHE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return True
+
+    try:
+        get_dynamodb_client().update_item(
+            TableName=table_name,
+            Key={"portal_run_id": {"S": portal_run_id}},
+            UpdateExpression="SET ledger_status = :status, ledger_status_rank = :status_rank, #ttl = :ttl",
+            ConditionExpression="attribute_not_exists(ledger_status_rank) OR ledger_status_rank < :status_rank",
+            ExpressionAttributeNames={"#ttl": "ttl"},
+            ExpressionAttributeValues={
+                ":status": {"S": status},
+                ":status_rank": {"N": str(status_rank)},
+                ":ttl": {"N": str(int(time()) + WES_STATE_CACHE_TABLE_TTL_SECONDS)},
+            },
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+    return True
+
 
+def is_stale_or_duplicate_status(portal_run_id: str, status: str) -> bool:
+    """
+    A status is stale (or a duplicate) if it does not rank above the ledger status of the portal run
+    :param portal_run_id:
+    :param status:
+    :return:
+    """
+    status_rank = WES_STATUS_RANK_MAP.get(status, None)
+    if status_rank is None:
+        return False
+
+    ledger_status_rank = get_ledger_status_rank(portal_run_id)
+
+    return ledger_status_rank is not None and status_rank <= ledger_status_rank
+
+
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Perform the following steps:
     1. Get portal run ID from ICAv2 WES Event Tags
     2. Look up workflow run / payload using the portal run ID
+       (from the WES state cache for non-terminal state changes)
     3. Generate the WRSC Event payload based on the existing WRSC Event payload
+
+    Input:
+      {
+        "icav2WesStateChangeEvent": {"status": "RUNNING", "tags": {"portalRunId": "..."}, ...},
+        "executionArn": "arn:aws:states:...",  (claims a terminal state change for the execution)
+        "consistentRead": true  (terminal state changes, read the workflow run from the workflow manager)
+      }
+
+    Output:
+      {
+        "workflowRunStateChangeEvent": {...},
+        "coalesceId": "<uuid>",  (non-terminal state changes only, when coalescing)
+        "coalesceWindowSeconds": 30
+      }
+      or {"isDropped": true} for a stale or duplicate state change,
+      a terminal state change claimed by another execution,
+      or a non-terminal state change after the portal run reached a terminal state
+
+    Coalesced Event Input:
+      {"coalescedEvent": {"portalRunId": "...", "coalesceId": "<uuid>"}}
+
+    Coalesced Event Output:
+      {"isLatest": true}  — no later state change of the portal run has been registered, emit this one
+
+    Published Event Input (once the WorkflowRunUpdate event has been published, to commit it):
+      {
+        "publishedEvent": {
+          "portalRunId": "...", "status": "SUCCEEDED", "inputFingerprint": "<sha256>" (or null),
+          "outputUri": "s3://...", "cacheUri": "s3://..." (or null), "outputs": {...} (or null)
+        }
+      }
+
+    Published Event Output:
+      {"isLedgerAdvanced": true}  — false if the ledger already held the status (a duplicate was published)
+
     :param event:
     :param context:
     :return:
     """
+    # Check a coalesced state change is still the latest after the coalescing window
+    if event.get('coalescedEvent', None) is not None:
+        wes_state = get_wes_state(event['coalescedEvent']['portalRunId'])
+        return {
+            "isLatest": (
+                wes_state is not None and
+                wes_state['terminalStatus'] is None and
+                wes_state['latestCoalesceId'] == event['coalescedEvent']['coalesceId']
+            )
+        }
+
+    # Commit a published state change
+    if event.get('publishedEvent', None) is not None:
+        published_event = event['publishedEvent']
+        # Index the result of a SUCCEEDED event, so identical inputs can reuse it
+        if (
+                published_event['status'] == 'SUCCEEDED' and
+                published_event.get('inputFingerprint', None) is not None
+        ):
+            put_result_in_reuse_index(
+                input_fingerprint=published_event['inputFingerprint'],
+                portal_run_id=published_event['portalRunId'],
+                output_uri=published_event['outputUri'],
+                outputs=published_event['outputs'],
+            )
+        # Index a FAILED event, so a new run with the same inputs resumes from its cache
+        if (
+                published_event['status'] == 'FAILED' and
+                published_event.get('inputFingerprint', None) is not None and
+                published_event.get('cacheUri', None) is not None
+        ):
+            put_failed_run_in_reuse_index(
+                input_fingerprint=published_event['inputFingerprint'],
+                portal_run_id=published_event['portalRunId'],
+                cache_uri=published_event['cacheUri'],
+            )
+        # Advanced last, a commit that fails part way is retried in full
+        return {
+            "isLedgerAdvanced": advance_ledger_status(published_event['portalRunId'], published_event['status'])
+        }
 
     # ICAV2 WES State Change Event payload
     icav2_wes_event = event['icav2WesStateChangeEvent']
@@ -43,39 +584,76 @@ def handler(event, context):
     # Get the ICAv2 analysis ID from the WES event
     icav2_analysis_id = icav2_wes_event.get('icav2AnalysisId')
 
-    # Get the workflow run using the portal run ID
-    workflow_run = get_workflow_run_from_portal_run_id(portal_run_id)
+    # Drop stale and duplicate state changes before any api calls
+    if is_stale_or_duplicate_status(portal_run_id, icav2_wes_event['status']):
+        return {
+            "isDropped": True
+        }
+
+    is_terminal = icav2_wes_event['status'] in TERMINAL_STATUS_LIST
+    coalesce_id: Optional[str] = None
+
+    # Only one execution of a terminal state change goes on to comment and emit it
+    # (without an execution arn, the invocation is its own claimant)
+    if is_terminal and not claim_terminal_wes_state(
+        portal_run_id,
+        icav2_wes_event['status'],
+        event.get('executionArn', None) or str(uuid.uuid4())
+    ):
+        return {
+            "isDropped": True
+        }
+
+    if is_coalescing_enabled() and not is_terminal:
+        # Non-terminal state changes are built from the WES state cache
+        coalesce_id = str(uuid.uuid4())
+        non_terminal_workflow_run_and_payload = get_non_terminal_workflow_run_and_payload(
+            portal_run_id, coalesce_id
+        )
+        if non_terminal_workflow_run_and_payload is None:
+            return {
+                "isDropped": True
+            }
+        workflow_run, latest_payload = non_terminal_workflow_run_and_payload
+    else:
+        # Get the workflow run using the portal run ID
+        workflow_run = get_cached_workflow_run_from_portal_run_id(
+            portal_run_id,
+            consistent_read=event.get('consistentRead', False)
+        )
 
-    # Get the latest payload from the workflow run
-    latest_payload = get_latest_payload_from_workflow_run(workflow_run['orcabusId'])
+        # Get the latest payload from the workflow run
+        latest_payload = get_stored_latest_payload_from_workflow_run(workflow_run)
 
     # Check if the status was SUCCEEDED, if so we populate the 'outputs' data payload
     if icav2_wes_event['status'] == 'SUCCEEDED':
         # Get the workflow run inputs
         workflow_run_inputs = latest_payload['data']['inputs']
-        # We want to generate the following output dict
-        outputs = {
-          "dnaRnaOncoanalyserAnalysisRelPath": f"{workflow_run_inputs['groupId']}/",
-        }
+        # The output directory of each sample group
+        # (joint analysis groups have an output directory for each additional tumor group)
+        outputs = get_group_outputs(workflow_run_inputs)
+        # Incremental reprocessing runs link the outputs of the processes they reused
+        if icav2_wes_event['tags'].get(REUSED_PROCESSES_TAG_KEY, None):
+            outputs.update(get_reused_process_outputs(
+                workflow_run_inputs,
+                icav2_wes_event['tags'][REUSED_PROCESSES_TAG_KEY].split(","),
+                get_prior_run(workflow_run_inputs['reprocessFromPortalRunId'])[1]
+            ))
     else:
         outputs = None
 
     # Check for failures
     if icav2_wes_event.get('errorMessageUri', None) is not None:
         analysis_failure_type = icav2_wes_event.get('errorType')
-        add_comment_to_workflow_run(
-            workflow_run_orcabus_id=workflow_run['orcabusId'],
-            comment=f"Workflow failed with icav2 wes error type: {analysis_failure_type}",
-            author=COMMENT_AUTHOR.format(
-                WORKFLOW_NAME=environ.get(WORKFLOW_NAME_ENV_VAR)
-            ),
-        )
-        add_comment_to_workflow_run(
-            workflow_run_orcabus_id=workflow_run['orcabusId'],
-            comment=f"More details can be found at {icav2_wes_event['errorMessageUri']}",
+        enqueue_comments(
+            workflow_run_id=workflow_run['orcabusId'],
             author=COMMENT_AUTHOR.format(
                 WORKFLOW_NAME=environ.get(WORKFLOW_NAME_ENV_VAR)
             ),
+            comment_list=[
+                f"Workflow failed with icav2 wes error type: {analysis_failure_type}",
+                f"More details can be found at {icav2_wes_event['errorMessageUri']}",
+            ]
         )
 
     # Update the latest payload with the outputs if available
@@ -87,7 +665,7 @@ def handler(event, context):
         latest_payload['data']['engineParameters']['analysisId'] = icav2_analysis_id
 
     # Update the workflow object to contain 'name' and 'version'
-    workflow = dict(deepcopy(workflow_run['workflow']))
+    workflow = dict(workflow_run['workflow'])
 
     # Prepare the WRSC Event payload
     return {
@@ -111,5 +689,14 @@ def handler(event, context):
             },
             # Execution ID (ICAv2 analysis ID)
             **({"executionId": icav2_analysis_id} if icav2_analysis_id else {})
-        }
+        },
+        # Non-terminal state changes wait out the coalescing window
+        **(
+            {
+                "coalesceId": coalesce_id,
+                "coalesceWindowSeconds": COALESCE_WINDOW_SECONDS,
+            }
+            if coalesce_id is not None
+            else {}
+        )
     }
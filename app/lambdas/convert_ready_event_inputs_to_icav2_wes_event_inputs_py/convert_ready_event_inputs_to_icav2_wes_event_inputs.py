@@ -3,6 +3,48 @@
 """
 Given inputs from a Ready Event, convert them to the format expected by the ICAV2 WES Event Inputs.
 
+The samplesheet is built column by column from the tumor dna, normal dna and tumor rna input sections
+(the filetype of each input key is looked up in a table built at import), each bam row is followed by its bai row,
+the columns are then zipped into the samplesheet rows.
+
+Joint analysis groups list their additional tumors under additionalTumorGroups, each additional tumor
+(and its optional tumor RNA) is added to the samplesheet as its own group alongside the shared normal,
+so one WES analysis covers all of a subject's tumors.
+
+READY events are queued and handed to the ready state machine in batches, each ready event detail of the batch
+goes through convert_ready_event_detail, which
+  * plans the processes of an incremental reprocessing run (see pipeline_manager_tools.incremental_processes),
+  * converts the (planned) inputs into the ICAv2 WES inputs,
+  * and looks up a reusable result.
+The ICAv2 WES request event details (and the WorkflowRunUpdate event details of reused results)
+are grouped into batches for PutEvents (max 10 entries per call).
+A ready event that fails to convert is reported in the errors list rather than failing the batch.
+
+The converted inputs (with the pipeline id and nextflow config) are fingerprinted,
+the fingerprint is added to the WES request tags so that a SUCCEEDED run is indexed by its fingerprint in the result reuse index table.
+If a SUCCEEDED run with the same fingerprint is in the index (see pipeline_manager_tools.result_reuse_index),
+and its outputs are still in the filemanager, a SUCCEEDED WorkflowRunUpdate event detail
+linking the prior outputs is returned instead of a WES request, so no new analysis is launched.
+
+Incremental reprocessing runs only launch the planned processes, the reused processes are listed
+(comma separated) in the reusedProcesses tag of the WES request, so their prior output directories are added
+to the outputs of the run once it has succeeded. If no process needs to run, the prior run's result is published
+as a SUCCEEDED WorkflowRunUpdate event detail instead.
+
+The publish mode can be set per output with a publishDirModePolicy, mapping output classes ('reports', 'calls')
+or outputs ('orange', 'cuppa', 'lilac', 'neo') to a nextflow publish mode, the most specific entry wins.
+The policy's default is the publish_dir_mode input, outputs with another mode are published through
+a generated nextflow config fragment, added to the WES request engine parameters as nextflowConfig.
+Outputs consumed by other processes (lilac by neo and orange, cuppa by orange) cannot be published with 'move',
+as the consuming processes read them from the work directory after they are published.
+
+A run with the inputs of a FAILED run supersedes it, and resumes from the FAILED run's nextflow cache.
+The FAILED run is either set in the draft (engineParameters.resumeFromPortalRunId, see post_schema_validation),
+or found in the result reuse index by the input fingerprint (the cacheUri is then the cache uri of the FAILED run).
+The WES request of a resumed run has 'resume = true' in its nextflowConfig engine parameter, so nextflow launches
+with -resume against the cacheUri, and the resumed run is listed in the resumedFromPortalRunId tag.
+resumeFromPortalRunId itself is not an engine parameter of the WES request, and is not passed on.
+
 Workflow inputs:
   * groupId: tags.idvID
   * subjectId: tags.subjectId
@@ -28,6 +70,10 @@ Workflow inputs:
       * bwamem2Index
       * gridssIndex
       * starIndex
+  * publishDirMode: "symlink"
+  * publishDirModePolicy:
+    * default: "symlink"
+    * reports: "copy"
   * tumorDnaInputs:
     * bamRedux
     * reduxJitterTsv
@@ -50,6 +96,12 @@ Workflow inputs:
   * tumorRnaInputs:
     * bam
     * isofoxDir
+  * additionalTumorGroups: (optional)
+    * groupId
+    * tumorDnaSampleId
+    * tumorDnaInputs
+    * tumorRnaSampleId (optional)
+    * tumorRnaInputs (optional)
 
 
 WES Input Payload:
@@ -278,10 +330,22 @@ WES Input Payload:
 }
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
-from typing import Dict, List, Any
+import hashlib
+import json
+import logging
+from typing import Dict, List, Any, Tuple, Optional
 from packaging.version import Version
 
+# Layer imports
+from pipeline_manager_tools.incremental_processes import PROCESS_DEPENDENCIES, plan_incremental_processes
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.result_reuse_index import get_reusable_result, get_resumable_run
+from pipeline_manager_tools.timestamps import normalise_timestamp
+
 # Globals
 DEFAULT_MODE = "wgts"
 DEFAULT_MONOCHROME_LOGS = True
@@ -289,6 +353,10 @@ DEFAULT_GENOME = "GRCh38_hmf"
 DEFAULT_GENOME_VERSION = "38"
 DEFAULT_GENOME_TYPE = "no_alt"
 DEFAULT_PUBLISH_DIR_MODE = "symlink"
+PUBLISH_DIR_MODES = ["symlink", "rellink", "link", "copy", "copyNoFollow", "move"]
+PUBLISH_DIR_MODE_POLICY_DEFAULT_KEY = "default"
+# Publish modes that remove the output from the work directory
+PUBLISH_DIR_MODES_REMOVING_OUTPUT = ["move"]
 DEFAULT_OUTDIR = "out"
 
 TUMOR_PHENOTYPE = "tumor"
@@ -308,17 +376,18 @@ DEFAULT_SAMPLESHEET_COLUMNS = [
 ]
 
 TUMOR_DNA_INPUT_PARAMS = [
-    "bamRedux"
-    "reduxJitterTsv"
-    "reduxMsTsv"
-    "bamtoolsDir"
-    "sageDir"
-    "linxAnnoDir"
-    "linxPlotDir"
-    "purpleDir"
-    "virusinterpreterDir"
-    "chordDir"
-    "sigsDir"
+    "bamRedux",
+    "reduxJitterTsv",
+    "reduxMsTsv",
+    "bamtoolsDir",
+    "sageDir",
+    "linxAnnoDir",
+    "linxPlotDir",
+    "purpleDir",
+    "virusinterpreterDir",
+    "chordDir",
+    "sigsDir",
+    "lilacDir",
 ]
 
 NORMAL_DNA_INPUT_PARAMS = [
@@ -335,123 +404,188 @@ TUMOR_RNA_INPUT_PARAMS = [
     "isofoxDir",
 ]
 
+# Samplesheet sections, (inputs key, sample id key, sample type, sequence type)
+SAMPLESHEET_SECTIONS: List[Tuple[str, str, str, str]] = [
+    ("tumorDnaInputs", "tumorDnaSampleId", TUMOR_PHENOTYPE, DNA_SAMPLE_TYPE),
+    ("normalDnaInputs", "normalDnaSampleId", NORMAL_PHENOTYPE, DNA_SAMPLE_TYPE),
+    ("tumorRnaInputs", "tumorRnaSampleId", TUMOR_PHENOTYPE, RNA_SAMPLE_TYPE),
+]
+
+# Samplesheet row order within each section, nextflow task hashes (and so -resume)
+# depend on the samplesheet, so rows must not follow the key order of the payload
+SAMPLESHEET_SECTION_INPUT_PARAMS: Dict[str, List[str]] = {
+    "tumorDnaInputs": TUMOR_DNA_INPUT_PARAMS,
+    "normalDnaInputs": NORMAL_DNA_INPUT_PARAMS,
+    "tumorRnaInputs": TUMOR_RNA_INPUT_PARAMS,
+}
+
+# Bam filetypes are followed by a bai row for their index
+BAM_FILETYPES = {"bam_redux", "bam"}
+BAI_FILETYPE = "bai"
+
 DEFAULT_WORKFLOW_VERSION = "2.2.0"
 PROCESSES_PIVOT_WORKFLOW_VERSION = Version("2.2.0")
 
-def convert_params_to_samplesheet_row(
-        group_id: str,
-        subject_id: str,
-        sample_id: str,
-        sample_type: str,
-        sequence_type: str,
-        filetype: str,
-        filepath: str
-) -> Dict[str, str]:
+# Publish policy output classes, small report files vs larger per-sample calls
+PUBLISH_OUTPUT_CLASSES: Dict[str, List[str]] = {
+    "reports": ["orange", "cuppa"],
+    "calls": ["lilac", "neo"],
+}
+
+# Output -> nextflow process selector
+PUBLISH_OUTPUT_PROCESS_SELECTORS: Dict[str, str] = {
+    "orange": "ORANGE",
+    "cuppa": "CUPPA",
+    "lilac": "LILAC",
+    "neo": "NEO_.*",
+}
+
+# Outputs are published to <outdir>/<group id>/<output>/, as with the pipeline's own publish settings
+NEXTFLOW_PUBLISH_DIR_CONFIG_TEMPLATE = """\
+    withName: '{process_selector}' {{
+        publishDir = [
+            path: {{ "${{params.outdir}}/${{meta.key}}" }},
+            mode: '{mode}',
+            saveAs: {{ filename -> filename.equals('versions.yml') ? null : filename }},
+        ]
+    }}"""
+
+# PutEvents accepts at most 10 entries per call
+PUT_EVENTS_MAX_ENTRIES = 10
+
+# Result reuse
+INPUT_FINGERPRINT_TAG_KEY = "inputFingerprint"
+REUSED_PROCESSES_TAG_KEY = "reusedProcesses"
+SUCCEEDED_STATUS = "SUCCEEDED"
+
+# Resuming a FAILED run
+RESUME_FROM_PORTAL_RUN_ID_ENGINE_PARAMETER = "resumeFromPortalRunId"
+RESUMED_FROM_PORTAL_RUN_ID_TAG_KEY = "resumedFromPortalRunId"
+NEXTFLOW_RESUME_CONFIG = "resume = true\n"
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def camel_case_to_snake_case(name: str) -> str:
+    """Convert camelCase to snake_case."""
+    return ''.join(['_' + i.lower() if i.isupper() else i for i in name]).lstrip('_')
+
+
+# Input key (camelCase) -> samplesheet filetype, built once at import
+FILETYPE_BY_INPUT_KEY: Dict[str, str] = dict(map(
+    lambda input_key_iter_: (input_key_iter_, camel_case_to_snake_case(input_key_iter_)),
+    TUMOR_DNA_INPUT_PARAMS + NORMAL_DNA_INPUT_PARAMS + TUMOR_RNA_INPUT_PARAMS
+))
+
+
+def get_filetype(input_key: str) -> str:
     """
-    Convert parameters to a samplesheet row.
+    Input keys not in the input params (i.e from a newer payload version) are converted as they come
+    :param input_key:
+    :return:
     """
-    return {
-        "group_id": group_id,
-        "subject_id": subject_id,
-        "sample_id": sample_id,
-        "sample_type": sample_type,
-        "sequence_type": sequence_type,
-        "filetype": camel_case_to_snake_case(filetype),
-        "filepath": filepath
-    }
+    return FILETYPE_BY_INPUT_KEY.get(input_key, None) or camel_case_to_snake_case(input_key)
 
 
-def map_tumor_dna_inputs_to_samplesheet_rows(
-        group_id: str,
-        subject_id: str,
-        tumor_dna_sample_id: str,
-        tumor_dna_inputs_dict: Dict[str, str]
-) -> List[Dict[str, str]]:
+def get_ordered_section_inputs(inputs_key: str, section_inputs: Dict[str, str]) -> List[Tuple[str, str]]:
     """
-    Map tumor DNA inputs to samplesheet rows.
-    :param group_id: Group ID.
-    :param subject_id: Subject ID.
-    :param tumor_dna_sample_id: Sample ID for tumor DNA.
-    :param tumor_dna_inputs_dict: Dictionary containing tumor DNA inputs.
-    :return: List of samplesheet rows.
+    Order the inputs of a samplesheet section by the section's input params,
+    any input keys not in the section's input params follow in alphabetical order
+    :param inputs_key:
+    :param section_inputs:
+    :return:
     """
-    return list(map(
-        lambda key_value_iter: convert_params_to_samplesheet_row(
-            group_id=group_id,
-            subject_id=subject_id,
-            sample_id=tumor_dna_sample_id,
-            sample_type=TUMOR_PHENOTYPE,
-            sequence_type=DNA_SAMPLE_TYPE,
-            filetype=camel_case_to_snake_case(key_value_iter[0]),
-            filepath=key_value_iter[1]
-        ),
-        tumor_dna_inputs_dict.items()
-    ))
+    input_params = SAMPLESHEET_SECTION_INPUT_PARAMS.get(inputs_key, [])
+    return sorted(
+        section_inputs.items(),
+        key=lambda kv_iter_: (
+            (input_params.index(kv_iter_[0]), "")
+            if kv_iter_[0] in input_params
+            else (len(input_params), kv_iter_[0])
+        )
+    )
 
 
-def map_normal_dna_inputs_to_samplesheet_rows(
-        group_id: str,
-        subject_id: str,
-        normal_dna_sample_id: str,
-        normal_dna_inputs_dict: Dict[str, str]
-) -> List[Dict[str, str]]:
+def get_sample_groups(inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    Map normal DNA inputs to samplesheet rows.
-    :param group_id: Group ID.
-    :param subject_id: Subject ID.
-    :param normal_dna_sample_id: Sample ID for normal DNA.
-    :param normal_dna_inputs_dict: Dictionary containing normal DNA inputs.
-    :return: List of samplesheet rows.
+    Get the sample groups of the samplesheet, the primary group from the inputs,
+    then one group for each additional tumor (ordered by group id), sharing the normal of the primary group
+    :param inputs:
+    :return:
     """
-    return list(map(
-        lambda key_value_iter: convert_params_to_samplesheet_row(
-            group_id=group_id,
-            subject_id=subject_id,
-            sample_id=normal_dna_sample_id,
-            sample_type=NORMAL_PHENOTYPE,
-            sequence_type=DNA_SAMPLE_TYPE,
-            filetype=camel_case_to_snake_case(key_value_iter[0]),
-            filepath=key_value_iter[1]
-        ),
-        normal_dna_inputs_dict.items()
+    return [inputs] + list(map(
+        lambda additional_tumor_group_iter_: {
+            "groupId": additional_tumor_group_iter_["groupId"],
+            "subjectId": inputs["subjectId"],
+            "tumorDnaSampleId": additional_tumor_group_iter_["tumorDnaSampleId"],
+            "tumorDnaInputs": additional_tumor_group_iter_["tumorDnaInputs"],
+            "normalDnaSampleId": inputs.get("normalDnaSampleId", None),
+            "normalDnaInputs": inputs.get("normalDnaInputs", None),
+            "tumorRnaSampleId": additional_tumor_group_iter_.get("tumorRnaSampleId", None),
+            "tumorRnaInputs": additional_tumor_group_iter_.get("tumorRnaInputs", None),
+        },
+        sorted(
+            inputs.get("additionalTumorGroups", None) or [],
+            key=lambda additional_tumor_group_iter_: additional_tumor_group_iter_["groupId"]
+        )
     ))
 
 
-def map_tumor_rna_inputs_to_samplesheet_rows(
-        group_id: str,
-        subject_id: str,
-        tumor_rna_sample_id: str,
-        tumor_rna_inputs_dict: Dict[str, str]
-) -> List[Dict[str, str]]:
+def get_samplesheet_columns(inputs: Dict[str, Any]) -> Dict[str, List[str]]:
     """
-    Map normal DNA inputs to samplesheet rows.
-    :param group_id: Group ID.
-    :param subject_id: Subject ID.
-    :param tumor_rna_sample_id: Sample ID for normal DNA.
-    :param tumor_rna_inputs_dict: Dictionary containing normal DNA inputs.
-    :return: List of samplesheet rows.
+    Build the samplesheet columns from the input sections of each sample group,
+    each bam is followed by its bai index row.
+    Row order only depends on the inputs given, not on the order of the keys in the payload.
+    :param inputs:
+    :return:
     """
-    return list(map(
-        lambda key_value_iter: convert_params_to_samplesheet_row(
-            group_id=group_id,
-            subject_id=subject_id,
-            sample_id=tumor_rna_sample_id,
-            sample_type=TUMOR_PHENOTYPE,
-            sequence_type=RNA_SAMPLE_TYPE,
-            filetype=camel_case_to_snake_case(key_value_iter[0]),
-            filepath=key_value_iter[1]
-        ),
-        tumor_rna_inputs_dict.items()
+    samplesheet_columns: Dict[str, List[str]] = dict(map(
+        lambda column_iter_: (column_iter_, []),
+        DEFAULT_SAMPLESHEET_COLUMNS
     ))
 
-
-def get_bai_from_bam_row(bam_row: Dict[str, str]) -> Dict[str, str]:
-    bai_row = bam_row.copy()
-
-    bai_row['filetype'] = 'bai'
-    bai_row['filepath'] = f"{bam_row['filepath']}.bai"
-
-    return bai_row
+    def add_row(
+            sample_group: Dict[str, Any],
+            sample_id: str, sample_type: str, sequence_type: str, filetype: str, filepath: str
+    ):
+        samplesheet_columns["group_id"].append(sample_group["groupId"])
+        samplesheet_columns["subject_id"].append(sample_group["subjectId"])
+        samplesheet_columns["sample_id"].append(sample_id)
+        samplesheet_columns["sample_type"].append(sample_type)
+        samplesheet_columns["sequence_type"].append(sequence_type)
+        samplesheet_columns["filetype"].append(filetype)
+        samplesheet_columns["filepath"].append(filepath)
+
+    for sample_group in get_sample_groups(inputs):
+        for inputs_key, sample_id_key, sample_type, sequence_type in SAMPLESHEET_SECTIONS:
+            section_inputs = sample_group.get(inputs_key, None)
+            if not section_inputs:
+                continue
+
+            sample_id = sample_group[sample_id_key]
+            for input_key, filepath in get_ordered_section_inputs(inputs_key, section_inputs):
+                filetype = get_filetype(input_key)
+                add_row(sample_group, sample_id, sample_type, sequence_type, filetype, filepath)
+                if filetype in BAM_FILETYPES:
+                    add_row(sample_group, sample_id, sample_type, sequence_type, BAI_FILETYPE, f"{filepath}.bai")
+
+    return samplesheet_columns
+
+
+def serialise_samplesheet_columns(samplesheet_columns: Dict[str, List[str]]) -> List[Dict[str, str]]:
+    """
+    Serialise the samplesheet columns to the list of rows expected by the WES inputs
+    :param samplesheet_columns:
+    :return:
+    """
+    return list(map(
+        lambda row_iter_: dict(zip(DEFAULT_SAMPLESHEET_COLUMNS, row_iter_)),
+        zip(*map(
+            lambda column_iter_: samplesheet_columns[column_iter_],
+            DEFAULT_SAMPLESHEET_COLUMNS
+        ))
+    ))
 
 
 def genome_keys_to_snake_case(genome: Dict[str, str]) -> Dict[str, str]:
@@ -466,9 +600,85 @@ def genome_keys_to_snake_case(genome: Dict[str, str]) -> Dict[str, str]:
     ))
 
 
-def camel_case_to_snake_case(name: str) -> str:
-    """Convert camelCase to snake_case."""
-    return ''.join(['_' + i.lower() if i.isupper() else i for i in name]).lstrip('_')
+def get_output_consumer_list(output: str) -> List[str]:
+    """
+    The processes that read the outputs of the given output's process
+    :param output:
+    :return:
+    """
+    return list(filter(
+        lambda process_iter_: output in PROCESS_DEPENDENCIES[process_iter_],
+        PROCESS_DEPENDENCIES
+    ))
+
+
+def get_publish_dir_mode_by_output(inputs: Dict[str, Any]) -> Tuple[str, Dict[str, str]]:
+    """
+    Resolve the publish policy into the default publish mode, and the outputs with another publish mode,
+    an output entry takes precedence over its class entry, which takes precedence over the default
+    :param inputs:
+    :return:
+    """
+    publish_dir_mode_policy: Dict[str, str] = inputs.get("publishDirModePolicy", None) or {}
+
+    default_publish_dir_mode = publish_dir_mode_policy.get(
+        PUBLISH_DIR_MODE_POLICY_DEFAULT_KEY,
+        inputs.get("publishDirMode", DEFAULT_PUBLISH_DIR_MODE)
+    )
+
+    for policy_key, publish_dir_mode in publish_dir_mode_policy.items():
+        if publish_dir_mode not in PUBLISH_DIR_MODES:
+            raise ValueError(
+                f"Publish mode '{publish_dir_mode}' for '{policy_key}' is not one of {', '.join(PUBLISH_DIR_MODES)}"
+            )
+        if not (
+                policy_key == PUBLISH_DIR_MODE_POLICY_DEFAULT_KEY or
+                policy_key in PUBLISH_OUTPUT_CLASSES or
+                policy_key in PUBLISH_OUTPUT_PROCESS_SELECTORS
+        ):
+            raise ValueError(
+                f"Unknown publish policy key '{policy_key}', expected '{PUBLISH_DIR_MODE_POLICY_DEFAULT_KEY}', "
+                f"an output class ({', '.join(PUBLISH_OUTPUT_CLASSES)}) "
+                f"or an output ({', '.join(PUBLISH_OUTPUT_PROCESS_SELECTORS)})"
+            )
+
+    publish_dir_mode_by_output: Dict[str, str] = {}
+    for output_class, output_list in PUBLISH_OUTPUT_CLASSES.items():
+        for output in output_list:
+            publish_dir_mode = publish_dir_mode_policy.get(
+                output,
+                publish_dir_mode_policy.get(output_class, default_publish_dir_mode)
+            )
+            if publish_dir_mode != default_publish_dir_mode:
+                publish_dir_mode_by_output[output] = publish_dir_mode
+
+            # Outputs read by other processes must stay in the work directory
+            consumer_list = get_output_consumer_list(output)
+            if publish_dir_mode in PUBLISH_DIR_MODES_REMOVING_OUTPUT and consumer_list:
+                raise ValueError(
+                    f"Publish mode '{publish_dir_mode}' cannot be used for '{output}', "
+                    f"its outputs are read by {', '.join(consumer_list)}"
+                )
+
+    return default_publish_dir_mode, publish_dir_mode_by_output
+
+
+def get_nextflow_publish_dir_config(publish_dir_mode_by_output: Dict[str, str]) -> Optional[str]:
+    """
+    Generate the nextflow config fragment for the outputs published with a mode other than the default
+    :param publish_dir_mode_by_output:
+    :return:
+    """
+    if not publish_dir_mode_by_output:
+        return None
+
+    return "process {\n" + "\n".join(map(
+        lambda kv_iter_: NEXTFLOW_PUBLISH_DIR_CONFIG_TEMPLATE.format(
+            process_selector=PUBLISH_OUTPUT_PROCESS_SELECTORS[kv_iter_[0]],
+            mode=kv_iter_[1],
+        ),
+        publish_dir_mode_by_output.items()
+    )) + "\n}\n"
 
 
 def convert_ready_event_inputs_to_icav2_wes_event_inputs(
@@ -478,40 +688,11 @@ def convert_ready_event_inputs_to_icav2_wes_event_inputs(
     """
     Convert the ready event inputs to ICAv2 WES event inputs.
     """
-    samplesheet = (
-            map_tumor_dna_inputs_to_samplesheet_rows(
-                group_id=inputs["groupId"],
-                subject_id=inputs["subjectId"],
-                tumor_dna_sample_id=inputs["tumorDnaSampleId"],
-                tumor_dna_inputs_dict=inputs.get("tumorDnaInputs", {})
-            ) +
-            map_normal_dna_inputs_to_samplesheet_rows(
-                group_id=inputs["groupId"],
-                subject_id=inputs["subjectId"],
-                normal_dna_sample_id=inputs["normalDnaSampleId"],
-                normal_dna_inputs_dict=inputs.get("normalDnaInputs", {})
-            ) +
-            map_tumor_rna_inputs_to_samplesheet_rows(
-                group_id=inputs["groupId"],
-                subject_id=inputs["subjectId"],
-                tumor_rna_sample_id=inputs["tumorRnaSampleId"],
-                tumor_rna_inputs_dict=inputs.get("tumorRnaInputs", {})
-            )
+    samplesheet = serialise_samplesheet_columns(
+        get_samplesheet_columns(inputs)
     )
 
-    # Extend samplesheet with bam indexes for bam_redux and bam filetypes
-    samplesheet_bams = list(filter(
-        lambda row: row["filetype"] in ["bam_redux", "bam"],
-        samplesheet
-    ))
-
-    # Add bai files for each bam file
-    samplesheet.extend(
-        list(map(
-            lambda row: get_bai_from_bam_row(row),
-            samplesheet_bams
-        ))
-    )
+    default_publish_dir_mode, _ = get_publish_dir_mode_by_output(inputs)
 
     # Return the dictionary of inputs
     return dict(filter(
@@ -519,7 +700,7 @@ def convert_ready_event_inputs_to_icav2_wes_event_inputs(
         {
             "mode": inputs.get("mode", DEFAULT_MODE),
             "monochrome_logs": inputs.get("monochromeLogs", DEFAULT_MONOCHROME_LOGS),
-            "publish_dir_mode": inputs.get("publishDirMode", DEFAULT_PUBLISH_DIR_MODE),
+            "publish_dir_mode": default_publish_dir_mode,
             "outdir": inputs.get("outdir", DEFAULT_OUTDIR),
             "samplesheet": samplesheet,
             "genome": inputs.get("genome", DEFAULT_GENOME),
@@ -564,18 +745,277 @@ def convert_ready_event_inputs_to_icav2_wes_event_inputs(
     ))
 
 
-def handler(event, context):
+def get_input_fingerprint(
+        icav2_wes_inputs: Dict[str, Any],
+        pipeline_id: Optional[str],
+        nextflow_config: Optional[str] = None
+) -> str:
     """
-    Convert the ready event inputs to ICAv2 WES event inputs.
-    :param event:
-    :param context:
+    Fingerprint the converted WES inputs (samplesheet, genome, processes etc), the pipeline id
+    and the generated nextflow config (if any, so runs without one keep their fingerprint),
+    samplesheet row order does not change the fingerprint
+    :param icav2_wes_inputs:
+    :param pipeline_id:
+    :param nextflow_config:
+    :return:
+    """
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "pipelineId": pipeline_id,
+                **({"nextflowConfig": nextflow_config} if nextflow_config is not None else {}),
+                "inputs": {
+                    **icav2_wes_inputs,
+                    "samplesheet": sorted(
+                        map(
+                            lambda row_iter_: json.dumps(row_iter_, sort_keys=True),
+                            icav2_wes_inputs.get("samplesheet", [])
+                        )
+                    ),
+                },
+            },
+            sort_keys=True,
+            separators=(",", ":")
+        ).encode()
+    ).hexdigest()
+
+
+def get_reused_result_workflow_run_update_detail(
+        ready_event_detail: Dict[str, Any],
+        reusable_result: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Publish the ready workflow run as SUCCEEDED with the outputs of the prior run
+    :param ready_event_detail:
+    :param reusable_result:
     :return:
     """
-    workflow_version = Version(event.get("workflowVersion", DEFAULT_WORKFLOW_VERSION))
+    payload_data = ready_event_detail['payload']['data']
 
     return {
-        "inputs": convert_ready_event_inputs_to_icav2_wes_event_inputs(
-            inputs=event['inputs'],
-            workflow_version=workflow_version
-        )
+        "status": SUCCEEDED_STATUS,
+        "timestamp": normalise_timestamp(),
+        "portalRunId": ready_event_detail['portalRunId'],
+        "workflow": ready_event_detail['workflow'],
+        "workflowRunName": ready_event_detail['workflowRunName'],
+        "libraries": ready_event_detail['libraries'],
+        "payload": {
+            "version": ready_event_detail['payload']['version'],
+            "data": {
+                **payload_data,
+                "engineParameters": {
+                    **payload_data['engineParameters'],
+                    "outputUri": reusable_result['outputUri'],
+                    "reusedFromPortalRunId": reusable_result['portalRunId'],
+                },
+                "outputs": reusable_result['outputs'],
+            },
+        },
+    }
+
+
+def get_icav2_wes_engine_parameters(
+        ready_event_detail: Dict[str, Any],
+        input_fingerprint: str,
+        nextflow_config: Optional[str]
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Get the engine parameters of the WES request, a run that supersedes a FAILED run
+    (set in the draft, or the FAILED run with the same input fingerprint) resumes from its cache
+    :param ready_event_detail:
+    :param input_fingerprint:
+    :param nextflow_config: The publish dir nextflow config (if any)
+    :return: The engine parameters, and the portal run id of the resumed run (if any)
+    """
+    engine_parameters = dict(filter(
+        lambda kv_iter_: kv_iter_[0] != RESUME_FROM_PORTAL_RUN_ID_ENGINE_PARAMETER,
+        ready_event_detail['payload']['data']['engineParameters'].items()
+    ))
+
+    # The cacheUri of a draft that sets the run to resume has been checked by post schema validation
+    resume_from_portal_run_id = ready_event_detail['payload']['data']['engineParameters'].get(
+        RESUME_FROM_PORTAL_RUN_ID_ENGINE_PARAMETER, None
+    )
+    if resume_from_portal_run_id is None:
+        resumable_run = get_resumable_run(input_fingerprint)
+        if resumable_run is not None and resumable_run['portalRunId'] != ready_event_detail['portalRunId']:
+            resume_from_portal_run_id = resumable_run['portalRunId']
+            engine_parameters['cacheUri'] = resumable_run['cacheUri']
+
+    nextflow_config_list = list(filter(
+        lambda nextflow_config_iter_: nextflow_config_iter_ is not None,
+        [
+            nextflow_config,
+            NEXTFLOW_RESUME_CONFIG if resume_from_portal_run_id is not None else None
+        ]
+    ))
+    if nextflow_config_list:
+        engine_parameters['nextflowConfig'] = "".join(nextflow_config_list)
+
+    return engine_parameters, resume_from_portal_run_id
+
+
+def convert_ready_event_detail(ready_event_detail: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Plan, convert and look up a reusable result for the ready event,
+    returns either the ICAv2 WES request event detail or the WorkflowRunUpdate event detail of the reused result
+    :param ready_event_detail:
+    :return: {"icav2WesRequestDetail": {...}} or {"workflowRunUpdateDetail": {...}}
+    """
+    payload_data = ready_event_detail['payload']['data']
+
+    # Incremental reprocessing only runs the processes without up-to-date outputs in the prior run
+    inputs = payload_data['inputs']
+    reused_process_list: List[str] = []
+    if inputs.get("reprocessFromPortalRunId", None) is not None:
+        incremental_processes_plan = plan_incremental_processes(inputs)
+
+        # Nothing to run, publish the prior run's result
+        if incremental_processes_plan.get("priorResult", None) is not None:
+            return {
+                "workflowRunUpdateDetail": get_reused_result_workflow_run_update_detail(
+                    ready_event_detail, incremental_processes_plan['priorResult']
+                ),
+            }
+
+        inputs = incremental_processes_plan['inputs']
+        reused_process_list = incremental_processes_plan['reusedProcessesList']
+
+    icav2_wes_inputs = convert_ready_event_inputs_to_icav2_wes_event_inputs(
+        inputs=inputs,
+        workflow_version=Version(ready_event_detail['workflow'].get('version', None) or DEFAULT_WORKFLOW_VERSION)
+    )
+
+    nextflow_config = get_nextflow_publish_dir_config(
+        get_publish_dir_mode_by_output(inputs)[1]
+    )
+
+    input_fingerprint = get_input_fingerprint(
+        icav2_wes_inputs, payload_data['engineParameters'].get('pipelineId', None), nextflow_config
+    )
+
+    reusable_result = get_reusable_result(input_fingerprint)
+    if reusable_result is not None:
+        return {
+            "workflowRunUpdateDetail": get_reused_result_workflow_run_update_detail(
+                ready_event_detail, reusable_result
+            ),
+        }
+
+    # Not fingerprinted, a resumed run has the inputs of the run it resumes
+    engine_parameters, resume_from_portal_run_id = get_icav2_wes_engine_parameters(
+        ready_event_detail, input_fingerprint, nextflow_config
+    )
+
+    return {
+        "icav2WesRequestDetail": {
+            "name": ready_event_detail['workflowRunName'],
+            "inputs": icav2_wes_inputs,
+            "engineParameters": engine_parameters,
+            "tags": {
+                **payload_data.get('tags', {}),
+                "portalRunId": ready_event_detail['portalRunId'],
+                INPUT_FINGERPRINT_TAG_KEY: input_fingerprint,
+                # The outputs of the reused processes are recorded once the run has succeeded
+                **(
+                    {REUSED_PROCESSES_TAG_KEY: ",".join(reused_process_list)}
+                    if reused_process_list
+                    else {}
+                ),
+                **(
+                    {RESUMED_FROM_PORTAL_RUN_ID_TAG_KEY: resume_from_portal_run_id}
+                    if resume_from_portal_run_id is not None
+                    else {}
+                ),
+            },
+        },
     }
+
+
+def get_put_events_batches(detail_list: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    return list(map(
+        lambda batch_index_iter_: detail_list[batch_index_iter_:batch_index_iter_ + PUT_EVENTS_MAX_ENTRIES],
+        range(0, len(detail_list), PUT_EVENTS_MAX_ENTRIES)
+    ))
+
+
+def convert_ready_event_detail_list(ready_event_detail_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert each ready event detail, failures are collected per ready event so that one bad draft does not fail the batch
+    :param ready_event_detail_list:
+    :return:
+    """
+    icav2_wes_request_detail_list: List[Dict[str, Any]] = []
+    workflow_run_update_detail_list: List[Dict[str, Any]] = []
+    error_list: List[Dict[str, Any]] = []
+
+    for ready_event_detail in ready_event_detail_list:
+        try:
+            converted_ready_event_detail = convert_ready_event_detail(ready_event_detail)
+        except Exception as e:
+            logger.exception(f"Could not convert ready event for {ready_event_detail.get('portalRunId', None)}")
+            error_list.append({
+                "orcabusId": ready_event_detail.get('orcabusId', None),
+                "portalRunId": ready_event_detail.get('portalRunId', None),
+                "errorType": type(e).__name__,
+                "errorMessage": str(e),
+            })
+            continue
+
+        if "workflowRunUpdateDetail" in converted_ready_event_detail:
+            workflow_run_update_detail_list.append(converted_ready_event_detail['workflowRunUpdateDetail'])
+        else:
+            icav2_wes_request_detail_list.append(converted_ready_event_detail['icav2WesRequestDetail'])
+
+    return {
+        "icav2WesRequestDetailBatches": get_put_events_batches(icav2_wes_request_detail_list),
+        "workflowRunUpdateDetailBatches": get_put_events_batches(workflow_run_update_detail_list),
+        "errors": error_list,
+    }
+
+
+@trace_invocation
+@memoized_invocation()
+def handler(event, context):
+    """
+    Convert a batch of ready events to ICAv2 WES request events
+    (or WorkflowRunUpdate events, for the ready events with a reusable result).
+
+    Input:
+      {"readyEvents": [{<ready event detail>}, ...]}
+
+    Output:
+      {
+        "icav2WesRequestDetailBatches": [
+          [
+            {
+              "name": "...", "inputs": {...},
+              "engineParameters": {..., "nextflowConfig": "process {...}\nresume = true\n"},
+              "tags": {
+                ..., "portalRunId": "...", "inputFingerprint": "<sha256>",
+                "reusedProcesses": "lilac,neo",  (incremental reprocessing runs only)
+                "resumedFromPortalRunId": "..."  (resumed runs only)
+              }
+            },
+            ...
+          ],
+          ...
+        ],
+        "workflowRunUpdateDetailBatches": [
+          [
+            {
+              "status": "SUCCEEDED", "portalRunId": "...", ...,
+              "payload": {"version": "...", "data": {..., "engineParameters": {..., "reusedFromPortalRunId": "..."}}}
+            },
+            ...
+          ],
+          ...
+        ],
+        "errors": [{"orcabusId": "wfr.xxx", "portalRunId": "...", "errorType": "KeyError", "errorMessage": "..."}]
+      }
+
+    :param event:
+    :param context:
+    :return:
+    """
+    return convert_ready_event_detail_list(event["readyEvents"])
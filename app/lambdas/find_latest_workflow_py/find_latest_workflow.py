@@ -8,15 +8,42 @@ Used by:
 - glueSucceededEventsToDraftUpdate: finding existing DRAFT runs for this service to update
 - populateDraftData: finding upstream SUCCEEDED workflows to collect outputs as inputs
 
+Multiple searches can be made in a single invocation (batch mode), these run concurrently,
+and searches that share the same criteria (apart from the workflow name and status) are coalesced into a single
+Workflow Manager API query, with the results partitioned locally by workflow name and status.
+
+Library-only searches are first served from the workflow run index, a read model keyed by library id
+that is fed by the WorkflowRunStateChange events (see the update_workflow_run_index lambda).
+The index only holds the runs indexed since it was deployed, so a search is only served from the index
+once it has been backfilled: the first time a (workflow name, version, libraries) search is made
+we fall back to the Workflow Manager API, write the results to the index and mark the search as backfilled.
+
+If the WORKFLOW_RUN_INDEX_TABLE_NAME env var is set, the index is read from DynamoDB,
+otherwise if WORKFLOW_RUN_INDEX_SQLITE_PATH is set, a local SQLite database is used instead (tests and benchmarking).
+If neither is set, all searches go to the Workflow Manager API.
 """
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
-from typing import List
+from functools import reduce
+from typing import List, Optional, Dict, Any, Callable, Tuple, TypedDict
 
-# Local imports
+# Layer imports
 from orcabus_api_tools.workflow import (
     get_workflow_runs_from_metadata
 )
 from orcabus_api_tools.workflow.models import WorkflowRunDetail
+from pipeline_manager_tools.timestamps import normalise_timestamp
+from pipeline_manager_tools.workflow_run_index import (
+    is_workflow_run_index_enabled,
+    is_backfilled,
+    get_indexed_workflow_runs_for_library,
+    put_workflow_runs_in_index,
+    put_backfill_marker,
+)
+from pipeline_manager_tools.memoize import InvocationThreadPoolExecutor, memoized, memoized_invocation
+from pipeline_manager_tools.projection import get_projected_object
 
 # Globals
 # Terminal states that indicate a run has been superseded or is no longer relevant
@@ -26,69 +53,121 @@ NON_SUCCEEDED_TERMINATED_STATUS_LIST = [
     'RESOLVED'
 ]
 
+# Batch mode
+MAX_CONCURRENT_QUERIES = 8
 
-def handler(event, context):
+
+# Read-only orcabus api calls, memoized for the invocation
+get_workflow_runs_from_metadata = memoized(get_workflow_runs_from_metadata)
+
+
+class WorkflowSearchCriteria(TypedDict):
+    workflowName: str
+    workflowVersion: Optional[str]
+    status: Optional[str]
+    analysisRunId: Optional[str]
+    libraryIdList: List[str]
+    rgidList: Optional[List[str]]
+
+
+def get_workflow_runs_from_index(
+        workflow_name: str,
+        workflow_version: Optional[str],
+        library_id_list: List[str]
+) -> Optional[List[Dict[str, Any]]]:
     """
-    Query the Workflow Manager API for workflow runs matching the given criteria.
+    Get the workflow runs linked to all of the libraries in the library id list from the workflow run index.
 
-    Input:
-      {
-        "workflowName": "oncoanalyser-wgts-dna-rna",  # Required
-        "workflowVersion": "1.0.0",                    # Optional
-        "status": "DRAFT" | "SUCCEEDED" | ...,         # Optional
-        "libraries": [{"libraryId": "L1234"}],         # Conditional (required if no analysisRunId)
-        "analysisRunId": "anr.xxx",                    # Conditional (required if no libraries)
-        "rgidList": ["RGID1", "RGID2"]                 # Optional
-      }
+    Returns None if the search has not been backfilled (the index may be missing runs from before it was deployed),
+    in which case the caller should fall back to the Workflow Manager API.
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :return:
+    """
+    if not is_backfilled(workflow_name, workflow_version, library_id_list):
+        return None
 
-    Output:
-      {"workflowRunList": [...]}  — sorted by orcabusId descending (most recent first)
-      {"workflowRunList": []}     — if no match or newer run supersedes
+    workflow_runs_by_library_list = list(map(
+        lambda library_id_iter_: dict(map(
+            lambda workflow_run_iter_: (workflow_run_iter_['portalRunId'], workflow_run_iter_),
+            get_indexed_workflow_runs_for_library(library_id_iter_, workflow_name)
+        )),
+        library_id_list
+    ))
 
-    DRAFT Deduplication Logic:
-      When status=SUCCEEDED and multiple runs are found, check if the most recent run
-      (by currentState.orcabusId) is still in-progress (not SUCCEEDED and not in a
-      terminal state like FAILED/ABORTED/RESOLVED). If so, return empty list — the
-      newer run supersedes the succeeded one.
+    # Runs must be linked to every library in the query
+    portal_run_id_set = reduce(
+        lambda set_a, set_b: set_a & set_b,
+        map(lambda workflow_runs_iter_: set(workflow_runs_iter_.keys()), workflow_runs_by_library_list)
+    )
 
-    :param event: Input event with search criteria
-    :param context: Lambda context (unused)
-    :return: Dictionary with workflowRunList
+    return list(filter(
+        lambda workflow_run_iter_: (
+            workflow_version is None or
+            workflow_run_iter_['workflow']['version'] == workflow_version
+        ),
+        map(
+            lambda portal_run_id_iter_: workflow_runs_by_library_list[0][portal_run_id_iter_],
+            sorted(portal_run_id_set)
+        )
+    ))
+
+
+def backfill_workflow_run_index(
+        search_criteria_list: List[WorkflowSearchCriteria],
+        library_id_list: List[str],
+        workflows_list: List[WorkflowRunDetail]
+):
+    """
+    Add the workflow runs returned by the Workflow Manager API into the workflow run index
+    (never overwriting a newer state change), then mark each search as backfilled
+    so the next search for these libraries is a local read
+    :param search_criteria_list: The searches the query covered
+    :param library_id_list: The library id list used in the query
+    :param workflows_list:
+    :return:
     """
+    put_workflow_runs_in_index(workflows_list)
 
-    # Get the workflow type, name is mandatory
-    workflow_name = event['workflowName']
-    workflow_version = event.get('workflowVersion', None)
+    for search_criteria_iter_ in search_criteria_list:
+        # Only searches for exactly the queried libraries are complete
+        if set(search_criteria_iter_['libraryIdList']) != set(library_id_list):
+            continue
+        put_backfill_marker(
+            workflow_name=search_criteria_iter_['workflowName'],
+            workflow_version=search_criteria_iter_['workflowVersion'],
+            library_id_list=library_id_list
+        )
 
-    # Workflow state
-    workflow_status = event.get('status', None)
 
-    # Get the libraries / and/or the analysis run id
-    # The analysis run id takes preference when making queries
-    analysis_run_id = event.get('analysisRunId', None)
-    libraries = event.get('libraries', [])
-    rgid_list = event.get('rgidList', None)
+def get_state_orcabus_id(workflow_run: Dict[str, Any]) -> str:
+    return workflow_run['currentState']['orcabusId']
 
-    # Check not both analysis run id and libraries are empty/None
-    if analysis_run_id is None and not libraries:
-        raise ValueError("Either analysisRunId or libraries must be provided")
 
-    # Build library_id_list from libraries input
-    library_id_list = list(map(
-        lambda library_iter_: library_iter_['libraryId'],
-        libraries
-    )) if libraries else []
+def get_state_timestamp(workflow_run: Dict[str, Any]) -> str:
+    return normalise_timestamp(workflow_run['currentState']['timestamp'])
 
-    # Query the Workflow Manager API for matching workflow runs
-    workflows_list: List[WorkflowRunDetail]
-    workflows_list = get_workflow_runs_from_metadata(
-        analysis_run_id=analysis_run_id,
-        workflow_name=workflow_name,
-        workflow_version=workflow_version,
-        library_id_list=library_id_list,
-        rgid_list=rgid_list
-    )
 
+def filter_workflow_runs_by_status(
+        workflows_list: List[Dict[str, Any]],
+        workflow_status: Optional[str],
+        state_sort_key: Callable[[Dict[str, Any]], str] = get_state_orcabus_id
+) -> List[Dict[str, Any]]:
+    """
+    Filter the workflow runs to the requested status and sort by orcabusId descending (most recent first)
+
+    DRAFT Deduplication Logic:
+      When status=SUCCEEDED and multiple runs are found, check if the most recent run
+      (by state_sort_key, the currentState.orcabusId for API results) is still in-progress
+      (not SUCCEEDED and not in a terminal state like FAILED/ABORTED/RESOLVED).
+      If so, return empty list — the newer run supersedes the succeeded one.
+
+    :param workflows_list:
+    :param workflow_status:
+    :param state_sort_key: Orders runs by their latest state change
+    :return:
+    """
     # Filter to workflow state if provided
     if workflow_status is not None:
         # DRAFT deduplication: when looking for SUCCEEDED runs,
@@ -105,10 +184,10 @@ def handler(event, context):
             ))
 
             if active_workflows:
-                # Get the most recent run (by currentState.orcabusId which reflects the latest state change)
+                # Get the most recent run (by its latest state change)
                 recent_run_status = sorted(
                     active_workflows,
-                    key=lambda workflow_iter_: workflow_iter_['currentState']['orcabusId'],
+                    key=state_sort_key,
                     reverse=True
                 )[0]['currentState']['status']
 
@@ -119,9 +198,7 @@ def handler(event, context):
                     recent_run_status not in NON_SUCCEEDED_TERMINATED_STATUS_LIST
                 ):
                     # A newer run is still in-progress, superseding the succeeded one
-                    return {
-                        "workflowRunList": []
-                    }
+                    return []
 
         # Filter by the requested status
         workflows_list = list(filter(
@@ -129,18 +206,336 @@ def handler(event, context):
             workflows_list
         ))
 
-    if len(workflows_list) == 0:
+    # Return results sorted by orcabusId descending (most recent first)
+    return sorted(
+        workflows_list,
+        key=lambda workflow_iter_: workflow_iter_.get('orcabusId', ''),
+        reverse=True
+    )
+
+
+def get_search_criteria(event: Dict[str, Any]) -> WorkflowSearchCriteria:
+    """
+    Collect the search criteria from a (single mode) event or a batch mode query
+    :param event:
+    :return:
+    """
+    # Get the workflow type, name is mandatory
+    workflow_name = event['workflowName']
+    workflow_version = event.get('workflowVersion', None)
+
+    # Workflow state
+    workflow_status = event.get('status', None)
+
+    # Get the libraries / and/or the analysis run id
+    # The analysis run id takes preference when making queries
+    analysis_run_id = event.get('analysisRunId', None)
+    libraries = event.get('libraries', [])
+    rgid_list = event.get('rgidList', None)
+
+    # Check not both analysis run id and libraries are empty/None
+    if analysis_run_id is None and not libraries:
+        raise ValueError("Either analysisRunId or libraries must be provided")
+
+    # Build library_id_list from libraries input
+    library_id_list = list(map(
+        lambda library_iter_: library_iter_['libraryId'],
+        libraries
+    )) if libraries else []
+
+    return {
+        "workflowName": workflow_name,
+        "workflowVersion": workflow_version,
+        "status": workflow_status,
+        "analysisRunId": analysis_run_id,
+        "libraryIdList": library_id_list,
+        "rgidList": rgid_list,
+    }
+
+
+def can_use_workflow_run_index(search_criteria: WorkflowSearchCriteria) -> bool:
+    # Library-only searches can be served by the workflow run index
+    return (
+        is_workflow_run_index_enabled() and
+        search_criteria['analysisRunId'] is None and
+        search_criteria['rgidList'] is None and
+        len(search_criteria['libraryIdList']) > 0
+    )
+
+
+def get_indexed_workflow_run_list(search_criteria: WorkflowSearchCriteria) -> Optional[List[Dict[str, Any]]]:
+    """
+    Serve the search from the workflow run index,
+    returns None if the search cannot be served by the index (not a library-only search, or a cold index)
+    :param search_criteria:
+    :return:
+    """
+    if not can_use_workflow_run_index(search_criteria):
+        return None
+
+    indexed_workflows_list = get_workflow_runs_from_index(
+        workflow_name=search_criteria['workflowName'],
+        workflow_version=search_criteria['workflowVersion'],
+        library_id_list=search_criteria['libraryIdList']
+    )
+
+    if indexed_workflows_list is None:
+        return None
+
+    return filter_workflow_runs_by_status(
+        indexed_workflows_list,
+        workflow_status=search_criteria['status'],
+        state_sort_key=get_state_timestamp
+    )
+
+
+def get_coalesce_key(search_criteria: WorkflowSearchCriteria) -> Tuple:
+    """
+    Searches with the same coalesce key can share a single Workflow Manager API query.
+
+    The analysis run id takes preference when making queries, so searches within the same analysis run
+    are coalesced regardless of their libraries, otherwise searches must share the same set of libraries.
+    :param search_criteria:
+    :return:
+    """
+    return (
+        search_criteria['analysisRunId'],
+        (
+            tuple(sorted(set(search_criteria['libraryIdList'])))
+            if search_criteria['analysisRunId'] is None
+            else None
+        ),
+        tuple(search_criteria['rgidList']) if search_criteria['rgidList'] is not None else None,
+        search_criteria['workflowVersion'],
+    )
+
+
+def get_coalesced_workflow_run_list(
+        search_criteria_list: List[WorkflowSearchCriteria]
+) -> Tuple[List[str], List[WorkflowRunDetail]]:
+    """
+    Run a single Workflow Manager API query covering all searches in the list (which share a coalesce key).
+
+    The workflow name is only used in the query if all searches share it,
+    the library id list is the set of libraries common to all searches.
+    :param search_criteria_list:
+    :return: The library id list used in the query, and the workflow runs
+    """
+    workflow_name_set = set(map(
+        lambda search_criteria_iter_: search_criteria_iter_['workflowName'],
+        search_criteria_list
+    ))
+
+    library_id_list = sorted(reduce(
+        lambda set_a, set_b: set_a & set_b,
+        map(
+            lambda search_criteria_iter_: set(search_criteria_iter_['libraryIdList']),
+            search_criteria_list
+        )
+    ))
+
+    workflows_list: List[WorkflowRunDetail]
+    workflows_list = get_workflow_runs_from_metadata(
+        analysis_run_id=search_criteria_list[0]['analysisRunId'],
+        workflow_name=(
+            search_criteria_list[0]['workflowName']
+            if len(workflow_name_set) == 1
+            else None
+        ),
+        workflow_version=search_criteria_list[0]['workflowVersion'],
+        library_id_list=library_id_list,
+        rgid_list=search_criteria_list[0]['rgidList']
+    )
+
+    # Warm the index so the next search for these libraries is a local read
+    if can_use_workflow_run_index(search_criteria_list[0]):
+        backfill_workflow_run_index(search_criteria_list, library_id_list, workflows_list)
+
+    return library_id_list, workflows_list
+
+
+def partition_workflow_run_list(
+        search_criteria: WorkflowSearchCriteria,
+        queried_library_id_list: List[str],
+        workflows_list: List[WorkflowRunDetail]
+) -> List[Dict[str, Any]]:
+    """
+    Select the workflow runs from a coalesced query that belong to this search
+    :param search_criteria:
+    :param queried_library_id_list: The library id list used in the coalesced query
+    :param workflows_list:
+    :return:
+    """
+    # Filter to the workflow name of this search
+    workflows_list = list(filter(
+        lambda workflow_run_iter_: workflow_run_iter_['workflow']['name'] == search_criteria['workflowName'],
+        workflows_list
+    ))
+
+    # If the coalesced query used fewer libraries than this search,
+    # the workflow run must also be linked to the remaining libraries of this search
+    if set(queried_library_id_list) != set(search_criteria['libraryIdList']):
+        workflows_list = list(filter(
+            lambda workflow_run_iter_: set(search_criteria['libraryIdList']).issubset(set(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                workflow_run_iter_.get('libraries', [])
+            ))),
+            workflows_list
+        ))
+
+    return filter_workflow_runs_by_status(
+        workflows_list,
+        workflow_status=search_criteria['status']
+    )
+
+
+def find_latest_workflow_run_list(search_criteria: WorkflowSearchCriteria) -> List[Dict[str, Any]]:
+    """
+    Find the workflow runs for a single search
+    :param search_criteria:
+    :return:
+    """
+    indexed_workflow_run_list = get_indexed_workflow_run_list(search_criteria)
+    if indexed_workflow_run_list is not None:
+        return indexed_workflow_run_list
+
+    queried_library_id_list, workflows_list = get_coalesced_workflow_run_list([search_criteria])
+
+    return partition_workflow_run_list(
+        search_criteria,
+        queried_library_id_list=queried_library_id_list,
+        workflows_list=workflows_list
+    )
+
+
+def find_latest_workflow_run_list_batch(
+        search_criteria_by_query_id: Dict[str, WorkflowSearchCriteria]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Find the workflow runs for multiple searches.
+
+    1. Serve what we can from the workflow run index (concurrently)
+    2. Group the remaining searches by their coalesce key
+    3. Run one Workflow Manager API query per group (concurrently)
+    4. Partition each group's results by workflow name and status
+    :param search_criteria_by_query_id:
+    :return:
+    """
+    with InvocationThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUERIES) as executor:
+        workflow_run_list_by_query_id = dict(zip(
+            search_criteria_by_query_id.keys(),
+            executor.map(get_indexed_workflow_run_list, search_criteria_by_query_id.values())
+        ))
+
+        # Group the searches not served by the index
+        query_id_list_by_coalesce_key: Dict[Tuple, List[str]] = {}
+        for query_id, workflow_run_list in workflow_run_list_by_query_id.items():
+            if workflow_run_list is not None:
+                continue
+            query_id_list_by_coalesce_key.setdefault(
+                get_coalesce_key(search_criteria_by_query_id[query_id]), []
+            ).append(query_id)
+
+        coalesced_results_list = list(executor.map(
+            lambda query_id_list_iter_: get_coalesced_workflow_run_list(list(map(
+                lambda query_id_iter_: search_criteria_by_query_id[query_id_iter_],
+                query_id_list_iter_
+            ))),
+            query_id_list_by_coalesce_key.values()
+        ))
+
+    for query_id_list, (queried_library_id_list, workflows_list) in zip(
+            query_id_list_by_coalesce_key.values(), coalesced_results_list
+    ):
+        for query_id in query_id_list:
+            workflow_run_list_by_query_id[query_id] = partition_workflow_run_list(
+                search_criteria_by_query_id[query_id],
+                queried_library_id_list=queried_library_id_list,
+                workflows_list=workflows_list
+            )
+
+    return workflow_run_list_by_query_id
+
+
+@trace_invocation
+@memoized_invocation()
+def handler(event, context):
+    """
+    Query the workflow run index (or the Workflow Manager API) for workflow runs matching the given criteria.
+
+    Input:
+      {
+        "workflowName": "oncoanalyser-wgts-dna-rna",  # Required
+        "workflowVersion": "1.0.0",                    # Optional
+        "status": "DRAFT" | "SUCCEEDED" | ...,         # Optional
+        "libraries": [{"libraryId": "L1234"}],         # Conditional (required if no analysisRunId)
+        "analysisRunId": "anr.xxx",                    # Conditional (required if no libraries)
+        "rgidList": ["RGID1", "RGID2"],                # Optional
+        "fields": ["portalRunId", "currentState.status"]  # Optional, return only these fields of each workflow run
+      }
+
+    Output:
+      {"workflowRunList": [...]}  — sorted by orcabusId descending (most recent first)
+      {"workflowRunList": []}     — if no match or newer run supersedes
+
+    Batch mode Input:
+      {
+        "queries": [
+          {"queryId": "dna", "workflowName": "oncoanalyser-wgts-dna", "status": "SUCCEEDED", "libraries": [...], ...},
+          {"queryId": "rna", "workflowName": "oncoanalyser-wgts-rna", "status": "SUCCEEDED", "libraries": [...], ...}
+        ],
+        "fields": ["portalRunId"]  # Optional, applies to all queries
+      }
+
+    Batch mode Output:
+      {
+        "workflowRunListByQueryId": {
+          "dna": [...],
+          "rna": [...]
+        }
+      }
+
+    DRAFT Deduplication Logic:
+      When status=SUCCEEDED and multiple runs are found, check if the most recent run
+      (by currentState.orcabusId) is still in-progress (not SUCCEEDED and not in a
+      terminal state like FAILED/ABORTED/RESOLVED). If so, return empty list — the
+      newer run supersedes the succeeded one.
+
+    :param event: Input event with search criteria
+    :param context: Lambda context (unused)
+    :return: Dictionary with workflowRunList (or workflowRunListByQueryId in batch mode)
+    """
+    # Projection
+    field_path_list = event.get('fields', None)
+
+    # Batch mode
+    if event.get('queries', None) is not None:
+        search_criteria_by_query_id = dict(map(
+            lambda query_iter_: (query_iter_['queryId'], get_search_criteria(query_iter_)),
+            event['queries']
+        ))
+
+        if len(search_criteria_by_query_id) != len(event['queries']):
+            raise ValueError("Each query in the batch must have a unique queryId")
+
         return {
-            "workflowRunList": []
+            "workflowRunListByQueryId": dict(map(
+                lambda kv_iter_: (
+                    kv_iter_[0],
+                    list(map(
+                        lambda workflow_run_iter_: get_projected_object(workflow_run_iter_, field_path_list),
+                        kv_iter_[1]
+                    ))
+                ),
+                find_latest_workflow_run_list_batch(search_criteria_by_query_id).items()
+            ))
         }
 
-    # Return results sorted by orcabusId descending (most recent first)
     return {
-        "workflowRunList": sorted(
-            workflows_list,
-            key=lambda workflow_iter_: workflow_iter_['orcabusId'],
-            reverse=True
-        )
+        "workflowRunList": list(map(
+            lambda workflow_run_iter_: get_projected_object(workflow_run_iter_, field_path_list),
+            find_latest_workflow_run_list(get_search_criteria(event))
+        ))
     }
 
 
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+"""
+Flush the comment outbox
+
+The commentary lambdas do not post workflow run comments themselves, they add
+(workflowRunId, author, comment) records to the comment outbox and return straight away.
+
+This lambda takes a batch of outbox records, merges the comments of each workflow run and author
+(in the order they were enqueued) into as few comments as possible, and posts them one at a time.
+
+Consecutive comments with the same footer (the step functions execution arn) share a single footer.
+A comment is never split, a merged comment is at most MAX_COMMENT_LENGTH characters long.
+
+If a merged comment cannot be posted, it and the remaining comments of the same workflow run
+are reported as failed so they are retried (in order) with the next batch.
+
+The outbox is a FIFO SQS queue with a message group per workflow run (this lambda is its event source),
+or if COMMENT_OUTBOX_SQLITE_PATH is set, a local SQLite table that is drained on each invocation
+(tests and benchmarking), see pipeline_manager_tools.comment_outbox.
+"""
+
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
+# Standard imports
+import json
+import logging
+from os import environ
+from time import sleep
+from typing import Dict, List, Any, Optional, Tuple
+
+# Layer imports
+from orcabus_api_tools.workflow import add_comment_to_workflow_run
+from pipeline_manager_tools.comment_outbox import (
+    COMMENT_OUTBOX_SQLITE_PATH_ENV_VAR,
+    delete_records_from_sqlite_outbox,
+    get_records_from_sqlite_outbox,
+)
+
+# Globals
+MAX_COMMENT_LENGTH = 1024
+COMMENT_FOOTER_SEPARATOR = "\n---\n"
+COMMENT_BODY_SEPARATOR = "\n\n"
+
+# Rate limit the comment api
+COMMENT_POST_INTERVAL_SECONDS = 1
+
+# Stop posting with this much of the invocation left, the remaining comments are retried
+MIN_REMAINING_TIME_MILLIS = 10000
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def get_records_from_sqs_event(event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return list(map(
+        lambda sqs_record_iter_: {
+            **json.loads(sqs_record_iter_['body']),
+            "recordId": sqs_record_iter_['messageId'],
+        },
+        event['Records']
+    ))
+
+
+def split_comment_footer(comment: str) -> Tuple[str, Optional[str]]:
+    body, separator, footer = comment.rpartition(COMMENT_FOOTER_SEPARATOR)
+    if not separator:
+        return comment, None
+    return body, footer
+
+
+def join_comment(body_list: List[str], footer: Optional[str]) -> str:
+    body = COMMENT_BODY_SEPARATOR.join(body_list)
+    if footer is None:
+        return body
+    return f"{body}{COMMENT_FOOTER_SEPARATOR}{footer}"
+
+
+def merge_comments(record_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge the comments of each workflow run and author, in the order they were enqueued,
+    into as few comments of at most MAX_COMMENT_LENGTH characters as possible
+    :param record_list: The outbox records
+    :return: The merged comments (workflowRunId, author, comment, recordIdList), in the order to post them
+    """
+    merged_comment_list: List[Dict[str, Any]] = []
+    open_merged_comment_by_key: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    for record in sorted(record_list, key=lambda record_iter_: (record_iter_['enqueuedAt'], record_iter_['sequence'])):
+        key = (record['workflowRunId'], record['author'])
+        body, footer = split_comment_footer(record['comment'])
+
+        merged_comment = open_merged_comment_by_key.get(key, None)
+        if merged_comment is not None:
+            # Comments with the same footer share it, otherwise the open comment keeps its own footer
+            if merged_comment['footer'] == footer:
+                next_body_list = merged_comment['bodyList'] + [body]
+            else:
+                next_body_list = [join_comment(merged_comment['bodyList'], merged_comment['footer']), body]
+
+            next_comment = join_comment(next_body_list, footer)
+            if len(next_comment) <= MAX_COMMENT_LENGTH:
+                merged_comment.update({
+                    "bodyList": next_body_list,
+                    "footer": footer,
+                    "comment": next_comment,
+                    "recordIdList": merged_comment['recordIdList'] + [record['recordId']],
+                })
+                continue
+
+        # Start a new comment for the workflow run and author
+        merged_comment = {
+            "workflowRunId": record['workflowRunId'],
+            "author": record['author'],
+            "bodyList": [body],
+            "footer": footer,
+            "comment": record['comment'],
+            "recordIdList": [record['recordId']],
+        }
+        open_merged_comment_by_key[key] = merged_comment
+        merged_comment_list.append(merged_comment)
+
+    return list(map(
+        lambda merged_comment_iter_: {
+            "workflowRunId": merged_comment_iter_['workflowRunId'],
+            "author": merged_comment_iter_['author'],
+            "comment": merged_comment_iter_['comment'],
+            "recordIdList": merged_comment_iter_['recordIdList'],
+        },
+        merged_comment_list
+    ))
+
+
+def post_merged_comments(merged_comment_list: List[Dict[str, Any]], context) -> List[str]:
+    """
+    Post the merged comments, COMMENT_POST_INTERVAL_SECONDS apart
+    :param merged_comment_list:
+    :param context: The lambda context (None when run locally)
+    :return: The record ids of the comments that were not posted
+    """
+    failed_record_id_list: List[str] = []
+    failed_workflow_run_id_set = set()
+    has_posted = False
+
+    for merged_comment in merged_comment_list:
+        # Keep the comments of a workflow run (its message group) in order, retry everything after a failed comment
+        if merged_comment['workflowRunId'] in failed_workflow_run_id_set or (
+            context is not None and
+            context.get_remaining_time_in_millis() < MIN_REMAINING_TIME_MILLIS
+        ):
+            failed_workflow_run_id_set.add(merged_comment['workflowRunId'])
+            failed_record_id_list.extend(merged_comment['recordIdList'])
+            continue
+
+        if has_posted:
+            sleep(COMMENT_POST_INTERVAL_SECONDS)
+
+        try:
+            add_comment_to_workflow_run(
+                workflow_run_orcabus_id=merged_comment['workflowRunId'],
+                comment=merged_comment['comment'],
+                author=merged_comment['author'],
+            )
+        except Exception as e:
+            logger.warning(f"Could not add comment to workflow run {merged_comment['workflowRunId']}: {e}")
+            failed_workflow_run_id_set.add(merged_comment['workflowRunId'])
+            failed_record_id_list.extend(merged_comment['recordIdList'])
+        has_posted = True
+
+    return failed_record_id_list
+
+
+@trace_invocation
+def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Merge and post the comments in the comment outbox
+
+    Input:
+      The SQS event, each message body is an outbox record
+      {
+        "Records": [
+          {
+            "messageId": "...",
+            "body": "{\"workflowRunId\": \"wfr.xxx\", \"author\": \"...\", \"comment\": \"...\", \"enqueuedAt\": 1735689600.0, \"sequence\": 0}"
+          },
+          ...
+        ]
+      }
+
+      Or {} to drain the local stand-in (COMMENT_OUTBOX_SQLITE_PATH)
+
+    Output:
+      {"batchItemFailures": [{"itemIdentifier": "<message id>"}]}  — the records to retry
+
+    :param event:
+    :param context:
+    :return:
+    """
+    sqlite_path = environ.get(COMMENT_OUTBOX_SQLITE_PATH_ENV_VAR, None)
+
+    if 'Records' in event:
+        record_list = get_records_from_sqs_event(event)
+    elif sqlite_path is not None:
+        record_list = get_records_from_sqlite_outbox(sqlite_path)
+    else:
+        raise EnvironmentError(
+            f"Expected an SQS event, or {COMMENT_OUTBOX_SQLITE_PATH_ENV_VAR} to be set"
+        )
+
+    merged_comment_list = merge_comments(record_list)
+
+    logger.info(f"Merged {len(record_list)} outbox records into {len(merged_comment_list)} comments")
+
+    failed_record_id_list = post_merged_comments(merged_comment_list, context)
+
+    if 'Records' not in event:
+        delete_records_from_sqlite_outbox(
+            sqlite_path,
+            list(filter(
+                lambda record_id_iter_: record_id_iter_ not in failed_record_id_list,
+                map(lambda record_iter_: record_iter_['recordId'], record_list)
+            ))
+        )
+
+    return {
+        "batchItemFailures": list(map(
+            lambda record_id_iter_: {"itemIdentifier": record_id_iter_},
+            failed_record_id_list
+        ))
+    }
+
+
+# if __name__ == "__main__":
+#     # Three comments from one validation execution and one from the next, for the same workflow run
+#     execution_footer = "---\nStep Functions Execution: arn:aws:states:ap-southeast-2:123456789012:execution:validate:abc"
+#     next_execution_footer = "---\nStep Functions Execution: arn:aws:states:ap-southeast-2:123456789012:execution:validate:def"
+#     print(json.dumps(
+#         merge_comments([
+#             {
+#                 "recordId": str(idx_iter_),
+#                 "workflowRunId": "wfr.01K42RRMD5T5S0DKQNHP0KKXQB",
+#                 "author": "oncoanalyser-wgts-dna-rna-workflow-validation-service",
+#                 "comment": comment_iter_,
+#                 "enqueuedAt": 1735689600.0,
+#                 "sequence": idx_iter_,
+#             }
+#             for idx_iter_, comment_iter_ in enumerate([
+#                 f"Post schema validation failed for 2 reasons\n{execution_footer}",
+#                 f"Reason 1 of 2: outputUri is not set\n{execution_footer}",
+#                 f"Reason 2 of 2: logsUri is not set\n{execution_footer}",
+#                 f"Post schema validation failed: projectId is not set\n{next_execution_footer}",
+#             ])
+#         ]),
+#         indent=4
+#     ))
+#
+#     # [
+#     #     {
+#     #         "workflowRunId": "wfr.01K42RRMD5T5S0DKQNHP0KKXQB",
+#     #         "author": "oncoanalyser-wgts-dna-rna-workflow-validation-service",
+#     #         "comment": "Post schema validation failed for 2 reasons\n\nReason 1 of 2: outputUri is not set\n\nReason 2 of 2: logsUri is not set\n---\nStep Functions Execution: arn:aws:states:ap-southeast-2:123456789012:execution:validate:abc\n\nPost schema validation failed: projectId is not set\n---\nStep Functions Execution: arn:aws:states:ap-southeast-2:123456789012:execution:validate:def",
+#     #         "recordIdList": [
+#     #             "0",
+#     #             "1",
+#     #             "2",
+#     #             "3"
+#     #         ]
+#     #     }
+#     # ]
@@ -2,109 +2,205 @@
 
 """
 Generate a WRU event object with merged data
+
+The WRU event object is put on the event bus as is, so it is returned in full by default,
+a list of (dot-separated) field paths can be provided to return only those fields
+
+The draft workflow run is read through the workflow run cache (invalidated by WorkflowRunStateChange events),
+the status is published back in the WRU event, so the cache is skipped unless consistentRead is set to false.
+If the caller already has the full workflow run, it can be provided as workflowRun and no lookup is made
+(both the populate draft data and glue state machines pass the draft workflow run they fetched).
+
+The upstream inputs are merged into the payload inputs with the INPUTS_MERGE_RULES,
+existing inputs are never overwritten and null inputs are pruned.
+The merge never modifies the event payload and only copies the dicts along the changed path,
+all other subtrees are shared with the event payload.
+An RFC 7386 merge patch of the payload data can be returned alongside the full object.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
+# Standard imports
+from typing import Dict, Any, List, Optional, Tuple
+
 # Layer imports
-from orcabus_api_tools.workflow import (
-    get_workflow_run_from_portal_run_id
-)
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.projection import get_projected_object
+from pipeline_manager_tools.workflow_run_cache import get_cached_workflow_run_from_portal_run_id
+
+# Globals
+# Merge rules for the payload inputs
+# Each rule is a group of input sections that is only filled in from the upstream data
+# if none of the sections in the group are set yet
+INPUTS_MERGE_RULES: List[List[str]] = [
+    ["tumorDnaInputs", "normalDnaInputs"],
+    ["tumorRnaInputs"],
+]
+
+
+def get_normalised_library(library: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "libraryId": library['libraryId'],
+        "orcabusId": library['orcabusId'],
+        "readsets": library.get('readsets', [])
+    }
+
+
+def merge_inputs(
+        inputs: Optional[Dict[str, Any]],
+        upstream_data: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Merge the upstream input sections into the payload inputs with the INPUTS_MERGE_RULES,
+    null input sections are pruned from the merged inputs.
+
+    If no rule applies, the inputs are returned as is (not pruned).
+    The input sections are never copied, the merged inputs reference the existing and upstream sections.
+
+    Returns the merged inputs and the RFC 7386 merge patch from the inputs to the merged inputs,
+    the merged inputs are None if no rule applies
+    :param inputs:
+    :param upstream_data:
+    :return:
+    """
+    existing_inputs = inputs if inputs is not None else {}
+
+    # Collect the sections of each rule where none of the sections have been set
+    upstream_sections: Dict[str, Any] = {}
+    for input_section_list in INPUTS_MERGE_RULES:
+        if any(map(
+            lambda input_section_iter_: existing_inputs.get(input_section_iter_, None) is not None,
+            input_section_list
+        )):
+            continue
+        for input_section in input_section_list:
+            upstream_sections[input_section] = upstream_data.get(input_section, None)
+
+    # Keep the original, we don't want to overwrite existing data
+    if not upstream_sections:
+        return None, {}
+
+    merged_inputs = dict(filter(
+        lambda kv_iter_: kv_iter_[1] is not None,
+        {**existing_inputs, **upstream_sections}.items()
+    ))
+
+    # Pruned null sections are removed by a null in the merge patch
+    inputs_merge_patch: Dict[str, Any] = dict(map(
+        lambda input_section_iter_: (input_section_iter_, None),
+        filter(
+            lambda input_section_iter_: input_section_iter_ not in merged_inputs,
+            existing_inputs.keys()
+        )
+    ))
+    inputs_merge_patch.update(dict(filter(
+        lambda kv_iter_: kv_iter_[1] is not None,
+        upstream_sections.items()
+    )))
+
+    return merged_inputs, inputs_merge_patch
+
+
+def merge_payload_data(
+        data: Dict[str, Any],
+        upstream_data: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Merge the upstream data into the payload data, returns the merged data and its RFC 7386 merge patch.
+
+    If any rule applies, the merged data always has an inputs object (empty if every section was pruned)
+    :param data:
+    :param upstream_data:
+    :return:
+    """
+    merged_inputs, inputs_merge_patch = merge_inputs(data.get("inputs", None), upstream_data)
+
+    # Return the original, we don't want to overwrite existing data
+    if merged_inputs is None:
+        return data, {}
+
+    return (
+        {
+            **data,
+            "inputs": merged_inputs
+        },
+        {
+            "inputs": inputs_merge_patch
+        }
+    )
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Generate WRU event object with merged data
+
+    Input:
+      {
+        "portalRunId": "20250101abcdef12",
+        "workflowRun": {...},  (optional, the full draft workflow run, saves the lookup by portal run id)
+        "libraries": [{"libraryId": "L1234", "orcabusId": "lib.xxx", "readsets": [...]}],  (optional)
+        "payload": {"version": "...", "data": {"inputs": {...}, "tags": {...}, "engineParameters": {...}}},
+        "upstreamData": {"tumorDnaInputs": {...}, "normalDnaInputs": {...}, "tumorRnaInputs": {...}},
+        "fields": ["portalRunId", "payload"],  (optional)
+        "includeMergePatch": true  (optional)
+      }
+
+    Output:
+      {
+        "workflowRunUpdate": {...},
+        "payloadDataMergePatch": {"inputs": {"tumorRnaInputs": {...}}}  (if includeMergePatch is set)
+      }
+
     :param event:
     :param context:
     :return:
     """
-
-    # Get the event inputs
     # Get the event inputs
     portal_run_id = event.get("portalRunId", None)
     libraries = event.get("libraries", None)
     payload = event.get("payload", None)
-    upstream_data = event.get("upstreamData", {})
-
-    # Get the dragen draft workflow run data
-    oncoanalyser_wgts_tumor_dna_inputs = upstream_data.get('tumorDnaInputs', None)
-    oncoanalyser_wgts_normal_dna_inputs = upstream_data.get('normalDnaInputs', None)
-    oncoanalyser_wgts_tumor_rna_inputs = upstream_data.get('tumorRnaInputs', None)
-
-    # Create a copy of the oncoanalyser draft workflow run object to update
-    oncoanalyser_draft_workflow_run = get_workflow_run_from_portal_run_id(
-        portal_run_id=portal_run_id
-    )
-
-    # Make a copy
-    draft_workflow_update = oncoanalyser_draft_workflow_run.copy()
-
-    # Remove 'currentState' and replace with 'status'
-    draft_workflow_update['status'] = draft_workflow_update.pop('currentState')['status']
+    upstream_data = event.get("upstreamData", None) or {}
+    field_path_list = event.get("fields", None)
+
+    # Get the oncoanalyser draft workflow run object
+    oncoanalyser_draft_workflow_run = event.get("workflowRun", None)
+    if oncoanalyser_draft_workflow_run is None:
+        oncoanalyser_draft_workflow_run = get_cached_workflow_run_from_portal_run_id(
+            portal_run_id=portal_run_id,
+            consistent_read=event.get("consistentRead", True)
+        )
+
+    # Replace 'currentState' with 'status'
+    draft_workflow_update = dict(filter(
+        lambda kv_iter_: kv_iter_[0] != 'currentState',
+        oncoanalyser_draft_workflow_run.items()
+    ))
+    draft_workflow_update['status'] = oncoanalyser_draft_workflow_run['currentState']['status']
 
     # Add in the libraries if provided
     if libraries is not None:
         draft_workflow_update["libraries"] = list(map(
-            lambda library_iter: {
-                "libraryId": library_iter['libraryId'],
-                "orcabusId": library_iter['orcabusId'],
-                "readsets": library_iter.get('readsets', [])
-            },
+            get_normalised_library,
             libraries
         ))
 
-    # First check if the oncoanalyser draft workflow object has the fields we would update with the
-
-    # Generate a workflow run update object with the merged data
-    if (
-            (
-                    payload['data'].get("inputs", {}).get("tumorDnaInputs", None) is not None or
-                    payload['data'].get("inputs", {}).get("normalDnaInputs", None) is not None
-            ) and (
-                    payload['data'].get("inputs", {}).get("tumorRnaInputs", None) is not None
-            )
-    ):
-        # Return the OG, we dont want to overwrite existing data
-        draft_workflow_update["payload"] = {
-            "version": payload['version'],
-            "data": payload['data']
-        }
-        return {
-            "workflowRunUpdate": draft_workflow_update
-        }
-
-    if payload['data'].get("inputs", {}) is None:
-        payload['data']['inputs'] = {}
+    # Merge the upstream data into the payload data
+    merged_data, data_merge_patch = merge_payload_data(payload['data'], upstream_data)
 
-    if (
-            payload['data'].get("inputs", {}).get("tumorDnaInputs", None) is None and
-            payload['data'].get("inputs", {}).get("normalDnaInputs", None) is None
-    ):
-        # Get the dragen draft payload tumor and normal bam uris
-        payload['data']['inputs']['tumorDnaInputs'] = oncoanalyser_wgts_tumor_dna_inputs
-        payload['data']['inputs']['normalDnaInputs'] = oncoanalyser_wgts_normal_dna_inputs
-
-    if (
-            payload['data'].get("inputs", {}).get("tumorRnaInputs", None) is None
-    ):
-        payload['data']['inputs']['tumorRnaInputs'] = oncoanalyser_wgts_tumor_rna_inputs
-
-    # Remove nulls from inputs
-    payload['data']['inputs'] = dict(filter(
-        lambda kv_iter_: kv_iter_[1] is not None,
-        payload['data']['inputs'].items()
-    ))
-
-    # Merge the data from the dragen draft payload into the oncoanalyser draft payload
-    new_data_object = payload['data'].copy()
-    if new_data_object.get("inputs", None) is None:
-        new_data_object["inputs"] = {}
-
-    # Update the inputs with the dragen draft payload data
     draft_workflow_update["payload"] = {
         "version": payload['version'],
-        "data": new_data_object
+        "data": merged_data
     }
 
+    if event.get("includeMergePatch", False):
+        return {
+            "workflowRunUpdate": get_projected_object(draft_workflow_update, field_path_list),
+            "payloadDataMergePatch": data_merge_patch,
+        }
+
     return {
-        "workflowRunUpdate": draft_workflow_update
+        "workflowRunUpdate": get_projected_object(draft_workflow_update, field_path_list)
     }
@@ -7,15 +7,23 @@ If genomes.GRCh38Umccr is a key, we switch it to genomes.GRCh38_umccr
 
 Given a portal run id
 
+The latest payload is read through the payload store (see pipeline_manager_tools.payload_store),
+only payload bodies we haven't stored yet are downloaded.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
 from requests import HTTPError
 
 # Local imports
-from orcabus_api_tools.workflow import get_latest_payload_from_portal_run_id
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.payload_store import get_stored_latest_payload_from_portal_run_id
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Get the latest payload from the portal run id
@@ -26,7 +34,10 @@ def handler(event, context):
     portal_run_id = event['portalRunId']
 
     try:
-        payload = get_latest_payload_from_portal_run_id(portal_run_id)
+        payload = get_stored_latest_payload_from_portal_run_id(
+            portal_run_id,
+            consistent_read=event.get('consistentRead', False)
+        )
     except HTTPError as e:
         return {
             "payload": {},
@@ -4,23 +4,121 @@
 Get the fastq ids from the rgid list
 
 Given the rgid list, return the fastq ids that are associated with these rgids.
+
+Alternatively, given a list of libraries, each with their own rgid list, return the readsets
+(fastq id + rgid) for each library. All rgids across all libraries are resolved in the one invocation.
+
+Rgids are resolved concurrently (with bounded parallelism) against the fastq manager.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
+# Standard imports
+from typing import Dict, List
+
 # Layer imports
 from orcabus_api_tools.fastq import get_fastq_by_rgid
+from pipeline_manager_tools.memoize import InvocationThreadPoolExecutor, memoized, memoized_invocation
+
+# Globals
+MAX_CONCURRENT_REQUESTS = 8
+
+
+# Read-only orcabus api calls, memoized for the invocation
+get_fastq_by_rgid = memoized(get_fastq_by_rgid)
+
+
+def get_fastq_id_by_rgid_map(fastq_rgid_list: List[str]) -> Dict[str, str]:
+    """
+    Resolve each (unique) rgid to its fastq id
+    :param fastq_rgid_list:
+    :return:
+    """
+    unique_fastq_rgid_list = list(dict.fromkeys(fastq_rgid_list))
 
+    if not unique_fastq_rgid_list:
+        return {}
 
+    with InvocationThreadPoolExecutor(
+        max_workers=min(MAX_CONCURRENT_REQUESTS, len(unique_fastq_rgid_list))
+    ) as executor:
+        return dict(zip(
+            unique_fastq_rgid_list,
+            executor.map(
+                lambda fastq_rgid_iter_: get_fastq_by_rgid(fastq_rgid_iter_)['id'],
+                unique_fastq_rgid_list
+            )
+        ))
+
+
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Given a list of fastq RGIDs, return the corresponding fastq IDs.
-    :param event: A dictionary containing the key "fastqRgidList", which is a list of fastq RGIDs.
+
+    Input:
+      {"fastqRgidList": ["RGID1", "RGID2"]}
+
+    Output:
+      {"fastqIdList": ["fqr.1", "fqr.2"]}
+
+    Bulk Input:
+      {
+        "libraries": [
+          {"libraryId": "L1234", "fastqRgidList": ["RGID1", "RGID2"]},
+          {"libraryId": "L5678", "fastqRgidList": ["RGID3"]}
+        ]
+      }
+
+    Bulk Output:
+      {
+        "libraries": [
+          {"libraryId": "L1234", "readsets": [{"orcabusId": "fqr.1", "rgid": "RGID1"}, {"orcabusId": "fqr.2", "rgid": "RGID2"}]},
+          {"libraryId": "L5678", "readsets": [{"orcabusId": "fqr.3", "rgid": "RGID3"}]}
+        ]
+      }
+
+    :param event: A dictionary containing the key "fastqRgidList", which is a list of fastq RGIDs, or the key "libraries"
     :param context: AWS Lambda context object (not used in this function).
-    :return: A dictionary with the key "fastqIdList", which is a list of fastq IDs corresponding to the input RGIDs.
+    :return: A dictionary with the key "fastqIdList", which is a list of fastq IDs corresponding to the input RGIDs,
+      or the key "libraries" with the readsets of each library in bulk mode
     """
+    # Bulk mode
+    if event.get("libraries", None) is not None:
+        libraries = event["libraries"]
+
+        fastq_id_by_rgid_map = get_fastq_id_by_rgid_map(
+            [
+                fastq_rgid_iter_
+                for library_iter_ in libraries
+                for fastq_rgid_iter_ in library_iter_.get("fastqRgidList", [])
+            ]
+        )
+
+        return {
+            "libraries": list(map(
+                lambda library_iter_: {
+                    "libraryId": library_iter_['libraryId'],
+                    "readsets": list(map(
+                        lambda fastq_rgid_iter_: {
+                            "orcabusId": fastq_id_by_rgid_map[fastq_rgid_iter_],
+                            "rgid": fastq_rgid_iter_,
+                        },
+                        library_iter_.get("fastqRgidList", [])
+                    ))
+                },
+                libraries
+            ))
+        }
+
     fastq_rgid_list = event.get("fastqRgidList", [])
 
+    fastq_id_by_rgid_map = get_fastq_id_by_rgid_map(fastq_rgid_list)
+
     all_fastq_ids = sorted(list(map(
-        lambda fastq_rgid_iter_: get_fastq_by_rgid(fastq_rgid_iter_)['id'],
+        lambda fastq_rgid_iter_: fastq_id_by_rgid_map[fastq_rgid_iter_],
         fastq_rgid_list
     )))
 
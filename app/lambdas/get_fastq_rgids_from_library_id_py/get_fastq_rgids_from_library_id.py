@@ -6,11 +6,39 @@ Get the fastq rgids from the library id
 Given a library id, use the fastq set endpoint to collect all rgids associated with the library.
 
 Rgids are returned in the format '<index>+<index2>.<lane>.<instrument_run_id>'
+
+Alternatively, given the normal dna, tumor dna and tumor rna library ids together, fetch their current fastq sets
+concurrently and return both the rgid tags and the readsets (fastq id + rgid) of each library,
+since the fastq objects in the fastq set already carry their fastq id.
+The additional tumor libraries of a joint analysis group have no rgid tags, only their readsets are returned.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
+# Standard imports
+from typing import List, Dict, Any, Optional
+
 # Layer imports
 from orcabus_api_tools.fastq import get_fastq_sets, get_fastq_list_rows_in_fastq_set
 from orcabus_api_tools.fastq.models import Fastq
+from pipeline_manager_tools.memoize import InvocationThreadPoolExecutor, memoized, memoized_invocation
+
+# Globals
+LIBRARY_ID_KEY_TO_FASTQ_RGID_LIST_TAG_MAP = {
+    "normalDnaLibraryId": "normalDnaFastqRgidList",
+    "tumorDnaLibraryId": "tumorDnaFastqRgidList",
+    "tumorRnaLibraryId": "tumorRnaFastqRgidList",
+}
+ADDITIONAL_LIBRARY_ID_LIST_KEY_LIST = [
+    "additionalTumorDnaLibraryIdList",
+    "additionalTumorRnaLibraryIdList",
+]
+
+
+# Read-only orcabus api calls, memoized for the invocation
+get_fastq_sets = memoized(get_fastq_sets)
+get_fastq_list_rows_in_fastq_set = memoized(get_fastq_list_rows_in_fastq_set)
 
 
 def get_rgid_from_fastq_obj(fastq_obj: Fastq):
@@ -20,16 +48,8 @@ def get_rgid_from_fastq_obj(fastq_obj: Fastq):
         fastq_obj['instrumentRunId']
     ])
 
-def handler(event, context):
-    """
-    Given a library id, get the fastq rgids associated with the library.
-    :param event:
-    :param context:
-    :return:
-    """
-
-    library_id = event.get("libraryId")
 
+def get_fastqs_in_current_fastq_set(library_id: str) -> List[Fastq]:
     fastq_sets = get_fastq_sets(
         library=library_id,
         currentFastqSet=True
@@ -40,7 +60,120 @@ def handler(event, context):
         raise ValueError(f"Expected exactly one current fastq set for library {library_id}, found {len(fastq_sets)}")
 
     # Get the fastqs from the fastq set
-    fastqs_list = get_fastq_list_rows_in_fastq_set(fastq_sets[0]['id'])
+    return get_fastq_list_rows_in_fastq_set(fastq_sets[0]['id'])
+
+
+def get_fastq_rgids_and_readsets_from_library_ids(
+        library_id_map: Dict[str, str],
+        additional_library_id_list: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Fetch the current fastq sets of each library concurrently
+    :param library_id_map: The library id keys (normalDnaLibraryId, tumorDnaLibraryId, tumorRnaLibraryId) to library ids
+    :param additional_library_id_list: The additional tumor library ids, readsets only (they have no rgid tags)
+    :return:
+    """
+    # Each library is fetched once, even if it is listed twice
+    unique_library_id_list = list(dict.fromkeys(
+        list(library_id_map.values()) + (additional_library_id_list or [])
+    ))
+
+    if not unique_library_id_list:
+        return {
+            "tags": {},
+            "libraries": [],
+        }
+
+    with InvocationThreadPoolExecutor(max_workers=len(unique_library_id_list)) as executor:
+        fastqs_list_by_library_id = dict(zip(
+            unique_library_id_list,
+            executor.map(get_fastqs_in_current_fastq_set, unique_library_id_list)
+        ))
+
+    return {
+        "tags": dict(map(
+            lambda kv_iter_: (
+                LIBRARY_ID_KEY_TO_FASTQ_RGID_LIST_TAG_MAP[kv_iter_[0]],
+                list(map(
+                    lambda fastq_iter_: get_rgid_from_fastq_obj(fastq_iter_),
+                    fastqs_list_by_library_id[kv_iter_[1]]
+                ))
+            ),
+            library_id_map.items()
+        )),
+        "libraries": list(map(
+            lambda library_id_iter_: {
+                "libraryId": library_id_iter_,
+                "readsets": list(map(
+                    lambda fastq_iter_: {
+                        "orcabusId": fastq_iter_['id'],
+                        "rgid": get_rgid_from_fastq_obj(fastq_iter_),
+                    },
+                    fastqs_list_by_library_id[library_id_iter_]
+                ))
+            },
+            unique_library_id_list
+        )),
+    }
+
+
+@trace_invocation
+@memoized_invocation()
+def handler(event, context):
+    """
+    Given a library id, get the fastq rgids associated with the library.
+
+    Input:
+      {"libraryId": "L1234"}
+
+    Output:
+      {"fastqRgidList": ["AAGTCCAA+TACTCATA.2.241024_A00130_0336_BHW7MVDSXC"]}
+
+    Combined Input (null library ids are skipped):
+      {
+        "normalDnaLibraryId": "L1234",
+        "tumorDnaLibraryId": "L5678",
+        "tumorRnaLibraryId": null,
+        "additionalTumorDnaLibraryIdList": [],
+        "additionalTumorRnaLibraryIdList": []
+      }
+
+    Combined Output:
+      {
+        "tags": {
+          "normalDnaFastqRgidList": ["AAGTCCAA+TACTCATA.2.241024_A00130_0336_BHW7MVDSXC"],
+          "tumorDnaFastqRgidList": ["CAAGCTAG+CGCTATGT.2.241024_A00130_0336_BHW7MVDSXC"]
+        },
+        "libraries": [
+          {"libraryId": "L1234", "readsets": [{"orcabusId": "fqr.xxx", "rgid": "AAGTCCAA+TACTCATA.2.241024_A00130_0336_BHW7MVDSXC"}]},
+          {"libraryId": "L5678", "readsets": [{"orcabusId": "fqr.yyy", "rgid": "CAAGCTAG+CGCTATGT.2.241024_A00130_0336_BHW7MVDSXC"}]}
+        ]
+      }
+
+    :param event:
+    :param context:
+    :return:
+    """
+    # Combined mode
+    if event.get("libraryId", None) is None:
+        return get_fastq_rgids_and_readsets_from_library_ids(
+            dict(filter(
+                lambda kv_iter_: kv_iter_[1] is not None,
+                map(
+                    lambda library_id_key_iter_: (library_id_key_iter_, event.get(library_id_key_iter_, None)),
+                    LIBRARY_ID_KEY_TO_FASTQ_RGID_LIST_TAG_MAP.keys()
+                )
+            )),
+            additional_library_id_list=[
+                library_id_iter_
+                for library_id_list_key_iter_ in ADDITIONAL_LIBRARY_ID_LIST_KEY_LIST
+                for library_id_iter_ in (event.get(library_id_list_key_iter_, None) or [])
+            ]
+        )
+
+    library_id = event.get("libraryId")
+
+    fastqs_list = get_fastqs_in_current_fastq_set(library_id)
 
     return {
         "fastqRgidList": list(map(
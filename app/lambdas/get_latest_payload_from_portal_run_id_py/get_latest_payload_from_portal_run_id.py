@@ -2,12 +2,21 @@
 
 """
 Get the dragen wgts dna succeeded event object
+
+The latest payload is read through the payload store (see pipeline_manager_tools.payload_store),
+only payload bodies we haven't stored yet are downloaded.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Layer imports
-from orcabus_api_tools.workflow import get_latest_payload_from_portal_run_id
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.payload_store import get_stored_latest_payload_from_portal_run_id
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Get the workflow run object
@@ -19,7 +28,10 @@ def handler(event, context):
     portal_run_id = event['portalRunId']
 
     # Get the workflow run object
-    workflow_payload = get_latest_payload_from_portal_run_id(portal_run_id)
+    workflow_payload = get_stored_latest_payload_from_portal_run_id(
+        portal_run_id,
+        consistent_read=event.get('consistentRead', False)
+    )
 
     # Return the workflow payload object
     return {
@@ -2,19 +2,161 @@
 
 """
 Get the libraries from the input, check their metadata,
+
+Library metadata is fetched concurrently, and libraries are bucketed by (phenotype, type) in a single pass,
+all missing or ambiguous (more than one library) roles are reported together.
+
+Joint analysis groups may link more than one tumor DNA (and tumor RNA) library against the one normal,
+the first tumor DNA library (by library id) fills the tumor role and the rest are returned as the additional tumor libraries.
+Each tumor RNA library is paired with the tumor DNA library prepared from the same sample (see get_library_sample_key),
+the additional tumor RNA libraries are listed in the order of their tumor DNA libraries.
+
+Library records are cached in the warm container and in the library metadata cache table
+(shared with get_metadata_tags, see pipeline_manager_tools.library_metadata_cache).
 """
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
-from typing import List, Literal
+from typing import List, Literal, Dict, Optional, Tuple
 
 # Layer imports
-from orcabus_api_tools.metadata import get_library_from_library_orcabus_id
 from orcabus_api_tools.metadata.models import LibraryBase
+from pipeline_manager_tools.library_metadata_cache import get_cached_library, get_library_sample_key
+from pipeline_manager_tools.memoize import InvocationThreadPoolExecutor, memoized_invocation
 
 # Literals
 Phenotype = Literal['tumor', 'normal']
 SampleType = Literal['WGS', 'WTS']
 
+# Globals
+MAX_CONCURRENT_REQUESTS = 8
+
+# Output key to (phenotype, type) of each library role
+LIBRARY_ROLE_MAP: Dict[str, Tuple[Phenotype, SampleType]] = {
+    "tumorDnaLibraryId": ('tumor', 'WGS'),
+    "normalDnaLibraryId": ('normal', 'WGS'),
+    "tumorRnaLibraryId": ('tumor', 'WTS'),
+}
+
+# Roles that may have more than one library, role output key to additional libraries output key
+ADDITIONAL_LIBRARY_ROLE_MAP: Dict[str, str] = {
+    "tumorDnaLibraryId": "additionalTumorDnaLibraryIdList",
+    "tumorRnaLibraryId": "additionalTumorRnaLibraryIdList",
+}
+
+LIBRARY_ROLE_DESCRIPTION_MAP: Dict[str, str] = {
+    "tumorDnaLibraryId": "tumor DNA library with WGS type",
+    "normalDnaLibraryId": "normal DNA library with WGS type",
+    "tumorRnaLibraryId": "tumor RNA library with WTS type",
+}
+
+
+def get_library_obj_list(libraries: List[LibraryBase]) -> List[LibraryBase]:
+    # Skip libraries linked more than once
+    library_orcabus_id_list = list(dict.fromkeys(map(
+        lambda library_iter_: library_iter_['orcabusId'],
+        libraries
+    )))
+
+    with InvocationThreadPoolExecutor(
+        max_workers=min(MAX_CONCURRENT_REQUESTS, len(library_orcabus_id_list))
+    ) as executor:
+        return list(executor.map(
+            lambda library_orcabus_id_iter_: get_cached_library(library_orcabus_id=library_orcabus_id_iter_),
+            library_orcabus_id_list
+        ))
+
+
+def get_library_obj_list_by_role(library_obj_list: List[LibraryBase]) -> Dict[Tuple[str, str], List[LibraryBase]]:
+    """
+    Bucket the libraries by their (phenotype, type)
+    :param library_obj_list:
+    :return:
+    """
+    library_obj_list_by_role: Dict[Tuple[str, str], List[LibraryBase]] = {}
+    for library_obj in library_obj_list:
+        library_obj_list_by_role.setdefault(
+            (library_obj['phenotype'], library_obj['type']), []
+        ).append(library_obj)
 
+    return library_obj_list_by_role
+
+
+def get_tumor_library_pair_list(
+        tumor_dna_library_obj_list: List[LibraryBase],
+        tumor_rna_library_obj_list: List[LibraryBase],
+) -> List[Tuple[LibraryBase, Optional[LibraryBase]]]:
+    """
+    Pair each tumor DNA library (sorted by library id) with the tumor RNA library from the same sample.
+    A lone tumor DNA library and tumor RNA library are always paired.
+
+    All tumor RNA libraries must be paired, and the first tumor DNA library must have a tumor RNA library,
+    all pairing errors are reported together.
+    :param tumor_dna_library_obj_list:
+    :param tumor_rna_library_obj_list:
+    :return: (tumor DNA library, tumor RNA library or None) pairs
+    """
+    tumor_dna_library_obj_list = sorted(
+        tumor_dna_library_obj_list,
+        key=lambda library_iter_: library_iter_['libraryId']
+    )
+
+    if len(tumor_dna_library_obj_list) == 1 and len(tumor_rna_library_obj_list) == 1:
+        return [(tumor_dna_library_obj_list[0], tumor_rna_library_obj_list[0])]
+
+    tumor_rna_library_obj_list_by_sample_key: Dict[Optional[str], List[LibraryBase]] = {}
+    for library_obj in sorted(tumor_rna_library_obj_list, key=lambda library_iter_: library_iter_['libraryId']):
+        tumor_rna_library_obj_list_by_sample_key.setdefault(
+            get_library_sample_key(library_obj), []
+        ).append(library_obj)
+
+    error_message_list = []
+    tumor_library_pair_list: List[Tuple[LibraryBase, Optional[LibraryBase]]] = []
+    for tumor_dna_library_obj in tumor_dna_library_obj_list:
+        sample_key = get_library_sample_key(tumor_dna_library_obj)
+        sample_tumor_rna_library_obj_list = (
+            tumor_rna_library_obj_list_by_sample_key.pop(sample_key, [])
+            if sample_key is not None
+            else []
+        )
+        if len(sample_tumor_rna_library_obj_list) > 1:
+            library_id_list_str = ", ".join(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                sample_tumor_rna_library_obj_list
+            ))
+            error_message_list.append(
+                f"Found more than one {LIBRARY_ROLE_DESCRIPTION_MAP['tumorRnaLibraryId']} "
+                f"from the sample of tumor DNA library {tumor_dna_library_obj['libraryId']} "
+                f"({library_id_list_str})"
+            )
+        tumor_library_pair_list.append((
+            tumor_dna_library_obj,
+            sample_tumor_rna_library_obj_list[0] if sample_tumor_rna_library_obj_list else None
+        ))
+
+    # Tumor RNA libraries without a tumor DNA library from the same sample
+    for unpaired_tumor_rna_library_obj_list in tumor_rna_library_obj_list_by_sample_key.values():
+        for library_obj in unpaired_tumor_rna_library_obj_list:
+            error_message_list.append(
+                f"Could not pair the tumor RNA library {library_obj['libraryId']} "
+                f"with a {LIBRARY_ROLE_DESCRIPTION_MAP['tumorDnaLibraryId']} from the same sample"
+            )
+
+    if tumor_library_pair_list[0][1] is None:
+        error_message_list.append(
+            f"Could not pair the tumor DNA library {tumor_library_pair_list[0][0]['libraryId']} "
+            f"with a {LIBRARY_ROLE_DESCRIPTION_MAP['tumorRnaLibraryId']} from the same sample"
+        )
+
+    if error_message_list:
+        raise ValueError("; ".join(error_message_list))
+
+    return tumor_library_pair_list
+
+
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Get the libraries from the input, check their metadata,
@@ -26,48 +168,60 @@ def handler(event, context):
     if not libraries:
         raise ValueError("No libraries provided in the input")
 
-    # Get library metadata for both libraries
-    library_obj_list = list(map(
-        lambda library_iter_: get_library_from_library_orcabus_id(library_iter_['orcabusId']),
-        libraries
-    ))
-
-    try:
-        tumor_dna_library_obj = next(filter(
-            lambda library_iter_: (
-                    library_iter_['phenotype'] == 'tumor' and
-                    library_iter_['type'] == 'WGS'
-            ),
-            library_obj_list
-        ))
-    except StopIteration:
-        raise ValueError("Could not get tumor DNA library with WGS type from the provided libraries")
-
-    try:
-        normal_dna_library_obj = next(filter(
-            lambda library_iter_: (
-                    library_iter_['phenotype'] == 'normal' and
-                    library_iter_['type'] == 'WGS'
-            ),
-            library_obj_list
-        ))
-    except StopIteration:
-        raise ValueError("Could not get normal DNA library with WGS type from the provided libraries")
-
-    try:
-        tumor_rna_library_obj = next(filter(
-            lambda library_iter_: (
-                    library_iter_['phenotype'] == 'tumor' and
-                    library_iter_['type'] == 'WTS'
-            ),
-            library_obj_list
-        ))
-    except StopIteration:
-        raise ValueError("Could not get tumor RNA library with WTS type from the provided libraries")
-
-    # If both libraries are provided, return their IDs
-    return {
-        "tumorDnaLibraryId": tumor_dna_library_obj['libraryId'],
-        "normalDnaLibraryId": normal_dna_library_obj['libraryId'],
-        "tumorRnaLibraryId": tumor_rna_library_obj['libraryId']
+    # Get library metadata for all libraries
+    library_obj_list_by_role = get_library_obj_list_by_role(
+        get_library_obj_list(libraries)
+    )
+
+    # Collect all missing and ambiguous roles before failing
+    error_message_list = []
+    for role_key, role in LIBRARY_ROLE_MAP.items():
+        role_library_obj_list = library_obj_list_by_role.get(role, [])
+        if len(role_library_obj_list) == 0:
+            error_message_list.append(
+                f"Could not get {LIBRARY_ROLE_DESCRIPTION_MAP[role_key]} from the provided libraries"
+            )
+        elif len(role_library_obj_list) > 1 and role_key not in ADDITIONAL_LIBRARY_ROLE_MAP:
+            library_id_list_str = ", ".join(map(
+                lambda library_iter_: library_iter_['libraryId'],
+                role_library_obj_list
+            ))
+            error_message_list.append(
+                f"Found more than one {LIBRARY_ROLE_DESCRIPTION_MAP[role_key]} in the provided libraries "
+                f"({library_id_list_str})"
+            )
+
+    if error_message_list:
+        raise ValueError("; ".join(error_message_list))
+
+    # Pair the tumor libraries, the first tumor DNA library fills the tumor role
+    tumor_library_pair_list = get_tumor_library_pair_list(
+        library_obj_list_by_role[LIBRARY_ROLE_MAP["tumorDnaLibraryId"]],
+        library_obj_list_by_role[LIBRARY_ROLE_MAP["tumorRnaLibraryId"]],
+    )
+
+    library_ids = {
+        "tumorDnaLibraryId": tumor_library_pair_list[0][0]['libraryId'],
+        "normalDnaLibraryId": library_obj_list_by_role[LIBRARY_ROLE_MAP["normalDnaLibraryId"]][0]['libraryId'],
+        "tumorRnaLibraryId": tumor_library_pair_list[0][1]['libraryId'],
     }
+
+    # Add in the additional tumor libraries of a joint analysis group
+    additional_tumor_library_id_list_by_role_key: Dict[str, List[str]] = {
+        "tumorDnaLibraryId": list(map(
+            lambda tumor_library_pair_iter_: tumor_library_pair_iter_[0]['libraryId'],
+            tumor_library_pair_list[1:]
+        )),
+        "tumorRnaLibraryId": list(map(
+            lambda tumor_library_pair_iter_: tumor_library_pair_iter_[1]['libraryId'],
+            filter(
+                lambda tumor_library_pair_iter_: tumor_library_pair_iter_[1] is not None,
+                tumor_library_pair_list[1:]
+            )
+        )),
+    }
+    for role_key, additional_role_key in ADDITIONAL_LIBRARY_ROLE_MAP.items():
+        if additional_tumor_library_id_list_by_role_key[role_key]:
+            library_ids[additional_role_key] = additional_tumor_library_id_list_by_role_key[role_key]
+
+    return library_ids
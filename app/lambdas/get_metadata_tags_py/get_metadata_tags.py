@@ -4,12 +4,21 @@
 Get the metadata tags from a library id
 
 Given a library id, collect and return the library object
+
+Library records are cached in the warm container and in the library metadata cache table
+(shared with get_libraries, see pipeline_manager_tools.library_metadata_cache).
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Layer imports
-from orcabus_api_tools.metadata import get_library_from_library_id
+from pipeline_manager_tools.library_metadata_cache import get_cached_library
+from pipeline_manager_tools.memoize import memoized_invocation
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Get the library object from a library id
@@ -18,5 +27,5 @@ def handler(event, context):
     :return:
     """
     return {
-        "libraryObj": get_library_from_library_id(event['libraryId']),
+        "libraryObj": get_cached_library(library_id=event['libraryId']),
     }
@@ -4,6 +4,9 @@
 Given a payload data object, validate it against the schema and return the list of missing/invalid fields.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 import boto3
 import json
 import typing
@@ -32,6 +35,7 @@ def get_schema_from_registry(registry_name: str, schema_name: str) -> str:
     return response["Content"]
 
 
+@trace_invocation
 def handler(event, context):
     """
     Validate the data against the schema and return missing fields.
@@ -3,8 +3,17 @@
 """
 1 Get the latest succeeded workflow for a given library id
 2 Get the BAM file from that workflow
+
+The latest payload is read through the payload store (see pipeline_manager_tools.payload_store),
+only payload bodies we haven't stored yet are downloaded.
+
+The orcabus api calls are memoized for the invocation, so the workflow run and payload lookups
+shared by the template and output path resolution are only requested once.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
 from typing import Optional, Literal, List, TypedDict, Dict, cast, Union, Tuple
 from pathlib import Path
@@ -13,10 +22,9 @@ from packaging.version import Version
 
 # Layer imports
 from orcabus_api_tools.filemanager import list_files_from_portal_run_id
-from orcabus_api_tools.workflow import (
-    get_latest_payload_from_portal_run_id,
-    get_workflow_run_from_portal_run_id
-)
+from pipeline_manager_tools.memoize import memoized, memoized_invocation
+from pipeline_manager_tools.workflow_run_cache import get_cached_workflow_run_from_portal_run_id
+from pipeline_manager_tools.payload_store import get_stored_latest_payload_from_portal_run_id
 
 # Globals
 ONCOANALYSER_WGTS_DNA_WORKFLOW_RUN_NAME = "oncoanalyser-wgts-dna"
@@ -27,6 +35,10 @@ PHENOTYPE_LIST: List[Phenotype] = ["TUMOR", "NORMAL"]
 SAMPLE_LIST: List[SampleType] = ["DNA", "RNA"]
 
 
+# Read-only orcabus api calls, memoized for the invocation
+list_files_from_portal_run_id = memoized(list_files_from_portal_run_id)
+
+
 class TumorDnaInputs(TypedDict):
     bamRedux: str
     reduxJitterTsv: str
@@ -257,16 +269,15 @@ def get_inputs(
 
     # Get output relative path
     if sample_type == 'DNA':
-        outputs = get_latest_payload_from_portal_run_id(
+        latest_payload = get_stored_latest_payload_from_portal_run_id(
             portal_run_id=portal_run_id
-        )['data']['outputs']
+        )
+        outputs = latest_payload['data']['outputs']
 
         if 'dnaOncoanalyserAnalysisRelPath' in outputs:
             output_relative_path = outputs['dnaOncoanalyserAnalysisRelPath']
         elif 'dnaOncoanalyserAnalysisUri' in outputs:
-            output_uri = get_latest_payload_from_portal_run_id(
-                portal_run_id=portal_run_id
-            )['data']['engineParameters']['outputUri']
+            output_uri = latest_payload['data']['engineParameters']['outputUri']
             output_relative_path = str(
                 Path(
                     urlparse(outputs['dnaOncoanalyserAnalysisUri']).path
@@ -278,7 +289,7 @@ def get_inputs(
             raise ValueError("No dnaOncoanalyserAnalysisRelPath or dnaOncoanalyserAnalysisUri found in outputs")
 
     elif sample_type == 'RNA':
-        output_relative_path = get_latest_payload_from_portal_run_id(
+        output_relative_path = get_stored_latest_payload_from_portal_run_id(
             portal_run_id=portal_run_id
         )['data']['outputs']['rnaOncoanalyserAnalysisRelPath']
     else:
@@ -328,7 +339,8 @@ def get_inputs(
 
 
 def handle_templates_by_version(portal_run_id: str) -> Tuple:
-    workflow_run_obj = get_workflow_run_from_portal_run_id(
+    # The workflow name and version never change, so the cached workflow run is fine here
+    workflow_run_obj = get_cached_workflow_run_from_portal_run_id(
         portal_run_id
     )
 
@@ -353,6 +365,8 @@ def handle_templates_by_version(portal_run_id: str) -> Tuple:
     return tumor_dna, normal_dna
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context):
     """
     Given a normal and tumor library id, get the latest dragen workflow and return the bam files
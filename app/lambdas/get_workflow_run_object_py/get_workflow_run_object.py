@@ -2,16 +2,29 @@
 
 """
 Get the workflow run object
+
+The step functions only use a handful of fields from the workflow run object,
+so a list of (dot-separated) field paths can be provided to return only those fields
+
+The workflow run is read through the workflow run cache (invalidated by WorkflowRunStateChange events),
+set consistentRead to skip the cache
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard library imports
 from typing import Dict
 
 # Layer imports
-from orcabus_api_tools.workflow import get_workflow_run_from_portal_run_id
 from orcabus_api_tools.workflow.models import WorkflowRunDetail
+from pipeline_manager_tools.memoize import memoized_invocation
+from pipeline_manager_tools.projection import get_projected_object
+from pipeline_manager_tools.workflow_run_cache import get_cached_workflow_run_from_portal_run_id
 
 
+@trace_invocation
+@memoized_invocation()
 def handler(event, context) -> Dict[str, WorkflowRunDetail]:
     """
     Given a portal run id, return the workflow run object
@@ -22,6 +35,15 @@ def handler(event, context) -> Dict[str, WorkflowRunDetail]:
     # Get the portal run id object
     portal_run_id = event['portalRunId']
 
+    # Get the (optional) field paths to project the workflow run object to
+    field_path_list = event.get('fields', None)
+
     return {
-        "workflowRunObject": get_workflow_run_from_portal_run_id(portal_run_id)
+        "workflowRunObject": get_projected_object(
+            get_cached_workflow_run_from_portal_run_id(
+                portal_run_id,
+                consistent_read=event.get('consistentRead', False)
+            ),
+            field_path_list
+        )
     }
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+Invalidate the library metadata cache from a MetadataStateChange event
+
+The library metadata cache table holds each library record once under its orcabus id,
+with an alias item under its library id (see pipeline_manager_tools.library_metadata_cache),
+both are replaced with invalidation markers when the library is updated or deleted.
+The next get_libraries / get_metadata_tags call then fetches the record from the metadata manager,
+a record fetched before the update is not written back over the markers.
+"""
+
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
+# Standard imports
+from typing import Dict, List
+
+# Layer imports
+from pipeline_manager_tools.library_metadata_cache import invalidate_library
+
+# Globals
+LIBRARY_MODEL_NAME = "LIBRARY"
+
+
+@trace_invocation
+def handler(event, context) -> Dict[str, List[str]]:
+    """
+    Remove the library from the library metadata cache
+
+    Input:
+      The MetadataStateChange event detail
+      {
+        "action": "UPDATE",
+        "model": "LIBRARY",
+        "refId": "lib.xxx",
+        "data": {"orcabusId": "lib.xxx", "libraryId": "L1234", ...}
+      }
+
+    Output:
+      {"libraryKeyList": ["lib.xxx", "L1234"]}  — the cache keys invalidated
+
+    :param event:
+    :param context:
+    :return:
+    """
+    if event.get("model", "").upper() != LIBRARY_MODEL_NAME:
+        return {
+            "libraryKeyList": []
+        }
+
+    library_data = event.get("data", None) or {}
+
+    library_key_list = invalidate_library(
+        library_orcabus_id=event.get("refId", None) or library_data.get("orcabusId", None),
+        library_id=library_data.get("libraryId", None)
+    )
+
+    return {
+        "libraryKeyList": library_key_list
+    }
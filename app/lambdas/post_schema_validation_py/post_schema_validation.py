@@ -12,17 +12,27 @@ Performs the following steps:
   - Confirm outputUri ends with /<analysis-midfix>/<workflow-name>/<portal-run-id>/
   - Confirm logsUri ends with /logs/<workflow-name>/<portal-run-id>/
   - Confirm pipelineId is accessible in the specified projectId
+  - When resuming (resumeFromPortalRunId is set), confirm cacheUri ends with /cache/<workflow-name>/<resumed-portal-run-id>/
+    and the resumed run is a FAILED run of this workflow with identical inputs
 * Validate inputs:
   - Confirm ALL input URIs exist via Filemanager (files and folders)
   - For URIs not in reference/test/project-prefix: validate linked to project via ICA API
-* On failure: write descriptive comments to workflow run record, return {"isValid": false}
+* Validate the additional tumor groups (joint analysis groups):
+  - Confirm the groups match the additional tumor library tags
+  - Confirm the tumor RNA library of each group is from the same sample as its tumor DNA library
+* On failure: add descriptive comments to the comment outbox (see flush_comment_outbox), return {"isValid": false}
 * On success: return {"isValid": true}
+
+The orcabus api lookups are memoized for the invocation, and the portal run id is taken from the event
+when the caller already has it, rather than fetching the workflow run.
 """
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Imports
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
 import logging
 from os import environ
-from time import sleep
 from urllib.parse import urlparse
 
 # Wrapica imports
@@ -33,10 +43,17 @@ from wrapica.project_pipelines import get_project_pipeline_obj
 from wrapica.project import get_project_obj_from_project_id
 
 # Layer imports
-from orcabus_api_tools.workflow import add_comment_to_workflow_run, get_workflow_run
+from orcabus_api_tools.workflow import (
+    get_workflow_run,
+    get_workflow_run_from_portal_run_id,
+    get_latest_payload_from_workflow_run
+)
 from orcabus_api_tools.filemanager import get_s3_object_id_from_s3_uri, list_files_recursively
 from orcabus_api_tools.filemanager.errors import S3FileNotFoundError
 from icav2_tools import set_icav2_env_vars
+from pipeline_manager_tools.comment_outbox import enqueue_comments
+from pipeline_manager_tools.library_metadata_cache import get_cached_library, get_library_sample_key
+from pipeline_manager_tools.memoize import memoized, memoized_invocation
 
 # Globals
 WORKFLOW_NAME_ENV_VAR = "WORKFLOW_NAME"
@@ -51,6 +68,10 @@ COMMENT_AUTHOR = f"{WORKFLOW_NAME}-workflow-validation-service"
 # Midfixes
 ANALYSIS_MIDFIXES = ["analysis", "output", "outputs"]
 LOGS_MIDFIX = "logs"
+CACHE_MIDFIX = "cache"
+
+# Only a failed run's work directory may be resumed
+RESUMABLE_STATUS = "FAILED"
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -59,6 +80,7 @@ logger.setLevel(logging.INFO)
 MAX_COMMENT_LENGTH = 1024
 TRUNCATION_SUFFIX = "\n... [truncated, see execution ARN for full detail]"
 
+
 # Input key definitions
 TUMOR_DNA_INPUTS: List[str] = [
     "bamRedux",
@@ -72,6 +94,7 @@ TUMOR_DNA_INPUTS: List[str] = [
     "virusinterpreterDir",
     "chordDir",
     "sigsDir",
+    "lilacDir",
 ]
 
 NORMAL_DNA_INPUTS: List[str] = [
@@ -89,6 +112,14 @@ TUMOR_RNA_INPUTS: List[str] = [
 ]
 
 
+# Read-only orcabus api calls, memoized for the invocation
+get_workflow_run = memoized(get_workflow_run)
+get_workflow_run_from_portal_run_id = memoized(get_workflow_run_from_portal_run_id)
+get_latest_payload_from_workflow_run = memoized(get_latest_payload_from_workflow_run)
+get_s3_object_id_from_s3_uri = memoized(get_s3_object_id_from_s3_uri)
+list_files_recursively = memoized(list_files_recursively)
+
+
 def _format_comment_with_arn(body: str, execution_arn: str) -> str:
     """
     Append the execution ARN footer to a comment and enforce the 1024 char limit.
@@ -106,13 +137,15 @@ def _format_comment_with_arn(body: str, execution_arn: str) -> str:
 def validate_engine_parameters(
         engine_parameters: Dict,
         workflow_run_id: str,
-        project_prefix: str
+        project_prefix: str,
+        portal_run_id: Optional[str] = None,
 ) -> Tuple[bool, List[str]]:
     """
     Validate the engine parameters.
     :param engine_parameters: The engine parameters to validate.
     :param workflow_run_id: The workflow run ID
     :param project_prefix: The project prefix
+    :param portal_run_id: The portal run ID (looked up from the workflow run ID if not provided)
     :return: A tuple of (is_valid, list of failure comments)
     """
     failures: List[str] = []
@@ -145,7 +178,8 @@ def validate_engine_parameters(
         failures.append(f"cacheUri '{cache_uri}' is not in the project context '{project_prefix}'")
 
     # Get the portal run id from the workflow run id
-    portal_run_id = get_workflow_run(workflow_run_id)['portalRunId']
+    if portal_run_id is None:
+        portal_run_id = get_workflow_run(workflow_run_id)['portalRunId']
 
     # Validate outputUri ends with /<analysis-midfix>/<workflow-name>/<portal-run-id>/
     output_uri_valid = any(
@@ -168,9 +202,11 @@ def validate_engine_parameters(
         )
 
     # Validate cacheUri ends with /cache/<workflow-name>/<portal-run-id>/
-    if cache_uri and not cache_uri.endswith(f"/cache/{WORKFLOW_NAME}/{portal_run_id}/"):
+    # or, when resuming, the cache of the resumed run
+    cache_portal_run_id = engine_parameters.get("resumeFromPortalRunId", None) or portal_run_id
+    if cache_uri and not cache_uri.endswith(f"/{CACHE_MIDFIX}/{WORKFLOW_NAME}/{cache_portal_run_id}/"):
         failures.append(
-            f"cacheUri '{cache_uri}' does not end with '/cache/{WORKFLOW_NAME}/{portal_run_id}/'"
+            f"cacheUri '{cache_uri}' does not end with '/{CACHE_MIDFIX}/{WORKFLOW_NAME}/{cache_portal_run_id}/'"
         )
 
     # Confirm the pipeline is accessible in the project
@@ -187,6 +223,57 @@ def validate_engine_parameters(
     return True, []
 
 
+def validate_resume_from_portal_run_id(
+        resume_from_portal_run_id: str,
+        inputs: Dict,
+        portal_run_id: Optional[str] = None,
+) -> Tuple[bool, List[str]]:
+    """
+    Validate the run being resumed, its nextflow cache is only reusable
+    if it is a failed run of this workflow with the same inputs as this run.
+    :param resume_from_portal_run_id: The portal run id of the run being resumed
+    :param inputs: The inputs of this run
+    :param portal_run_id: The portal run id of this run
+    :return: A tuple of (is_valid, list of failure comments)
+    """
+    if resume_from_portal_run_id == portal_run_id:
+        return False, [f"resumeFromPortalRunId '{resume_from_portal_run_id}' is the portal run id of this run"]
+
+    try:
+        resumed_workflow_run = get_workflow_run_from_portal_run_id(resume_from_portal_run_id)
+    except Exception:
+        return False, [f"Cannot find the workflow run to resume '{resume_from_portal_run_id}'"]
+
+    failures: List[str] = []
+
+    if resumed_workflow_run['workflow']['name'] != WORKFLOW_NAME:
+        failures.append(
+            f"resumeFromPortalRunId '{resume_from_portal_run_id}' is a "
+            f"'{resumed_workflow_run['workflow']['name']}' run, not a '{WORKFLOW_NAME}' run"
+        )
+
+    resumed_status = resumed_workflow_run['currentState']['status']
+    if resumed_status != RESUMABLE_STATUS:
+        failures.append(
+            f"resumeFromPortalRunId '{resume_from_portal_run_id}' has status '{resumed_status}', "
+            f"only a {RESUMABLE_STATUS} run can be resumed"
+        )
+
+    if failures:
+        return False, failures
+
+    resumed_payload = get_latest_payload_from_workflow_run(resumed_workflow_run['orcabusId'])
+    if resumed_payload['data'].get('inputs', None) != inputs:
+        failures.append(
+            f"The inputs differ from the inputs of resumeFromPortalRunId '{resume_from_portal_run_id}', "
+            f"the cache of the resumed run cannot be reused"
+        )
+
+    if failures:
+        return False, failures
+    return True, []
+
+
 def validate_inputs(
         inputs: Dict,
         project_id: str,
@@ -218,12 +305,14 @@ def validate_inputs(
         ("tumorRnaInputs", TUMOR_RNA_INPUTS),
     ]
 
-    for inputs_top_key, input_keys in inputs_list:
-        nested_inputs_dict = inputs.get(inputs_top_key, {})
-        for input_key in input_keys:
-            uri = nested_inputs_dict.get(input_key)
-            if uri:
-                data_uris.append(uri)
+    # Joint analysis groups have input groups for each additional tumor
+    for inputs_group in [inputs] + (inputs.get("additionalTumorGroups", None) or []):
+        for inputs_top_key, input_keys in inputs_list:
+            nested_inputs_dict = inputs_group.get(inputs_top_key, None) or {}
+            for input_key in input_keys:
+                uri = nested_inputs_dict.get(input_key)
+                if uri:
+                    data_uris.append(uri)
 
     # Reference data inputs
     # refDataHmfDataPath is a directory URI
@@ -314,6 +403,63 @@ def validate_inputs(
     return True, []
 
 
+def validate_additional_tumor_groups(
+        inputs: Dict,
+        tags: Dict,
+) -> Tuple[bool, List[str]]:
+    """
+    The additional tumor groups must match the additional tumor library tags (sample ids are library ids),
+    and the tumor RNA library of each group must be from the same sample as its tumor DNA library
+    :param inputs: The inputs to validate.
+    :param tags: The tags of the draft
+    :return: A tuple of (is_valid, list of failure comments)
+    """
+    failures: List[str] = []
+
+    additional_tumor_group_list = inputs.get("additionalTumorGroups", None) or []
+
+    for sample_id_key, library_id_list_key in [
+        ("tumorDnaSampleId", "additionalTumorDnaLibraryIdList"),
+        ("tumorRnaSampleId", "additionalTumorRnaLibraryIdList"),
+    ]:
+        sample_id_list = list(filter(
+            lambda sample_id_iter_: sample_id_iter_ is not None,
+            map(
+                lambda additional_tumor_group_iter_: additional_tumor_group_iter_.get(sample_id_key, None),
+                additional_tumor_group_list
+            )
+        ))
+        library_id_list = tags.get(library_id_list_key, None) or []
+        if sorted(sample_id_list) != sorted(set(library_id_list)):
+            failures.append(
+                f"The additionalTumorGroups {sample_id_key}s ({', '.join(sample_id_list) or 'none'}) "
+                f"do not match the {library_id_list_key} tag ({', '.join(library_id_list) or 'none'})"
+            )
+
+    if failures:
+        return False, failures
+
+    for additional_tumor_group in additional_tumor_group_list:
+        if additional_tumor_group.get("tumorRnaSampleId", None) is None:
+            continue
+        tumor_dna_sample_key, tumor_rna_sample_key = map(
+            lambda library_id_iter_: get_library_sample_key(get_cached_library(library_id=library_id_iter_)),
+            [additional_tumor_group["tumorDnaSampleId"], additional_tumor_group["tumorRnaSampleId"]]
+        )
+        if tumor_dna_sample_key is None or tumor_dna_sample_key != tumor_rna_sample_key:
+            failures.append(
+                f"The additional tumor group '{additional_tumor_group['groupId']}' pairs the tumor RNA library "
+                f"'{additional_tumor_group['tumorRnaSampleId']}' with the tumor DNA library "
+                f"'{additional_tumor_group['tumorDnaSampleId']}', which is from a different sample"
+            )
+
+    if failures:
+        return False, failures
+    return True, []
+
+
+@trace_invocation
+@memoized_invocation()
 def handler(event, context) -> Dict[str, bool]:
     """
     Given a draft schema, validate it against the current schema and print the results.
@@ -321,6 +467,7 @@ def handler(event, context) -> Dict[str, bool]:
     Input:
       {
         "workflowRunId": "wfr.xxx",
+        "portalRunId": "20250101abcdef12",  (optional)
         "executionArn": "arn:aws:states:...",
         "data": {
           "engineParameters": {
@@ -328,7 +475,8 @@ def handler(event, context) -> Dict[str, bool]:
             "pipelineId": "...",
             "outputUri": "s3://...",
             "logsUri": "s3://...",
-            "cacheUri": "s3://..."
+            "cacheUri": "s3://...",
+            "resumeFromPortalRunId": "20250101fedcba21"  (optional)
           },
           "inputs": { ... },
           "tags": { ... }
@@ -345,6 +493,7 @@ def handler(event, context) -> Dict[str, bool]:
     # Get the event data
     payload_data = event.get('data')
     workflow_run_id = event.get("workflowRunId", "")
+    portal_run_id = event.get("portalRunId", None)
     execution_arn = event.get("executionArn", "")
 
     # Get the ICAv2 project id from the event
@@ -354,37 +503,43 @@ def handler(event, context) -> Dict[str, bool]:
     project_id = engine_parameters.get("projectId")
     if project_id is None:
         # Write failure comment
-        add_comment_to_workflow_run(
-            workflow_run_orcabus_id=workflow_run_id,
-            comment=_format_comment_with_arn(
-                "Post schema validation failed: projectId is not set",
-                execution_arn
-            ),
-            author=COMMENT_AUTHOR
+        enqueue_comments(
+            workflow_run_id=workflow_run_id,
+            author=COMMENT_AUTHOR,
+            comment_list=[
+                _format_comment_with_arn(
+                    "Post schema validation failed: projectId is not set",
+                    execution_arn
+                )
+            ]
         )
         return {"isValid": False}
 
     try:
         project_prefix = get_s3_key_prefix_by_project_id(project_id)
     except ApiException:
-        add_comment_to_workflow_run(
-            workflow_run_orcabus_id=workflow_run_id,
-            comment=_format_comment_with_arn(
-                f"Post schema validation failed: cannot resolve S3 key prefix for projectId '{project_id}'",
-                execution_arn,
-            ),
+        enqueue_comments(
+            workflow_run_id=workflow_run_id,
             author=COMMENT_AUTHOR,
+            comment_list=[
+                _format_comment_with_arn(
+                    f"Post schema validation failed: cannot resolve S3 key prefix for projectId '{project_id}'",
+                    execution_arn,
+                )
+            ]
         )
         return {"isValid": False}
 
     if project_prefix is None:
-        add_comment_to_workflow_run(
-            workflow_run_orcabus_id=workflow_run_id,
-            comment=_format_comment_with_arn(
-                f"Post schema validation failed: no S3 key prefix configured for projectId '{project_id}'",
-                execution_arn,
-            ),
+        enqueue_comments(
+            workflow_run_id=workflow_run_id,
             author=COMMENT_AUTHOR,
+            comment_list=[
+                _format_comment_with_arn(
+                    f"Post schema validation failed: no S3 key prefix configured for projectId '{project_id}'",
+                    execution_arn,
+                )
+            ]
         )
         return {"isValid": False}
 
@@ -396,12 +551,22 @@ def handler(event, context) -> Dict[str, bool]:
         engine_parameters,
         workflow_run_id=workflow_run_id,
         project_prefix=project_prefix,
+        portal_run_id=portal_run_id,
     )
     all_failures.extend(failures)
 
+    # Validate the run being resumed (only if engine params are valid)
+    inputs = payload_data.get("inputs", {})
+    if is_valid and engine_parameters.get("resumeFromPortalRunId", None):
+        is_valid, failures = validate_resume_from_portal_run_id(
+            engine_parameters["resumeFromPortalRunId"],
+            inputs=inputs,
+            portal_run_id=portal_run_id,
+        )
+        all_failures.extend(failures)
+
     # Validate the inputs (only if engine params are valid — we need project context)
     if is_valid:
-        inputs = payload_data.get("inputs", {})
         is_valid, failures = validate_inputs(
             inputs,
             project_id=project_id,
@@ -409,38 +574,44 @@ def handler(event, context) -> Dict[str, bool]:
         )
         all_failures.extend(failures)
 
+    # Validate the additional tumor groups against the tags
+    _, failures = validate_additional_tumor_groups(
+        inputs,
+        tags=payload_data.get("tags", None) or {},
+    )
+    all_failures.extend(failures)
+
     # Write failure comments
     if all_failures:
         if len(all_failures) == 1:
-            add_comment_to_workflow_run(
-                workflow_run_orcabus_id=workflow_run_id,
-                comment=_format_comment_with_arn(
-                    f"Post schema validation failed: {all_failures[0]}",
-                    execution_arn
-                ),
-                author=COMMENT_AUTHOR
+            enqueue_comments(
+                workflow_run_id=workflow_run_id,
+                author=COMMENT_AUTHOR,
+                comment_list=[
+                    _format_comment_with_arn(
+                        f"Post schema validation failed: {all_failures[0]}",
+                        execution_arn
+                    )
+                ]
             )
         else:
-            # Write a summary comment
-            add_comment_to_workflow_run(
-                workflow_run_orcabus_id=workflow_run_id,
-                comment=_format_comment_with_arn(
-                    f"Post schema validation failed for {len(all_failures)} reasons",
-                    execution_arn
-                ),
-                author=COMMENT_AUTHOR
-            )
-            # Write each failure as a separate numbered comment
-            for idx, failure in enumerate(all_failures, start=1):
-                add_comment_to_workflow_run(
-                    workflow_run_orcabus_id=workflow_run_id,
-                    comment=_format_comment_with_arn(
+            # Write a summary comment, then each failure as a separate numbered comment
+            enqueue_comments(
+                workflow_run_id=workflow_run_id,
+                author=COMMENT_AUTHOR,
+                comment_list=[
+                    _format_comment_with_arn(
+                        f"Post schema validation failed for {len(all_failures)} reasons",
+                        execution_arn
+                    )
+                ] + [
+                    _format_comment_with_arn(
                         f"Reason {idx} of {len(all_failures)}: {failure}",
                         execution_arn
-                    ),
-                    author=COMMENT_AUTHOR
-                )
-                sleep(1)
+                    )
+                    for idx, failure in enumerate(all_failures, start=1)
+                ]
+            )
 
         return {"isValid": False}
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Update the library id -> workflow run index from a WorkflowRunStateChange event
+
+The index is a read model of the workflow runs this service (and its upstream oncoanalyser
+wgts dna / rna services) have published, keyed by library id so that findLatestWorkflow can resolve
+DRAFT and upstream SUCCEEDED runs without querying the Workflow Manager API (see pipeline_manager_tools.workflow_run_index).
+
+The state change event does not carry the full workflow run (i.e the orcabus id of its current state),
+so the workflow run is read from the Workflow Manager API and indexed in the same shape as the runs
+findLatestWorkflow backfills from the API. If the API has not yet recorded the state change, the event is retried.
+
+Events may arrive out of order, so an item is only overwritten by a state change with the same or newer timestamp.
+
+If the WORKFLOW_RUN_INDEX_TABLE_NAME env var is set, the index is stored in DynamoDB,
+otherwise if WORKFLOW_RUN_INDEX_SQLITE_PATH is set, a local SQLite database is used instead (tests and benchmarking).
+
+If the WORKFLOW_RUN_CACHE_TABLE_NAME env var is set, the cached workflow run for the portal run id is also invalidated,
+the invalidation marker holds the state change timestamp so that a reader that fetched the workflow run
+before the state change cannot write the stale workflow run back into the cache.
+"""
+
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
+# Standard imports
+from os import environ
+from typing import Dict, List, Any
+
+# Layer imports
+from orcabus_api_tools.workflow import get_workflow_run_from_portal_run_id
+from pipeline_manager_tools.memoize import memoized, memoized_invocation
+from pipeline_manager_tools.timestamps import normalise_timestamp
+from pipeline_manager_tools.workflow_run_cache import (
+    WORKFLOW_RUN_CACHE_TABLE_NAME_ENV_VAR,
+    invalidate_workflow_run_in_cache,
+)
+from pipeline_manager_tools.workflow_run_index import (
+    WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR,
+    WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR,
+    is_workflow_run_index_enabled,
+    put_workflow_runs_in_index,
+)
+
+
+# Read-only orcabus api calls, memoized for the invocation
+get_workflow_run_from_portal_run_id = memoized(get_workflow_run_from_portal_run_id)
+
+
+class StateChangeNotYetRecordedError(Exception):
+    """
+    The Workflow Manager API does not yet hold the state change of the event
+    """
+    pass
+
+
+def get_workflow_run_for_wrsc_event(wrsc_event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the workflow run (as returned by the Workflow Manager API) at or after the state change of the event
+    :param wrsc_event:
+    :return:
+    """
+    state_timestamp = normalise_timestamp(wrsc_event.get("timestamp", None))
+
+    workflow_run = get_workflow_run_from_portal_run_id(wrsc_event['portalRunId'])
+    current_state_timestamp = normalise_timestamp(workflow_run['currentState'].get('timestamp', None))
+
+    if current_state_timestamp < state_timestamp:
+        raise StateChangeNotYetRecordedError(
+            f"The workflow run {wrsc_event['portalRunId']} is at {workflow_run['currentState']['status']} "
+            f"({current_state_timestamp}), "
+            f"the {wrsc_event['status']} state change ({state_timestamp}) has not yet been recorded"
+        )
+
+    return workflow_run
+
+
+@trace_invocation
+@memoized_invocation()
+def handler(event, context) -> Dict[str, List[str]]:
+    """
+    Add the workflow run state change to the workflow run index
+
+    Input:
+      The WorkflowRunStateChange event detail
+      {
+        "orcabusId": "wfr.xxx",
+        "portalRunId": "20250101abcdef12",
+        "timestamp": "2025-01-01T00:00:00Z",
+        "status": "SUCCEEDED",
+        "workflow": {"name": "oncoanalyser-wgts-dna", "version": "2.2.0", ...},
+        "workflowRunName": "...",
+        "libraries": [{"libraryId": "L1234", "orcabusId": "lib.xxx"}],
+        ...
+      }
+
+    Output:
+      {"libraryIdList": ["L1234"]}  — the library ids the run was indexed under
+
+    :param event:
+    :param context:
+    :return:
+    """
+    if not is_workflow_run_index_enabled():
+        raise EnvironmentError(
+            f"Neither {WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR} nor {WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR} is set"
+        )
+
+    # Invalidate the cached workflow run first, so the cache never outlives the state change
+    if environ.get(WORKFLOW_RUN_CACHE_TABLE_NAME_ENV_VAR, None) is not None:
+        invalidate_workflow_run_in_cache(
+            table_name=environ[WORKFLOW_RUN_CACHE_TABLE_NAME_ENV_VAR],
+            portal_run_id=event['portalRunId'],
+            state_timestamp=normalise_timestamp(event.get("timestamp", None))
+        )
+
+    workflow_run = get_workflow_run_for_wrsc_event(event)
+
+    put_workflow_runs_in_index([workflow_run])
+
+    return {
+        "libraryIdList": list(map(
+            lambda library_iter_: library_iter_['libraryId'],
+            workflow_run.get('libraries', None) or []
+        ))
+    }
+
+
+# if __name__ == "__main__":
+#     import json
+#     from os import environ
+#     environ['AWS_PROFILE'] = 'umccr-development'
+#     environ['HOSTNAME_SSM_PARAMETER_NAME'] = '/hosted_zone/umccr/name'
+#     environ['ORCABUS_TOKEN_SECRET_ID'] = 'orcabus/token-service-jwt'
+#     environ['WORKFLOW_RUN_INDEX_SQLITE_PATH'] = '/tmp/workflow_run_index.db'
+#     print(json.dumps(
+#         handler(
+#             {
+#                 "orcabusId": "wfr.01K42RRMD5T5S0DKQNHP0KKXQB",
+#                 "portalRunId": "202509019aa880c3",
+#                 "timestamp": "2025-09-01T00:00:00Z",
+#                 "status": "SUCCEEDED",
+#                 "workflow": {
+#                     "name": "oncoanalyser-wgts-dna",
+#                     "version": "2.2.0"
+#                 },
+#                 "workflowRunName": "umccr--automated--oncoanalyser-wgts-dna--2-2-0--202509019aa880c3",
+#                 "libraries": [
+#                     {
+#                         "libraryId": "L2300950",
+#                         "orcabusId": "lib.01J9T6AV2XJWBDJ42VAK6RB1XK"
+#                     },
+#                     {
+#                         "libraryId": "L2300943",
+#                         "orcabusId": "lib.01J9T6ATSB40216793T4DJ7AWD"
+#                     }
+#                 ]
+#             },
+#             None
+#         ),
+#         indent=4
+#     ))
+#
+#     # {
+#     #     "libraryIdList": [
+#     #         "L2300950",
+#     #         "L2300943"
+#     #     ]
+#     # }
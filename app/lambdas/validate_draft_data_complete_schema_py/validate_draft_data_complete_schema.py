@@ -2,8 +2,13 @@
 
 """
 Download the draft schema, validate it against the current schema, and print the results.
+
+Validation errors are added to the comment outbox (see flush_comment_outbox) rather than posted on the critical path.
 """
 
+# Tracing imports (before the api client imports, so the api clients are traced)
+from lambda_tracing import trace_invocation
+
 # Standard imports
 import json
 import boto3
@@ -16,7 +21,7 @@ from jsonschema import ValidationError
 from pathlib import Path
 
 # Layer imports
-from orcabus_api_tools.workflow import add_comment_to_workflow_run
+from pipeline_manager_tools.comment_outbox import enqueue_comments
 
 # Type checking imports
 if typing.TYPE_CHECKING:
@@ -30,6 +35,7 @@ WORKFLOW_NAME_ENV_VAR = "WORKFLOW_NAME"
 COMMENT_AUTHOR = "{WORKFLOW_NAME}-workflow-validation-service"
 DEFAULT_PAYLOAD_VERSION_ENV_VAR = "DEFAULT_PAYLOAD_VERSION"
 
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -98,17 +104,18 @@ def validate_draft_schema(
     except ValidationError as e:
         logger.info(f"Failed validation, {e}")
         if comment_error:
-            add_comment_to_workflow_run(
-                workflow_run_orcabus_id=workflow_run_id,
-                comment=f"Draft schema validation failed: {e.message} at \"{e.json_path}\"",
+            enqueue_comments(
+                workflow_run_id=workflow_run_id,
                 author=COMMENT_AUTHOR.format(
                     WORKFLOW_NAME=environ.get(WORKFLOW_NAME_ENV_VAR)
-                )
+                ),
+                comment_list=[f"Draft schema validation failed: {e.message} at \"{e.json_path}\""]
             )
         return False
     return True
 
 
+@trace_invocation
 def handler(event, context) -> Dict[str, bool]:
     """
     Given a draft schema, validate it against the current schema and print the results.
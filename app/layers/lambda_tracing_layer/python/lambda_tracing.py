@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+"""
+Spans around the external calls of a lambda, summarised in one CloudWatch EMF record per invocation
+
+Import this module before the API clients, and decorate the handler with trace_invocation:
+
+    from lambda_tracing import trace_invocation
+
+    from orcabus_api_tools.workflow import get_workflow_run
+    ...
+
+    @trace_invocation
+    def handler(event, context):
+        ...
+
+When TRACING_ENABLED is 'true', a span is recorded for every call to
+  * the orcabus_api_tools workflow, metadata, fastq and filemanager functions (dependency 'workflow', 'metadata', ...)
+  * the wrapica project, project data, project pipeline and storage configuration functions (dependency 'icav2')
+  * jsonschema.validate and the jsonschema validator classes (dependency 'jsonschema')
+  * every aws sdk (boto3) call, by service (dependency 'dynamodb', 'sqs', 'ssm', ...)
+with its duration, payload size (the response size, plus the request size for the aws sdk) and outcome.
+Calls made within a span (i.e the aws sdk calls an api client makes) are part of that span.
+
+At the end of each invocation one JSON record is printed, with the invocation duration and per dependency totals
+(CallCount, ErrorCount, DurationMs and PayloadBytes, as '<dependency>.<metric>') as EMF metrics with the function name
+as the dimension, and the spans themselves (up to MAX_SPANS_PER_RECORD) as a property.
+
+When TRACING_ENABLED is not 'true' nothing is patched, and trace_invocation, trace_span and traced
+return the handler, a shared no-op context manager and the function unchanged.
+"""
+
+# Standard imports
+import importlib.abc
+import inspect
+import json
+import sys
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from os import environ
+from threading import Lock
+from time import perf_counter, time
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+# Globals
+TRACING_ENABLED_ENV_VAR = "TRACING_ENABLED"
+TRACING_METRICS_NAMESPACE_ENV_VAR = "TRACING_METRICS_NAMESPACE"
+DEFAULT_TRACING_METRICS_NAMESPACE = "OrcaBus/OncoanalyserWgtsBoth"
+
+TRACING_ENABLED = environ.get(TRACING_ENABLED_ENV_VAR, "false").lower() == "true"
+
+MAX_SPANS_PER_RECORD = 100
+
+OK_OUTCOME = "ok"
+ERROR_OUTCOME = "error"
+
+# The api client modules whose public functions are traced, and their dependency name
+TRACED_MODULE_DEPENDENCY_MAP: Dict[str, str] = {
+    "orcabus_api_tools.workflow": "workflow",
+    "orcabus_api_tools.metadata": "metadata",
+    "orcabus_api_tools.fastq": "fastq",
+    "orcabus_api_tools.filemanager": "filemanager",
+    "wrapica.project": "icav2",
+    "wrapica.project_data": "icav2",
+    "wrapica.project_pipelines": "icav2",
+    "wrapica.storage_configuration": "icav2",
+    "jsonschema": "jsonschema",
+}
+
+# Validator class methods traced in the jsonschema module
+TRACED_VALIDATOR_METHOD_NAMES = ["validate", "iter_errors", "is_valid"]
+
+TRACED_ATTR = "__traced__"
+BOTO3_SPAN_CONTEXT_KEY = "lambda_tracing_span"
+
+# Set while a span is open, spans opened within it are not recorded
+_ACTIVE_SPAN: ContextVar[bool] = ContextVar("active_span", default=False)
+
+# The invocation of the current context, worker threads see it when run in a copy of the caller's context
+_INVOCATION: ContextVar[Optional["_Invocation"]] = ContextVar("invocation", default=None)
+
+
+class _Invocation:
+    """
+    The spans of the current invocation, spans may be added from the handler's worker threads
+    """
+    def __init__(self, function_name: str, request_id: Optional[str]):
+        self.function_name = function_name
+        self.request_id = request_id
+        self.started_at = perf_counter()
+        self.span_list: List[Dict[str, Any]] = []
+        self.totals_by_dependency: Dict[str, Dict[str, float]] = {}
+        self._lock = Lock()
+
+    def add_span(self, dependency: str, operation: str, duration_ms: float, payload_bytes: Optional[int], outcome: str):
+        with self._lock:
+            totals = self.totals_by_dependency.setdefault(
+                dependency,
+                {"CallCount": 0, "ErrorCount": 0, "DurationMs": 0.0, "PayloadBytes": 0}
+            )
+            totals['CallCount'] += 1
+            totals['ErrorCount'] += int(outcome != OK_OUTCOME)
+            totals['DurationMs'] += duration_ms
+            totals['PayloadBytes'] += payload_bytes or 0
+            self.span_list.append({
+                "dependency": dependency,
+                "operation": operation,
+                "durationMs": round(duration_ms, 3),
+                "payloadBytes": payload_bytes,
+                "outcome": outcome,
+            })
+
+    def get_emf_record(self, outcome: str) -> Dict[str, Any]:
+        with self._lock:
+            metric_values = {
+                "InvocationDurationMs": round((perf_counter() - self.started_at) * 1000, 3),
+                **{
+                    f"{dependency}.{metric_name}": round(value, 3)
+                    for dependency, totals in sorted(self.totals_by_dependency.items())
+                    for metric_name, value in totals.items()
+                },
+            }
+            span_list = sorted(self.span_list, key=lambda span_iter_: -span_iter_['durationMs'])
+
+        return {
+            "_aws": {
+                "Timestamp": int(time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": environ.get(TRACING_METRICS_NAMESPACE_ENV_VAR, DEFAULT_TRACING_METRICS_NAMESPACE),
+                        "Dimensions": [["FunctionName"]],
+                        "Metrics": list(map(
+                            lambda metric_name_iter_: {
+                                "Name": metric_name_iter_,
+                                "Unit": get_metric_unit(metric_name_iter_),
+                            },
+                            metric_values.keys()
+                        )),
+                    }
+                ],
+            },
+            "FunctionName": self.function_name,
+            "RequestId": self.request_id,
+            "Outcome": outcome,
+            **metric_values,
+            # The slowest spans
+            "Spans": span_list[:MAX_SPANS_PER_RECORD],
+            "DroppedSpanCount": max(0, len(span_list) - MAX_SPANS_PER_RECORD),
+        }
+
+
+def get_metric_unit(metric_name: str) -> str:
+    if metric_name.endswith("DurationMs"):
+        return "Milliseconds"
+    if metric_name.endswith("PayloadBytes"):
+        return "Bytes"
+    return "Count"
+
+
+def get_payload_bytes(value: Any) -> Optional[int]:
+    """
+    The size of a response, JSON encoded
+    :param value:
+    :return: None if the size is not known (i.e. the response is not JSON)
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (dict, list, tuple)):
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return None
+    if hasattr(value, "to_dict"):
+        return get_payload_bytes(value.to_dict())
+    return None
+
+
+def add_span(dependency: str, operation: str, duration_ms: float, payload_bytes: Optional[int], outcome: str):
+    # Spans outside an invocation (i.e at import) are dropped
+    invocation = _INVOCATION.get()
+    if invocation is not None:
+        invocation.add_span(dependency, operation, duration_ms, payload_bytes, outcome)
+
+
+class _Span:
+    def __init__(self):
+        self.payload_bytes: Optional[int] = None
+
+    def set_payload(self, value: Any):
+        self.payload_bytes = get_payload_bytes(value)
+
+
+class _NoOpSpan(_Span):
+    def set_payload(self, value: Any):
+        pass
+
+
+# Yielded when tracing is disabled, or within another span
+_NO_OP_SPAN = _NoOpSpan()
+
+
+@contextmanager
+def _trace_span(dependency: str, operation: str):
+    if _ACTIVE_SPAN.get():
+        yield _NO_OP_SPAN
+        return
+
+    active_span_token = _ACTIVE_SPAN.set(True)
+    span = _Span()
+    outcome = OK_OUTCOME
+    started_at = perf_counter()
+    try:
+        yield span
+    except Exception:
+        outcome = ERROR_OUTCOME
+        raise
+    finally:
+        _ACTIVE_SPAN.reset(active_span_token)
+        add_span(dependency, operation, (perf_counter() - started_at) * 1000, span.payload_bytes, outcome)
+
+
+def trace_span(dependency: str, operation: str):
+    """
+    Record a span around a block, set the payload with span.set_payload(response)
+
+        with trace_span("filemanager", "list_files") as span:
+            file_list = ...
+            span.set_payload(file_list)
+
+    :param dependency:
+    :param operation:
+    :return:
+    """
+    if not TRACING_ENABLED:
+        return nullcontext(_NO_OP_SPAN)
+    return _trace_span(dependency, operation)
+
+
+def _get_traced_function(func: Callable, dependency: str, operation: str) -> Callable:
+    if inspect.isgeneratorfunction(func):
+        # The span covers the iteration
+        @wraps(func)
+        def traced_generator_function(*args, **kwargs):
+            with _trace_span(dependency, operation):
+                return (yield from func(*args, **kwargs))
+
+        setattr(traced_generator_function, TRACED_ATTR, True)
+        return traced_generator_function
+
+    @wraps(func)
+    def traced_function(*args, **kwargs):
+        with _trace_span(dependency, operation) as span:
+            response = func(*args, **kwargs)
+            span.set_payload(response)
+            return response
+
+    setattr(traced_function, TRACED_ATTR, True)
+    return traced_function
+
+
+def traced(dependency: str, operation: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator, record a span around each call of the function
+    :param dependency:
+    :param operation: Defaults to the function name
+    :return:
+    """
+    def decorator(func: Callable) -> Callable:
+        if not TRACING_ENABLED:
+            return func
+        return _get_traced_function(func, dependency, operation or func.__name__)
+    return decorator
+
+
+def trace_invocation(handler: Callable) -> Callable:
+    """
+    Handler decorator, collect the spans of each invocation and print them as an EMF record
+    :param handler:
+    :return:
+    """
+    if not TRACING_ENABLED:
+        return handler
+
+    @wraps(handler)
+    def traced_handler(event, context):
+        invocation = _Invocation(
+            function_name=getattr(context, "function_name", None) or environ.get("AWS_LAMBDA_FUNCTION_NAME", handler.__module__),
+            request_id=getattr(context, "aws_request_id", None),
+        )
+        invocation_token = _INVOCATION.set(invocation)
+
+        outcome = ERROR_OUTCOME
+        try:
+            response = handler(event, context)
+            outcome = OK_OUTCOME
+            return response
+        finally:
+            _INVOCATION.reset(invocation_token)
+            print(json.dumps(invocation.get_emf_record(outcome)))
+
+    return traced_handler
+
+
+def _patch_module(module: ModuleType):
+    """
+    Swap the public functions of a traced module (defined in its package) for traced functions,
+    and for jsonschema, trace the methods of the validator classes
+    :param module:
+    :return:
+    """
+    dependency = TRACED_MODULE_DEPENDENCY_MAP[module.__name__]
+    package_name = module.__name__.split(".")[0]
+
+    for attr_name, attr in list(vars(module).items()):
+        if attr_name.startswith("_") or getattr(attr, TRACED_ATTR, False):
+            continue
+
+        if inspect.isfunction(attr) and (attr.__module__ or "").startswith(package_name):
+            setattr(module, attr_name, _get_traced_function(attr, dependency, attr_name))
+            continue
+
+        if package_name == "jsonschema" and inspect.isclass(attr) and attr_name.endswith("Validator"):
+            for method_name in TRACED_VALIDATOR_METHOD_NAMES:
+                method = attr.__dict__.get(method_name, None)
+                if inspect.isfunction(method) and not getattr(method, TRACED_ATTR, False):
+                    setattr(attr, method_name, _get_traced_function(method, dependency, f"{attr_name}.{method_name}"))
+
+
+class _TracingLoader(importlib.abc.Loader):
+    def __init__(self, loader: importlib.abc.Loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType):
+        self.loader.exec_module(module)
+        _patch_module(module)
+
+
+class _TracingFinder(importlib.abc.MetaPathFinder):
+    """
+    Trace the api client modules as they are imported, the module is found by the finders after this one
+    """
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in TRACED_MODULE_DEPENDENCY_MAP:
+            return None
+        for finder in sys.meta_path[sys.meta_path.index(self) + 1:]:
+            spec = finder.find_spec(fullname, path, target) if hasattr(finder, "find_spec") else None
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is None:
+            return spec
+        spec.loader = _TracingLoader(spec.loader)
+        return spec
+
+
+def _before_boto3_call(model, context, params=None, **kwargs):
+    if _ACTIVE_SPAN.get():
+        return
+    body = (params or {}).get("body", None)
+    context[BOTO3_SPAN_CONTEXT_KEY] = {
+        "dependency": model.service_model.service_name,
+        "operation": model.name,
+        "startedAt": perf_counter(),
+        "requestBytes": len(body) if isinstance(body, (bytes, str)) else 0,
+    }
+
+
+def _after_boto3_call(context, http_response=None, exception=None, **kwargs):
+    # after-call-error is emitted with the exception and context only
+    boto3_span = context.pop(BOTO3_SPAN_CONTEXT_KEY, None)
+    if boto3_span is None:
+        return
+    response_bytes = len(http_response.content or b"") if http_response is not None else 0
+    add_span(
+        boto3_span['dependency'],
+        boto3_span['operation'],
+        (perf_counter() - boto3_span['startedAt']) * 1000,
+        boto3_span['requestBytes'] + response_bytes,
+        OK_OUTCOME if exception is None and http_response is not None and http_response.status_code < 300 else ERROR_OUTCOME,
+    )
+
+
+def _instrument():
+    """
+    Trace the api client modules imported from here on (and any already imported),
+    and every aws sdk call of the default boto3 session
+    """
+    if not any(map(lambda finder_iter_: isinstance(finder_iter_, _TracingFinder), sys.meta_path)):
+        sys.meta_path.insert(0, _TracingFinder())
+
+    for module_name in TRACED_MODULE_DEPENDENCY_MAP:
+        if module_name in sys.modules:
+            _patch_module(sys.modules[module_name])
+
+    try:
+        import boto3
+    except ImportError:
+        return
+    # Clients copy the session's event handlers, so every client made from here on is traced
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register("before-call", _before_boto3_call, unique_id="lambda-tracing-before-call")
+    boto3.DEFAULT_SESSION.events.register("after-call", _after_boto3_call, unique_id="lambda-tracing-after-call")
+    boto3.DEFAULT_SESSION.events.register("after-call-error", _after_boto3_call, unique_id="lambda-tracing-after-call-error")
+
+
+if TRACING_ENABLED:
+    _instrument()
+
+
+# if __name__ == "__main__":
+#     # TRACING_ENABLED=true python -c '...'
+#     import jsonschema
+#
+#     @trace_invocation
+#     def handler(event, context):
+#         jsonschema.validate(instance={"a": 1}, schema={"type": "object"})
+#         return {}
+#
+#     handler({}, None)
+#
+#     # {"_aws": {"Timestamp": 1760000000000, "CloudWatchMetrics": [{"Namespace": "OrcaBus/OncoanalyserWgtsBoth", "Dimensions": [["FunctionName"]], "Metrics": [{"Name": "InvocationDurationMs", "Unit": "Milliseconds"}, {"Name": "jsonschema.CallCount", "Unit": "Count"}, ...]}]},
+#     #  "FunctionName": "__main__", "RequestId": null, "Outcome": "ok", "InvocationDurationMs": 0.9, "jsonschema.CallCount": 1, "jsonschema.ErrorCount": 0, "jsonschema.DurationMs": 0.7, "jsonschema.PayloadBytes": 0,
+#     #  "Spans": [{"dependency": "jsonschema", "operation": "validate", "durationMs": 0.7, "payloadBytes": 0, "outcome": "ok"}], "DroppedSpanCount": 0}
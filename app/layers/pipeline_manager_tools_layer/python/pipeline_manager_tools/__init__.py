@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+"""
+Helpers shared by the lambdas of this service (added to every lambda as the pipeline manager tools layer)
+
+  * aws_clients: The warm container AWS clients
+  * comment_outbox: The workflow run comment outbox (FIFO queue)
+  * incremental_processes: Plan the processes of an incremental reprocessing run
+  * library_metadata_cache: The library record cache (warm container and table)
+  * memoize: Memoize the read-only orcabus api calls within an invocation
+  * payload_store: The payload orcabus id -> payload body store (warm container and table)
+  * projection: Project the returned objects down to the fields the state machines read
+  * result_reuse_index: The input fingerprint -> SUCCEEDED run result index
+  * sqlite_stand_in: The local SQLite stand-in for the tables and queues (tests and benchmarking)
+  * timestamps: Lexically comparable UTC timestamps
+  * workflow_run_cache: The portal run id -> workflow run read-through cache
+  * workflow_run_index: The library id -> workflow run read model
+"""
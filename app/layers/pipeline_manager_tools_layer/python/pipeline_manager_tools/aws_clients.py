@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+"""
+AWS clients, created once per warm container and shared by the stores of this layer and the handlers
+"""
+
+# Standard imports
+import typing
+from typing import Optional
+
+import boto3
+
+# Type checking imports
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBClient
+    from mypy_boto3_sqs import SQSClient
+
+# Globals
+_DYNAMODB_CLIENT: Optional['DynamoDBClient'] = None
+_SQS_CLIENT: Optional['SQSClient'] = None
+
+
+def get_dynamodb_client() -> 'DynamoDBClient':
+    global _DYNAMODB_CLIENT
+
+    if _DYNAMODB_CLIENT is None:
+        _DYNAMODB_CLIENT = boto3.client("dynamodb")
+
+    return _DYNAMODB_CLIENT
+
+
+def get_sqs_client() -> 'SQSClient':
+    global _SQS_CLIENT
+
+    if _SQS_CLIENT is None:
+        _SQS_CLIENT = boto3.client("sqs")
+
+    return _SQS_CLIENT
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+"""
+The comment outbox, workflow run comments waiting to be merged and posted by the flush_comment_outbox lambda
+
+The commentary lambdas (and the validation and ICAv2 WES translation lambdas) add
+(workflowRunId, author, comment) records to the outbox rather than posting comments on the critical path.
+
+The outbox is a FIFO SQS queue (COMMENT_OUTBOX_QUEUE_URL), each workflow run is its own message group,
+so the comments of a workflow run are delivered (and retried) in the order they were enqueued.
+If COMMENT_OUTBOX_SQLITE_PATH is set, the outbox is a local SQLite table instead (tests and benchmarking).
+
+If neither is set, the comments are posted straight away.
+"""
+
+# Standard imports
+import json
+from os import environ
+from time import sleep, time
+from typing import Any, Dict, List
+
+# Local imports
+from .aws_clients import get_sqs_client
+from .sqlite_stand_in import sqlite_transaction
+
+# Globals
+COMMENT_OUTBOX_QUEUE_URL_ENV_VAR = "COMMENT_OUTBOX_QUEUE_URL"
+COMMENT_OUTBOX_SQLITE_PATH_ENV_VAR = "COMMENT_OUTBOX_SQLITE_PATH"
+SQS_SEND_MESSAGE_BATCH_SIZE = 10
+
+# Rate limit the comment api (when posting straight away)
+COMMENT_POST_INTERVAL_SECONDS = 1
+
+SQLITE_CREATE_TABLE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS comment_outbox (
+    record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workflow_run_id TEXT NOT NULL,
+    author TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    sequence INTEGER NOT NULL
+)
+"""
+
+SQLITE_INSERT_STATEMENT = """
+INSERT INTO comment_outbox (workflow_run_id, author, comment, enqueued_at, sequence)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+SQLITE_SELECT_STATEMENT = """
+SELECT record_id, workflow_run_id, author, comment, enqueued_at, sequence
+FROM comment_outbox
+ORDER BY record_id
+"""
+
+SQLITE_DELETE_STATEMENT = """
+DELETE FROM comment_outbox WHERE record_id = ?
+"""
+
+
+def enqueue_comments(workflow_run_id: str, author: str, comment_list: List[str]):
+    """
+    Add the comments to the comment outbox, the flushCommentOutbox lambda merges and posts them.
+    If there is no outbox (neither COMMENT_OUTBOX_QUEUE_URL nor COMMENT_OUTBOX_SQLITE_PATH is set),
+    the comments are posted straight away
+    :param workflow_run_id:
+    :param author:
+    :param comment_list:
+    :return:
+    """
+    enqueued_at = time()
+    record_list = list(map(
+        lambda comment_iter_: {
+            "workflowRunId": workflow_run_id,
+            "author": author,
+            "comment": comment_iter_[1],
+            "enqueuedAt": enqueued_at,
+            "sequence": comment_iter_[0],
+        },
+        enumerate(comment_list)
+    ))
+
+    if environ.get(COMMENT_OUTBOX_QUEUE_URL_ENV_VAR, None) is not None:
+        for batch_start_iter_ in range(0, len(record_list), SQS_SEND_MESSAGE_BATCH_SIZE):
+            response = get_sqs_client().send_message_batch(
+                QueueUrl=environ[COMMENT_OUTBOX_QUEUE_URL_ENV_VAR],
+                Entries=list(map(
+                    lambda record_iter_: {
+                        "Id": str(record_iter_['sequence']),
+                        "MessageBody": json.dumps(record_iter_),
+                        # Messages are deduplicated by their content (see the queue)
+                        "MessageGroupId": record_iter_['workflowRunId'],
+                    },
+                    record_list[batch_start_iter_:batch_start_iter_ + SQS_SEND_MESSAGE_BATCH_SIZE]
+                ))
+            )
+            if response.get("Failed", []):
+                raise RuntimeError(f"Could not add comments to the comment outbox: {response['Failed']}")
+        return
+
+    if environ.get(COMMENT_OUTBOX_SQLITE_PATH_ENV_VAR, None) is not None:
+        with sqlite_transaction(
+            environ[COMMENT_OUTBOX_SQLITE_PATH_ENV_VAR], [SQLITE_CREATE_TABLE_STATEMENT]
+        ) as connection:
+            connection.executemany(
+                SQLITE_INSERT_STATEMENT,
+                list(map(
+                    lambda record_iter_: (
+                        record_iter_['workflowRunId'],
+                        record_iter_['author'],
+                        record_iter_['comment'],
+                        record_iter_['enqueuedAt'],
+                        record_iter_['sequence'],
+                    ),
+                    record_list
+                ))
+            )
+        return
+
+    # Imported here, the layer is added to lambdas without the orcabus api tools layer
+    from orcabus_api_tools.workflow import add_comment_to_workflow_run
+
+    for record_iter_ in record_list:
+        if record_iter_['sequence'] > 0:
+            sleep(COMMENT_POST_INTERVAL_SECONDS)
+        add_comment_to_workflow_run(
+            workflow_run_orcabus_id=record_iter_['workflowRunId'],
+            comment=record_iter_['comment'],
+            author=record_iter_['author'],
+        )
+
+
+def get_records_from_sqlite_outbox(sqlite_path: str) -> List[Dict[str, Any]]:
+    """
+    Get the records of the local stand-in, in the order they were enqueued
+    :param sqlite_path:
+    :return:
+    """
+    with sqlite_transaction(sqlite_path, [SQLITE_CREATE_TABLE_STATEMENT]) as connection:
+        row_list = connection.execute(SQLITE_SELECT_STATEMENT).fetchall()
+
+    return list(map(
+        lambda row_iter_: {
+            "recordId": str(row_iter_[0]),
+            "workflowRunId": row_iter_[1],
+            "author": row_iter_[2],
+            "comment": row_iter_[3],
+            "enqueuedAt": row_iter_[4],
+            "sequence": row_iter_[5],
+        },
+        row_list
+    ))
+
+
+def delete_records_from_sqlite_outbox(sqlite_path: str, record_id_list: List[str]):
+    """
+    Remove the records that have been posted from the local stand-in
+    :param sqlite_path:
+    :param record_id_list:
+    :return:
+    """
+    with sqlite_transaction(sqlite_path, [SQLITE_CREATE_TABLE_STATEMENT]) as connection:
+        connection.executemany(
+            SQLITE_DELETE_STATEMENT,
+            list(map(
+                lambda record_id_iter_: (int(record_id_iter_),),
+                record_id_list
+            ))
+        )
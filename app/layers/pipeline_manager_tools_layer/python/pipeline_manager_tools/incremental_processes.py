@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+
+"""
+Plan an incremental reprocessing run, used by convert_ready_event_inputs_to_icav2_wes_event_inputs
+for every READY event with a reprocessFromPortalRunId
+
+Check the outputs of the prior run for each of the requested processes,
+and only keep the processes whose outputs are missing or stale.
+
+A process is planned if:
+  * it is listed in refreshProcessesList, or
+  * its output directory is missing from the prior run (for any of the sample groups), or
+  * one of its dependencies is planned, or
+  * it is a dependency of a planned process and its outputs cannot be wired in as inputs
+
+If refreshProcessesList is not set, and the prior run was given different inputs,
+every process is stale and the run is planned in full.
+
+The existing outputs of processes that are not planned are wired in as inputs where oncoanalyser supports it,
+and the prior output directory of each reused process is recorded in the outputs of the run
+(see get_reused_process_outputs).
+
+If no process needs to run, nothing is launched, the prior run's result is returned to be published instead.
+"""
+
+# Standard imports
+import logging
+from copy import deepcopy
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+# Layer imports
+from orcabus_api_tools.filemanager import list_files_recursively
+from orcabus_api_tools.workflow import (
+    get_workflow_run_from_portal_run_id,
+    get_latest_payload_from_workflow_run
+)
+
+# Local imports
+from .memoize import InvocationThreadPoolExecutor, memoized
+
+# Globals
+MAX_CONCURRENT_REQUESTS = 8
+
+# Input keys that select what to process rather than what is processed
+PROCESS_SELECTION_INPUT_KEYS = [
+    "processesList",
+    "reprocessFromPortalRunId",
+    "refreshProcessesList",
+]
+
+# Processes that depend on the outputs of other processes
+PROCESS_DEPENDENCIES: Dict[str, List[str]] = {
+    "lilac": [],
+    "neo": ["lilac"],
+    "cuppa": [],
+    "orange": ["lilac", "cuppa"],
+}
+
+# Process outputs oncoanalyser accepts as (tumor dna) samplesheet inputs
+PROCESS_OUTPUT_INPUT_KEYS: Dict[str, str] = {
+    "lilac": "lilacDir",
+}
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Read-only orcabus api calls, memoized for the invocation
+get_workflow_run_from_portal_run_id = memoized(get_workflow_run_from_portal_run_id)
+get_latest_payload_from_workflow_run = memoized(get_latest_payload_from_workflow_run)
+list_files_recursively = memoized(list_files_recursively)
+
+
+def join_uri(uri: str, path: str) -> str:
+    return uri.rstrip("/") + "/" + path.strip("/") + "/"
+
+
+def get_prior_run(reprocess_from_portal_run_id: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Get the inputs and the output uri of the prior run (which must have SUCCEEDED with outputs)
+    :param reprocess_from_portal_run_id:
+    :return:
+    """
+    workflow_run = get_workflow_run_from_portal_run_id(reprocess_from_portal_run_id)
+    payload_data = get_latest_payload_from_workflow_run(workflow_run['orcabusId'])['data']
+
+    output_uri = payload_data['engineParameters']['outputUri']
+    outputs = payload_data.get('outputs', None) or {}
+
+    if outputs.get('dnaRnaOncoanalyserAnalysisRelPath', None) is None:
+        raise ValueError(f"The run to reprocess from '{reprocess_from_portal_run_id}' has no outputs")
+
+    return payload_data['inputs'], output_uri
+
+
+def get_group_output_uri_list(inputs: Dict[str, Any], output_uri: str) -> List[str]:
+    """
+    Get the output directory of each sample group (primary group first),
+    each sample group is written to <output uri>/<group id>/
+    :param inputs:
+    :param output_uri:
+    :return:
+    """
+    return list(map(
+        lambda sample_group_iter_: join_uri(output_uri, sample_group_iter_['groupId']),
+        [inputs] + (inputs.get("additionalTumorGroups", None) or [])
+    ))
+
+
+def has_files(directory_uri: str) -> bool:
+    directory_urlobj = urlparse(directory_uri)
+    return len(list_files_recursively(directory_urlobj.netloc, directory_urlobj.path.lstrip("/"))) > 0
+
+
+def get_existing_processes(process_list: List[str], group_output_uri_list: List[str]) -> List[str]:
+    """
+    Get the processes with an output directory in every sample group of the prior run
+    :param process_list:
+    :param group_output_uri_list:
+    :return:
+    """
+    process_directory_list = [
+        (process_iter_, join_uri(group_output_uri_iter_, process_iter_))
+        for process_iter_ in process_list
+        for group_output_uri_iter_ in group_output_uri_list
+    ]
+
+    if not process_directory_list:
+        return []
+
+    with InvocationThreadPoolExecutor(
+        max_workers=min(MAX_CONCURRENT_REQUESTS, len(process_directory_list))
+    ) as executor:
+        has_files_list = list(executor.map(
+            lambda process_directory_iter_: has_files(process_directory_iter_[1]),
+            process_directory_list
+        ))
+
+    return list(filter(
+        lambda process_iter_: all(
+            has_files_iter_
+            for (process_directory_process_iter_, _), has_files_iter_ in zip(process_directory_list, has_files_list)
+            if process_directory_process_iter_ == process_iter_
+        ),
+        process_list
+    ))
+
+
+def plan_processes(
+        process_list: List[str],
+        existing_process_list: List[str],
+        refresh_process_list: List[str],
+) -> List[str]:
+    """
+    Get the processes to run, in the order of the process list
+    :param process_list: The requested processes
+    :param existing_process_list: The requested processes with outputs in the prior run
+    :param refresh_process_list: The processes to run regardless of their outputs
+    :return:
+    """
+    planned_process_set = set(filter(
+        lambda process_iter_: (
+            process_iter_ in refresh_process_list or
+            process_iter_ not in existing_process_list
+        ),
+        process_list
+    ))
+
+    # Add dependents of planned processes, and dependencies we cannot wire in, until nothing changes
+    while True:
+        next_planned_process_set = planned_process_set | set(filter(
+            lambda process_iter_: (
+                any(
+                    dependency_iter_ in planned_process_set
+                    for dependency_iter_ in PROCESS_DEPENDENCIES.get(process_iter_, [])
+                ) or
+                (
+                    process_iter_ not in PROCESS_OUTPUT_INPUT_KEYS and
+                    any(
+                        process_iter_ in PROCESS_DEPENDENCIES.get(planned_process_iter_, [])
+                        for planned_process_iter_ in planned_process_set
+                    )
+                )
+            ),
+            process_list
+        ))
+        if next_planned_process_set == planned_process_set:
+            break
+        planned_process_set = next_planned_process_set
+
+    return list(filter(
+        lambda process_iter_: process_iter_ in planned_process_set,
+        process_list
+    ))
+
+
+def wire_existing_outputs(
+        inputs: Dict[str, Any],
+        reused_process_list: List[str],
+        group_output_uri_list: List[str]
+) -> Dict[str, Any]:
+    """
+    Add the prior run's outputs of the reused processes to the tumor dna inputs of each sample group,
+    inputs that are already set are kept
+    :param inputs:
+    :param reused_process_list:
+    :param group_output_uri_list:
+    :return:
+    """
+    inputs = deepcopy(inputs)
+
+    sample_group_list = [inputs] + (inputs.get("additionalTumorGroups", None) or [])
+
+    for sample_group, group_output_uri in zip(sample_group_list, group_output_uri_list):
+        for process in reused_process_list:
+            input_key = PROCESS_OUTPUT_INPUT_KEYS.get(process, None)
+            if input_key is None:
+                continue
+            sample_group.setdefault("tumorDnaInputs", {}).setdefault(
+                input_key, join_uri(group_output_uri, process)
+            )
+
+    return inputs
+
+
+def get_reused_process_outputs(
+        inputs: Dict[str, Any],
+        reused_process_list: List[str],
+        prior_output_uri: str
+) -> Dict[str, Any]:
+    """
+    Map each reused process to its output directory in the prior run, for the primary group
+    (and for each additional tumor group, in the order of additionalTumorGroups), i.e
+      {
+        "reusedProcessOutputUriMap": {"lilac": "s3://.../20250101abcdef12/SBJ05828/lilac/"},
+        "additionalReusedProcessOutputUriMapList": [{"lilac": "s3://.../20250101abcdef12/SBJ05829/lilac/"}]
+      }
+    :param inputs:
+    :param reused_process_list:
+    :param prior_output_uri:
+    :return:
+    """
+    if not reused_process_list:
+        return {}
+
+    reused_process_output_uri_map_list = list(map(
+        lambda group_output_uri_iter_: dict(map(
+            lambda process_iter_: (process_iter_, join_uri(group_output_uri_iter_, process_iter_)),
+            reused_process_list
+        )),
+        get_group_output_uri_list(inputs, prior_output_uri)
+    ))
+
+    return {
+        "reusedProcessOutputUriMap": reused_process_output_uri_map_list[0],
+        **(
+            {"additionalReusedProcessOutputUriMapList": reused_process_output_uri_map_list[1:]}
+            if len(reused_process_output_uri_map_list) > 1
+            else {}
+        ),
+    }
+
+
+def get_group_outputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The output directory of each sample group, relative to the output uri
+    :param inputs:
+    :return:
+    """
+    return {
+        "dnaRnaOncoanalyserAnalysisRelPath": f"{inputs['groupId']}/",
+        **(
+            {
+                "additionalDnaRnaOncoanalyserAnalysisRelPathList": list(map(
+                    lambda additional_tumor_group_iter_: f"{additional_tumor_group_iter_['groupId']}/",
+                    inputs['additionalTumorGroups']
+                ))
+            }
+            if inputs.get("additionalTumorGroups", None)
+            else {}
+        ),
+    }
+
+
+def plan_incremental_processes(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Plan the processes of an incremental reprocessing run
+
+    Returns the planned inputs and the processes reused from the prior run, i.e
+      {
+        "inputs": {
+          ...,
+          "processesList": ["cuppa", "orange"],
+          "tumorDnaInputs": {..., "lilacDir": "s3://.../20250101abcdef12/SBJ05828/lilac/"}
+        },
+        "reusedProcessesList": ["lilac", "neo"]
+      }
+
+    If every process already has up-to-date outputs in the prior run, there is nothing to run,
+    the prior run's result (with every process reused) is returned as the priorResult, i.e
+      {
+        "inputs": {...},
+        "reusedProcessesList": ["lilac", "neo", "cuppa", "orange"],
+        "priorResult": {
+          "portalRunId": "20250101abcdef12",
+          "outputUri": "s3://.../20250101abcdef12/",
+          "outputs": {
+            "dnaRnaOncoanalyserAnalysisRelPath": "SBJ05828/",
+            "reusedProcessOutputUriMap": {"lilac": "s3://.../20250101abcdef12/SBJ05828/lilac/", ...}
+          }
+        }
+      }
+    :param inputs: The READY event inputs, with the reprocessFromPortalRunId and (optional) refreshProcessesList
+    :return:
+    """
+    reprocess_from_portal_run_id: Optional[str] = inputs.get("reprocessFromPortalRunId", None)
+    process_list: List[str] = inputs.get("processesList", None) or []
+    refresh_process_list: Optional[List[str]] = inputs.get("refreshProcessesList", None)
+
+    if reprocess_from_portal_run_id is None or not process_list:
+        return {
+            "inputs": inputs,
+            "reusedProcessesList": [],
+        }
+
+    prior_inputs, prior_output_uri = get_prior_run(reprocess_from_portal_run_id)
+
+    # Without an explicit refresh list, any change to the inputs makes every process stale
+    if refresh_process_list is None:
+        is_same_inputs = all(
+            inputs.get(key_iter_, None) == prior_inputs.get(key_iter_, None)
+            for key_iter_ in set(inputs.keys()) | set(prior_inputs.keys())
+            if key_iter_ not in PROCESS_SELECTION_INPUT_KEYS
+        )
+        if not is_same_inputs:
+            logger.info(f"The inputs differ from those of {reprocess_from_portal_run_id}, planning every process")
+            return {
+                "inputs": inputs,
+                "reusedProcessesList": [],
+            }
+        refresh_process_list = []
+
+    # A sample group not in the prior run has no outputs, so its processes are missing
+    group_output_uri_list = get_group_output_uri_list(inputs, prior_output_uri)
+
+    existing_process_list = get_existing_processes(process_list, group_output_uri_list)
+
+    planned_process_list = plan_processes(process_list, existing_process_list, refresh_process_list)
+
+    # Nothing to reprocess, the prior run's result is reused as is
+    if not planned_process_list:
+        logger.info(f"Every process has outputs in {reprocess_from_portal_run_id}, nothing to run")
+        return {
+            "inputs": inputs,
+            "reusedProcessesList": process_list,
+            "priorResult": {
+                "portalRunId": reprocess_from_portal_run_id,
+                "outputUri": prior_output_uri,
+                "outputs": {
+                    **get_group_outputs(inputs),
+                    **get_reused_process_outputs(inputs, process_list, prior_output_uri),
+                },
+            },
+        }
+
+    reused_process_list = list(filter(
+        lambda process_iter_: process_iter_ not in planned_process_list,
+        process_list
+    ))
+
+    logger.info(f"Planned processes {planned_process_list}, reusing {reused_process_list} from {reprocess_from_portal_run_id}")
+
+    return {
+        "inputs": {
+            **wire_existing_outputs(inputs, reused_process_list, group_output_uri_list),
+            "processesList": planned_process_list,
+        },
+        "reusedProcessesList": reused_process_list,
+    }
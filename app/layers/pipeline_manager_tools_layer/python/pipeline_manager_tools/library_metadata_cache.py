@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+"""
+The library metadata cache, shared by get_libraries, get_metadata_tags and post_schema_validation,
+and invalidated by the invalidate_library_metadata_cache lambda
+
+Library records are cached in the warm container and in the library metadata cache table.
+The table holds each library record once under its orcabus id:
+  * library_key (partition key): The library orcabus id
+  * library_id: The library id
+  * library: The JSON encoded library record (as returned by the metadata manager)
+  * fetched_at: When the library record was fetched from the metadata manager (epoch seconds)
+  * ttl: Expiry (epoch seconds)
+with an alias item under its library id:
+  * library_key (partition key): The library id
+  * library_orcabus_id: The library orcabus id
+  * fetched_at: When the library record was fetched from the metadata manager (epoch seconds)
+  * ttl: Expiry (epoch seconds)
+
+When the metadata manager reports a library update, both items are replaced with invalidation markers
+(no library record, invalidated_at in epoch seconds). A reader that fetched the library record before the update
+cannot write the stale record back, as a record is only cached if it was fetched after the invalidation
+(and after the record it replaces). Warm containers hold records for a short time only.
+
+If the LIBRARY_METADATA_CACHE_TABLE_NAME env var is not set, only the warm container cache is used.
+"""
+
+# Standard imports
+import json
+from collections import OrderedDict
+from os import environ
+from threading import Lock
+from time import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .aws_clients import get_dynamodb_client
+from .memoize import memoized
+
+# Globals
+LIBRARY_METADATA_CACHE_TABLE_NAME_ENV_VAR = "LIBRARY_METADATA_CACHE_TABLE_NAME"
+# Metadata update events invalidate the table, so warm containers hold records for a short time only
+LIBRARY_CACHE_MEMORY_TTL_SECONDS = 300
+LIBRARY_CACHE_MEMORY_MAX_SIZE = 256
+LIBRARY_CACHE_TABLE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Warm container cache, each library record is held once (by orcabus id)
+# with a library id -> orcabus id alias map
+_LIBRARY_CACHE: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+_LIBRARY_ID_TO_ORCABUS_ID_MAP: Dict[str, str] = {}
+_LIBRARY_CACHE_LOCK = Lock()
+
+
+def get_library_from_memory_cache(
+        library_orcabus_id: Optional[str] = None,
+        library_id: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    with _LIBRARY_CACHE_LOCK:
+        if library_orcabus_id is None:
+            library_orcabus_id = _LIBRARY_ID_TO_ORCABUS_ID_MAP.get(library_id, None)
+        if library_orcabus_id is None or library_orcabus_id not in _LIBRARY_CACHE:
+            return None
+
+        expiry_time, library_obj = _LIBRARY_CACHE[library_orcabus_id]
+        if expiry_time < time():
+            invalidate_library_in_memory_cache(library_orcabus_id)
+            return None
+
+        # Most recently used
+        _LIBRARY_CACHE.move_to_end(library_orcabus_id)
+        return library_obj
+
+
+def put_library_in_memory_cache(library_obj: Dict[str, Any]):
+    with _LIBRARY_CACHE_LOCK:
+        _LIBRARY_CACHE[library_obj['orcabusId']] = (time() + LIBRARY_CACHE_MEMORY_TTL_SECONDS, library_obj)
+        _LIBRARY_CACHE.move_to_end(library_obj['orcabusId'])
+        _LIBRARY_ID_TO_ORCABUS_ID_MAP[library_obj['libraryId']] = library_obj['orcabusId']
+
+        # Evict the least recently used
+        while len(_LIBRARY_CACHE) > LIBRARY_CACHE_MEMORY_MAX_SIZE:
+            _, (_, evicted_library_obj) = _LIBRARY_CACHE.popitem(last=False)
+            _LIBRARY_ID_TO_ORCABUS_ID_MAP.pop(evicted_library_obj['libraryId'], None)
+
+
+def invalidate_library_in_memory_cache(library_orcabus_id: str):
+    # Caller holds the lock
+    _, library_obj = _LIBRARY_CACHE.pop(library_orcabus_id, (None, None))
+    if library_obj is not None:
+        _LIBRARY_ID_TO_ORCABUS_ID_MAP.pop(library_obj['libraryId'], None)
+
+
+def get_library_from_table_cache(
+        library_orcabus_id: Optional[str] = None,
+        library_id: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Library records are stored once under their orcabus id,
+    the library id item is an alias that points to the orcabus id item
+    :param library_orcabus_id:
+    :param library_id:
+    :return:
+    """
+    table_name = environ.get(LIBRARY_METADATA_CACHE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return None
+
+    if library_orcabus_id is None:
+        alias_item = get_dynamodb_client().get_item(
+            TableName=table_name,
+            Key={"library_key": {"S": library_id}}
+        ).get("Item", None)
+        # Expired items are not deleted straight away, invalidated items have no library orcabus id
+        if (
+                alias_item is None or
+                int(alias_item['ttl']['N']) < time() or
+                "library_orcabus_id" not in alias_item
+        ):
+            return None
+        library_orcabus_id = alias_item['library_orcabus_id']['S']
+
+    library_item = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key={"library_key": {"S": library_orcabus_id}}
+    ).get("Item", None)
+    if library_item is None or int(library_item['ttl']['N']) < time() or "library" not in library_item:
+        return None
+
+    return json.loads(library_item['library']['S'])
+
+
+def put_library_in_table_cache(library_obj: Dict[str, Any], fetched_at: float):
+    """
+    Only cache the library record (and its alias) if it was fetched after the latest invalidation,
+    and after the record it replaces, a fetch that raced a library update must not overwrite the invalidation
+    :param library_obj:
+    :param fetched_at: When the library record was fetched from the metadata manager (epoch seconds)
+    :return:
+    """
+    table_name = environ.get(LIBRARY_METADATA_CACHE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return
+
+    ttl = str(int(time()) + LIBRARY_CACHE_TABLE_TTL_SECONDS)
+
+    for item in [
+        {
+            "library_key": {"S": library_obj['orcabusId']},
+            "library_id": {"S": library_obj['libraryId']},
+            "library": {"S": json.dumps(library_obj)},
+            "fetched_at": {"N": str(fetched_at)},
+            "ttl": {"N": ttl},
+        },
+        {
+            "library_key": {"S": library_obj['libraryId']},
+            "library_orcabus_id": {"S": library_obj['orcabusId']},
+            "fetched_at": {"N": str(fetched_at)},
+            "ttl": {"N": ttl},
+        },
+    ]:
+        try:
+            get_dynamodb_client().put_item(
+                TableName=table_name,
+                Item=item,
+                ConditionExpression=(
+                    "attribute_not_exists(library_key) OR "
+                    "invalidated_at < :fetched_at OR "
+                    "fetched_at <= :fetched_at"
+                ),
+                ExpressionAttributeValues={
+                    ":fetched_at": {"N": str(fetched_at)},
+                }
+            )
+        except ClientError as e:
+            # The library has been updated since the record was fetched
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+def get_library_from_metadata_manager(
+        library_orcabus_id: Optional[str] = None,
+        library_id: Optional[str] = None
+) -> Dict[str, Any]:
+    # Imported here, the invalidation lambda has no orcabus api tools layer
+    from orcabus_api_tools.metadata import get_library_from_library_orcabus_id, get_library_from_library_id
+
+    if library_orcabus_id is not None:
+        return memoized(get_library_from_library_orcabus_id)(library_orcabus_id)
+    return memoized(get_library_from_library_id)(library_id)
+
+
+def get_cached_library(
+        library_orcabus_id: Optional[str] = None,
+        library_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Get the library from the warm container cache, then the library metadata cache table,
+    then the metadata manager (filling both caches)
+    :param library_orcabus_id:
+    :param library_id:
+    :return:
+    """
+    library_obj = get_library_from_memory_cache(library_orcabus_id=library_orcabus_id, library_id=library_id)
+    if library_obj is not None:
+        return library_obj
+
+    library_obj = get_library_from_table_cache(library_orcabus_id=library_orcabus_id, library_id=library_id)
+    if library_obj is None:
+        # Taken before the fetch, so an invalidation during the fetch wins
+        fetched_at = time()
+        library_obj = get_library_from_metadata_manager(
+            library_orcabus_id=library_orcabus_id,
+            library_id=library_id
+        )
+        put_library_in_table_cache(library_obj, fetched_at)
+
+    put_library_in_memory_cache(library_obj)
+
+    return library_obj
+
+
+def get_library_sample_key(library_obj: Dict[str, Any]) -> Optional[str]:
+    """
+    The sample a library was prepared from,
+    the DNA and RNA libraries of a tumor share the external sample id (or the sample id)
+    :param library_obj:
+    :return:
+    """
+    sample_obj = library_obj.get('sample', None) or {}
+    return sample_obj.get('externalSampleId', None) or sample_obj.get('sampleId', None)
+
+
+def invalidate_library(
+        library_orcabus_id: Optional[str] = None,
+        library_id: Optional[str] = None
+) -> List[str]:
+    """
+    Replace the library record and its alias in the library metadata cache table with invalidation markers
+    (and remove the library record from this warm container)
+    :param library_orcabus_id:
+    :param library_id:
+    :return: The cache keys invalidated
+    """
+    table_name = environ[LIBRARY_METADATA_CACHE_TABLE_NAME_ENV_VAR]
+
+    # Find the library id alias from the cached record
+    if library_id is None and library_orcabus_id is not None:
+        library_item = get_dynamodb_client().get_item(
+            TableName=table_name,
+            Key={"library_key": {"S": library_orcabus_id}}
+        ).get("Item", None)
+        if library_item is not None:
+            library_id = library_item.get("library_id", {}).get("S", None)
+
+    library_key_list = list(filter(
+        lambda library_key_iter_: library_key_iter_ is not None,
+        [library_orcabus_id, library_id]
+    ))
+
+    invalidated_at = time()
+    for library_key in library_key_list:
+        get_dynamodb_client().put_item(
+            TableName=table_name,
+            Item={
+                "library_key": {"S": library_key},
+                # So a later invalidation by orcabus id still finds the library id alias
+                **({"library_id": {"S": library_id}} if library_id is not None else {}),
+                "invalidated_at": {"N": str(invalidated_at)},
+                "ttl": {"N": str(int(invalidated_at) + LIBRARY_CACHE_TABLE_TTL_SECONDS)},
+            }
+        )
+
+    with _LIBRARY_CACHE_LOCK:
+        if library_orcabus_id is None:
+            library_orcabus_id = _LIBRARY_ID_TO_ORCABUS_ID_MAP.get(library_id, None)
+        if library_orcabus_id is not None:
+            invalidate_library_in_memory_cache(library_orcabus_id)
+
+    return library_key_list
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Memoize the read-only orcabus api calls made within a single invocation
+
+The handler is wrapped with memoized_invocation, and the read-only api functions with memoized, i.e
+
+    get_workflow_run_from_portal_run_id = memoized(get_workflow_run_from_portal_run_id)
+
+    @trace_invocation
+    @memoized_invocation()
+    def handler(event, context):
+        ...
+
+Identical calls share the one result (including calls still in flight on another thread),
+each caller gets its own copy, and failures are not memoized.
+The call counts (requested, made) are logged when the invocation completes.
+Outside of memoized_invocation the functions are called as is.
+
+The memo of the invocation is held in a context variable, so invocations run at once on different threads
+(i.e the executions of the local_sfn load driver) each have their own memo. Worker threads do not start in
+the caller's context, so a handler runs its concurrent calls on an InvocationThreadPoolExecutor,
+whose workers run each call in a copy of the submitting caller's context.
+"""
+
+# Standard imports
+import json
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from copy import deepcopy
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+# Globals
+_INVOCATION_MEMO: ContextVar[Optional["_InvocationMemo"]] = ContextVar("invocation_memo", default=None)
+_LAST_INVOCATION_CALL_COUNTS: ContextVar[Dict[str, Tuple[int, int]]] = ContextVar(
+    "last_invocation_call_counts", default={}
+)
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class _InvocationMemo:
+    """
+    The results (by memo key) and call counts (by function name) of an invocation,
+    shared by the handler's worker threads
+    """
+    def __init__(self):
+        self.future_by_memo_key: Dict[str, Future] = {}
+        self.call_counts: Dict[str, Tuple[int, int]] = {}
+        self.lock = Lock()
+
+
+class InvocationThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    A thread pool whose workers run each call in a copy of the submitting caller's context,
+    so the calls share the memo (and the tracing) of the invocation
+    """
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(copy_context().run, fn, *args, **kwargs)
+
+
+@contextmanager
+def memoized_invocation():
+    """
+    Memoize the (read-only) orcabus api calls made within a single invocation,
+    identical calls share the one result (including calls still in flight on another thread).
+    The call counts are logged when the invocation completes.
+    """
+    invocation_memo = _InvocationMemo()
+    invocation_memo_token = _INVOCATION_MEMO.set(invocation_memo)
+    try:
+        yield
+    finally:
+        _INVOCATION_MEMO.reset(invocation_memo_token)
+        with invocation_memo.lock:
+            call_counts = dict(invocation_memo.call_counts)
+        _LAST_INVOCATION_CALL_COUNTS.set(call_counts)
+        if call_counts:
+            logger.info(f"Orcabus api calls (requested, made): {json.dumps(call_counts)}")
+
+
+def get_invocation_call_counts() -> Dict[str, Tuple[int, int]]:
+    """
+    The (requested, made) call counts by function name, of the current (or last) invocation in this context
+    :return:
+    """
+    invocation_memo = _INVOCATION_MEMO.get()
+    if invocation_memo is None:
+        return dict(_LAST_INVOCATION_CALL_COUNTS.get())
+    with invocation_memo.lock:
+        return dict(invocation_memo.call_counts)
+
+
+def memoized(func: Callable) -> Callable:
+    """
+    Wrap a read-only orcabus api function so that, inside memoized_invocation,
+    each unique set of arguments is only requested once
+    :param func:
+    :return:
+    """
+    # Functions of the same name from different api modules (i.e get_workflow_run) are memoized separately
+    func_qualified_name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def memoized_func(*args, **kwargs):
+        invocation_memo = _INVOCATION_MEMO.get()
+        if invocation_memo is None:
+            return func(*args, **kwargs)
+
+        memo_key = json.dumps([func_qualified_name, args, kwargs], sort_keys=True, default=str)
+
+        with invocation_memo.lock:
+            future = invocation_memo.future_by_memo_key.get(memo_key, None)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                invocation_memo.future_by_memo_key[memo_key] = future
+            requested_count, made_count = invocation_memo.call_counts.get(func.__name__, (0, 0))
+            invocation_memo.call_counts[func.__name__] = (requested_count + 1, made_count + int(is_owner))
+
+        if is_owner:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                # Don't memoize failures, a later call may retry
+                with invocation_memo.lock:
+                    invocation_memo.future_by_memo_key.pop(memo_key, None)
+                future.set_exception(e)
+
+        # Callers may modify the result
+        return deepcopy(future.result())
+
+    return memoized_func
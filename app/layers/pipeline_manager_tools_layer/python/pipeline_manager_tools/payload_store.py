@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+The payload store, shared by every lambda that reads the latest payload of a workflow run
+
+Payload bodies never change once written, so they are kept in the warm container and in the payload store table,
+keyed by the payload orcabus id:
+  * payload_orcabus_id (partition key): The payload orcabus id
+  * payload: The gzipped JSON encoded payload (as returned by the Workflow Manager API)
+  * ttl: Expiry (epoch seconds)
+
+The latest payload pointer (the payload of the current state) is read from the workflow run cache,
+so getting the latest payload of a portal run only calls the Workflow Manager API
+when the workflow run has changed state or the payload body has not been stored yet.
+
+If the PAYLOAD_STORE_TABLE_NAME env var is not set, only the warm container store is used.
+"""
+
+# Standard imports
+import gzip
+import json
+from collections import OrderedDict
+from copy import deepcopy
+from os import environ
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional
+
+# Layer imports
+from orcabus_api_tools.workflow import get_payload, get_latest_payload_from_workflow_run
+from orcabus_api_tools.workflow.models import WorkflowRunDetail
+
+# Local imports
+from .aws_clients import get_dynamodb_client
+from .memoize import memoized
+from .workflow_run_cache import get_cached_workflow_run_from_portal_run_id
+
+# Globals
+PAYLOAD_STORE_TABLE_NAME_ENV_VAR = "PAYLOAD_STORE_TABLE_NAME"
+PAYLOAD_STORE_MEMORY_MAX_SIZE = 64
+PAYLOAD_STORE_TABLE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# Warm container payload store, payloads never change once written so entries need no TTL
+_PAYLOAD_STORE: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+_PAYLOAD_STORE_LOCK = Lock()
+
+# Read-only orcabus api calls, memoized for the invocation
+get_payload = memoized(get_payload)
+get_latest_payload_from_workflow_run = memoized(get_latest_payload_from_workflow_run)
+
+
+def get_payload_from_memory_store(payload_orcabus_id: str) -> Optional[Dict[str, Any]]:
+    with _PAYLOAD_STORE_LOCK:
+        if payload_orcabus_id not in _PAYLOAD_STORE:
+            return None
+
+        # Most recently used
+        _PAYLOAD_STORE.move_to_end(payload_orcabus_id)
+        return _PAYLOAD_STORE[payload_orcabus_id]
+
+
+def put_payload_in_memory_store(payload: Dict[str, Any]):
+    with _PAYLOAD_STORE_LOCK:
+        _PAYLOAD_STORE[payload['orcabusId']] = payload
+        _PAYLOAD_STORE.move_to_end(payload['orcabusId'])
+
+        # Evict the least recently used
+        while len(_PAYLOAD_STORE) > PAYLOAD_STORE_MEMORY_MAX_SIZE:
+            _PAYLOAD_STORE.popitem(last=False)
+
+
+def get_payload_from_store(payload_orcabus_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the payload body from the warm container store, then the payload store table
+    :param payload_orcabus_id:
+    :return:
+    """
+    payload = get_payload_from_memory_store(payload_orcabus_id)
+    if payload is not None:
+        return payload
+
+    table_name = environ.get(PAYLOAD_STORE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return None
+
+    payload_item = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key={"payload_orcabus_id": {"S": payload_orcabus_id}}
+    ).get("Item", None)
+    if payload_item is None:
+        return None
+
+    payload = json.loads(gzip.decompress(payload_item['payload']['B']))
+    put_payload_in_memory_store(payload)
+
+    return payload
+
+
+def put_payload_in_store(payload: Dict[str, Any]):
+    put_payload_in_memory_store(payload)
+
+    table_name = environ.get(PAYLOAD_STORE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return
+
+    get_dynamodb_client().put_item(
+        TableName=table_name,
+        Item={
+            "payload_orcabus_id": {"S": payload['orcabusId']},
+            "payload": {"B": gzip.compress(json.dumps(payload).encode())},
+            "ttl": {"N": str(int(time()) + PAYLOAD_STORE_TABLE_TTL_SECONDS)},
+        }
+    )
+
+
+def get_latest_payload_pointer(workflow_run: WorkflowRunDetail) -> Optional[str]:
+    """
+    The payload of the current state is the latest payload,
+    this may be the payload orcabus id or the payload object itself
+    :param workflow_run:
+    :return:
+    """
+    current_state_payload = (workflow_run.get('currentState', None) or {}).get('payload', None)
+
+    if isinstance(current_state_payload, dict):
+        return current_state_payload.get('orcabusId', None)
+
+    return current_state_payload
+
+
+def get_stored_latest_payload_from_workflow_run(workflow_run: WorkflowRunDetail) -> Dict[str, Any]:
+    """
+    Resolve the latest payload pointer, and only download the payload body if we haven't stored it yet.
+
+    A copy is returned as callers modify the payload.
+    :param workflow_run:
+    :return:
+    """
+    payload_orcabus_id = get_latest_payload_pointer(workflow_run)
+
+    payload = get_payload_from_store(payload_orcabus_id) if payload_orcabus_id is not None else None
+
+    if payload is None:
+        payload = (
+            get_payload(payload_orcabus_id)
+            if payload_orcabus_id is not None
+            # The current state has no payload, walk the states instead
+            else get_latest_payload_from_workflow_run(workflow_run['orcabusId'])
+        )
+        put_payload_in_store(payload)
+
+    return deepcopy(payload)
+
+
+def get_stored_latest_payload_from_portal_run_id(
+        portal_run_id: str,
+        consistent_read: bool = False
+) -> Dict[str, Any]:
+    """
+    The latest payload pointer is read from the workflow run cache (a single table read when warm),
+    rather than fetching the full workflow run from the Workflow Manager API
+    :param portal_run_id:
+    :param consistent_read: Skip the workflow run cache, the payload body is still read from the store
+    :return:
+    """
+    return get_stored_latest_payload_from_workflow_run(
+        get_cached_workflow_run_from_portal_run_id(portal_run_id, consistent_read=consistent_read)
+    )
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+"""
+Field projection, so the handlers only return the fields the state machines read
+(keeping the state payloads well under the Step Functions limit)
+"""
+
+# Standard imports
+from typing import Any, Dict, List, Optional
+
+
+def get_projected_object(obj: Dict[str, Any], field_path_list: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Project the object down to the requested (dot-separated) field paths, i.e
+    ['portalRunId', 'currentState.status'] -> {'portalRunId': '...', 'currentState': {'status': '...'}}
+
+    Missing fields are omitted, if no field paths are provided, the object is returned as is
+    :param obj:
+    :param field_path_list:
+    :return:
+    """
+    if not field_path_list:
+        return obj
+
+    projected_object: Dict[str, Any] = {}
+    for field_path in field_path_list:
+        field_key_list = field_path.split(".")
+
+        # Walk down to the value
+        value = obj
+        for field_key in field_key_list:
+            if not isinstance(value, dict) or field_key not in value:
+                break
+            value = value[field_key]
+        else:
+            # Walk down the projected object, creating the parent dicts as we go
+            projected_parent = projected_object
+            for field_key in field_key_list[:-1]:
+                projected_parent = projected_parent.setdefault(field_key, {})
+            projected_parent[field_key_list[-1]] = value
+
+    return projected_object
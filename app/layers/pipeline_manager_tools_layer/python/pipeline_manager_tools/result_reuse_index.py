@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+"""
+The result reuse index, SUCCEEDED run results (and FAILED runs to resume) keyed by the fingerprint of their WES inputs
+
+Read by convert_ready_event_inputs_to_icav2_wes_event_inputs (read only), and written by
+convert_icav2_wes_event_to_wrsc_event once the SUCCEEDED (or FAILED) WorkflowRunUpdate event has been published.
+
+Each input fingerprint holds one item:
+  * input_fingerprint (partition key): The sha256 fingerprint of the converted WES inputs, pipeline id and nextflow config
+  * portal_run_id: The portal run id of the SUCCEEDED run
+  * output_uri: The output uri of the SUCCEEDED run
+  * outputs: The JSON encoded outputs of the SUCCEEDED run
+  * failed_portal_run_id: The portal run id of the latest FAILED run
+  * failed_cache_uri: The cache uri of the latest FAILED run
+
+Outputs can be removed after the run has been indexed,
+so a result is only reused while each of its output directories still has files in the filemanager.
+
+A new run with the inputs of a FAILED run (and no SUCCEEDED result to reuse) supersedes the FAILED run,
+and resumes from the FAILED run's cache. Indexing a SUCCEEDED result replaces the item, so a fingerprint
+with a result is never resumed.
+
+If the RESULT_REUSE_INDEX_TABLE_NAME env var is not set, no results are indexed or reused.
+"""
+
+# Standard imports
+import json
+import logging
+from os import environ
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .aws_clients import get_dynamodb_client
+from .incremental_processes import has_files, join_uri
+
+# Globals
+RESULT_REUSE_INDEX_TABLE_NAME_ENV_VAR = "RESULT_REUSE_INDEX_TABLE_NAME"
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def get_result_output_uri_list(result: Dict[str, Any]) -> List[str]:
+    """
+    The output directory of each sample group of the result (primary group first)
+    :param result:
+    :return:
+    """
+    return list(map(
+        lambda output_rel_path_iter_: join_uri(result['outputUri'], output_rel_path_iter_),
+        (
+            [result['outputs']['dnaRnaOncoanalyserAnalysisRelPath']] +
+            (result['outputs'].get('additionalDnaRnaOncoanalyserAnalysisRelPathList', None) or [])
+        )
+    ))
+
+
+def get_reusable_result(input_fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the result of a SUCCEEDED run with the same input fingerprint (if any),
+    results whose outputs have since been removed are not reused
+    :param input_fingerprint:
+    :return:
+    """
+    table_name = environ.get(RESULT_REUSE_INDEX_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return None
+
+    result_item = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key={"input_fingerprint": {"S": input_fingerprint}}
+    ).get("Item", None)
+
+    # Only a FAILED run has been indexed
+    if result_item is None or "portal_run_id" not in result_item:
+        return None
+
+    result = {
+        "portalRunId": result_item['portal_run_id']['S'],
+        "outputUri": result_item['output_uri']['S'],
+        "outputs": json.loads(result_item['outputs']['S']),
+    }
+
+    if not all(map(has_files, get_result_output_uri_list(result))):
+        logger.info(f"The outputs of {result['portalRunId']} are no longer available, not reusing the result")
+        return None
+
+    return result
+
+
+def put_result_in_reuse_index(
+        input_fingerprint: str,
+        portal_run_id: str,
+        output_uri: str,
+        outputs: Dict[str, Any],
+):
+    """
+    Index the result of a SUCCEEDED run, call once its SUCCEEDED event has been published
+    :param input_fingerprint:
+    :param portal_run_id:
+    :param output_uri:
+    :param outputs:
+    :return:
+    """
+    table_name = environ.get(RESULT_REUSE_INDEX_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return
+
+    get_dynamodb_client().put_item(
+        TableName=table_name,
+        Item={
+            "input_fingerprint": {"S": input_fingerprint},
+            "portal_run_id": {"S": portal_run_id},
+            "output_uri": {"S": output_uri},
+            "outputs": {"S": json.dumps(outputs)},
+        }
+    )
+
+
+def get_resumable_run(input_fingerprint: str) -> Optional[Dict[str, str]]:
+    """
+    Get the latest FAILED run with the same input fingerprint (if any),
+    a new run with the same inputs can resume from its cache
+    :param input_fingerprint:
+    :return: {"portalRunId": "...", "cacheUri": "s3://..."}
+    """
+    table_name = environ.get(RESULT_REUSE_INDEX_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return None
+
+    result_item = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key={"input_fingerprint": {"S": input_fingerprint}}
+    ).get("Item", None)
+
+    if result_item is None or "failed_portal_run_id" not in result_item:
+        return None
+
+    return {
+        "portalRunId": result_item['failed_portal_run_id']['S'],
+        "cacheUri": result_item['failed_cache_uri']['S'],
+    }
+
+
+def put_failed_run_in_reuse_index(
+        input_fingerprint: str,
+        portal_run_id: str,
+        cache_uri: str,
+):
+    """
+    Index a FAILED run, so a new run with the same inputs resumes from its cache,
+    call once its FAILED event has been published.
+    A fingerprint that already has a SUCCEEDED result is left as is.
+    :param input_fingerprint:
+    :param portal_run_id:
+    :param cache_uri:
+    :return:
+    """
+    table_name = environ.get(RESULT_REUSE_INDEX_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return
+
+    try:
+        get_dynamodb_client().update_item(
+            TableName=table_name,
+            Key={"input_fingerprint": {"S": input_fingerprint}},
+            UpdateExpression="SET failed_portal_run_id = :portal_run_id, failed_cache_uri = :cache_uri",
+            ConditionExpression="attribute_not_exists(portal_run_id)",
+            ExpressionAttributeValues={
+                ":portal_run_id": {"S": portal_run_id},
+                ":cache_uri": {"S": cache_uri},
+            },
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        logger.info(f"The inputs of {portal_run_id} already have a SUCCEEDED result, not indexing the FAILED run")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""
+Local SQLite stand-in for the tables and queues of this service (tests and benchmarking)
+
+Each store has its own *_SQLITE_PATH env var, when set the store is kept in that SQLite database
+instead of its DynamoDB table (or SQS queue).
+
+One connection per database file is kept for the warm container, and shared between threads
+(i.e the batch mode of findLatestWorkflow), so every read and write goes through sqlite_transaction,
+which holds the lock for the whole transaction.
+"""
+
+# Standard imports
+import sqlite3
+from contextlib import contextmanager
+from threading import RLock
+from typing import Dict, Iterator, List, Set, Tuple
+
+# Globals
+# Warm container connections, by database file
+_SQLITE_CONNECTION_BY_PATH: Dict[str, sqlite3.Connection] = {}
+_SQLITE_CREATED_TABLE_SET: Set[Tuple[str, str]] = set()
+_SQLITE_LOCK = RLock()
+
+
+def get_sqlite_connection(sqlite_path: str, create_table_statement_list: List[str]) -> sqlite3.Connection:
+    """
+    Get the connection to the database file, creating its tables on first use.
+    Call with the lock held.
+    :param sqlite_path:
+    :param create_table_statement_list:
+    :return:
+    """
+    if sqlite_path not in _SQLITE_CONNECTION_BY_PATH:
+        _SQLITE_CONNECTION_BY_PATH[sqlite_path] = sqlite3.connect(sqlite_path, check_same_thread=False)
+
+    connection = _SQLITE_CONNECTION_BY_PATH[sqlite_path]
+
+    for create_table_statement in create_table_statement_list:
+        if (sqlite_path, create_table_statement) in _SQLITE_CREATED_TABLE_SET:
+            continue
+        with connection:
+            connection.execute(create_table_statement)
+        _SQLITE_CREATED_TABLE_SET.add((sqlite_path, create_table_statement))
+
+    return connection
+
+
+@contextmanager
+def sqlite_transaction(sqlite_path: str, create_table_statement_list: List[str]) -> Iterator[sqlite3.Connection]:
+    """
+    Run statements in a single transaction, committed when the block exits (rolled back if it raises)
+
+        with sqlite_transaction(sqlite_path, [CREATE_TABLE_STATEMENT]) as connection:
+            connection.execute(...)
+
+    :param sqlite_path:
+    :param create_table_statement_list: The tables the statements use, created if they do not exist
+    :return:
+    """
+    with _SQLITE_LOCK:
+        connection = get_sqlite_connection(sqlite_path, create_table_statement_list)
+        with connection:
+            yield connection
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+"""
+Timestamps are stored as UTC ISO8601 strings with a fixed format, so they can be compared lexically
+(in DynamoDB condition expressions and SQLite statements)
+"""
+
+# Standard imports
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def normalise_timestamp(timestamp: Optional[str] = None) -> str:
+    """
+    Convert an ISO8601 timestamp to a UTC timestamp with a fixed format so timestamps can be compared lexically,
+    the current time is used if no timestamp is given
+    :param timestamp:
+    :return:
+    """
+    if timestamp is None:
+        return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+    return datetime.fromisoformat(
+        timestamp.replace("Z", "+00:00")
+    ).astimezone(timezone.utc).isoformat(timespec='microseconds')
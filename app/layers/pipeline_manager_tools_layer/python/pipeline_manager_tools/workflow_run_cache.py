@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Read-through cache of workflow run details, keyed by portal run id
+
+Each portal run id holds one item:
+  * portal_run_id (partition key): The portal run id
+  * state_timestamp: The (UTC, ISO8601) timestamp of the current state of the cached workflow run
+  * workflow_run: The JSON encoded workflow run object (as returned by the Workflow Manager API)
+  * invalidated_state_timestamp: The timestamp of the latest state change seen by update_workflow_run_index
+  * ttl: Expiry (epoch seconds)
+
+WorkflowRunStateChange events replace the item with an invalidation marker (no workflow run),
+a reader that fetched the workflow run before the state change cannot write the stale workflow run back,
+as only workflow runs at or after the invalidated state timestamp are cached.
+
+If the WORKFLOW_RUN_CACHE_TABLE_NAME env var is not set, every lookup goes to the Workflow Manager API.
+"""
+
+# Standard imports
+import json
+from os import environ
+from time import time
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+# Layer imports
+from orcabus_api_tools.workflow import get_workflow_run_from_portal_run_id
+from orcabus_api_tools.workflow.models import WorkflowRunDetail
+
+# Local imports
+from .aws_clients import get_dynamodb_client
+from .memoize import memoized
+from .timestamps import normalise_timestamp
+
+# Globals
+WORKFLOW_RUN_CACHE_TABLE_NAME_ENV_VAR = "WORKFLOW_RUN_CACHE_TABLE_NAME"
+WORKFLOW_RUN_CACHE_TABLE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Read-only orcabus api calls, memoized for the invocation
+get_workflow_run_from_portal_run_id = memoized(get_workflow_run_from_portal_run_id)
+
+
+def get_workflow_run_from_cache(table_name: str, portal_run_id: str) -> Optional[WorkflowRunDetail]:
+    workflow_run_item = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key={"portal_run_id": {"S": portal_run_id}}
+    ).get("Item", None)
+
+    # Items invalidated by a state change have no workflow run
+    if workflow_run_item is None or "workflow_run" not in workflow_run_item:
+        return None
+
+    return json.loads(workflow_run_item['workflow_run']['S'])
+
+
+def put_workflow_run_in_cache(table_name: str, workflow_run: WorkflowRunDetail):
+    """
+    Only cache the workflow run if no newer state change has been seen for it,
+    a fresh read that raced a state change event must not overwrite the invalidation
+    :param table_name:
+    :param workflow_run:
+    :return:
+    """
+    state_timestamp = normalise_timestamp(workflow_run['currentState']['timestamp'])
+
+    try:
+        get_dynamodb_client().put_item(
+            TableName=table_name,
+            Item={
+                "portal_run_id": {"S": workflow_run['portalRunId']},
+                "state_timestamp": {"S": state_timestamp},
+                "workflow_run": {"S": json.dumps(workflow_run)},
+                "ttl": {"N": str(int(time()) + WORKFLOW_RUN_CACHE_TABLE_TTL_SECONDS)},
+            },
+            ConditionExpression=(
+                "attribute_not_exists(portal_run_id) OR "
+                "invalidated_state_timestamp <= :state_timestamp OR "
+                "state_timestamp <= :state_timestamp"
+            ),
+            ExpressionAttributeValues={
+                ":state_timestamp": {"S": state_timestamp},
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def invalidate_workflow_run_in_cache(table_name: str, portal_run_id: str, state_timestamp: str):
+    """
+    Replace the cached workflow run with an invalidation marker,
+    stale state changes (older than the current marker) are dropped
+    :param table_name:
+    :param portal_run_id:
+    :param state_timestamp: The (normalised) timestamp of the state change
+    :return:
+    """
+    try:
+        get_dynamodb_client().put_item(
+            TableName=table_name,
+            Item={
+                "portal_run_id": {"S": portal_run_id},
+                "invalidated_state_timestamp": {"S": state_timestamp},
+                "ttl": {"N": str(int(time()) + WORKFLOW_RUN_CACHE_TABLE_TTL_SECONDS)},
+            },
+            ConditionExpression=(
+                "attribute_not_exists(invalidated_state_timestamp) OR "
+                "invalidated_state_timestamp <= :state_timestamp"
+            ),
+            ExpressionAttributeValues={
+                ":state_timestamp": {"S": state_timestamp},
+            }
+        )
+    except ClientError as e:
+        # A newer state change has already invalidated the cached workflow run
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def get_cached_workflow_run_from_portal_run_id(
+        portal_run_id: str,
+        consistent_read: bool = False
+) -> WorkflowRunDetail:
+    """
+    Read-through cache of workflow run details, entries are invalidated by WorkflowRunStateChange events.
+    Use consistent_read to skip the cache (the fresh workflow run is still cached)
+    :param portal_run_id:
+    :param consistent_read:
+    :return:
+    """
+    table_name = environ.get(WORKFLOW_RUN_CACHE_TABLE_NAME_ENV_VAR, None)
+    if table_name is None:
+        return get_workflow_run_from_portal_run_id(portal_run_id)
+
+    if not consistent_read:
+        workflow_run = get_workflow_run_from_cache(table_name, portal_run_id)
+        if workflow_run is not None:
+            return workflow_run
+
+    workflow_run = get_workflow_run_from_portal_run_id(portal_run_id)
+    put_workflow_run_in_cache(table_name, workflow_run)
+
+    return workflow_run
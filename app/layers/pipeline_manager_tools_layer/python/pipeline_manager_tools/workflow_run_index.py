@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+"""
+The workflow run index, a read model of workflow runs keyed by library id
+
+Written by the update_workflow_run_index lambda (from WorkflowRunStateChange events) and by findLatestWorkflow
+(backfilling the Workflow Manager API results), read by findLatestWorkflow.
+
+Each linked library holds one item per workflow run:
+  * library_id (partition key): The library id
+  * workflow_run_key (sort key): '<workflow_name>#<portal_run_id>'
+  * status: The latest status of the workflow run
+  * state_timestamp: The (UTC, ISO8601) timestamp of the latest state change
+  * workflow_run: The JSON encoded workflow run object (as returned by the Workflow Manager API)
+
+Events may arrive out of order, so an item is only overwritten by a state change with the same or newer timestamp.
+
+Runs are only indexed from the events once the index is deployed, so the index only answers a search
+once the search has been backfilled from the Workflow Manager API. A backfill item marks the
+(workflow name, workflow version, library set) searches that have been backfilled:
+  * library_id (partition key): The first library id of the (sorted) library set
+  * workflow_run_key (sort key): '#backfilled#<workflow_name>#<workflow_version>#<library_id>,<library_id>...'
+  * backfilled_at: The (UTC, ISO8601) time of the backfill
+  * ttl: Expiry (epoch seconds)
+The '#backfilled#' prefix never matches a '<workflow_name>#' prefix query.
+
+A backfill only lasts WORKFLOW_RUN_INDEX_BACKFILL_MAX_AGE_SECONDS, so a state change event that never reached
+the index (i.e a failed update_workflow_run_index invocation) is picked up by the next backfill of the search.
+Expired items may outlive their ttl (DynamoDB deletes them lazily), so the age of backfilled_at is checked on read.
+
+If the WORKFLOW_RUN_INDEX_TABLE_NAME env var is set, the index is stored in DynamoDB,
+otherwise if WORKFLOW_RUN_INDEX_SQLITE_PATH is set, a local SQLite database is used instead (tests and benchmarking).
+"""
+
+# Standard imports
+import json
+from datetime import datetime, timedelta, timezone
+from os import environ
+from time import time
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .aws_clients import get_dynamodb_client
+from .sqlite_stand_in import sqlite_transaction
+from .timestamps import normalise_timestamp
+
+# Globals
+WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR = "WORKFLOW_RUN_INDEX_TABLE_NAME"
+WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR = "WORKFLOW_RUN_INDEX_SQLITE_PATH"
+WORKFLOW_RUN_INDEX_BACKFILL_MAX_AGE_SECONDS = 24 * 60 * 60
+WORKFLOW_RUN_KEY_SEPARATOR = "#"
+BACKFILL_KEY_PREFIX = "#backfilled#"
+ANY_WORKFLOW_VERSION = ""
+
+SQLITE_CREATE_TABLE_STATEMENT_LIST = [
+    """
+    CREATE TABLE IF NOT EXISTS workflow_run_index (
+        library_id TEXT NOT NULL,
+        workflow_run_key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        state_timestamp TEXT NOT NULL,
+        workflow_run TEXT NOT NULL,
+        PRIMARY KEY (library_id, workflow_run_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS workflow_run_index_backfill (
+        library_id TEXT NOT NULL,
+        workflow_run_key TEXT NOT NULL,
+        backfilled_at TEXT NOT NULL,
+        PRIMARY KEY (library_id, workflow_run_key)
+    )
+    """,
+]
+
+SQLITE_SELECT_STATEMENT = """
+SELECT workflow_run FROM workflow_run_index
+WHERE library_id = ? AND workflow_run_key >= ? AND workflow_run_key < ?
+"""
+
+SQLITE_UPSERT_STATEMENT = """
+INSERT INTO workflow_run_index (library_id, workflow_run_key, status, state_timestamp, workflow_run)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (library_id, workflow_run_key) DO UPDATE SET
+    status = excluded.status,
+    state_timestamp = excluded.state_timestamp,
+    workflow_run = excluded.workflow_run
+WHERE excluded.state_timestamp >= workflow_run_index.state_timestamp
+"""
+
+SQLITE_SELECT_BACKFILL_STATEMENT = """
+SELECT 1 FROM workflow_run_index_backfill WHERE library_id = ? AND workflow_run_key = ? AND backfilled_at >= ?
+"""
+
+SQLITE_UPSERT_BACKFILL_STATEMENT = """
+INSERT INTO workflow_run_index_backfill (library_id, workflow_run_key, backfilled_at)
+VALUES (?, ?, ?)
+ON CONFLICT (library_id, workflow_run_key) DO UPDATE SET
+    backfilled_at = excluded.backfilled_at
+"""
+
+
+def is_workflow_run_index_enabled() -> bool:
+    return (
+        environ.get(WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR, None) is not None or
+        environ.get(WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR, None) is not None
+    )
+
+
+def get_min_backfilled_at() -> str:
+    """
+    Backfills from before this time have expired
+    :return:
+    """
+    return normalise_timestamp(
+        (datetime.now(timezone.utc) - timedelta(seconds=WORKFLOW_RUN_INDEX_BACKFILL_MAX_AGE_SECONDS)).isoformat()
+    )
+
+
+def get_workflow_run_key_prefix(workflow_name: str) -> str:
+    return f"{workflow_name}{WORKFLOW_RUN_KEY_SEPARATOR}"
+
+
+def get_workflow_run_key(workflow_name: str, portal_run_id: str) -> str:
+    return get_workflow_run_key_prefix(workflow_name) + portal_run_id
+
+
+def get_backfill_key(workflow_name: str, workflow_version: Optional[str], library_id_list: List[str]) -> str:
+    return BACKFILL_KEY_PREFIX + WORKFLOW_RUN_KEY_SEPARATOR.join([
+        workflow_name,
+        workflow_version or ANY_WORKFLOW_VERSION,
+        ",".join(sorted(set(library_id_list))),
+    ])
+
+
+def get_indexed_workflow_runs_for_library(library_id: str, workflow_name: str) -> List[Dict[str, Any]]:
+    """
+    Get all indexed workflow runs of a given workflow name for a library
+    :param library_id:
+    :param workflow_name:
+    :return:
+    """
+    workflow_run_key_prefix = get_workflow_run_key_prefix(workflow_name)
+
+    if environ.get(WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        query_kwargs = {
+            "TableName": environ[WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR],
+            "KeyConditionExpression": (
+                "library_id = :library_id AND begins_with(workflow_run_key, :workflow_run_key_prefix)"
+            ),
+            "ExpressionAttributeValues": {
+                ":library_id": {"S": library_id},
+                ":workflow_run_key_prefix": {"S": workflow_run_key_prefix},
+            },
+            "ProjectionExpression": "workflow_run",
+        }
+        items = []
+        while True:
+            response = get_dynamodb_client().query(**query_kwargs)
+            items.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return list(map(
+            lambda item_iter_: json.loads(item_iter_['workflow_run']['S']),
+            items
+        ))
+
+    # Local stand-in
+    with sqlite_transaction(
+        environ[WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR], SQLITE_CREATE_TABLE_STATEMENT_LIST
+    ) as connection:
+        rows = connection.execute(
+            SQLITE_SELECT_STATEMENT,
+            (
+                library_id,
+                workflow_run_key_prefix,
+                # The separator is the last character in the prefix, so bump it to get the upper bound
+                workflow_run_key_prefix[:-1] + chr(ord(WORKFLOW_RUN_KEY_SEPARATOR) + 1)
+            )
+        ).fetchall()
+
+    return list(map(
+        lambda row_iter_: json.loads(row_iter_[0]),
+        rows
+    ))
+
+
+def put_workflow_runs_in_index(workflow_run_list: List[Dict[str, Any]]):
+    """
+    Write each workflow run under each of its linked libraries,
+    stale state changes (older than the current item) are dropped
+    :param workflow_run_list: Workflow runs as returned by the Workflow Manager API
+    :return:
+    """
+    index_rows = []
+    for workflow_run_iter_ in workflow_run_list:
+        # The workflow run is stored as returned by the API, the state timestamp is normalised to compare
+        state_timestamp = normalise_timestamp(workflow_run_iter_['currentState'].get('timestamp', None))
+        for library_iter_ in workflow_run_iter_.get('libraries', None) or []:
+            index_rows.append((
+                library_iter_['libraryId'],
+                get_workflow_run_key(workflow_run_iter_['workflow']['name'], workflow_run_iter_['portalRunId']),
+                workflow_run_iter_['currentState']['status'],
+                state_timestamp,
+                json.dumps(workflow_run_iter_, default=str),
+            ))
+
+    if environ.get(WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        for library_id, workflow_run_key, status, state_timestamp, workflow_run_json in index_rows:
+            try:
+                get_dynamodb_client().put_item(
+                    TableName=environ[WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR],
+                    Item={
+                        "library_id": {"S": library_id},
+                        "workflow_run_key": {"S": workflow_run_key},
+                        "status": {"S": status},
+                        "state_timestamp": {"S": state_timestamp},
+                        "workflow_run": {"S": workflow_run_json},
+                    },
+                    ConditionExpression="attribute_not_exists(library_id) OR state_timestamp <= :state_timestamp",
+                    ExpressionAttributeValues={
+                        ":state_timestamp": {"S": state_timestamp},
+                    }
+                )
+            except ClientError as e:
+                # A newer state change has already been indexed
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        return
+
+    # Local stand-in
+    with sqlite_transaction(
+        environ[WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR], SQLITE_CREATE_TABLE_STATEMENT_LIST
+    ) as connection:
+        connection.executemany(SQLITE_UPSERT_STATEMENT, index_rows)
+
+
+def is_backfilled(workflow_name: str, workflow_version: Optional[str], library_id_list: List[str]) -> bool:
+    """
+    The search has been backfilled (within the max age), for this workflow version or for any workflow version
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :return:
+    """
+    library_id = sorted(library_id_list)[0]
+    backfill_key_list = list(map(
+        lambda workflow_version_iter_: get_backfill_key(workflow_name, workflow_version_iter_, library_id_list),
+        sorted({workflow_version or ANY_WORKFLOW_VERSION, ANY_WORKFLOW_VERSION})
+    ))
+    min_backfilled_at = get_min_backfilled_at()
+
+    if environ.get(WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        return any(map(
+            lambda backfill_key_iter_: get_dynamodb_client().get_item(
+                TableName=environ[WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR],
+                Key={"library_id": {"S": library_id}, "workflow_run_key": {"S": backfill_key_iter_}},
+                ProjectionExpression="backfilled_at",
+            ).get("Item", {}).get("backfilled_at", {}).get("S", "") >= min_backfilled_at,
+            backfill_key_list
+        ))
+
+    # Local stand-in
+    with sqlite_transaction(
+        environ[WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR], SQLITE_CREATE_TABLE_STATEMENT_LIST
+    ) as connection:
+        return any(map(
+            lambda backfill_key_iter_: connection.execute(
+                SQLITE_SELECT_BACKFILL_STATEMENT, (library_id, backfill_key_iter_, min_backfilled_at)
+            ).fetchone() is not None,
+            backfill_key_list
+        ))
+
+
+def put_backfill_marker(workflow_name: str, workflow_version: Optional[str], library_id_list: List[str]):
+    """
+    Mark the search as backfilled, call once the Workflow Manager API results have been written to the index.
+    Later runs of these libraries are indexed from their state change events.
+    :param workflow_name:
+    :param workflow_version:
+    :param library_id_list:
+    :return:
+    """
+    library_id = sorted(library_id_list)[0]
+    backfill_key = get_backfill_key(workflow_name, workflow_version, library_id_list)
+    backfilled_at = normalise_timestamp()
+
+    if environ.get(WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR, None) is not None:
+        get_dynamodb_client().put_item(
+            TableName=environ[WORKFLOW_RUN_INDEX_TABLE_NAME_ENV_VAR],
+            Item={
+                "library_id": {"S": library_id},
+                "workflow_run_key": {"S": backfill_key},
+                "backfilled_at": {"S": backfilled_at},
+                "ttl": {"N": str(int(time()) + WORKFLOW_RUN_INDEX_BACKFILL_MAX_AGE_SECONDS)},
+            }
+        )
+        return
+
+    # Local stand-in
+    with sqlite_transaction(
+        environ[WORKFLOW_RUN_INDEX_SQLITE_PATH_ENV_VAR], SQLITE_CREATE_TABLE_STATEMENT_LIST
+    ) as connection:
+        connection.execute(SQLITE_UPSERT_BACKFILL_STATEMENT, (library_id, backfill_key, backfilled_at))
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+"""
+Run the state machine templates in app/step-functions-templates locally, see executor and load_driver
+
+Only the latency models are imported here, they are shared with the API stand-in (app/api_stand_in),
+which must not need jsonata-python. Import the executor from local_sfn.executor.
+"""
+
+from .latency_models import (
+    LatencyModel,
+    NoLatencyModel,
+    ConstantLatencyModel,
+    UniformLatencyModel,
+    LogNormalLatencyModel,
+    KeyedLatencyModel,
+    parse_latency_model,
+)
+
+__all__ = [
+    "LatencyModel",
+    "NoLatencyModel",
+    "ConstantLatencyModel",
+    "UniformLatencyModel",
+    "LogNormalLatencyModel",
+    "KeyedLatencyModel",
+    "parse_latency_model",
+]
@@ -0,0 +1,751 @@
+#!/usr/bin/env python3
+
+"""
+Local executor for the state machine templates in app/step-functions-templates
+
+Interprets the subset of the Amazon States Language (JSONata query language) these templates use:
+  * Pass, Task, Choice, Wait, Succeed, Fail, Parallel and (inline) Map states
+  * Arguments, Output, Assign, Items and Choice conditions as JSONata expressions, with $states and workflow variables
+    (inner Parallel / Map scopes can read the variables of their outer scope)
+  * Retry and Catch
+  * The ${__...__} definition substitutions the CDK stack makes (lambda arns, ssm parameter names, event constants)
+
+Task states are dispatched directly to the handlers in app/lambdas (or to handler overrides),
+'arn:aws:states:::events:putEvents' tasks are checked (a list of one to ten entries) and recorded on the execution, and
+'arn:aws:states:::aws-sdk:ssm:getParameter' tasks are answered from a dictionary of ssm parameters.
+
+Every task call is delayed by a latency model (see latency_models), Wait states and retry intervals
+are scaled by wait_time_scale (0 by default, so they do not hold up a benchmark).
+
+Each execution reports its status, output, duration, number of state transitions and number of calls per task key.
+
+Handlers run in this process, so their environment (table names, SQLite stand-ins, layer packages) must be set up
+by the caller. Concurrent executions share the handler modules, like concurrent invocations of one warm container.
+"""
+
+# Standard imports
+import hashlib
+import importlib.util
+import json
+import random
+import re
+import sys
+import traceback
+import uuid
+from collections import ChainMap, Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock, local
+from time import sleep, perf_counter
+from types import ModuleType
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+import jsonata
+
+# Local imports
+from .latency_models import LatencyModel, NoLatencyModel
+
+# Globals
+APP_DIR = Path(__file__).absolute().parent.parent
+LAMBDA_DIR = APP_DIR / "lambdas"
+# The layers of this repository, the other layers (i.e orcabus_api_tools) must be installed
+LAYER_PYTHON_DIR_LIST = [
+    APP_DIR / "layers" / "lambda_tracing_layer" / "python",
+    APP_DIR / "layers" / "pipeline_manager_tools_layer" / "python",
+]
+STEP_FUNCTIONS_TEMPLATES_DIR = APP_DIR / "step-functions-templates"
+
+LOCAL_REGION = "local"
+LOCAL_ACCOUNT_ID = "000000000000"
+LAMBDA_TIMEOUT_MILLIS = 60000
+
+LAMBDA_INVOKE_RESOURCE = "arn:aws:states:::lambda:invoke"
+EVENTS_PUT_EVENTS_RESOURCE = "arn:aws:states:::events:putEvents"
+SSM_GET_PARAMETER_RESOURCE = "arn:aws:states:::aws-sdk:ssm:getParameter"
+# PutEvents takes at most ten entries per call
+PUT_EVENTS_MAX_ENTRIES = 10
+
+LAMBDA_FUNCTION_ARN_SUBSTITUTION_REGEX = re.compile(r"^__(?P<lambda_name>\w+)_lambda_function_arn__$")
+DEFINITION_SUBSTITUTION_REGEX = re.compile(r"\$\{(?P<substitution_key>__\w+__)\}")
+
+SSM_PARAMETER_PATH_PREFIX = "/orcabus/workflows/oncoanalyser-wgts-dna-rna/"
+
+# Mirrors the (non-lambda) definition substitutions of the CDK stack (infrastructure/stage/step-functions)
+DEFAULT_DEFINITION_SUBSTITUTIONS: Dict[str, str] = {
+    "__draft_status__": "DRAFT",
+    "__ready_status__": "READY",
+    "__succeeded_status__": "SUCCEEDED",
+    "__oncoanalyser_wgts_dna_workflow_name__": "oncoanalyser-wgts-dna",
+    "__oncoanalyser_wgts_rna_workflow_name__": "oncoanalyser-wgts-rna",
+    "__default_payload_version__": "2025.08.05",
+    "__workflow_name__": "oncoanalyser-wgts-dna-rna",
+    "__event_bus_name__": "OrcaBusMain",
+    "__workflow_run_state_change_event_detail_type__": "WorkflowRunStateChange",
+    "__workflow_run_update_event_detail_type__": "WorkflowRunUpdate",
+    "__icav2_wes_request_detail_type__": "Icav2WesRequest",
+    "__stack_source__": "orcabus.oncoanalyserwgtsboth",
+    "__ready_event_status__": "READY",
+    "__default_project_id_ssm_parameter_name__": SSM_PARAMETER_PATH_PREFIX + "icav2-project-id",
+    "__workflow_name_ssm_parameter_name__": SSM_PARAMETER_PATH_PREFIX + "workflow-name",
+    "__workflow_version_ssm_parameter_name__": SSM_PARAMETER_PATH_PREFIX + "default-workflow-version",
+    "__default_output_uri_prefix_ssm_parameter_name__": SSM_PARAMETER_PATH_PREFIX + "output-prefix",
+    "__default_logs_uri_prefix_ssm_parameter_name__": SSM_PARAMETER_PATH_PREFIX + "logs-prefix",
+    "__default_cache_uri_prefix_ssm_parameter_name__": SSM_PARAMETER_PATH_PREFIX + "cache-prefix",
+    "__default_inputs_ssm_parameter_prefix__": SSM_PARAMETER_PATH_PREFIX + "inputs-by-workflow-version",
+    "__workflow_id_to_pipeline_id_ssm_parameter_path_prefix__": SSM_PARAMETER_PATH_PREFIX + "pipeline-ids-by-workflow-version",
+    "__default_hmf_reference_data_path_ssm_parameter_prefix__": SSM_PARAMETER_PATH_PREFIX + "default-hmf-reference-paths-by-workflow-version",
+    "__default_genome_ssm_parameter_prefix__": SSM_PARAMETER_PATH_PREFIX + "genomes",
+}
+
+# Retrier defaults
+DEFAULT_RETRY_INTERVAL_SECONDS = 1
+DEFAULT_RETRY_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF_RATE = 2.0
+
+# Errors
+STATES_ALL_ERROR = "States.ALL"
+STATES_TASK_FAILED_ERROR = "States.TaskFailed"
+STATES_NO_CHOICE_MATCHED_ERROR = "States.NoChoiceMatched"
+STATES_QUERY_EVALUATION_ERROR = "States.QueryEvaluationError"
+STATES_RUNTIME_ERROR = "States.Runtime"
+
+HASH_ALGORITHM_MAP: Dict[str, str] = {
+    "MD5": "md5",
+    "SHA-1": "sha1",
+    "SHA-256": "sha256",
+    "SHA-384": "sha384",
+    "SHA-512": "sha512",
+}
+
+# The functions Step Functions adds to JSONata
+STEP_FUNCTIONS_JSONATA_FUNCTIONS: Dict[str, Any] = {
+    "parse": jsonata.Jsonata.JLambda(lambda json_str: json.loads(json_str)),
+    "uuid": jsonata.Jsonata.JLambda(lambda: str(uuid.uuid4())),
+    "partition": jsonata.Jsonata.JLambda(
+        lambda data_list, chunk_size: [
+            data_list[idx:idx + int(chunk_size)]
+            for idx in range(0, len(data_list), int(chunk_size))
+        ]
+    ),
+    "range": jsonata.Jsonata.JLambda(
+        lambda start, end, step: list(range(int(start), int(end) + (1 if step > 0 else -1), int(step)))
+    ),
+    "hash": jsonata.Jsonata.JLambda(
+        lambda data, algorithm: hashlib.new(HASH_ALGORITHM_MAP[algorithm], str(data).encode()).hexdigest()
+    ),
+    "random": jsonata.Jsonata.JLambda(lambda *seed: random.Random(*seed).random()),
+}
+
+# Compiled JSONata expressions are not thread safe, each thread keeps its own
+_JSONATA_EXPRESSION_CACHE = local()
+
+# Handler modules are loaded once and shared by every executor
+_HANDLER_MODULE_CACHE: Dict[str, ModuleType] = {}
+_HANDLER_MODULE_CACHE_LOCK = Lock()
+
+
+class StatesError(Exception):
+    """
+    A named error raised by a state, Retry and Catch match on the error name
+    """
+    def __init__(self, error: str, cause: str):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+
+@dataclass
+class LocalLambdaContext:
+    function_name: str
+    aws_request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    started_at: float = field(default_factory=perf_counter)
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int(LAMBDA_TIMEOUT_MILLIS - (perf_counter() - self.started_at) * 1000))
+
+
+@dataclass
+class ExecutionResult:
+    execution_arn: str
+    status: str
+    output: Any = None
+    error: Optional[str] = None
+    cause: Optional[str] = None
+    duration_seconds: float = 0.0
+    transition_count: int = 0
+    task_call_count_by_key: Dict[str, int] = field(default_factory=dict)
+    put_event_entry_list: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class _Execution:
+    """
+    The counters of a single execution, shared by its Parallel branches and Map iterations
+    """
+    def __init__(self, execution_arn: str, execution_input: Any):
+        self.execution_arn = execution_arn
+        self.execution_input = execution_input
+        self.start_time = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace("+00:00", "Z")
+        self.transition_count = 0
+        self.task_call_count_by_key: Counter = Counter()
+        self.put_event_entry_list: List[Dict[str, Any]] = []
+        self._lock = Lock()
+
+    def add_transition(self):
+        with self._lock:
+            self.transition_count += 1
+
+    def add_task_call(self, task_key: str):
+        with self._lock:
+            self.task_call_count_by_key[task_key] += 1
+
+    def add_put_event_entries(self, entry_list: List[Dict[str, Any]]):
+        with self._lock:
+            self.put_event_entry_list.extend(entry_list)
+
+
+def get_template_path(state_machine_name: str) -> Path:
+    """
+    Get the template of a state machine from its name (as in the CDK stack) or its template file name
+    :param state_machine_name: i.e 'populateDraftData', 'populate_draft_data' or 'populate_draft_data_sfn_template.asl.json'
+    :return:
+    """
+    if state_machine_name.endswith(".json"):
+        return STEP_FUNCTIONS_TEMPLATES_DIR / state_machine_name
+    snake_case_name = re.sub(r"(?<!^)(?=[A-Z])", "_", state_machine_name).lower()
+    return STEP_FUNCTIONS_TEMPLATES_DIR / f"{snake_case_name}_sfn_template.asl.json"
+
+
+def get_local_lambda_function_arn(lambda_name: str) -> str:
+    return f"arn:aws:lambda:{LOCAL_REGION}:{LOCAL_ACCOUNT_ID}:function:{lambda_name}"
+
+
+def get_lambda_name_from_function_arn(function_arn: str) -> str:
+    return function_arn.split(":function:", 1)[-1].split(":", 1)[0]
+
+
+def load_definition(template_path: Path, definition_substitutions: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Read the template and make the definition substitutions,
+    lambda arn substitutions (__<lambda_name>_lambda_function_arn__) default to a local arn of the lambda
+    :param template_path:
+    :param definition_substitutions:
+    :return:
+    """
+    def substitute(match: re.Match) -> str:
+        substitution_key = match.group("substitution_key")
+        if substitution_key in definition_substitutions:
+            return definition_substitutions[substitution_key]
+        lambda_function_arn_match = LAMBDA_FUNCTION_ARN_SUBSTITUTION_REGEX.match(substitution_key)
+        if lambda_function_arn_match is not None:
+            return get_local_lambda_function_arn(lambda_function_arn_match.group("lambda_name"))
+        raise ValueError(f"No definition substitution for {substitution_key} in {template_path.name}")
+
+    return json.loads(DEFINITION_SUBSTITUTION_REGEX.sub(substitute, template_path.read_text()))
+
+
+def load_handler_module(lambda_name: str) -> ModuleType:
+    """
+    Import the handler module app/lambdas/<lambda_name>_py/<lambda_name>.py (once)
+    :param lambda_name:
+    :return:
+    """
+    with _HANDLER_MODULE_CACHE_LOCK:
+        for layer_python_dir in LAYER_PYTHON_DIR_LIST:
+            if str(layer_python_dir) not in sys.path:
+                sys.path.append(str(layer_python_dir))
+
+        if lambda_name not in _HANDLER_MODULE_CACHE:
+            module_path = LAMBDA_DIR / f"{lambda_name}_py" / f"{lambda_name}.py"
+            if not module_path.is_file():
+                raise StatesError("Lambda.ResourceNotFoundException", f"No handler at {module_path}")
+            module_spec = importlib.util.spec_from_file_location(f"local_sfn_lambdas.{lambda_name}", module_path)
+            module = importlib.util.module_from_spec(module_spec)
+            module_spec.loader.exec_module(module)
+            _HANDLER_MODULE_CACHE[lambda_name] = module
+
+        return _HANDLER_MODULE_CACHE[lambda_name]
+
+
+def load_handler(lambda_name: str) -> Callable[[Any, Any], Any]:
+    """
+    Import the handler of app/lambdas/<lambda_name>_py/<lambda_name>.py
+    :param lambda_name:
+    :return:
+    """
+    return load_handler_module(lambda_name).handler
+
+
+def unload_handlers():
+    """
+    Forget the loaded handler modules, the next task of each lambda loads its handler again (a cold start)
+    :return:
+    """
+    with _HANDLER_MODULE_CACHE_LOCK:
+        _HANDLER_MODULE_CACHE.clear()
+
+
+def get_jsonata_expression(expression: str) -> jsonata.Jsonata:
+    if not hasattr(_JSONATA_EXPRESSION_CACHE, "expression_by_str"):
+        _JSONATA_EXPRESSION_CACHE.expression_by_str = {}
+
+    if expression not in _JSONATA_EXPRESSION_CACHE.expression_by_str:
+        _JSONATA_EXPRESSION_CACHE.expression_by_str[expression] = jsonata.Jsonata(expression)
+
+    return _JSONATA_EXPRESSION_CACHE.expression_by_str[expression]
+
+
+def evaluate(value: Any, bindings: Dict[str, Any]) -> Any:
+    """
+    Evaluate the JSONata expressions ('{% ... %}' strings) in a value, other values are kept as is
+    :param value:
+    :param bindings: The variables and $states
+    :return:
+    """
+    if isinstance(value, dict):
+        return dict(map(
+            lambda kv_iter_: (kv_iter_[0], evaluate(kv_iter_[1], bindings)),
+            value.items()
+        ))
+    if isinstance(value, list):
+        return list(map(
+            lambda value_iter_: evaluate(value_iter_, bindings),
+            value
+        ))
+    if isinstance(value, str) and value.strip().startswith("{%") and value.strip().endswith("%}"):
+        expression = value.strip()[2:-2]
+        try:
+            return get_jsonata_expression(expression).evaluate(None, bindings)
+        except Exception as e:
+            raise StatesError(STATES_QUERY_EVALUATION_ERROR, f"{expression.strip()}: {e}")
+    return value
+
+
+def is_error_match(error_equals_list: List[str], error: str) -> bool:
+    return (
+        STATES_ALL_ERROR in error_equals_list or
+        error in error_equals_list or
+        (STATES_TASK_FAILED_ERROR in error_equals_list and not error.startswith("States."))
+    )
+
+
+class LocalStateMachine:
+    def __init__(
+            self,
+            state_machine_name: str,
+            definition_substitutions: Optional[Dict[str, str]] = None,
+            ssm_parameters: Optional[Dict[str, str]] = None,
+            handler_overrides: Optional[Dict[str, Callable[[Any, Any], Any]]] = None,
+            task_latency_model: Optional[LatencyModel] = None,
+            wait_time_scale: float = 0.0,
+            max_branch_concurrency: int = 40,
+    ):
+        """
+        :param state_machine_name: The state machine name or its template file name, i.e 'populateDraftData'
+        :param definition_substitutions: Substitutions to add to (or override) DEFAULT_DEFINITION_SUBSTITUTIONS
+        :param ssm_parameters: The ssm parameter values by parameter name, for the ssm:getParameter tasks
+        :param handler_overrides: Handlers to call instead of the app/lambdas handler, by lambda name
+        :param task_latency_model: The latency of each task call, see latency_models
+        :param wait_time_scale: Multiplies the seconds of Wait states and retry intervals
+        :param max_branch_concurrency: The number of Parallel branches / Map iterations run at once (per state)
+        """
+        self.state_machine_name = state_machine_name
+        self.definition = load_definition(
+            get_template_path(state_machine_name),
+            {
+                **DEFAULT_DEFINITION_SUBSTITUTIONS,
+                **(definition_substitutions or {}),
+            }
+        )
+        self.ssm_parameters = ssm_parameters or {}
+        self.handler_overrides = handler_overrides or {}
+        self.task_latency_model = task_latency_model or NoLatencyModel()
+        self.wait_time_scale = wait_time_scale
+        self.max_branch_concurrency = max_branch_concurrency
+
+    def start_execution(self, execution_input: Any, execution_name: Optional[str] = None) -> ExecutionResult:
+        """
+        Run an execution to completion (synchronously)
+        :param execution_input:
+        :param execution_name:
+        :return:
+        """
+        execution = _Execution(
+            execution_arn=(
+                f"arn:aws:states:{LOCAL_REGION}:{LOCAL_ACCOUNT_ID}:execution:"
+                f"{self.state_machine_name}:{execution_name or uuid.uuid4()}"
+            ),
+            execution_input=execution_input,
+        )
+
+        started_at = perf_counter()
+        try:
+            output = self._run_states(
+                self.definition, execution_input, ChainMap({}), execution
+            )
+            status, error, cause = "SUCCEEDED", None, None
+        except StatesError as e:
+            output = None
+            status, error, cause = "FAILED", e.error, e.cause
+
+        return ExecutionResult(
+            execution_arn=execution.execution_arn,
+            status=status,
+            output=output,
+            error=error,
+            cause=cause,
+            duration_seconds=perf_counter() - started_at,
+            transition_count=execution.transition_count,
+            task_call_count_by_key=dict(execution.task_call_count_by_key),
+            put_event_entry_list=execution.put_event_entry_list,
+        )
+
+    def _get_bindings(
+            self,
+            variables: ChainMap,
+            execution: _Execution,
+            state_name: str,
+            entered_time: str,
+            state_input: Any,
+            **states_bindings
+    ) -> Dict[str, Any]:
+        return {
+            **STEP_FUNCTIONS_JSONATA_FUNCTIONS,
+            **dict(variables),
+            "states": {
+                "input": state_input,
+                "context": {
+                    "Execution": {
+                        "Id": execution.execution_arn,
+                        "Input": execution.execution_input,
+                        "StartTime": execution.start_time,
+                    },
+                    "State": {
+                        "Name": state_name,
+                        "EnteredTime": entered_time,
+                    },
+                    "StateMachine": {
+                        "Id": execution.execution_arn.replace(":execution:", ":stateMachine:").rsplit(":", 1)[0],
+                        "Name": self.state_machine_name,
+                    },
+                },
+                **states_bindings,
+            },
+        }
+
+    def _run_states(self, states_definition: Dict[str, Any], state_input: Any, variables: ChainMap, execution: _Execution) -> Any:
+        """
+        Run the states of a state machine, Parallel branch or Map item processor from StartAt to an end state
+        :param states_definition:
+        :param state_input:
+        :param variables: The variables in scope, assignments are made to the innermost scope
+        :param execution:
+        :return: The output of the end state
+        """
+        state_name = states_definition['StartAt']
+
+        while True:
+            state = states_definition['States'][state_name]
+            execution.add_transition()
+            entered_time = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace("+00:00", "Z")
+
+            def get_bindings(**states_bindings) -> Dict[str, Any]:
+                return self._get_bindings(
+                    variables, execution, state_name, entered_time, state_input, **states_bindings
+                )
+
+            try:
+                state_output, next_state_name = self._run_state(state, state_input, variables, execution, get_bindings)
+            except StatesError as e:
+                catcher = next(filter(
+                    lambda catcher_iter_: is_error_match(catcher_iter_['ErrorEquals'], e.error),
+                    state.get("Catch", [])
+                ), None)
+                if catcher is None:
+                    raise
+                error_output = {"Error": e.error, "Cause": e.cause}
+                bindings = get_bindings(errorOutput=error_output)
+                self._assign(catcher, variables, bindings)
+                state_output = evaluate(catcher['Output'], bindings) if 'Output' in catcher else error_output
+                next_state_name = catcher['Next']
+
+            if next_state_name is None:
+                return state_output
+
+            state_name = next_state_name
+            state_input = state_output
+
+    @staticmethod
+    def _assign(state_or_rule: Dict[str, Any], variables: ChainMap, bindings: Dict[str, Any]):
+        # Every Assign expression sees the variable values from before the state
+        if 'Assign' in state_or_rule:
+            variables.update(evaluate(state_or_rule['Assign'], bindings))
+
+    def _complete_state(
+            self,
+            state: Dict[str, Any],
+            variables: ChainMap,
+            bindings: Dict[str, Any],
+            default_output: Any
+    ) -> Tuple[Any, Optional[str]]:
+        state_output = evaluate(state['Output'], bindings) if 'Output' in state else default_output
+        self._assign(state, variables, bindings)
+        return state_output, None if state.get("End", False) else state.get("Next", None)
+
+    def _run_state(
+            self,
+            state: Dict[str, Any],
+            state_input: Any,
+            variables: ChainMap,
+            execution: _Execution,
+            get_bindings: Callable[..., Dict[str, Any]]
+    ) -> Tuple[Any, Optional[str]]:
+        state_type = state['Type']
+
+        if state_type == "Pass":
+            return self._complete_state(state, variables, get_bindings(), default_output=state_input)
+
+        if state_type == "Choice":
+            bindings = get_bindings()
+            choice_rule = next(filter(
+                lambda choice_rule_iter_: evaluate(choice_rule_iter_['Condition'], bindings) is True,
+                state['Choices']
+            ), None)
+            if choice_rule is None and 'Default' not in state:
+                raise StatesError(STATES_NO_CHOICE_MATCHED_ERROR, "No choice rule matched and there is no Default")
+            state_output, _ = self._complete_state(
+                choice_rule if choice_rule is not None else state, variables, bindings, default_output=state_input
+            )
+            return state_output, choice_rule['Next'] if choice_rule is not None else state['Default']
+
+        if state_type == "Wait":
+            bindings = get_bindings()
+            if 'Seconds' in state:
+                wait_seconds = float(evaluate(state['Seconds'], bindings))
+            else:
+                wait_seconds = (
+                    datetime.fromisoformat(evaluate(state['Timestamp'], bindings).replace("Z", "+00:00")) -
+                    datetime.now(timezone.utc)
+                ).total_seconds()
+            sleep(max(0.0, wait_seconds * self.wait_time_scale))
+            return self._complete_state(state, variables, bindings, default_output=state_input)
+
+        if state_type == "Succeed":
+            state_output, _ = self._complete_state(state, variables, get_bindings(), default_output=state_input)
+            return state_output, None
+
+        if state_type == "Fail":
+            bindings = get_bindings()
+            raise StatesError(
+                evaluate(state.get("Error", "States.Fail"), bindings),
+                evaluate(state.get("Cause", ""), bindings),
+            )
+
+        if state_type == "Task":
+            arguments = evaluate(state.get("Arguments", {}), get_bindings())
+            result = self._run_with_retry(
+                state,
+                lambda: self._call_task(state['Resource'], arguments, execution)
+            )
+            return self._complete_state(state, variables, get_bindings(result=result), default_output=result)
+
+        if state_type == "Parallel":
+            branch_input = evaluate(state['Arguments'], get_bindings()) if 'Arguments' in state else state_input
+            result = self._run_with_retry(
+                state,
+                lambda: self._run_concurrently(
+                    list(map(
+                        lambda branch_iter_: (branch_iter_, branch_input),
+                        state['Branches']
+                    )),
+                    variables, execution
+                )
+            )
+            return self._complete_state(state, variables, get_bindings(result=result), default_output=result)
+
+        if state_type == "Map":
+            bindings = get_bindings()
+            item_list = evaluate(state['Items'], bindings) if 'Items' in state else state_input
+            if not isinstance(item_list, list):
+                raise StatesError(STATES_QUERY_EVALUATION_ERROR, f"Map items are not a list: {item_list}")
+            if 'ItemSelector' in state:
+                item_list = list(map(
+                    lambda item_iter_: evaluate(
+                        state['ItemSelector'],
+                        {
+                            **bindings,
+                            "states": {
+                                **bindings['states'],
+                                "context": {
+                                    **bindings['states']['context'],
+                                    "Map": {"Item": {"Index": item_iter_[0], "Value": item_iter_[1]}},
+                                },
+                            },
+                        }
+                    ),
+                    enumerate(item_list)
+                ))
+            result = self._run_with_retry(
+                state,
+                lambda: self._run_concurrently(
+                    list(map(
+                        lambda item_iter_: (state['ItemProcessor'], item_iter_),
+                        item_list
+                    )),
+                    variables, execution,
+                    max_concurrency=state.get("MaxConcurrency", 0)
+                )
+            )
+            return self._complete_state(state, variables, get_bindings(result=result), default_output=result)
+
+        raise StatesError(STATES_RUNTIME_ERROR, f"Unsupported state type {state_type}")
+
+    def _run_concurrently(
+            self,
+            states_definition_and_input_list: List[Tuple[Dict[str, Any], Any]],
+            variables: ChainMap,
+            execution: _Execution,
+            max_concurrency: int = 0
+    ) -> List[Any]:
+        """
+        Run Parallel branches or Map iterations, each in its own variable scope
+        :param states_definition_and_input_list:
+        :param variables:
+        :param execution:
+        :param max_concurrency: 0 for no limit other than max_branch_concurrency
+        :return: The outputs, in order
+        """
+        if not states_definition_and_input_list:
+            return []
+
+        max_workers = min(
+            max_concurrency or self.max_branch_concurrency,
+            self.max_branch_concurrency,
+            len(states_definition_and_input_list)
+        )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_list = list(map(
+                lambda states_definition_and_input_iter_: executor.submit(
+                    copy_context().run,
+                    self._run_states,
+                    states_definition_and_input_iter_[0],
+                    states_definition_and_input_iter_[1],
+                    variables.new_child(),
+                    execution
+                ),
+                states_definition_and_input_list
+            ))
+            return list(map(lambda future_iter_: future_iter_.result(), future_list))
+
+    def _run_with_retry(self, state: Dict[str, Any], run: Callable[[], Any]) -> Any:
+        attempt_count_by_retrier: Counter = Counter()
+
+        while True:
+            try:
+                return run()
+            except StatesError as e:
+                retrier_idx, retrier = next(filter(
+                    lambda retrier_iter_: is_error_match(retrier_iter_[1]['ErrorEquals'], e.error),
+                    enumerate(state.get("Retry", []))
+                ), (None, None))
+                if retrier is None or attempt_count_by_retrier[retrier_idx] >= retrier.get("MaxAttempts", DEFAULT_RETRY_MAX_ATTEMPTS):
+                    raise
+
+                retry_interval_seconds = (
+                    retrier.get("IntervalSeconds", DEFAULT_RETRY_INTERVAL_SECONDS) *
+                    retrier.get("BackoffRate", DEFAULT_RETRY_BACKOFF_RATE) ** attempt_count_by_retrier[retrier_idx]
+                )
+                if 'MaxDelaySeconds' in retrier:
+                    retry_interval_seconds = min(retry_interval_seconds, retrier['MaxDelaySeconds'])
+                if retrier.get("JitterStrategy", "NONE") == "FULL":
+                    retry_interval_seconds = random.uniform(0, retry_interval_seconds)
+
+                attempt_count_by_retrier[retrier_idx] += 1
+                sleep(retry_interval_seconds * self.wait_time_scale)
+
+    def _call_task(self, resource: str, arguments: Dict[str, Any], execution: _Execution) -> Any:
+        if resource == LAMBDA_INVOKE_RESOURCE:
+            lambda_name = get_lambda_name_from_function_arn(arguments['FunctionName'])
+            task_key = f"lambda:{lambda_name}"
+        elif resource == EVENTS_PUT_EVENTS_RESOURCE:
+            task_key = "events:putEvents"
+        elif resource == SSM_GET_PARAMETER_RESOURCE:
+            task_key = "ssm:getParameter"
+        else:
+            raise StatesError(STATES_RUNTIME_ERROR, f"Unsupported task resource {resource}")
+
+        execution.add_task_call(task_key)
+        sleep(self.task_latency_model.sample(task_key))
+
+        if resource == LAMBDA_INVOKE_RESOURCE:
+            return self._invoke_lambda(lambda_name, arguments.get("Payload", {}))
+
+        if resource == EVENTS_PUT_EVENTS_RESOURCE:
+            # As validated by the PutEvents api (i.e a JSONata $map of one item is an object, not a list)
+            if (
+                not isinstance(arguments.get('Entries', None), list) or
+                not 0 < len(arguments['Entries']) <= PUT_EVENTS_MAX_ENTRIES or
+                not all(map(lambda entry_iter_: isinstance(entry_iter_, dict), arguments['Entries']))
+            ):
+                raise StatesError(
+                    STATES_RUNTIME_ERROR,
+                    f"PutEvents Entries must be a list of 1 to {PUT_EVENTS_MAX_ENTRIES} objects, "
+                    f"got {json.dumps(arguments.get('Entries', None))[:200]}"
+                )
+            execution.add_put_event_entries(arguments['Entries'])
+            return {
+                "Entries": list(map(lambda _: {"EventId": str(uuid.uuid4())}, arguments['Entries'])),
+                "FailedEntryCount": 0,
+            }
+
+        if arguments['Name'] not in self.ssm_parameters:
+            raise StatesError("Ssm.ParameterNotFoundException", f"No ssm parameter {arguments['Name']}")
+        return {
+            "Parameter": {
+                "Name": arguments['Name'],
+                "Type": "String",
+                "Value": self.ssm_parameters[arguments['Name']],
+            }
+        }
+
+    def _invoke_lambda(self, lambda_name: str, payload: Any) -> Dict[str, Any]:
+        handler = self.handler_overrides.get(lambda_name, None) or load_handler(lambda_name)
+
+        try:
+            # Payloads are serialised on the way in and out, as they would be by the lambda service
+            result = handler(json.loads(json.dumps(payload)), LocalLambdaContext(function_name=lambda_name))
+            result = json.loads(json.dumps(result))
+        except Exception as e:
+            raise StatesError(
+                type(e).__name__,
+                json.dumps({
+                    "errorMessage": str(e),
+                    "errorType": type(e).__name__,
+                    "stackTrace": traceback.format_exception(e),
+                })
+            )
+
+        return {
+            "ExecutedVersion": "$LATEST",
+            "Payload": result,
+            "StatusCode": 200,
+        }
+
+
+# if __name__ == "__main__":
+#     # From the app directory, with a handler override for the one lambda the state machine calls
+#     # python -c 'from local_sfn.executor import ...'
+#     local_state_machine = LocalStateMachine(
+#         "validateDraftDataAndPutReadyEvent",
+#         handler_overrides={
+#             "validate_draft_data_complete_schema": lambda event, context: {"isValid": True},
+#             "post_schema_validation": lambda event, context: {"isValid": True},
+#         },
+#     )
+#     execution_result = local_state_machine.start_execution({...})
+#     print(execution_result.status, execution_result.transition_count, execution_result.task_call_count_by_key)
+#
+#     # SUCCEEDED 6 {'lambda:validate_draft_data_complete_schema': 1, 'lambda:post_schema_validation': 1, 'events:putEvents': 1}
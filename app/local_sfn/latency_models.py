@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+Latency models for the local state machine executor
+
+A latency model returns the number of seconds a call takes, given the call key.
+The executor samples a latency model for each of the service integrations a state machine calls:
+  * 'lambda:<lambda_name>' — a lambda invoke, e.g. 'lambda:get_libraries' (added to the handler run time)
+  * 'events:putEvents' — an EventBridge PutEvents call
+  * 'ssm:getParameter' — an SSM GetParameter call
+
+Models can be built from a short spec (for the load driver command line):
+  * 'none'
+  * 'constant:<seconds>'
+  * 'uniform:<low seconds>,<high seconds>'
+  * 'lognormal:<median seconds>,<p99 seconds>'
+"""
+
+# Standard imports
+import math
+import random
+from threading import Lock
+from typing import Dict, Optional
+
+# Globals
+# The z score of the 99th percentile of the standard normal distribution
+P99_Z_SCORE = 2.326
+
+
+class LatencyModel:
+    """
+    A latency model with its own (seeded) random number generator, so a benchmark can be repeated
+    """
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._random_lock = Lock()
+
+    def _sample(self, rng: random.Random, key: str) -> float:
+        raise NotImplementedError
+
+    def sample(self, key: str) -> float:
+        with self._random_lock:
+            return max(0.0, self._sample(self._random, key))
+
+
+class NoLatencyModel(LatencyModel):
+    def _sample(self, rng: random.Random, key: str) -> float:
+        return 0.0
+
+
+class ConstantLatencyModel(LatencyModel):
+    def __init__(self, seconds: float, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.seconds = seconds
+
+    def _sample(self, rng: random.Random, key: str) -> float:
+        return self.seconds
+
+
+class UniformLatencyModel(LatencyModel):
+    def __init__(self, low_seconds: float, high_seconds: float, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.low_seconds = low_seconds
+        self.high_seconds = high_seconds
+
+    def _sample(self, rng: random.Random, key: str) -> float:
+        return rng.uniform(self.low_seconds, self.high_seconds)
+
+
+class LogNormalLatencyModel(LatencyModel):
+    """
+    Long tailed latencies, parameterised by the median and the 99th percentile
+    """
+    def __init__(self, median_seconds: float, p99_seconds: float, seed: Optional[int] = None):
+        super().__init__(seed)
+        if p99_seconds < median_seconds:
+            raise ValueError("The p99 latency cannot be lower than the median latency")
+        self.mu = math.log(median_seconds)
+        self.sigma = math.log(p99_seconds / median_seconds) / P99_Z_SCORE
+
+    def _sample(self, rng: random.Random, key: str) -> float:
+        return rng.lognormvariate(self.mu, self.sigma)
+
+
+class KeyedLatencyModel(LatencyModel):
+    """
+    Use a different latency model per call key,
+    a key is matched exactly first, then by its service prefix ('lambda', 'events', 'ssm'), then falls back to the default
+    """
+    def __init__(self, latency_model_by_key: Dict[str, LatencyModel], default_latency_model: Optional[LatencyModel] = None):
+        super().__init__()
+        self.latency_model_by_key = latency_model_by_key
+        self.default_latency_model = default_latency_model or NoLatencyModel()
+
+    def sample(self, key: str) -> float:
+        latency_model = self.latency_model_by_key.get(
+            key,
+            self.latency_model_by_key.get(key.split(":", 1)[0], self.default_latency_model)
+        )
+        return latency_model.sample(key)
+
+
+def parse_latency_model(latency_model_spec: str, seed: Optional[int] = None) -> LatencyModel:
+    """
+    Build a latency model from a spec such as 'constant:0.05' or 'lognormal:0.05,0.5'
+    :param latency_model_spec:
+    :param seed:
+    :return:
+    """
+    model_name, _, model_args = latency_model_spec.partition(":")
+    model_arg_list = list(map(float, filter(None, model_args.split(","))))
+
+    if model_name == "none":
+        return NoLatencyModel()
+    if model_name == "constant" and len(model_arg_list) == 1:
+        return ConstantLatencyModel(*model_arg_list, seed=seed)
+    if model_name == "uniform" and len(model_arg_list) == 2:
+        return UniformLatencyModel(*model_arg_list, seed=seed)
+    if model_name == "lognormal" and len(model_arg_list) == 2:
+        return LogNormalLatencyModel(*model_arg_list, seed=seed)
+
+    raise ValueError(
+        f"Unknown latency model '{latency_model_spec}', "
+        "expected one of 'none', 'constant:<s>', 'uniform:<low s>,<high s>' or 'lognormal:<median s>,<p99 s>'"
+    )
+
+
+# if __name__ == "__main__":
+#     latency_model = KeyedLatencyModel(
+#         {
+#             "lambda": parse_latency_model("constant:0.02"),
+#             "lambda:find_latest_workflow": parse_latency_model("lognormal:0.2,2.0", seed=0),
+#         },
+#         default_latency_model=parse_latency_model("uniform:0.01,0.05", seed=0)
+#     )
+#     print(latency_model.sample("lambda:get_libraries"))
+#     print(latency_model.sample("events:putEvents"))
+#
+#     # 0.02
+#     # 0.04377...
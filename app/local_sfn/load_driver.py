@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark for a state machine template, run on the local executor
+
+Replays a list of events (the state machine input) through the state machine at a fixed concurrency,
+then reports the throughput, the execution latency percentiles, the state transitions per execution
+and the task calls per execution.
+
+Usage (from the app directory):
+
+    python -m local_sfn.load_driver populateDraftData \
+        --events events.jsonl \
+        --executions 500 \
+        --concurrency 20 \
+        --task-latency lognormal:0.05,0.5 \
+        --task-latency-for lambda:find_latest_workflow=lognormal:0.3,3 \
+        --ssm-parameters ssm_parameters.json
+
+The events file is a JSON list, or one JSON event per line, and is cycled through to make up the executions.
+The handlers run in process, so the environment they need (table names, SQLite stand-ins, layer packages) must be
+set before running the benchmark. Each execution runs on its own thread, and so in its own context, so the
+invocation state the handlers keep in context variables (the memo of memoized_invocation, the spans of
+trace_invocation) is not shared between executions. Set API_STAND_IN_MODE=replay to answer the handlers' API calls from recorded
+fixtures (see api_stand_in).
+"""
+
+# Standard imports
+import argparse
+import json
+import math
+import statistics
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from itertools import cycle, islice
+from pathlib import Path
+from time import perf_counter
+from typing import List, Dict, Any, Optional
+
+# Local imports
+from api_stand_in import install_from_env
+from .executor import LocalStateMachine, ExecutionResult
+from .latency_models import KeyedLatencyModel, parse_latency_model
+
+
+@dataclass
+class LoadReport:
+    state_machine_name: str
+    execution_count: int
+    concurrency: int
+    succeeded_count: int
+    failed_count: int
+    error_count_by_error: Dict[str, int]
+    wall_clock_seconds: float
+    executions_per_second: float
+    latency_p50_seconds: float
+    latency_p95_seconds: float
+    latency_p99_seconds: float
+    latency_mean_seconds: float
+    latency_max_seconds: float
+    mean_transition_count: float
+    mean_task_call_count_by_key: Dict[str, float] = field(default_factory=dict)
+
+
+def get_percentile(sorted_value_list: List[float], percentile: float) -> float:
+    """
+    Nearest rank percentile
+    :param sorted_value_list:
+    :param percentile: Between 0 and 100
+    :return:
+    """
+    if not sorted_value_list:
+        return 0.0
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_value_list)))
+    return sorted_value_list[min(rank, len(sorted_value_list)) - 1]
+
+
+def read_events(events_path: Path) -> List[Any]:
+    """
+    Read a JSON list of events, or a JSON lines file of events
+    :param events_path:
+    :return:
+    """
+    events_text = events_path.read_text().strip()
+    if events_text.startswith("["):
+        return json.loads(events_text)
+    return list(map(
+        lambda line_iter_: json.loads(line_iter_),
+        filter(lambda line_iter_: line_iter_.strip(), events_text.splitlines())
+    ))
+
+
+def get_load_report(
+        state_machine_name: str,
+        execution_result_list: List[ExecutionResult],
+        concurrency: int,
+        wall_clock_seconds: float
+) -> LoadReport:
+    duration_list = sorted(map(lambda result_iter_: result_iter_.duration_seconds, execution_result_list))
+    execution_count = len(execution_result_list)
+
+    task_call_counter: Counter = Counter()
+    for execution_result in execution_result_list:
+        task_call_counter.update(execution_result.task_call_count_by_key)
+
+    return LoadReport(
+        state_machine_name=state_machine_name,
+        execution_count=execution_count,
+        concurrency=concurrency,
+        succeeded_count=len(list(filter(lambda result_iter_: result_iter_.status == "SUCCEEDED", execution_result_list))),
+        failed_count=len(list(filter(lambda result_iter_: result_iter_.status == "FAILED", execution_result_list))),
+        error_count_by_error=dict(Counter(
+            map(
+                lambda result_iter_: result_iter_.error,
+                filter(lambda result_iter_: result_iter_.error is not None, execution_result_list)
+            )
+        )),
+        wall_clock_seconds=wall_clock_seconds,
+        executions_per_second=execution_count / wall_clock_seconds if wall_clock_seconds > 0 else 0.0,
+        latency_p50_seconds=get_percentile(duration_list, 50),
+        latency_p95_seconds=get_percentile(duration_list, 95),
+        latency_p99_seconds=get_percentile(duration_list, 99),
+        latency_mean_seconds=statistics.fmean(duration_list) if duration_list else 0.0,
+        latency_max_seconds=duration_list[-1] if duration_list else 0.0,
+        mean_transition_count=(
+            statistics.fmean(map(lambda result_iter_: result_iter_.transition_count, execution_result_list))
+            if execution_result_list else 0.0
+        ),
+        mean_task_call_count_by_key=dict(map(
+            lambda kv_iter_: (kv_iter_[0], kv_iter_[1] / execution_count),
+            sorted(task_call_counter.items())
+        )),
+    )
+
+
+def run_load(
+        local_state_machine: LocalStateMachine,
+        execution_input_list: List[Any],
+        execution_count: Optional[int] = None,
+        concurrency: int = 1
+) -> LoadReport:
+    """
+    Run execution_count executions (the inputs are cycled through), concurrency at a time
+    :param local_state_machine:
+    :param execution_input_list:
+    :param execution_count: Defaults to the number of inputs
+    :param concurrency:
+    :return:
+    """
+    if not execution_input_list:
+        raise ValueError("Need at least one execution input")
+
+    execution_count = execution_count if execution_count is not None else len(execution_input_list)
+
+    started_at = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        execution_result_list = list(executor.map(
+            local_state_machine.start_execution,
+            islice(cycle(execution_input_list), execution_count)
+        ))
+    wall_clock_seconds = perf_counter() - started_at
+
+    return get_load_report(
+        local_state_machine.state_machine_name,
+        execution_result_list,
+        concurrency,
+        wall_clock_seconds
+    )
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark a state machine template on the local executor")
+    parser.add_argument("state_machine_name", help="The state machine name, i.e populateDraftData, or its template file name")
+    parser.add_argument("--events", required=True, type=Path, help="A JSON list or JSON lines file of state machine inputs")
+    parser.add_argument("--executions", type=int, default=None, help="The number of executions (defaults to the number of events)")
+    parser.add_argument("--concurrency", type=int, default=1, help="The number of executions run at once")
+    parser.add_argument("--task-latency", default="none", help="The latency model for every task call, i.e 'constant:0.05'")
+    parser.add_argument(
+        "--task-latency-for", action="append", default=[], metavar="KEY=SPEC",
+        help="The latency model for a task key or service, i.e 'lambda:get_libraries=lognormal:0.1,1' or 'ssm=constant:0.02'"
+    )
+    parser.add_argument("--wait-time-scale", type=float, default=0.0, help="Multiplies Wait state and retry interval seconds")
+    parser.add_argument("--ssm-parameters", type=Path, default=None, help="A JSON object of ssm parameter values by name")
+    parser.add_argument("--substitutions", type=Path, default=None, help="A JSON object of extra definition substitutions")
+    parser.add_argument("--seed", type=int, default=None, help="Seed the latency models")
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    # Run the handlers against the API stand-in if API_STAND_IN_MODE is set
+    install_from_env()
+
+    latency_model_by_key = dict(map(
+        lambda key_spec_iter_: (
+            key_spec_iter_.split("=", 1)[0],
+            parse_latency_model(key_spec_iter_.split("=", 1)[1], seed=args.seed)
+        ),
+        args.task_latency_for
+    ))
+
+    local_state_machine = LocalStateMachine(
+        args.state_machine_name,
+        definition_substitutions=json.loads(args.substitutions.read_text()) if args.substitutions else None,
+        ssm_parameters=json.loads(args.ssm_parameters.read_text()) if args.ssm_parameters else None,
+        task_latency_model=KeyedLatencyModel(
+            latency_model_by_key,
+            default_latency_model=parse_latency_model(args.task_latency, seed=args.seed)
+        ),
+        wait_time_scale=args.wait_time_scale,
+    )
+
+    load_report = run_load(
+        local_state_machine,
+        read_events(args.events),
+        execution_count=args.executions,
+        concurrency=args.concurrency,
+    )
+
+    print(json.dumps(asdict(load_report), indent=4))
+
+    if load_report.failed_count > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""
+Shared fixtures for the handler tests
+
+Handlers are loaded with local_sfn (from app/lambdas, with the layers of this repository on the path),
+and run against the API stand-in in replay mode, so no API package needs to be installed.
+Each test adds the API calls it expects with the api_fixtures fixture, i.e
+
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": "20250101abcdef12"},
+        response={...}
+    )
+
+Local stand-ins (SQLite) are used for the tables and queues, set through the environment with monkeypatch.
+"""
+
+# Standard imports
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pytest
+
+# The app directory
+APP_DIR = Path(__file__).absolute().parent.parent
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+from api_stand_in import install, uninstall, FixtureStore, REPLAY_MODE  # noqa: E402
+from api_stand_in.fixtures import serialize_value  # noqa: E402
+from local_sfn.executor import LAYER_PYTHON_DIR_LIST, load_handler_module, unload_handlers  # noqa: E402
+
+for layer_python_dir in LAYER_PYTHON_DIR_LIST:
+    if str(layer_python_dir) not in sys.path:
+        sys.path.append(str(layer_python_dir))
+
+# Globals
+# Environment variables that point the handlers at (real or stand-in) tables and queues
+HANDLER_RESOURCE_ENV_VAR_SUFFIX_LIST = [
+    "_TABLE_NAME",
+    "_QUEUE_URL",
+    "_SQLITE_PATH",
+]
+
+
+class ApiFixtures:
+    """
+    Write the recorded API calls a test replays
+    """
+    def __init__(self, fixtures_dir: Path):
+        self.fixtures_dir = fixtures_dir
+        self.fixture_store = FixtureStore(fixtures_dir)
+
+    def add(
+            self,
+            api_name: str,
+            function_name: str,
+            arguments: Dict[str, Any],
+            response: Any = None,
+            error: Optional[Exception] = None,
+    ):
+        """
+        Record a call, the arguments are given in the order of the function's parameters
+        :param api_name: i.e 'workflow', 'metadata', 'filemanager', 'icav2'
+        :param function_name:
+        :param arguments:
+        :param response:
+        :param error:
+        :return:
+        """
+        self.fixture_store.put_recording(
+            api_name, function_name,
+            arguments=serialize_value(arguments),
+            duration_seconds=0.0,
+            response=response,
+            error=error,
+            parameter_list=list(map(
+                lambda parameter_name_iter_: {"name": parameter_name_iter_, "kind": "POSITIONAL_OR_KEYWORD"},
+                arguments
+            )),
+        )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def api_stand_in(tmp_path_factory):
+    """
+    Replay mode for the whole session, so the API packages are synthesized when the handlers are imported
+    """
+    install(REPLAY_MODE, tmp_path_factory.mktemp("no-api-fixtures"))
+    yield
+    uninstall()
+
+
+@pytest.fixture()
+def api_fixtures(tmp_path, tmp_path_factory) -> ApiFixtures:
+    """
+    The API calls of this test, add them before running the handler
+    """
+    fixtures_dir = tmp_path / "api-fixtures"
+    install(REPLAY_MODE, fixtures_dir)
+    yield ApiFixtures(fixtures_dir)
+    install(REPLAY_MODE, tmp_path_factory.mktemp("no-api-fixtures"))
+
+
+@pytest.fixture(autouse=True)
+def lambda_environ(monkeypatch):
+    """
+    A clean lambda environment, no tables or queues unless the test sets them
+    """
+    from os import environ
+
+    for env_var in list(environ):
+        if env_var.endswith(tuple(HANDLER_RESOURCE_ENV_VAR_SUFFIX_LIST)) or env_var.startswith("API_STAND_IN_"):
+            monkeypatch.delenv(env_var)
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "ap-southeast-2")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("WORKFLOW_NAME", "oncoanalyser-wgts-dna-rna")
+    monkeypatch.setenv("TRACING_ENABLED", "false")
+
+    yield
+
+    # Handlers keep warm container state in their module globals
+    unload_handlers()
+
+
+@pytest.fixture()
+def load_handler():
+    """
+    Load a handler module by its lambda name, i.e load_handler("find_latest_workflow")
+    """
+    return load_handler_module
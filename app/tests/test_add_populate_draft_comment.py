@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Comment suppression in add_populate_draft_comment, a window is only started once its comment has been queued
+"""
+
+# Standard imports
+import pytest
+
+# Layer imports
+from pipeline_manager_tools.comment_outbox import get_records_from_sqlite_outbox
+
+# Globals
+WORKFLOW_RUN_ID = "wfr.01JTESTWORKFLOWRUN000000031"
+
+
+def get_updating_inputs_event() -> dict:
+    return {
+        "workflowRunId": WORKFLOW_RUN_ID,
+        "commentType": "updating_inputs",
+        "executionArn": "arn:aws:states:ap-southeast-2:123456789012:execution:populate:abc",
+    }
+
+
+@pytest.fixture()
+def outbox_sqlite_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMMENT_SUPPRESSION_INDEX_SQLITE_PATH", str(tmp_path / "comment-suppression-index.sqlite"))
+    outbox_sqlite_path = str(tmp_path / "comment-outbox.sqlite")
+    monkeypatch.setenv("COMMENT_OUTBOX_SQLITE_PATH", outbox_sqlite_path)
+    return outbox_sqlite_path
+
+
+def test_comment_that_could_not_be_queued_is_posted_by_the_next_pass(load_handler, outbox_sqlite_path, monkeypatch):
+    add_populate_draft_comment = load_handler("add_populate_draft_comment")
+
+    def enqueue_comments_unavailable(**kwargs):
+        raise RuntimeError("Could not add comments to the comment outbox")
+
+    with monkeypatch.context() as enqueue_monkeypatch:
+        enqueue_monkeypatch.setattr(add_populate_draft_comment, "enqueue_comments", enqueue_comments_unavailable)
+        with pytest.raises(RuntimeError):
+            add_populate_draft_comment.handler(get_updating_inputs_event(), None)
+
+    # No window was started, so the comment is not suppressed
+    assert add_populate_draft_comment.get_comment_suppression_state(WORKFLOW_RUN_ID, "updating_inputs") is None
+    assert add_populate_draft_comment.handler(get_updating_inputs_event(), None) == {"commentAdded": True}
+
+    # Queued, identical comments are now suppressed
+    assert add_populate_draft_comment.handler(get_updating_inputs_event(), None) == {"commentAdded": False}
+    assert len(get_records_from_sqlite_outbox(outbox_sqlite_path)) == 1
+
+
+def test_rolled_over_window_posts_a_still_waiting_comment(load_handler, outbox_sqlite_path, monkeypatch):
+    add_populate_draft_comment = load_handler("add_populate_draft_comment")
+
+    assert add_populate_draft_comment.handler(get_updating_inputs_event(), None) == {"commentAdded": True}
+    assert add_populate_draft_comment.handler(get_updating_inputs_event(), None) == {"commentAdded": False}
+
+    monkeypatch.setenv("COMMENT_SUPPRESSION_WINDOW_SECONDS", "0")
+    assert add_populate_draft_comment.handler(get_updating_inputs_event(), None) == {"commentAdded": True}
+
+    record_list = get_records_from_sqlite_outbox(outbox_sqlite_path)
+    assert len(record_list) == 2
+    assert record_list[1]['comment'].startswith(
+        "Still updating inputs (population checks since the last comment: 2)."
+    )
+
+    # The still waiting comment started a new window
+    monkeypatch.delenv("COMMENT_SUPPRESSION_WINDOW_SECONDS")
+    assert add_populate_draft_comment.handler(get_updating_inputs_event(), None) == {"commentAdded": False}
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+The API stand-in in replay mode, with the API packages synthesized from the fixtures
+"""
+
+import pytest
+
+# Local imports
+from api_stand_in import install, FaultInjector, FixtureNotFoundError, REPLAY_MODE
+from local_sfn.latency_models import ConstantLatencyModel
+
+
+def test_replay_binds_positional_and_keyword_arguments(api_fixtures):
+    from orcabus_api_tools.metadata import get_library_from_library_id
+
+    api_fixtures.add(
+        "metadata", "get_library_from_library_id",
+        arguments={"library_id": "L2300001"},
+        response={"libraryId": "L2300001", "orcabusId": "lib.01JTESTLIBRARY0000000000001"},
+    )
+
+    assert get_library_from_library_id("L2300001")['orcabusId'] == "lib.01JTESTLIBRARY0000000000001"
+    assert get_library_from_library_id(library_id="L2300001")['libraryId'] == "L2300001"
+
+
+def test_unrecorded_call_raises(api_fixtures):
+    from orcabus_api_tools.metadata import get_library_from_library_id
+
+    api_fixtures.add(
+        "metadata", "get_library_from_library_id",
+        arguments={"library_id": "L2300001"},
+        response={"libraryId": "L2300001"},
+    )
+
+    with pytest.raises(FixtureNotFoundError):
+        get_library_from_library_id("L2300002")
+
+
+def test_recorded_http_error_is_raised_as_the_client_error(api_fixtures):
+    from requests import HTTPError
+    from orcabus_api_tools.workflow import get_payload
+
+    api_fixtures.add(
+        "workflow", "get_payload",
+        arguments={"payload_id": "pld.missing"},
+        error=HTTPError.from_status(404, "Not Found"),
+    )
+
+    with pytest.raises(HTTPError) as error_info:
+        get_payload("pld.missing")
+    assert error_info.value.response.status_code == 404
+
+
+def test_injected_faults_and_latency(api_fixtures):
+    from requests import HTTPError
+    from orcabus_api_tools.workflow import get_payload
+
+    api_fixtures.add(
+        "workflow", "get_payload",
+        arguments={"payload_id": "pld.1"},
+        response={"orcabusId": "pld.1"},
+    )
+
+    fault_injector = FaultInjector(
+        latency_model=ConstantLatencyModel(0.0),
+        error_rate=0.5,
+        seed=1
+    )
+    install(REPLAY_MODE, api_fixtures.fixtures_dir, fault_injector)
+
+    outcome_list = []
+    for _ in range(200):
+        try:
+            get_payload("pld.1")
+            outcome_list.append("ok")
+        except HTTPError as e:
+            assert e.response.status_code == 503
+            outcome_list.append("error")
+
+    assert 60 < outcome_list.count("error") < 140
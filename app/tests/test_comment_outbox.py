@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+The comment outbox, queued by the commentary lambdas and flushed (in order per workflow run) by flush_comment_outbox
+"""
+
+# Standard imports
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from botocore.stub import Stubber, ANY
+
+# Layer imports
+from pipeline_manager_tools import aws_clients
+from pipeline_manager_tools.comment_outbox import enqueue_comments, get_records_from_sqlite_outbox
+
+# Globals
+QUEUE_URL = "https://sqs.ap-southeast-2.amazonaws.com/123456789012/orca-onco-wgts-both--comment-outbox.fifo"
+AUTHOR = "oncoanalyser-wgts-dna-rna-workflow-validation-service"
+FOOTER = "\n---\nStep Functions Execution: arn:aws:states:ap-southeast-2:123456789012:execution:validate:abc"
+
+
+@pytest.fixture()
+def sqs_stubber(monkeypatch):
+    """
+    The comment outbox queue, stubbed
+    """
+    monkeypatch.setenv("COMMENT_OUTBOX_QUEUE_URL", QUEUE_URL)
+    sqs_client = boto3.client("sqs")
+    monkeypatch.setattr(aws_clients, "_SQS_CLIENT", sqs_client)
+    with Stubber(sqs_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture()
+def outbox_sqlite_path(tmp_path, monkeypatch):
+    outbox_sqlite_path = str(tmp_path / "comment-outbox.sqlite")
+    monkeypatch.setenv("COMMENT_OUTBOX_SQLITE_PATH", outbox_sqlite_path)
+    return outbox_sqlite_path
+
+
+@pytest.fixture()
+def flush_comment_outbox(load_handler, monkeypatch):
+    flush_comment_outbox = load_handler("flush_comment_outbox")
+    monkeypatch.setattr(flush_comment_outbox, "COMMENT_POST_INTERVAL_SECONDS", 0)
+    return flush_comment_outbox
+
+
+def test_comments_are_queued_in_the_workflow_run_message_group(sqs_stubber):
+    comment_list = list(map(lambda index_iter_: f"Reason {index_iter_}{FOOTER}", range(12)))
+
+    # Batches of up to ten messages
+    for batch_range_iter_ in [range(0, 10), range(10, 12)]:
+        sqs_stubber.add_response(
+            "send_message_batch",
+            {"Successful": [], "Failed": []},
+            {
+                "QueueUrl": QUEUE_URL,
+                "Entries": list(map(
+                    lambda index_iter_: {
+                        "Id": str(index_iter_),
+                        "MessageBody": ANY,
+                        "MessageGroupId": "wfr.01JTESTWORKFLOWRUN000000001",
+                    },
+                    batch_range_iter_
+                )),
+            },
+        )
+
+    enqueue_comments("wfr.01JTESTWORKFLOWRUN000000001", AUTHOR, comment_list)
+
+
+def test_failed_sends_are_raised(sqs_stubber):
+    sqs_stubber.add_response(
+        "send_message_batch",
+        {
+            "Successful": [],
+            "Failed": [{"Id": "0", "SenderFault": False, "Code": "InternalError"}],
+        },
+        {"QueueUrl": QUEUE_URL, "Entries": ANY},
+    )
+
+    with pytest.raises(RuntimeError, match="Could not add comments to the comment outbox"):
+        enqueue_comments("wfr.01JTESTWORKFLOWRUN000000001", AUTHOR, [f"Reason 0{FOOTER}"])
+
+
+def test_comments_queued_from_concurrent_threads_are_flushed(api_fixtures, outbox_sqlite_path, flush_comment_outbox):
+    workflow_run_id_list = list(map(lambda index_iter_: f"wfr.01JTESTWORKFLOWRUN00000001{index_iter_}", range(4)))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(
+            lambda workflow_run_id_iter_: enqueue_comments(
+                workflow_run_id_iter_, AUTHOR, [f"Reason 1 of 2{FOOTER}", f"Reason 2 of 2{FOOTER}"]
+            ),
+            workflow_run_id_list
+        ))
+
+    assert len(get_records_from_sqlite_outbox(outbox_sqlite_path)) == 8
+
+    # The comments of each workflow run share the one footer
+    for workflow_run_id in workflow_run_id_list:
+        api_fixtures.add(
+            "workflow", "add_comment_to_workflow_run",
+            arguments={
+                "workflow_run_orcabus_id": workflow_run_id,
+                "comment": f"Reason 1 of 2\n\nReason 2 of 2{FOOTER}",
+                "author": AUTHOR,
+            },
+            response={},
+        )
+
+    assert flush_comment_outbox.handler({}, None) == {"batchItemFailures": []}
+    assert get_records_from_sqlite_outbox(outbox_sqlite_path) == []
+
+
+def test_failed_comment_holds_back_its_workflow_run(api_fixtures, flush_comment_outbox):
+    record_list = [
+        # One comment each from two authors, for the same workflow run
+        ("wfr.01JTESTWORKFLOWRUN000000021", "author-a", "Comment a"),
+        ("wfr.01JTESTWORKFLOWRUN000000021", "author-b", "Comment b"),
+        ("wfr.01JTESTWORKFLOWRUN000000022", "author-a", "Comment c"),
+    ]
+    api_fixtures.add(
+        "workflow", "add_comment_to_workflow_run",
+        arguments={"workflow_run_orcabus_id": record_list[0][0], "comment": record_list[0][2], "author": "author-a"},
+        error=ValueError("Comment api unavailable"),
+    )
+    api_fixtures.add(
+        "workflow", "add_comment_to_workflow_run",
+        arguments={"workflow_run_orcabus_id": record_list[2][0], "comment": record_list[2][2], "author": "author-a"},
+        response={},
+    )
+
+    assert flush_comment_outbox.handler(
+        {
+            "Records": list(map(
+                lambda record_iter_: {
+                    "messageId": f"message-{record_iter_[0]}",
+                    "body": json.dumps({
+                        "workflowRunId": record_iter_[1][0],
+                        "author": record_iter_[1][1],
+                        "comment": record_iter_[1][2],
+                        "enqueuedAt": 1735689600.0,
+                        "sequence": record_iter_[0],
+                    }),
+                },
+                enumerate(record_list)
+            ))
+        },
+        None
+    ) == {
+        # The comment of the other author is retried with the failed comment, so the message group stays in order
+        "batchItemFailures": [{"itemIdentifier": "message-0"}, {"itemIdentifier": "message-1"}]
+    }
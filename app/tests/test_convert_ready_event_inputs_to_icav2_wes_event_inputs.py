@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+The READY event inputs -> ICAv2 WES inputs conversion, checked against golden samplesheets
+"""
+
+# Standard imports
+import pytest
+
+# Globals
+GROUP_ID = "SBJ05828"
+TUMOR_DNA_SAMPLE_ID = "L2401541"
+NORMAL_DNA_SAMPLE_ID = "L2401540"
+TUMOR_RNA_SAMPLE_ID = "L2401533"
+DNA_PREFIX = "s3://bucket/oncoanalyser-wgts-dna/202508052e398fe8/SBJ05828"
+RNA_PREFIX = "s3://bucket/oncoanalyser-wgts-rna/202508093e7596dc/SBJ05828"
+
+# (sample_id, sample_type, sequence_type, filetype, filepath), in samplesheet order
+GOLDEN_SAMPLESHEET_ROWS = [
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "bam_redux", f"{DNA_PREFIX}/alignments/dna/L2401541.redux.bam"),
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "bai", f"{DNA_PREFIX}/alignments/dna/L2401541.redux.bam.bai"),
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "redux_jitter_tsv", f"{DNA_PREFIX}/alignments/dna/L2401541.jitter_params.tsv"),
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "redux_ms_tsv", f"{DNA_PREFIX}/alignments/dna/L2401541.ms_table.tsv.gz"),
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "bamtools_dir", f"{DNA_PREFIX}/bamtools/L2401541/"),
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "sage_dir", f"{DNA_PREFIX}/sage/somatic/"),
+    (TUMOR_DNA_SAMPLE_ID, "tumor", "dna", "purple_dir", f"{DNA_PREFIX}/purple/"),
+    (NORMAL_DNA_SAMPLE_ID, "normal", "dna", "bam_redux", f"{DNA_PREFIX}/alignments/dna/L2401540.redux.bam"),
+    (NORMAL_DNA_SAMPLE_ID, "normal", "dna", "bai", f"{DNA_PREFIX}/alignments/dna/L2401540.redux.bam.bai"),
+    (NORMAL_DNA_SAMPLE_ID, "normal", "dna", "sage_dir", f"{DNA_PREFIX}/sage/germline/"),
+    (TUMOR_RNA_SAMPLE_ID, "tumor", "rna", "bam", f"{RNA_PREFIX}/alignments/rna/L2401533.md.bam"),
+    (TUMOR_RNA_SAMPLE_ID, "tumor", "rna", "bai", f"{RNA_PREFIX}/alignments/rna/L2401533.md.bam.bai"),
+    (TUMOR_RNA_SAMPLE_ID, "tumor", "rna", "isofox_dir", f"{RNA_PREFIX}/isofox/"),
+]
+
+
+def get_ready_event_inputs() -> dict:
+    # Input keys are deliberately not in the declared input params order
+    return {
+        "groupId": GROUP_ID,
+        "subjectId": GROUP_ID,
+        "tumorDnaSampleId": TUMOR_DNA_SAMPLE_ID,
+        "normalDnaSampleId": NORMAL_DNA_SAMPLE_ID,
+        "tumorRnaSampleId": TUMOR_RNA_SAMPLE_ID,
+        "processesList": ["lilac", "neo", "cuppa", "orange"],
+        "refDataHmfDataPath": "s3://bucket/hmf_pipeline_resources.38_v2.1.0--1/",
+        "tumorDnaInputs": {
+            "purpleDir": f"{DNA_PREFIX}/purple/",
+            "sageDir": f"{DNA_PREFIX}/sage/somatic/",
+            "reduxMsTsv": f"{DNA_PREFIX}/alignments/dna/L2401541.ms_table.tsv.gz",
+            "bamtoolsDir": f"{DNA_PREFIX}/bamtools/L2401541/",
+            "reduxJitterTsv": f"{DNA_PREFIX}/alignments/dna/L2401541.jitter_params.tsv",
+            "bamRedux": f"{DNA_PREFIX}/alignments/dna/L2401541.redux.bam",
+        },
+        "normalDnaInputs": {
+            "sageDir": f"{DNA_PREFIX}/sage/germline/",
+            "bamRedux": f"{DNA_PREFIX}/alignments/dna/L2401540.redux.bam",
+        },
+        "tumorRnaInputs": {
+            "isofoxDir": f"{RNA_PREFIX}/isofox/",
+            "bam": f"{RNA_PREFIX}/alignments/rna/L2401533.md.bam",
+        },
+    }
+
+
+def get_golden_samplesheet() -> list:
+    return list(map(
+        lambda row_iter_: {
+            "group_id": GROUP_ID,
+            "subject_id": GROUP_ID,
+            "sample_id": row_iter_[0],
+            "sample_type": row_iter_[1],
+            "sequence_type": row_iter_[2],
+            "filetype": row_iter_[3],
+            "filepath": row_iter_[4],
+        },
+        GOLDEN_SAMPLESHEET_ROWS
+    ))
+
+
+@pytest.mark.parametrize(
+    "workflow_version,expected_processes_inputs",
+    [
+        # Before 2.2.0, processes are listed in processes_include and processes_manual is a flag
+        ("2.1.0", {"processes_include": "lilac,neo,cuppa,orange", "processes_manual": True}),
+        # From 2.2.0, processes are listed in processes_manual
+        ("2.2.0", {"processes_manual": "lilac,neo,cuppa,orange"}),
+        ("2.3.1", {"processes_manual": "lilac,neo,cuppa,orange"}),
+    ]
+)
+def test_golden_wes_inputs(load_handler, workflow_version, expected_processes_inputs):
+    convert_module = load_handler("convert_ready_event_inputs_to_icav2_wes_event_inputs")
+
+    icav2_wes_inputs = convert_module.convert_ready_event_inputs_to_icav2_wes_event_inputs(
+        inputs=get_ready_event_inputs(),
+        workflow_version=convert_module.Version(workflow_version)
+    )
+
+    assert icav2_wes_inputs == {
+        "mode": "wgts",
+        "monochrome_logs": True,
+        "publish_dir_mode": "symlink",
+        "outdir": "out",
+        "samplesheet": get_golden_samplesheet(),
+        "genome": "GRCh38_hmf",
+        "genome_version": "38",
+        "genome_type": "no_alt",
+        "ref_data_hmf_data_path": "s3://bucket/hmf_pipeline_resources.38_v2.1.0--1/",
+        **expected_processes_inputs,
+    }
+    # Symlinked outputs need no publishDir overrides
+    assert convert_module.get_nextflow_publish_dir_config(
+        convert_module.get_publish_dir_mode_by_output(get_ready_event_inputs())[1]
+    ) is None
+
+
+def test_row_order_follows_the_declared_params(load_handler):
+    convert_module = load_handler("convert_ready_event_inputs_to_icav2_wes_event_inputs")
+
+    inputs = get_ready_event_inputs()
+    reversed_inputs = {
+        **inputs,
+        "tumorDnaInputs": dict(reversed(list(inputs['tumorDnaInputs'].items()))),
+        "normalDnaInputs": dict(reversed(list(inputs['normalDnaInputs'].items()))),
+        "tumorRnaInputs": dict(reversed(list(inputs['tumorRnaInputs'].items()))),
+    }
+
+    assert (
+        convert_module.serialise_samplesheet_columns(convert_module.get_samplesheet_columns(reversed_inputs)) ==
+        get_golden_samplesheet()
+    )
+
+
+def test_undeclared_input_keys_follow_in_alphabetical_order(load_handler):
+    convert_module = load_handler("convert_ready_event_inputs_to_icav2_wes_event_inputs")
+    filetype_by_input_key = dict(convert_module.FILETYPE_BY_INPUT_KEY)
+
+    samplesheet_columns = convert_module.get_samplesheet_columns({
+        "groupId": GROUP_ID,
+        "subjectId": GROUP_ID,
+        "tumorRnaSampleId": TUMOR_RNA_SAMPLE_ID,
+        "tumorRnaInputs": {
+            "starFusionDir": f"{RNA_PREFIX}/star_fusion/",
+            "arribaDir": f"{RNA_PREFIX}/arriba/",
+            "bam": f"{RNA_PREFIX}/alignments/rna/L2401533.md.bam",
+        },
+    })
+
+    assert samplesheet_columns['filetype'] == ["bam", "bai", "arriba_dir", "star_fusion_dir"]
+    # The filetype lookup is pure, undeclared keys are not added to the table
+    assert convert_module.FILETYPE_BY_INPUT_KEY == filetype_by_input_key
+
+
+@pytest.mark.parametrize(
+    "publish_dir_mode_policy, failure_match",
+    [
+        ({"default": "symlink", "reports": "copy", "neo": "move"}, None),
+        # orange is not read by any other process
+        ({"default": "symlink", "orange": "move"}, None),
+        ({"default": "symlink", "calls": "move"}, "'lilac', its outputs are read by neo, orange"),
+        ({"default": "symlink", "cuppa": "move"}, "'cuppa', its outputs are read by orange"),
+        ({"default": "move", "lilac": "copy", "cuppa": "copy"}, None),
+        ({"default": "move", "lilac": "copy"}, "'cuppa'"),
+    ]
+)
+def test_consumed_outputs_cannot_be_moved(load_handler, publish_dir_mode_policy, failure_match):
+    convert_module = load_handler("convert_ready_event_inputs_to_icav2_wes_event_inputs")
+    inputs = {**get_ready_event_inputs(), "publishDirModePolicy": publish_dir_mode_policy}
+
+    if failure_match is None:
+        convert_module.get_publish_dir_mode_by_output(inputs)
+    else:
+        with pytest.raises(ValueError, match=failure_match):
+            convert_module.get_publish_dir_mode_by_output(inputs)
+
+
+def test_fingerprint_includes_the_nextflow_config(load_handler):
+    convert_module = load_handler("convert_ready_event_inputs_to_icav2_wes_event_inputs")
+    inputs = get_ready_event_inputs()
+    icav2_wes_inputs = convert_module.convert_ready_event_inputs_to_icav2_wes_event_inputs(inputs=inputs)
+
+    nextflow_config_list = list(map(
+        lambda publish_dir_mode_policy_iter_: convert_module.get_nextflow_publish_dir_config(
+            convert_module.get_publish_dir_mode_by_output(
+                {**inputs, "publishDirModePolicy": publish_dir_mode_policy_iter_}
+            )[1]
+        ),
+        [{}, {"reports": "copy"}, {"reports": "link"}]
+    ))
+
+    fingerprint_list = list(map(
+        lambda nextflow_config_iter_: convert_module.get_input_fingerprint(
+            icav2_wes_inputs, "pipeline-1", nextflow_config_iter_
+        ),
+        nextflow_config_list
+    ))
+
+    assert len(set(fingerprint_list)) == 3
+    # Runs without a nextflow config keep their fingerprint
+    assert fingerprint_list[0] == convert_module.get_input_fingerprint(icav2_wes_inputs, "pipeline-1")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""
+find_latest_workflow batch mode, searches that share a coalesce key are made as one Workflow Manager API query
+and the results partitioned by workflow name, libraries and status
+"""
+
+# Standard imports
+import pytest
+
+# Globals
+ANALYSIS_RUN_ID = "anr.01JTESTANALYSISRUN0000000001"
+DNA_WORKFLOW_NAME = "oncoanalyser-wgts-dna"
+RNA_WORKFLOW_NAME = "oncoanalyser-wgts-rna"
+TUMOR_DNA_LIBRARY_ID = "L2300001"
+NORMAL_DNA_LIBRARY_ID = "L2300002"
+TUMOR_RNA_LIBRARY_ID = "L2300003"
+
+
+def get_workflow_run(portal_run_id: str, workflow_name: str, library_id_list: list, status: str) -> dict:
+    return {
+        "orcabusId": f"wfr.{portal_run_id}",
+        "portalRunId": portal_run_id,
+        "workflow": {"name": workflow_name, "version": "2.2.0"},
+        "libraries": list(map(
+            lambda library_id_iter_: {"libraryId": library_id_iter_, "orcabusId": f"lib.{library_id_iter_}"},
+            library_id_list
+        )),
+        "currentState": {
+            "orcabusId": f"wfs.{portal_run_id}",
+            "status": status,
+            "timestamp": "2025-01-01T00:00:00Z",
+        },
+    }
+
+
+def get_query(query_id: str, workflow_name: str, library_id_list: list) -> dict:
+    return {
+        "queryId": query_id,
+        "workflowName": workflow_name,
+        "status": "SUCCEEDED",
+        "libraries": list(map(lambda library_id_iter_: {"libraryId": library_id_iter_}, library_id_list)),
+        "analysisRunId": ANALYSIS_RUN_ID,
+    }
+
+
+def add_workflow_runs_from_metadata_fixture(api_fixtures, library_id_list: list, workflow_run_list: list):
+    api_fixtures.add(
+        "workflow", "get_workflow_runs_from_metadata",
+        arguments={
+            "analysis_run_id": ANALYSIS_RUN_ID,
+            "workflow_name": None,
+            "workflow_version": None,
+            "library_id_list": library_id_list,
+            "rgid_list": None,
+        },
+        response=workflow_run_list,
+    )
+
+
+@pytest.fixture()
+def find_latest_workflow(load_handler, monkeypatch):
+    """
+    The handler module, with the arguments of each Workflow Manager API query it makes
+    """
+    find_latest_workflow = load_handler("find_latest_workflow")
+    find_latest_workflow.query_kwargs_list = []
+    get_workflow_runs_from_metadata = find_latest_workflow.get_workflow_runs_from_metadata
+
+    def get_queried_workflow_runs_from_metadata(**kwargs):
+        find_latest_workflow.query_kwargs_list.append(kwargs)
+        return get_workflow_runs_from_metadata(**kwargs)
+
+    monkeypatch.setattr(
+        find_latest_workflow, "get_workflow_runs_from_metadata", get_queried_workflow_runs_from_metadata
+    )
+    return find_latest_workflow
+
+
+def test_dna_and_rna_queries_in_one_analysis_run_are_one_api_query(api_fixtures, find_latest_workflow):
+    dna_workflow_run = get_workflow_run(
+        "20250101aaaaaaaa", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID], "SUCCEEDED"
+    )
+    rna_workflow_run = get_workflow_run("20250101bbbbbbbb", RNA_WORKFLOW_NAME, [TUMOR_RNA_LIBRARY_ID], "SUCCEEDED")
+    # The libraries of the queries have nothing in common, so the query is by the analysis run alone
+    add_workflow_runs_from_metadata_fixture(
+        api_fixtures, [],
+        [
+            dna_workflow_run,
+            rna_workflow_run,
+            get_workflow_run(
+                "20250101cccccccc", "oncoanalyser-wgts-dna-rna",
+                [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID, TUMOR_RNA_LIBRARY_ID], "DRAFT"
+            ),
+        ]
+    )
+
+    assert find_latest_workflow.handler(
+        {
+            "queries": [
+                get_query("dna", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID]),
+                get_query("rna", RNA_WORKFLOW_NAME, [TUMOR_RNA_LIBRARY_ID]),
+            ],
+        },
+        None
+    ) == {
+        "workflowRunListByQueryId": {
+            "dna": [dna_workflow_run],
+            "rna": [rna_workflow_run],
+        }
+    }
+    assert len(find_latest_workflow.query_kwargs_list) == 1
+
+
+def test_coalesced_query_uses_the_common_libraries(api_fixtures, find_latest_workflow):
+    tumor_normal_workflow_run = get_workflow_run(
+        "20250101aaaaaaaa", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID], "SUCCEEDED"
+    )
+    tumor_only_workflow_run = get_workflow_run(
+        "20250101bbbbbbbb", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID], "SUCCEEDED"
+    )
+    rna_workflow_run = get_workflow_run(
+        "20250101cccccccc", RNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, TUMOR_RNA_LIBRARY_ID], "SUCCEEDED"
+    )
+    add_workflow_runs_from_metadata_fixture(
+        api_fixtures, [TUMOR_DNA_LIBRARY_ID],
+        [tumor_normal_workflow_run, tumor_only_workflow_run, rna_workflow_run]
+    )
+
+    workflow_run_list_by_query_id = find_latest_workflow.handler(
+        {
+            "queries": [
+                get_query("dna", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID]),
+                get_query("rna", RNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, TUMOR_RNA_LIBRARY_ID]),
+            ],
+        },
+        None
+    )['workflowRunListByQueryId']
+
+    # The tumor only run is not linked to the normal library of the dna search
+    assert workflow_run_list_by_query_id == {
+        "dna": [tumor_normal_workflow_run],
+        "rna": [rna_workflow_run],
+    }
+    assert find_latest_workflow.query_kwargs_list[0]['library_id_list'] == [TUMOR_DNA_LIBRARY_ID]
+
+
+def test_superseded_and_other_status_runs_are_partitioned_out(api_fixtures, find_latest_workflow):
+    library_id_list = [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID]
+    add_workflow_runs_from_metadata_fixture(
+        api_fixtures, library_id_list,
+        [
+            get_workflow_run("20250101aaaaaaaa", DNA_WORKFLOW_NAME, library_id_list, "SUCCEEDED"),
+            # A newer dna run still in progress supersedes the succeeded one
+            get_workflow_run("20250102aaaaaaaa", DNA_WORKFLOW_NAME, library_id_list, "RUNNING"),
+            get_workflow_run("20250101bbbbbbbb", RNA_WORKFLOW_NAME, library_id_list, "SUCCEEDED"),
+            get_workflow_run("20250102bbbbbbbb", RNA_WORKFLOW_NAME, library_id_list, "FAILED"),
+        ]
+    )
+
+    assert find_latest_workflow.handler(
+        {
+            "queries": [
+                get_query("dna", DNA_WORKFLOW_NAME, library_id_list),
+                get_query("rna", RNA_WORKFLOW_NAME, library_id_list),
+            ],
+            "fields": ["portalRunId", "currentState.status"],
+        },
+        None
+    ) == {
+        "workflowRunListByQueryId": {
+            "dna": [],
+            "rna": [{"portalRunId": "20250101bbbbbbbb", "currentState": {"status": "SUCCEEDED"}}],
+        }
+    }
+
+
+def test_queries_with_different_coalesce_keys_are_made_separately(api_fixtures, find_latest_workflow):
+    dna_workflow_run = get_workflow_run("20250101aaaaaaaa", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID], "SUCCEEDED")
+    rna_workflow_run = get_workflow_run("20250101bbbbbbbb", RNA_WORKFLOW_NAME, [TUMOR_RNA_LIBRARY_ID], "SUCCEEDED")
+    for workflow_run_iter_ in [dna_workflow_run, rna_workflow_run]:
+        api_fixtures.add(
+            "workflow", "get_workflow_runs_from_metadata",
+            arguments={
+                "analysis_run_id": None,
+                "workflow_name": workflow_run_iter_['workflow']['name'],
+                "workflow_version": None,
+                "library_id_list": [workflow_run_iter_['libraries'][0]['libraryId']],
+                "rgid_list": None,
+            },
+            response=[workflow_run_iter_],
+        )
+
+    # Without an analysis run, searches are only coalesced if they share their libraries
+    assert find_latest_workflow.handler(
+        {
+            "queries": list(map(
+                lambda query_iter_: {**query_iter_, "analysisRunId": None},
+                [
+                    get_query("dna", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID]),
+                    get_query("rna", RNA_WORKFLOW_NAME, [TUMOR_RNA_LIBRARY_ID]),
+                ]
+            )),
+            "fields": ["portalRunId"],
+        },
+        None
+    ) == {
+        "workflowRunListByQueryId": {
+            "dna": [{"portalRunId": dna_workflow_run['portalRunId']}],
+            "rna": [{"portalRunId": rna_workflow_run['portalRunId']}],
+        }
+    }
+    assert len(find_latest_workflow.query_kwargs_list) == 2
+
+
+@pytest.mark.parametrize(
+    "search_criteria_update, is_coalesced",
+    [
+        # The analysis run id takes preference over the libraries
+        ({"libraryIdList": [TUMOR_RNA_LIBRARY_ID]}, True),
+        ({"workflowName": RNA_WORKFLOW_NAME, "status": "DRAFT"}, True),
+        ({"workflowVersion": "2.2.0"}, False),
+        ({"rgidList": ["AAGTCCAA+TACTCATA.2.241024_A00130_0336_BHW7MVDSXC"]}, False),
+        ({"analysisRunId": None}, False),
+    ]
+)
+def test_get_coalesce_key(load_handler, search_criteria_update, is_coalesced):
+    find_latest_workflow = load_handler("find_latest_workflow")
+    search_criteria = find_latest_workflow.get_search_criteria(
+        get_query("dna", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID])
+    )
+
+    assert (
+        find_latest_workflow.get_coalesce_key(search_criteria) ==
+        find_latest_workflow.get_coalesce_key({**search_criteria, **search_criteria_update})
+    ) is is_coalesced
+
+
+def test_library_only_coalesce_key_ignores_the_library_order(load_handler):
+    find_latest_workflow = load_handler("find_latest_workflow")
+
+    assert find_latest_workflow.get_coalesce_key(find_latest_workflow.get_search_criteria({
+        **get_query("dna", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID, NORMAL_DNA_LIBRARY_ID]), "analysisRunId": None
+    })) == find_latest_workflow.get_coalesce_key(find_latest_workflow.get_search_criteria({
+        **get_query("dna", DNA_WORKFLOW_NAME, [NORMAL_DNA_LIBRARY_ID, TUMOR_DNA_LIBRARY_ID]), "analysisRunId": None
+    }))
+
+
+def test_duplicate_query_ids_are_rejected(find_latest_workflow):
+    with pytest.raises(ValueError, match="unique queryId"):
+        find_latest_workflow.handler(
+            {
+                "queries": [
+                    get_query("dna", DNA_WORKFLOW_NAME, [TUMOR_DNA_LIBRARY_ID]),
+                    get_query("dna", RNA_WORKFLOW_NAME, [TUMOR_RNA_LIBRARY_ID]),
+                ],
+            },
+            None
+        )
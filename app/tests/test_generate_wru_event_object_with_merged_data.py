@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+"""
+The WRU event object with merged upstream data, and the state machines that pass it the draft workflow run
+"""
+
+# Standard imports
+from copy import deepcopy
+from time import perf_counter
+
+import pytest
+
+# Local imports
+from local_sfn.executor import LocalStateMachine
+
+# Globals
+DRAFT_PORTAL_RUN_ID = "20250401aaaaaaaa"
+UPSTREAM_PORTAL_RUN_ID = "20250331bbbbbbbb"
+LARGE_PAYLOAD_KEY_COUNT = 10000
+
+
+def get_draft_workflow_run() -> dict:
+    return {
+        "orcabusId": "wfr.01JTESTDRAFT00000000000000",
+        "portalRunId": DRAFT_PORTAL_RUN_ID,
+        "workflowRunName": f"umccr--automated--oncoanalyser-wgts-dna-rna--2-2-0--{DRAFT_PORTAL_RUN_ID}",
+        "workflow": {"name": "oncoanalyser-wgts-dna-rna", "version": "2.2.0"},
+        "libraries": [{"libraryId": "L2300001", "orcabusId": "lib.01JTESTLIBRARY0000000000001"}],
+        "currentState": {"orcabusId": "wfs.0001", "status": "DRAFT", "timestamp": "2025-04-01T00:00:00Z"},
+    }
+
+
+def get_tumor_rna_inputs() -> dict:
+    return {"bam": "s3://bucket/L2300003.md.bam", "isofoxDir": "s3://bucket/isofox/"}
+
+
+def test_no_upstream_data_still_returns_pruned_inputs(load_handler):
+    payload = {"version": "2025.08.05", "data": {"tags": {"tumorRnaLibraryId": "L2300003"}}}
+
+    output = load_handler("generate_wru_event_object_with_merged_data").handler(
+        {
+            "workflowRun": get_draft_workflow_run(),
+            "payload": payload,
+            "upstreamData": {},
+            "includeMergePatch": True,
+        },
+        None
+    )
+
+    # As before the merge rules, the merged payload always has an inputs object
+    assert output['workflowRunUpdate']['payload'] == {
+        "version": "2025.08.05",
+        "data": {"tags": {"tumorRnaLibraryId": "L2300003"}, "inputs": {}},
+    }
+    assert output['payloadDataMergePatch'] == {"inputs": {}}
+    assert output['workflowRunUpdate']['status'] == "DRAFT"
+    assert "currentState" not in output['workflowRunUpdate']
+
+
+def test_null_sections_are_pruned_when_a_rule_applies(load_handler):
+    payload = {
+        "version": "2025.08.05",
+        "data": {"inputs": {"tumorDnaInputs": None, "normalDnaInputs": None, "tumorRnaInputs": None}},
+    }
+
+    output = load_handler("generate_wru_event_object_with_merged_data").handler(
+        {
+            "workflowRun": get_draft_workflow_run(),
+            "payload": payload,
+            "upstreamData": {"tumorRnaInputs": get_tumor_rna_inputs()},
+            "includeMergePatch": True,
+        },
+        None
+    )
+
+    assert output['workflowRunUpdate']['payload']['data'] == {"inputs": {"tumorRnaInputs": get_tumor_rna_inputs()}}
+    assert output['payloadDataMergePatch'] == {"inputs": {
+        "tumorDnaInputs": None,
+        "normalDnaInputs": None,
+        "tumorRnaInputs": get_tumor_rna_inputs(),
+    }}
+
+
+def test_existing_inputs_are_kept_and_shared(load_handler):
+    merged_data_module = load_handler("generate_wru_event_object_with_merged_data")
+
+    data = {
+        "inputs": {"tumorDnaInputs": {"bamRedux": "s3://bucket/tumor.redux.bam"}, "tumorRnaInputs": None},
+        "tags": {"tumorDnaLibraryId": "L2300001"},
+    }
+    original_data = deepcopy(data)
+
+    merged_data, data_merge_patch = merged_data_module.merge_payload_data(
+        data, {"tumorDnaInputs": {"bamRedux": "s3://other/tumor.redux.bam"}, "tumorRnaInputs": get_tumor_rna_inputs()}
+    )
+
+    # The set DNA section is never overwritten, the RNA section is filled in
+    assert merged_data['inputs'] == {
+        "tumorDnaInputs": {"bamRedux": "s3://bucket/tumor.redux.bam"},
+        "tumorRnaInputs": get_tumor_rna_inputs(),
+    }
+    assert data_merge_patch == {"inputs": {"tumorRnaInputs": get_tumor_rna_inputs()}}
+
+    # The event payload is left as is, unchanged subtrees are shared rather than copied
+    assert data == original_data
+    assert merged_data['tags'] is data['tags']
+    assert merged_data['inputs']['tumorDnaInputs'] is data['inputs']['tumorDnaInputs']
+
+    # No rule applies, the data is returned as is
+    assert merged_data_module.merge_payload_data(merged_data, {}) == (merged_data, {})
+
+
+def test_glue_passes_the_draft_workflow_run(api_fixtures):
+    draft_workflow_run = get_draft_workflow_run()
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": UPSTREAM_PORTAL_RUN_ID},
+        response={
+            "orcabusId": "wfr.01JTESTUPSTREAM0000000000",
+            "portalRunId": UPSTREAM_PORTAL_RUN_ID,
+            "workflow": {"name": "oncoanalyser-wgts-rna", "version": "2.2.0"},
+            "libraries": [],
+            "currentState": {"orcabusId": "wfs.0002", "status": "SUCCEEDED", "timestamp": "2025-03-31T00:00:00Z"},
+        },
+    )
+    # No fixture for the draft workflow run, it is never fetched again by portal run id
+
+    execution_result = LocalStateMachine(
+        "glueSucceededEventsToDraftUpdate",
+        handler_overrides={
+            "find_latest_workflow": lambda event, context: {"workflowRunList": [draft_workflow_run]},
+            "get_draft_payload": lambda event, context: {"payload": {
+                "version": "2025.08.05",
+                "data": {"tags": {"tumorRnaLibraryId": "L2300003"}, "inputs": {}},
+            }},
+            "get_oncoanalyser_wgts_outputs_from_portal_run_id": lambda event, context: {
+                "tumorRnaInputs": get_tumor_rna_inputs(),
+            },
+            "compare_payload": lambda event, context: {"hasChanged": True},
+        },
+    ).start_execution({
+        "portalRunId": UPSTREAM_PORTAL_RUN_ID,
+        "workflow": {"name": "oncoanalyser-wgts-rna", "version": "2.2.0"},
+        "libraries": [{"libraryId": "L2300003", "orcabusId": "lib.01JTESTLIBRARY0000000000003"}],
+    })
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+    assert execution_result.task_call_count_by_key["lambda:generate_wru_event_object_with_merged_data"] == 1
+    assert len(execution_result.put_event_entry_list) == 1
+    workflow_run_update = execution_result.put_event_entry_list[0]['Detail']
+    assert workflow_run_update['portalRunId'] == DRAFT_PORTAL_RUN_ID
+    assert workflow_run_update['status'] == "DRAFT"
+    assert workflow_run_update['payload']['data']['inputs'] == {"tumorRnaInputs": get_tumor_rna_inputs()}
+
+
+def get_large_section() -> dict:
+    return dict(map(
+        lambda index_iter_: (f"key{index_iter_}", f"s3://bucket/prefix/{index_iter_}/"),
+        range(LARGE_PAYLOAD_KEY_COUNT)
+    ))
+
+
+def get_mean_seconds(func, call_count: int) -> float:
+    started_at = perf_counter()
+    for _ in range(call_count):
+        func()
+    return (perf_counter() - started_at) / call_count
+
+
+@pytest.mark.benchmark
+def test_large_payload_merge_is_not_a_copy(load_handler):
+    merged_data_module = load_handler("generate_wru_event_object_with_merged_data")
+
+    large_section = get_large_section()
+    large_data = {
+        "inputs": {
+            "tumorDnaInputs": large_section,
+            "normalDnaInputs": deepcopy(large_section),
+            "tumorRnaInputs": None,
+        },
+        "tags": dict(map(lambda index_iter_: (f"tag{index_iter_}", index_iter_), range(LARGE_PAYLOAD_KEY_COUNT))),
+        "engineParameters": {},
+    }
+    upstream_data = {"tumorRnaInputs": get_large_section()}
+    event = {
+        "workflowRun": get_draft_workflow_run(),
+        "payload": {"version": "2025.08.05", "data": large_data},
+        "upstreamData": upstream_data,
+    }
+
+    merge_seconds = get_mean_seconds(lambda: merged_data_module.merge_payload_data(large_data, upstream_data), 1000)
+    handler_seconds = get_mean_seconds(lambda: merged_data_module.handler(event, None), 100)
+    # What each merge would cost if the payload were copied
+    copy_seconds = get_mean_seconds(lambda: deepcopy(large_data), 3)
+
+    print(
+        f"\n{LARGE_PAYLOAD_KEY_COUNT} key payload: merge {merge_seconds * 1e6:.1f}us, "
+        f"handler {handler_seconds * 1e6:.1f}us, deepcopy {copy_seconds * 1e6:.1f}us"
+    )
+
+    # The merge only copies the dicts along the changed path, so its cost does not grow with the payload
+    assert merge_seconds * 100 < copy_seconds
+    assert handler_seconds * 100 < copy_seconds
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+get_fastq_id_list_from_rgid_list, the fastq ids of an rgid list or the readsets of each library (bulk mode)
+"""
+
+# Layer imports
+from pipeline_manager_tools.memoize import get_invocation_call_counts
+
+# Globals
+INSTRUMENT_RUN_ID = "241024_A00130_0336_BHW7MVDSXC"
+NORMAL_DNA_RGID = f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"
+TUMOR_DNA_RGID = f"CAAGCTAG+CGCTATGT.2.{INSTRUMENT_RUN_ID}"
+TUMOR_RNA_RGID = f"GGACTTGG+CGTCTGCG.3.{INSTRUMENT_RUN_ID}"
+
+
+def add_fastq_by_rgid_fixtures(api_fixtures, fastq_id_by_rgid_map: dict):
+    for rgid, fastq_id in fastq_id_by_rgid_map.items():
+        api_fixtures.add(
+            "fastq", "get_fastq_by_rgid",
+            arguments={"rgid": rgid},
+            response={"id": fastq_id, "rgid": rgid},
+        )
+
+
+def test_readsets_of_each_library_are_resolved_in_one_invocation(api_fixtures, load_handler):
+    add_fastq_by_rgid_fixtures(api_fixtures, {
+        NORMAL_DNA_RGID: "fqr.1",
+        TUMOR_DNA_RGID: "fqr.2",
+        TUMOR_RNA_RGID: "fqr.3",
+    })
+
+    assert load_handler("get_fastq_id_list_from_rgid_list").handler(
+        {
+            "libraries": [
+                {"libraryId": "L2500001", "fastqRgidList": [NORMAL_DNA_RGID]},
+                {"libraryId": "L2500002", "fastqRgidList": [TUMOR_DNA_RGID, TUMOR_RNA_RGID]},
+                # The same rgid listed against a second library
+                {"libraryId": "L2500003", "fastqRgidList": [TUMOR_RNA_RGID]},
+                {"libraryId": "L2500004"},
+            ],
+        },
+        None
+    ) == {
+        "libraries": [
+            {"libraryId": "L2500001", "readsets": [{"orcabusId": "fqr.1", "rgid": NORMAL_DNA_RGID}]},
+            {
+                "libraryId": "L2500002",
+                "readsets": [
+                    {"orcabusId": "fqr.2", "rgid": TUMOR_DNA_RGID},
+                    {"orcabusId": "fqr.3", "rgid": TUMOR_RNA_RGID},
+                ],
+            },
+            {"libraryId": "L2500003", "readsets": [{"orcabusId": "fqr.3", "rgid": TUMOR_RNA_RGID}]},
+            {"libraryId": "L2500004", "readsets": []},
+        ],
+    }
+    # Each unique rgid is resolved once
+    assert get_invocation_call_counts() == {"get_fastq_by_rgid": (3, 3)}
+
+
+def test_bulk_mode_without_rgids_makes_no_api_calls(load_handler):
+    assert load_handler("get_fastq_id_list_from_rgid_list").handler(
+        {"libraries": [{"libraryId": "L2500001", "fastqRgidList": []}]},
+        None
+    ) == {
+        "libraries": [{"libraryId": "L2500001", "readsets": []}],
+    }
+
+
+def test_fastq_id_list_is_sorted(api_fixtures, load_handler):
+    add_fastq_by_rgid_fixtures(api_fixtures, {
+        NORMAL_DNA_RGID: "fqr.2",
+        TUMOR_DNA_RGID: "fqr.1",
+    })
+
+    assert load_handler("get_fastq_id_list_from_rgid_list").handler(
+        {"fastqRgidList": [NORMAL_DNA_RGID, TUMOR_DNA_RGID]},
+        None
+    ) == {
+        "fastqIdList": ["fqr.1", "fqr.2"],
+    }
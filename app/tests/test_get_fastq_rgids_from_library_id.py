@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+get_fastq_rgids_from_library_id, the rgid tags and readsets of the libraries from their current fastq sets
+"""
+
+# Standard imports
+import pytest
+
+# Layer imports
+from pipeline_manager_tools.memoize import get_invocation_call_counts
+
+# Globals
+INSTRUMENT_RUN_ID = "241024_A00130_0336_BHW7MVDSXC"
+
+
+def get_fastq_obj(fastq_id: str, index: str, lane: int) -> dict:
+    return {
+        "id": fastq_id,
+        "index": index,
+        "lane": lane,
+        "instrumentRunId": INSTRUMENT_RUN_ID,
+    }
+
+
+def add_current_fastq_set_fixtures(api_fixtures, library_id: str, fastq_obj_list: list):
+    fastq_set_id = f"fqs.{library_id}"
+    api_fixtures.add(
+        "fastq", "get_fastq_sets",
+        arguments={"library": library_id, "currentFastqSet": True},
+        response=[{"id": fastq_set_id}],
+    )
+    api_fixtures.add(
+        "fastq", "get_fastq_list_rows_in_fastq_set",
+        arguments={"fastq_set_id": fastq_set_id},
+        response=fastq_obj_list,
+    )
+
+
+def test_additional_tumor_libraries_get_readsets_but_no_tags(api_fixtures, load_handler):
+    get_fastq_rgids_from_library_id = load_handler("get_fastq_rgids_from_library_id")
+
+    add_current_fastq_set_fixtures(api_fixtures, "L2500001", [get_fastq_obj("fqr.1", "AAGTCCAA+TACTCATA", 2)])
+    add_current_fastq_set_fixtures(api_fixtures, "L2500002", [get_fastq_obj("fqr.2", "CAAGCTAG+CGCTATGT", 2)])
+    add_current_fastq_set_fixtures(api_fixtures, "L2500003", [get_fastq_obj("fqr.3", "GGACTTGG+CGTCTGCG", 3)])
+
+    assert get_fastq_rgids_from_library_id.handler(
+        {
+            "normalDnaLibraryId": "L2500001",
+            "tumorDnaLibraryId": None,
+            "tumorRnaLibraryId": None,
+            "additionalTumorDnaLibraryIdList": ["L2500002"],
+            "additionalTumorRnaLibraryIdList": ["L2500003"],
+        },
+        None
+    ) == {
+        "tags": {
+            "normalDnaFastqRgidList": [f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"],
+        },
+        "libraries": [
+            {"libraryId": "L2500001", "readsets": [{"orcabusId": "fqr.1", "rgid": f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"}]},
+            {"libraryId": "L2500002", "readsets": [{"orcabusId": "fqr.2", "rgid": f"CAAGCTAG+CGCTATGT.2.{INSTRUMENT_RUN_ID}"}]},
+            {"libraryId": "L2500003", "readsets": [{"orcabusId": "fqr.3", "rgid": f"GGACTTGG+CGTCTGCG.3.{INSTRUMENT_RUN_ID}"}]},
+        ],
+    }
+
+
+def test_null_library_ids_are_skipped_and_libraries_fetched_once(api_fixtures, load_handler):
+    get_fastq_rgids_from_library_id = load_handler("get_fastq_rgids_from_library_id")
+
+    add_current_fastq_set_fixtures(api_fixtures, "L2500001", [get_fastq_obj("fqr.1", "AAGTCCAA+TACTCATA", 2)])
+    add_current_fastq_set_fixtures(api_fixtures, "L2500002", [
+        get_fastq_obj("fqr.2", "CAAGCTAG+CGCTATGT", 2),
+        get_fastq_obj("fqr.3", "CAAGCTAG+CGCTATGT", 3),
+    ])
+
+    assert get_fastq_rgids_from_library_id.handler(
+        {
+            "normalDnaLibraryId": "L2500001",
+            "tumorDnaLibraryId": "L2500002",
+            "tumorRnaLibraryId": None,
+            # Also listed as the tumor DNA library
+            "additionalTumorDnaLibraryIdList": ["L2500002"],
+            "additionalTumorRnaLibraryIdList": None,
+        },
+        None
+    ) == {
+        "tags": {
+            "normalDnaFastqRgidList": [f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"],
+            "tumorDnaFastqRgidList": [
+                f"CAAGCTAG+CGCTATGT.2.{INSTRUMENT_RUN_ID}",
+                f"CAAGCTAG+CGCTATGT.3.{INSTRUMENT_RUN_ID}",
+            ],
+        },
+        "libraries": [
+            {"libraryId": "L2500001", "readsets": [{"orcabusId": "fqr.1", "rgid": f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"}]},
+            {
+                "libraryId": "L2500002",
+                "readsets": [
+                    {"orcabusId": "fqr.2", "rgid": f"CAAGCTAG+CGCTATGT.2.{INSTRUMENT_RUN_ID}"},
+                    {"orcabusId": "fqr.3", "rgid": f"CAAGCTAG+CGCTATGT.3.{INSTRUMENT_RUN_ID}"},
+                ],
+            },
+        ],
+    }
+    assert get_invocation_call_counts() == {
+        "get_fastq_sets": (2, 2),
+        "get_fastq_list_rows_in_fastq_set": (2, 2),
+    }
+
+
+def test_rgid_shared_across_libraries_is_kept_with_each_library(api_fixtures, load_handler):
+    get_fastq_rgids_from_library_id = load_handler("get_fastq_rgids_from_library_id")
+
+    # The same index on the same lane, in the fastq sets of two libraries
+    add_current_fastq_set_fixtures(api_fixtures, "L2500001", [get_fastq_obj("fqr.1", "AAGTCCAA+TACTCATA", 2)])
+    add_current_fastq_set_fixtures(api_fixtures, "L2500002", [get_fastq_obj("fqr.2", "AAGTCCAA+TACTCATA", 2)])
+
+    output = get_fastq_rgids_from_library_id.handler(
+        {"normalDnaLibraryId": "L2500001", "tumorDnaLibraryId": "L2500002"},
+        None
+    )
+
+    assert output['tags'] == {
+        "normalDnaFastqRgidList": [f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"],
+        "tumorDnaFastqRgidList": [f"AAGTCCAA+TACTCATA.2.{INSTRUMENT_RUN_ID}"],
+    }
+    assert list(map(lambda library_iter_: library_iter_['readsets'][0]['orcabusId'], output['libraries'])) == [
+        "fqr.1", "fqr.2"
+    ]
+
+
+def test_all_null_library_ids_make_no_api_calls(load_handler):
+    assert load_handler("get_fastq_rgids_from_library_id").handler(
+        {
+            "normalDnaLibraryId": None,
+            "tumorDnaLibraryId": None,
+            "tumorRnaLibraryId": None,
+            "additionalTumorDnaLibraryIdList": [],
+            "additionalTumorRnaLibraryIdList": [],
+        },
+        None
+    ) == {
+        "tags": {},
+        "libraries": [],
+    }
+
+
+def test_library_without_one_current_fastq_set_fails(api_fixtures, load_handler):
+    api_fixtures.add(
+        "fastq", "get_fastq_sets",
+        arguments={"library": "L2500001", "currentFastqSet": True},
+        response=[],
+    )
+
+    with pytest.raises(ValueError, match="Expected exactly one current fastq set for library L2500001, found 0"):
+        load_handler("get_fastq_rgids_from_library_id").handler({"normalDnaLibraryId": "L2500001"}, None)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Tumor library pairing and role checks in get_libraries, and the additional tumor group checks of post_schema_validation
+"""
+
+# Standard imports
+from typing import Optional
+
+import pytest
+
+
+def get_library(library_id: str, phenotype: str, library_type: str, external_sample_id: Optional[str]) -> dict:
+    return {
+        "orcabusId": f"lib.{library_id}",
+        "libraryId": library_id,
+        "phenotype": phenotype,
+        "type": library_type,
+        "sample": {"sampleId": f"PRJ{library_id[1:]}", "externalSampleId": external_sample_id},
+        "subject": {"subjectId": "SBJ00001"},
+    }
+
+
+def add_library_fixtures(api_fixtures, library_list):
+    for library in library_list:
+        api_fixtures.add(
+            "metadata", "get_library_from_library_orcabus_id",
+            arguments={"library_orcabus_id": library['orcabusId']},
+            response=library,
+        )
+        api_fixtures.add(
+            "metadata", "get_library_from_library_id",
+            arguments={"library_id": library['libraryId']},
+            response=library,
+        )
+
+
+def get_libraries_event(library_list) -> dict:
+    return {
+        "libraries": list(map(
+            lambda library_iter_: {"orcabusId": library_iter_['orcabusId'], "libraryId": library_iter_['libraryId']},
+            library_list
+        ))
+    }
+
+
+def test_tumor_rna_is_paired_by_sample_not_library_id(api_fixtures, load_handler):
+    library_list = [
+        get_library("L2500101", "normal", "WGS", "EXT-N"),
+        get_library("L2500102", "tumor", "WGS", "EXT-T1"),
+        get_library("L2500103", "tumor", "WGS", "EXT-T2"),
+        get_library("L2500104", "tumor", "WGS", "EXT-T3"),
+        # Sorted by library id, the RNA libraries are in the opposite order to their DNA libraries
+        get_library("L2500105", "tumor", "WTS", "EXT-T3"),
+        get_library("L2500106", "tumor", "WTS", "EXT-T1"),
+    ]
+    add_library_fixtures(api_fixtures, library_list)
+
+    assert load_handler("get_libraries").handler(get_libraries_event(library_list), None) == {
+        "tumorDnaLibraryId": "L2500102",
+        "normalDnaLibraryId": "L2500101",
+        "tumorRnaLibraryId": "L2500106",
+        "additionalTumorDnaLibraryIdList": ["L2500103", "L2500104"],
+        "additionalTumorRnaLibraryIdList": ["L2500105"],
+    }
+
+
+def test_lone_tumor_libraries_are_always_paired(api_fixtures, load_handler):
+    library_list = [
+        get_library("L2500201", "normal", "WGS", "EXT-N"),
+        get_library("L2500202", "tumor", "WGS", "EXT-T1"),
+        get_library("L2500203", "tumor", "WTS", None),
+    ]
+    add_library_fixtures(api_fixtures, library_list)
+
+    assert load_handler("get_libraries").handler(get_libraries_event(library_list), None) == {
+        "tumorDnaLibraryId": "L2500202",
+        "normalDnaLibraryId": "L2500201",
+        "tumorRnaLibraryId": "L2500203",
+    }
+
+
+def test_unpaired_tumor_rna_fails(api_fixtures, load_handler):
+    library_list = [
+        get_library("L2500301", "normal", "WGS", "EXT-N"),
+        get_library("L2500302", "tumor", "WGS", "EXT-T1"),
+        get_library("L2500303", "tumor", "WGS", "EXT-T2"),
+        get_library("L2500304", "tumor", "WTS", "EXT-T1"),
+        get_library("L2500305", "tumor", "WTS", "EXT-T9"),
+    ]
+    add_library_fixtures(api_fixtures, library_list)
+
+    with pytest.raises(ValueError, match="Could not pair the tumor RNA library L2500305"):
+        load_handler("get_libraries").handler(get_libraries_event(library_list), None)
+
+
+def test_every_missing_role_is_reported_together(api_fixtures, load_handler):
+    library_list = [get_library("L2500501", "normal", "WGS", "EXT-N")]
+    add_library_fixtures(api_fixtures, library_list)
+
+    with pytest.raises(ValueError) as error_info:
+        load_handler("get_libraries").handler(get_libraries_event(library_list), None)
+
+    assert str(error_info.value).split("; ") == [
+        "Could not get tumor DNA library with WGS type from the provided libraries",
+        "Could not get tumor RNA library with WTS type from the provided libraries",
+    ]
+
+
+def test_duplicate_normal_is_reported_with_the_missing_roles(api_fixtures, load_handler):
+    library_list = [
+        get_library("L2500601", "normal", "WGS", "EXT-N1"),
+        get_library("L2500602", "normal", "WGS", "EXT-N2"),
+        get_library("L2500603", "tumor", "WGS", "EXT-T1"),
+    ]
+    add_library_fixtures(api_fixtures, library_list)
+
+    with pytest.raises(ValueError) as error_info:
+        load_handler("get_libraries").handler(get_libraries_event(library_list), None)
+
+    assert str(error_info.value).split("; ") == [
+        "Found more than one normal DNA library with WGS type in the provided libraries (L2500601, L2500602)",
+        "Could not get tumor RNA library with WTS type from the provided libraries",
+    ]
+
+
+def test_library_linked_twice_is_not_a_duplicate(api_fixtures, load_handler):
+    library_list = [
+        get_library("L2500701", "normal", "WGS", "EXT-N"),
+        get_library("L2500702", "tumor", "WGS", "EXT-T1"),
+        get_library("L2500703", "tumor", "WTS", "EXT-T1"),
+    ]
+    add_library_fixtures(api_fixtures, library_list)
+
+    assert load_handler("get_libraries").handler(get_libraries_event([*library_list, library_list[0]]), None) == {
+        "tumorDnaLibraryId": "L2500702",
+        "normalDnaLibraryId": "L2500701",
+        "tumorRnaLibraryId": "L2500703",
+    }
+
+
+@pytest.fixture()
+def post_schema_validation(load_handler, monkeypatch):
+    monkeypatch.setenv("TEST_DATA_BUCKET_NAME", "test-data-bucket")
+    monkeypatch.setenv("REF_DATA_BUCKET_NAME", "ref-data-bucket")
+    return load_handler("post_schema_validation")
+
+
+@pytest.mark.parametrize(
+    "additional_tumor_group_list, tags, failure_match",
+    [
+        (
+            [{"groupId": "G1", "tumorDnaSampleId": "L2500402", "tumorRnaSampleId": "L2500403"}],
+            {"additionalTumorDnaLibraryIdList": ["L2500402"], "additionalTumorRnaLibraryIdList": ["L2500403"]},
+            None,
+        ),
+        # Tagged, but no group
+        (
+            [],
+            {"additionalTumorDnaLibraryIdList": ["L2500402"]},
+            "tumorDnaSampleIds",
+        ),
+        # Grouped, but the RNA library is not tagged
+        (
+            [{"groupId": "G1", "tumorDnaSampleId": "L2500402", "tumorRnaSampleId": "L2500403"}],
+            {"additionalTumorDnaLibraryIdList": ["L2500402"]},
+            "tumorRnaSampleIds",
+        ),
+        # Tagged, but grouped with a tumor DNA library from another sample
+        (
+            [{"groupId": "G1", "tumorDnaSampleId": "L2500402", "tumorRnaSampleId": "L2500404"}],
+            {"additionalTumorDnaLibraryIdList": ["L2500402"], "additionalTumorRnaLibraryIdList": ["L2500404"]},
+            "different sample",
+        ),
+    ]
+)
+def test_additional_tumor_groups_must_match_the_tags(
+        api_fixtures, post_schema_validation, additional_tumor_group_list, tags, failure_match
+):
+    add_library_fixtures(api_fixtures, [
+        get_library("L2500402", "tumor", "WGS", "EXT-T2"),
+        get_library("L2500403", "tumor", "WTS", "EXT-T2"),
+        get_library("L2500404", "tumor", "WTS", "EXT-T3"),
+    ])
+
+    is_valid, failures = post_schema_validation.validate_additional_tumor_groups(
+        {"additionalTumorGroups": additional_tumor_group_list},
+        tags=tags,
+    )
+
+    if failure_match is None:
+        assert (is_valid, failures) == (True, [])
+    else:
+        assert not is_valid
+        assert len(failures) == 1 and failure_match in failures[0]
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+Planning the processes of an incremental reprocessing run
+"""
+
+# Standard imports
+import pytest
+
+# Globals
+PROCESS_LIST = ["lilac", "neo", "cuppa", "orange"]
+
+
+@pytest.fixture()
+def incremental_processes(api_fixtures):
+    """
+    Imported once the API stand-in is installed
+    """
+    from pipeline_manager_tools import incremental_processes
+    return incremental_processes
+
+
+@pytest.mark.parametrize(
+    "existing_process_list, refresh_process_list, expected_planned_process_list",
+    [
+        # Everything is up-to-date
+        (PROCESS_LIST, [], []),
+        # Nothing to reuse
+        ([], [], PROCESS_LIST),
+        # orange depends on cuppa
+        (PROCESS_LIST, ["cuppa"], ["cuppa", "orange"]),
+        # neo and orange depend on lilac, and orange needs cuppa rerun (its outputs cannot be wired in)
+        (PROCESS_LIST, ["lilac"], PROCESS_LIST),
+        # A missing output is planned, with its dependents
+        (["lilac", "neo", "orange"], [], ["cuppa", "orange"]),
+        # cuppa outputs cannot be wired in, so cuppa is rerun for orange
+        (["lilac", "neo", "cuppa"], [], ["cuppa", "orange"]),
+        # lilac outputs are wired in, so lilac is not rerun for neo
+        (["lilac", "cuppa", "orange"], [], ["neo"]),
+    ]
+)
+def test_plan_processes(
+        incremental_processes, existing_process_list, refresh_process_list, expected_planned_process_list
+):
+    assert incremental_processes.plan_processes(
+        PROCESS_LIST, existing_process_list, refresh_process_list
+    ) == expected_planned_process_list
+
+
+def get_inputs(portal_run_id: str, refresh_process_list=None) -> dict:
+    return {
+        "groupId": "SBJ00001",
+        "subjectId": "SBJ00001",
+        "processesList": PROCESS_LIST,
+        "reprocessFromPortalRunId": portal_run_id,
+        **({"refreshProcessesList": refresh_process_list} if refresh_process_list is not None else {}),
+    }
+
+
+def add_prior_run_fixtures(api_fixtures, portal_run_id: str, existing_process_list):
+    prior_output_uri = f"s3://bucket/analysis/oncoanalyser-wgts-dna-rna/{portal_run_id}/"
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": portal_run_id},
+        response={"orcabusId": f"wfr.{portal_run_id}", "portalRunId": portal_run_id},
+    )
+    api_fixtures.add(
+        "workflow", "get_latest_payload_from_workflow_run",
+        arguments={"workflow_run_id": f"wfr.{portal_run_id}"},
+        response={
+            "data": {
+                "inputs": get_inputs(portal_run_id),
+                "engineParameters": {"outputUri": prior_output_uri},
+                "outputs": {"dnaRnaOncoanalyserAnalysisRelPath": "SBJ00001/"},
+            }
+        },
+    )
+    for process in PROCESS_LIST:
+        api_fixtures.add(
+            "filemanager", "list_files_recursively",
+            arguments={
+                "bucket": "bucket",
+                "key": f"analysis/oncoanalyser-wgts-dna-rna/{portal_run_id}/SBJ00001/{process}/",
+            },
+            response=[{"key": f"{process}.tsv"}] if process in existing_process_list else [],
+        )
+
+    return prior_output_uri
+
+
+def test_reused_process_outputs_are_wired_in(api_fixtures, incremental_processes):
+    prior_output_uri = add_prior_run_fixtures(api_fixtures, "20250402abcdef12", PROCESS_LIST)
+
+    incremental_processes_plan = incremental_processes.plan_incremental_processes(
+        get_inputs("20250402abcdef12", ["cuppa"])
+    )
+
+    assert incremental_processes_plan['inputs']['processesList'] == ["cuppa", "orange"]
+    assert incremental_processes_plan['inputs']['tumorDnaInputs'] == {
+        "lilacDir": f"{prior_output_uri}SBJ00001/lilac/"
+    }
+    assert incremental_processes_plan['reusedProcessesList'] == ["lilac", "neo"]
+    assert "priorResult" not in incremental_processes_plan
+
+
+def test_nothing_to_run_reuses_the_prior_result(api_fixtures, incremental_processes):
+    prior_output_uri = add_prior_run_fixtures(api_fixtures, "20250403abcdef12", PROCESS_LIST)
+
+    incremental_processes_plan = incremental_processes.plan_incremental_processes(get_inputs("20250403abcdef12"))
+
+    assert incremental_processes_plan['priorResult'] == {
+        "portalRunId": "20250403abcdef12",
+        "outputUri": prior_output_uri,
+        "outputs": {
+            "dnaRnaOncoanalyserAnalysisRelPath": "SBJ00001/",
+            "reusedProcessOutputUriMap": dict(map(
+                lambda process_iter_: (process_iter_, f"{prior_output_uri}SBJ00001/{process_iter_}/"),
+                PROCESS_LIST
+            )),
+        },
+    }
+
+
+def test_nothing_to_run_is_published_as_succeeded(api_fixtures, load_handler):
+    prior_output_uri = add_prior_run_fixtures(api_fixtures, "20250404abcdef12", PROCESS_LIST)
+
+    converted_ready_event_detail = load_handler(
+        "convert_ready_event_inputs_to_icav2_wes_event_inputs"
+    ).convert_ready_event_detail({
+        "portalRunId": "20250405abcdef12",
+        "workflowRunName": "umccr--automated--oncoanalyser-wgts-dna-rna--2-2-0--20250405abcdef12",
+        "workflow": {"name": "oncoanalyser-wgts-dna-rna", "version": "2.2.0"},
+        "libraries": [],
+        "payload": {
+            "version": "2025.08.05",
+            "data": {
+                "inputs": get_inputs("20250404abcdef12"),
+                "engineParameters": {
+                    "outputUri": "s3://bucket/analysis/oncoanalyser-wgts-dna-rna/20250405abcdef12/",
+                },
+            },
+        },
+    })
+
+    workflow_run_update_detail = converted_ready_event_detail['workflowRunUpdateDetail']
+    assert workflow_run_update_detail['status'] == "SUCCEEDED"
+    assert workflow_run_update_detail['payload']['data']['engineParameters']['outputUri'] == prior_output_uri
+    assert workflow_run_update_detail['payload']['data']['engineParameters']['reusedFromPortalRunId'] == (
+        "20250404abcdef12"
+    )
+    assert workflow_run_update_detail['payload']['data']['outputs']['reusedProcessOutputUriMap']['orange'] == (
+        f"{prior_output_uri}SBJ00001/orange/"
+    )
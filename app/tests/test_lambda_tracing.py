@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+lambda_tracing, the spans of the api client and aws sdk calls of an invocation and its EMF record
+
+Tracing is enabled per test (TRACING_ENABLED is read at import), nothing is patched outside the test:
+the import hook traces a stand-in api client, and the aws sdk hooks are registered on a private boto3 session.
+"""
+
+# Standard imports
+import importlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+
+# Layer imports
+import lambda_tracing as lambda_tracing_module
+from pipeline_manager_tools.memoize import InvocationThreadPoolExecutor
+
+# Globals
+STAND_IN_MODULE_NAME = "stand_in_api_client"
+STAND_IN_DEPENDENCY = "stand-in"
+STAND_IN_MODULE_SOURCE = '''
+from json import dumps
+
+
+def get_thing(thing_id):
+    return {"thingId": thing_id}
+
+
+def get_things(thing_id_list):
+    return list(map(get_thing, thing_id_list))
+
+
+def get_broken_thing(thing_id):
+    raise ValueError(f"Could not get {thing_id}")
+
+
+def _get_private_thing(thing_id):
+    return {"thingId": thing_id}
+'''
+
+
+class RawResponse:
+    """
+    The raw body of a response returned from a before-send handler, in place of the http call
+    """
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def get_context(function_name: str) -> SimpleNamespace:
+    return SimpleNamespace(function_name=function_name, aws_request_id=f"request-{function_name}")
+
+
+def get_emf_record_list(capsys) -> list:
+    return list(map(json.loads, capsys.readouterr().out.splitlines()))
+
+
+def get_operation_list(emf_record: dict) -> list:
+    return sorted(map(lambda span_iter_: span_iter_['operation'], emf_record['Spans']))
+
+
+@pytest.fixture()
+def lambda_tracing(monkeypatch):
+    monkeypatch.setattr(lambda_tracing_module, "TRACING_ENABLED", True)
+    return lambda_tracing_module
+
+
+@pytest.fixture()
+def stand_in_api_client(lambda_tracing, tmp_path, monkeypatch):
+    """
+    An api client module imported through the tracing import hook
+    """
+    (tmp_path / f"{STAND_IN_MODULE_NAME}.py").write_text(STAND_IN_MODULE_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setitem(lambda_tracing.TRACED_MODULE_DEPENDENCY_MAP, STAND_IN_MODULE_NAME, STAND_IN_DEPENDENCY)
+    monkeypatch.setattr(sys, "meta_path", [lambda_tracing._TracingFinder(), *sys.meta_path])
+
+    yield importlib.import_module(STAND_IN_MODULE_NAME)
+
+    sys.modules.pop(STAND_IN_MODULE_NAME, None)
+
+
+@pytest.fixture()
+def boto3_session(lambda_tracing):
+    """
+    A boto3 session with the tracing hooks, answering each call with the next (status code, body) response
+    """
+    response_list = []
+    boto3_session = boto3.session.Session()
+    boto3_session.events.register("before-call", lambda_tracing._before_boto3_call)
+    boto3_session.events.register("after-call", lambda_tracing._after_boto3_call)
+    boto3_session.events.register("after-call-error", lambda_tracing._after_boto3_call)
+    boto3_session.events.register(
+        "before-send",
+        lambda request, **kwargs: AWSResponse(
+            request.url, response_list[0][0], {}, RawResponse(response_list.pop(0)[1])
+        )
+    )
+    boto3_session.response_list = response_list
+    return boto3_session
+
+
+def test_disabled_tracing_returns_the_handler_unchanged(capsys, monkeypatch):
+    monkeypatch.setattr(lambda_tracing_module, "TRACING_ENABLED", False)
+
+    def handler(event, context):
+        with lambda_tracing_module.trace_span("workflow", "get_workflow_run") as span:
+            span.set_payload({"portalRunId": "20250101abcdef12"})
+        return {}
+
+    assert lambda_tracing_module.trace_invocation(handler) is handler
+    assert lambda_tracing_module.traced("workflow")(handler) is handler
+
+    assert handler({}, None) == {}
+    assert capsys.readouterr().out == ""
+
+
+def test_imported_api_client_functions_are_traced(stand_in_api_client, lambda_tracing, capsys):
+    # Only the public functions defined in the package
+    assert getattr(stand_in_api_client.get_thing, lambda_tracing.TRACED_ATTR, False)
+    assert not getattr(stand_in_api_client.dumps, lambda_tracing.TRACED_ATTR, False)
+    assert not getattr(stand_in_api_client._get_private_thing, lambda_tracing.TRACED_ATTR, False)
+
+    @lambda_tracing.trace_invocation
+    def handler(event, context):
+        return {
+            "thingList": stand_in_api_client.get_things(["a", "b"]),
+            "thing": stand_in_api_client.get_thing("c"),
+        }
+
+    handler({}, get_context("get_things"))
+
+    emf_record = get_emf_record_list(capsys)[0]
+    # The get_thing calls made within get_things are part of its span
+    assert get_operation_list(emf_record) == ["get_thing", "get_things"]
+    assert emf_record[f"{STAND_IN_DEPENDENCY}.CallCount"] == 2
+    assert emf_record[f"{STAND_IN_DEPENDENCY}.PayloadBytes"] == (
+        len(json.dumps([{"thingId": "a"}, {"thingId": "b"}])) + len(json.dumps({"thingId": "c"}))
+    )
+
+
+def test_failed_calls_are_error_spans(stand_in_api_client, lambda_tracing, capsys):
+    @lambda_tracing.trace_invocation
+    def handler(event, context):
+        return stand_in_api_client.get_broken_thing("a")
+
+    with pytest.raises(ValueError, match="Could not get a"):
+        handler({}, get_context("get_broken_thing"))
+
+    emf_record = get_emf_record_list(capsys)[0]
+    assert emf_record['Outcome'] == lambda_tracing.ERROR_OUTCOME
+    assert emf_record[f"{STAND_IN_DEPENDENCY}.ErrorCount"] == 1
+    assert emf_record['Spans'][0]['outcome'] == lambda_tracing.ERROR_OUTCOME
+
+
+def test_aws_sdk_calls_are_spans(boto3_session, lambda_tracing, capsys):
+    dynamodb_client = boto3_session.client("dynamodb")
+    get_item_body = b'{"Item": {"portal_run_id": {"S": "20250101abcdef12"}}}'
+    boto3_session.response_list.extend([
+        (200, get_item_body),
+        (400, b'{"__type": "com.amazonaws.dynamodb.v20120810#ResourceNotFoundException", "message": "No table"}'),
+        (200, get_item_body),
+    ])
+
+    @lambda_tracing.trace_invocation
+    def handler(event, context):
+        dynamodb_client.get_item(TableName="wes-state-cache", Key={"portal_run_id": {"S": "20250101abcdef12"}})
+        with pytest.raises(dynamodb_client.exceptions.ResourceNotFoundException):
+            dynamodb_client.get_item(TableName="missing", Key={"portal_run_id": {"S": "20250101abcdef12"}})
+        # An aws sdk call made by an api client is part of the api client span
+        with lambda_tracing.trace_span("workflow", "get_workflow_run"):
+            dynamodb_client.get_item(TableName="wes-state-cache", Key={"portal_run_id": {"S": "20250101abcdef12"}})
+        return {}
+
+    handler({}, get_context("get_item"))
+
+    emf_record = get_emf_record_list(capsys)[0]
+    assert sorted(map(
+        lambda span_iter_: (span_iter_['dependency'], span_iter_['operation'], span_iter_['outcome']),
+        emf_record['Spans']
+    )) == [
+        ("dynamodb", "GetItem", lambda_tracing.ERROR_OUTCOME),
+        ("dynamodb", "GetItem", lambda_tracing.OK_OUTCOME),
+        ("workflow", "get_workflow_run", lambda_tracing.OK_OUTCOME),
+    ]
+    assert (emf_record['dynamodb.CallCount'], emf_record['dynamodb.ErrorCount']) == (2, 1)
+    # The request and response sizes
+    assert emf_record['dynamodb.PayloadBytes'] > 2 * len(get_item_body)
+
+
+def test_emf_record_shape(lambda_tracing, capsys, monkeypatch):
+    monkeypatch.setenv("TRACING_METRICS_NAMESPACE", "Test/Tracing")
+    monkeypatch.setattr(lambda_tracing, "MAX_SPANS_PER_RECORD", 2)
+
+    @lambda_tracing.trace_invocation
+    def handler(event, context):
+        for file_list_iter_ in [["a"], ["b", "c"], []]:
+            with lambda_tracing.trace_span("filemanager", "list_files") as span:
+                span.set_payload(file_list_iter_)
+        return {}
+
+    handler({}, get_context("list_files"))
+
+    emf_record = get_emf_record_list(capsys)[0]
+    assert emf_record['_aws']['CloudWatchMetrics'] == [
+        {
+            "Namespace": "Test/Tracing",
+            "Dimensions": [["FunctionName"]],
+            "Metrics": [
+                {"Name": "InvocationDurationMs", "Unit": "Milliseconds"},
+                {"Name": "filemanager.CallCount", "Unit": "Count"},
+                {"Name": "filemanager.ErrorCount", "Unit": "Count"},
+                {"Name": "filemanager.DurationMs", "Unit": "Milliseconds"},
+                {"Name": "filemanager.PayloadBytes", "Unit": "Bytes"},
+            ],
+        }
+    ]
+    # Every metric is a value of the record
+    assert all(map(
+        lambda metric_iter_: isinstance(emf_record[metric_iter_['Name']], (int, float)),
+        emf_record['_aws']['CloudWatchMetrics'][0]['Metrics']
+    ))
+    assert (emf_record['FunctionName'], emf_record['RequestId'], emf_record['Outcome']) == (
+        "list_files", "request-list_files", lambda_tracing.OK_OUTCOME
+    )
+    assert (emf_record['filemanager.CallCount'], emf_record['filemanager.PayloadBytes']) == (
+        3, len(json.dumps(["a"])) + len(json.dumps(["b", "c"])) + len(json.dumps([]))
+    )
+    # The slowest spans, up to MAX_SPANS_PER_RECORD
+    assert len(emf_record['Spans']) == 2 and emf_record['DroppedSpanCount'] == 1
+    assert emf_record['Spans'][0]['durationMs'] >= emf_record['Spans'][1]['durationMs']
+
+
+def test_concurrent_invocations_keep_their_own_spans(lambda_tracing, capsys):
+    # Both invocations are open at once
+    invocation_barrier = Barrier(2)
+
+    @lambda_tracing.trace_invocation
+    def handler(event, context):
+        with lambda_tracing.trace_span("workflow", event['operation']):
+            invocation_barrier.wait(timeout=10)
+        # Spans of the handler's worker threads belong to its invocation
+        with InvocationThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(
+                lambda index_iter_: lambda_tracing.add_span(
+                    "metadata", f"{event['operation']}-worker", 1.0, 0, lambda_tracing.OK_OUTCOME
+                ),
+                range(2)
+            ))
+        return {}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(
+            lambda operation_iter_: handler({"operation": operation_iter_}, get_context(operation_iter_)),
+            ["first", "second"]
+        ))
+
+    emf_record_by_function_name = dict(map(
+        lambda emf_record_iter_: (emf_record_iter_['FunctionName'], emf_record_iter_),
+        get_emf_record_list(capsys)
+    ))
+    for operation in ["first", "second"]:
+        assert get_operation_list(emf_record_by_function_name[operation]) == [
+            operation, f"{operation}-worker", f"{operation}-worker"
+        ]
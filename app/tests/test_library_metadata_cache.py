@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+"""
+The library metadata cache shared by get_libraries and get_metadata_tags,
+and invalidated by invalidate_library_metadata_cache
+"""
+
+# Standard imports
+import json
+from time import time
+
+import boto3
+import pytest
+from botocore.stub import Stubber, ANY
+
+# Layer imports
+from pipeline_manager_tools import aws_clients, library_metadata_cache
+
+# Globals
+TABLE_NAME = "libraryMetadataCache"
+
+
+def get_library(library_id: str) -> dict:
+    return {
+        "orcabusId": f"lib.{library_id}",
+        "libraryId": library_id,
+        "phenotype": "tumor",
+        "type": "WGS",
+        "subject": {"subjectId": "SBJ00001"},
+    }
+
+
+@pytest.fixture()
+def dynamodb_stubber(monkeypatch):
+    """
+    The library metadata cache table, stubbed
+    """
+    monkeypatch.setenv("LIBRARY_METADATA_CACHE_TABLE_NAME", TABLE_NAME)
+    dynamodb_client = boto3.client("dynamodb")
+    monkeypatch.setattr(aws_clients, "_DYNAMODB_CLIENT", dynamodb_client)
+    with Stubber(dynamodb_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_libraries_are_shared_between_the_handlers(api_fixtures, load_handler):
+    library = get_library("L2400001")
+    api_fixtures.add(
+        "metadata", "get_library_from_library_orcabus_id",
+        arguments={"library_orcabus_id": library['orcabusId']},
+        response=library,
+    )
+
+    get_libraries = load_handler("get_libraries")
+    assert get_libraries.get_library_obj_list([{"orcabusId": library['orcabusId']}]) == [library]
+
+    # Served from the warm container cache, by its library id alias
+    assert load_handler("get_metadata_tags").handler({"libraryId": "L2400001"}, None) == {"libraryObj": library}
+
+
+def test_library_is_read_through_the_table(api_fixtures, dynamodb_stubber):
+    library = get_library("L2400002")
+    api_fixtures.add(
+        "metadata", "get_library_from_library_id",
+        arguments={"library_id": library['libraryId']},
+        response=library,
+    )
+
+    # Expired alias, so the metadata manager is asked and both items are written
+    dynamodb_stubber.add_response(
+        "get_item",
+        {"Item": {"library_orcabus_id": {"S": library['orcabusId']}, "ttl": {"N": str(int(time()) - 1)}}},
+        {"TableName": TABLE_NAME, "Key": {"library_key": {"S": library['libraryId']}}},
+    )
+    dynamodb_stubber.add_response("put_item", {})
+    dynamodb_stubber.add_response("put_item", {})
+
+    assert library_metadata_cache.get_cached_library(library_id=library['libraryId']) == library
+
+
+def test_record_fetched_before_an_invalidation_is_not_written_back(api_fixtures, dynamodb_stubber):
+    library = get_library("L2400004")
+    api_fixtures.add(
+        "metadata", "get_library_from_library_orcabus_id",
+        arguments={"library_orcabus_id": library['orcabusId']},
+        response=library,
+    )
+
+    # An invalidation marker, no library record
+    dynamodb_stubber.add_response(
+        "get_item",
+        {
+            "Item": {
+                "library_key": {"S": library['orcabusId']},
+                "invalidated_at": {"N": str(time())},
+                "ttl": {"N": str(int(time()) + 60)},
+            }
+        },
+        {"TableName": TABLE_NAME, "Key": {"library_key": {"S": library['orcabusId']}}},
+    )
+    # The library was updated again while the record was being fetched
+    for library_key in [library['orcabusId'], library['libraryId']]:
+        dynamodb_stubber.add_client_error(
+            "put_item",
+            service_error_code="ConditionalCheckFailedException",
+            expected_params={
+                "TableName": TABLE_NAME,
+                "Item": ANY,
+                "ConditionExpression": (
+                    "attribute_not_exists(library_key) OR "
+                    "invalidated_at < :fetched_at OR "
+                    "fetched_at <= :fetched_at"
+                ),
+                "ExpressionAttributeValues": {":fetched_at": ANY},
+            },
+        )
+
+    # The fetched record is still returned, it is only not cached in the table
+    assert library_metadata_cache.get_cached_library(library_orcabus_id=library['orcabusId']) == library
+
+
+def test_invalidation_removes_the_record_and_its_alias(load_handler, dynamodb_stubber):
+    library = get_library("L2400003")
+    library_metadata_cache.put_library_in_memory_cache(library)
+
+    dynamodb_stubber.add_response(
+        "get_item",
+        {"Item": {"library_id": {"S": library['libraryId']}, "library": {"S": json.dumps(library)}}},
+        {"TableName": TABLE_NAME, "Key": {"library_key": {"S": library['orcabusId']}}},
+    )
+    for library_key in [library['orcabusId'], library['libraryId']]:
+        dynamodb_stubber.add_response(
+            "put_item", {},
+            {
+                "TableName": TABLE_NAME,
+                "Item": {
+                    "library_key": {"S": library_key},
+                    "library_id": {"S": library['libraryId']},
+                    "invalidated_at": {"N": ANY},
+                    "ttl": {"N": ANY},
+                },
+            },
+        )
+
+    output = load_handler("invalidate_library_metadata_cache").handler(
+        {"action": "UPDATE", "model": "LIBRARY", "refId": library['orcabusId'], "data": {}}, None
+    )
+
+    assert output == {"libraryKeyList": [library['orcabusId'], library['libraryId']]}
+    assert library_metadata_cache.get_library_from_memory_cache(library_id=library['libraryId']) is None
@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+
+"""
+The local state machine executor, driving the handlers through the state machine templates with replayed API calls
+"""
+
+# Standard imports
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Barrier
+
+import pytest
+
+# Layer imports
+from pipeline_manager_tools.comment_outbox import get_records_from_sqlite_outbox
+
+# Local imports
+from local_sfn.executor import LocalStateMachine, get_template_path
+from local_sfn.latency_models import parse_latency_model, KeyedLatencyModel, ConstantLatencyModel
+from local_sfn.load_driver import get_percentile, run_load
+
+# Globals
+PORTAL_RUN_ID = "20250101abcdef12"
+WORKFLOW_RUN_ORCABUS_ID = "wfr.01JTESTWORKFLOWRUN000000000"
+PAYLOAD_ORCABUS_ID = "pld.01JTESTPAYLOAD00000000000000"
+EXECUTION_ARN = "arn:aws:states:ap-southeast-2:123456789012:execution:icav2WesEventToWrscEvent:abc"
+
+
+def get_workflow_run() -> dict:
+    return {
+        "orcabusId": WORKFLOW_RUN_ORCABUS_ID,
+        "portalRunId": PORTAL_RUN_ID,
+        "workflowRunName": f"umccr--automated--oncoanalyser-wgts-dna-rna--2-2-0--{PORTAL_RUN_ID}",
+        "workflow": {
+            "orcabusId": "wfl.01JTESTWORKFLOW0000000000000",
+            "name": "oncoanalyser-wgts-dna-rna",
+            "version": "2.2.0",
+        },
+        "libraries": [
+            {"libraryId": "L2300001", "orcabusId": "lib.01JTESTLIBRARY0000000000001"},
+            {"libraryId": "L2300002", "orcabusId": "lib.01JTESTLIBRARY0000000000002"},
+        ],
+        "currentState": {
+            "orcabusId": "wfs.01JTESTSTATE00000000000000",
+            "status": "READY",
+            "timestamp": "2025-01-01T00:00:00Z",
+            "payload": PAYLOAD_ORCABUS_ID,
+        },
+    }
+
+
+def get_payload() -> dict:
+    return {
+        "orcabusId": PAYLOAD_ORCABUS_ID,
+        "version": "2025.08.05",
+        "data": {
+            "inputs": {
+                "groupId": "SBJ00001",
+                "subjectId": "SBJ00001",
+            },
+            "engineParameters": {
+                "outputUri": f"s3://bucket/analysis/oncoanalyser-wgts-dna-rna/{PORTAL_RUN_ID}/",
+            },
+            "tags": {},
+        },
+    }
+
+
+def add_workflow_run_fixtures(api_fixtures):
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": PORTAL_RUN_ID},
+        response=get_workflow_run(),
+    )
+    api_fixtures.add(
+        "workflow", "get_payload",
+        arguments={"payload_id": PAYLOAD_ORCABUS_ID},
+        response=get_payload(),
+    )
+
+
+def test_validate_state_machine_with_handler_overrides():
+    local_state_machine = LocalStateMachine(
+        "validateDraftDataAndPutReadyEvent",
+        handler_overrides={
+            "validate_draft_data_complete_schema": lambda event, context: {"isValid": True},
+            "post_schema_validation": lambda event, context: {"isValid": True},
+        },
+    )
+
+    execution_result = local_state_machine.start_execution({
+        "portalRunId": PORTAL_RUN_ID,
+        "status": "DRAFT",
+        "payload": {"version": "2025.08.05", "data": {}},
+    })
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+    assert execution_result.task_call_count_by_key["lambda:validate_draft_data_complete_schema"] == 1
+    assert execution_result.task_call_count_by_key["lambda:post_schema_validation"] == 1
+    assert len(execution_result.put_event_entry_list) == 1
+
+
+def test_retry_then_catch(tmp_path):
+    template_path = tmp_path / "retry_then_catch.asl.json"
+    template_path.write_text(json.dumps({
+        "QueryLanguage": "JSONata",
+        "StartAt": "Flaky",
+        "States": {
+            "Flaky": {
+                "Type": "Task",
+                "Resource": "arn:aws:states:::lambda:invoke",
+                "Arguments": {"FunctionName": "${__flaky_lambda_function_arn__}", "Payload": {}},
+                "Retry": [{"ErrorEquals": ["ValueError"], "MaxAttempts": 2}],
+                "Catch": [{"ErrorEquals": ["States.ALL"], "Next": "Caught", "Output": "{% $states.errorOutput %}"}],
+                "End": True,
+            },
+            "Caught": {"Type": "Pass", "End": True},
+        },
+    }))
+
+    call_count = []
+
+    def flaky_handler(event, context):
+        call_count.append(1)
+        raise ValueError("Always fails")
+
+    execution_result = LocalStateMachine(
+        str(template_path), handler_overrides={"flaky": flaky_handler}
+    ).start_execution({})
+
+    assert execution_result.status == "SUCCEEDED"
+    # The first attempt and two retries
+    assert len(call_count) == 3
+    assert execution_result.output['Error'] == "ValueError"
+
+
+@pytest.mark.parametrize(
+    "entries_expression",
+    [
+        # A JSONata $map of one item is the item itself, not a list
+        "{% $map([1], function($v) { {'Detail': {'index': $v}} }) %}",
+        "{% [$map([1,2,3,4,5,6,7,8,9,10,11], function($v) { {'Detail': {'index': $v}} })] %}",
+        "{% ['not an entry'] %}",
+    ]
+)
+def test_invalid_put_events_entries_fail(tmp_path, entries_expression):
+    template_path = tmp_path / "put_events.asl.json"
+    template_path.write_text(json.dumps({
+        "QueryLanguage": "JSONata",
+        "StartAt": "Push",
+        "States": {
+            "Push": {
+                "Type": "Task",
+                "Resource": "arn:aws:states:::events:putEvents",
+                "Arguments": {"Entries": entries_expression},
+                "End": True,
+            },
+        },
+    }))
+
+    execution_result = LocalStateMachine(str(template_path)).start_execution({})
+
+    assert execution_result.status == "FAILED"
+    assert execution_result.error == "States.Runtime"
+    assert execution_result.put_event_entry_list == []
+
+
+def get_library_readsets_template_path(tmp_path: Path) -> Path:
+    """
+    The library readsets states of the populate draft data template, between a Pass state that assigns
+    the tags, libraries and library readsets list (from the input), and a Pass state that outputs the libraries
+    """
+    states_definition = json.loads(get_template_path("populateDraftData").read_text())['States']
+
+    library_readsets_states = dict(map(
+        lambda state_name_iter_: (
+            state_name_iter_,
+            {
+                **states_definition[state_name_iter_],
+                **(
+                    {"Next": "Libraries"}
+                    if states_definition[state_name_iter_].get("Next", None) == "Need upstream workflows"
+                    else {}
+                ),
+            }
+        ),
+        ["Has unresolved library readsets", "Set libraries with readsets", "Get libraries with readsets"]
+    ))
+
+    template_path = tmp_path / "library_readsets.asl.json"
+    template_path.write_text(json.dumps({
+        "QueryLanguage": "JSONata",
+        "StartAt": "Set draft",
+        "States": {
+            "Set draft": {
+                "Type": "Pass",
+                "Next": "Has unresolved library readsets",
+                "Assign": {
+                    "tags": "{% $states.input.tags %}",
+                    "libraries": "{% $states.input.libraries %}",
+                    "libraryReadsetsList": "{% $states.input.libraryReadsetsList %}",
+                },
+            },
+            **library_readsets_states,
+            "Libraries": {"Type": "Pass", "End": True, "Output": "{% $libraries %}"},
+        },
+    }))
+
+    return template_path
+
+
+def get_readsets(library_id: str) -> list:
+    return [{"orcabusId": f"fqr.{library_id}", "rgid": f"AAGTCCAA+TACTCATA.2.{library_id}"}]
+
+
+@pytest.mark.parametrize("is_tumor_dna_resolved", [True, False])
+def test_additional_tumor_libraries_are_kept_with_their_readsets(tmp_path, is_tumor_dna_resolved):
+    # A joint analysis group, the additional tumor libraries have no rgid tags
+    tags = {
+        "normalDnaLibraryId": "L2500001",
+        "normalDnaFastqRgidList": ["AAGTCCAA+TACTCATA.2.L2500001"],
+        "tumorDnaLibraryId": "L2500002",
+        "tumorDnaFastqRgidList": ["AAGTCCAA+TACTCATA.2.L2500002"],
+        "additionalTumorDnaLibraryIdList": ["L2500003"],
+    }
+    library_id_list = ["L2500001", "L2500002", "L2500003", "L2500004"]
+    resolved_library_id_list = ["L2500001", "L2500003"] + (["L2500002"] if is_tumor_dna_resolved else [])
+
+    bulk_event_list = []
+
+    def get_fastq_id_list_from_rgid_list(event, context):
+        bulk_event_list.append(event)
+        return {
+            "libraries": list(map(
+                lambda library_iter_: {"libraryId": library_iter_['libraryId'], "readsets": get_readsets(library_iter_['libraryId'])},
+                event['libraries']
+            ))
+        }
+
+    execution_result = LocalStateMachine(
+        str(get_library_readsets_template_path(tmp_path)),
+        handler_overrides={"get_fastq_id_list_from_rgid_list": get_fastq_id_list_from_rgid_list},
+    ).start_execution({
+        "tags": tags,
+        "libraries": list(map(
+            lambda library_id_iter_: {"libraryId": library_id_iter_, "orcabusId": f"lib.{library_id_iter_}"},
+            library_id_list
+        )),
+        "libraryReadsetsList": list(map(
+            lambda library_id_iter_: {"libraryId": library_id_iter_, "readsets": get_readsets(library_id_iter_)},
+            resolved_library_id_list
+        )),
+    })
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+
+    # Only the unresolved tumor dna library is resolved from its rgids
+    assert bulk_event_list == (
+        [] if is_tumor_dna_resolved
+        else [{"libraries": [{"libraryId": "L2500002", "fastqRgidList": ["AAGTCCAA+TACTCATA.2.L2500002"]}]}]
+    )
+
+    # Every draft library is kept, in order, libraries without readsets are kept as they are
+    assert execution_result.output == [
+        {"libraryId": "L2500001", "orcabusId": "lib.L2500001", "readsets": get_readsets("L2500001")},
+        {"libraryId": "L2500002", "orcabusId": "lib.L2500002", "readsets": get_readsets("L2500002")},
+        {"libraryId": "L2500003", "orcabusId": "lib.L2500003", "readsets": get_readsets("L2500003")},
+        {"libraryId": "L2500004", "orcabusId": "lib.L2500004"},
+    ]
+
+
+def test_icav2_succeeded_event_is_published_with_outputs(api_fixtures):
+    add_workflow_run_fixtures(api_fixtures)
+
+    execution_result = LocalStateMachine("icav2WesEventToWrscEvent").start_execution({
+        "status": "SUCCEEDED",
+        "icav2AnalysisId": "analysis-1",
+        "tags": {"portalRunId": PORTAL_RUN_ID},
+    })
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+    assert len(execution_result.put_event_entry_list) == 1
+    wrsc_event = execution_result.put_event_entry_list[0]['Detail']
+    assert wrsc_event['status'] == "SUCCEEDED"
+    assert wrsc_event['payload']['data']['outputs'] == {"dnaRnaOncoanalyserAnalysisRelPath": "SBJ00001/"}
+    assert wrsc_event['payload']['data']['engineParameters']['analysisId'] == "analysis-1"
+
+
+def test_icav2_succeeded_result_is_indexed_once_published(api_fixtures):
+    add_workflow_run_fixtures(api_fixtures)
+
+    execution_result = LocalStateMachine("icav2WesEventToWrscEvent").start_execution({
+        "status": "SUCCEEDED",
+        "icav2AnalysisId": "analysis-1",
+        "tags": {"portalRunId": PORTAL_RUN_ID, "inputFingerprint": "fingerprint"},
+    })
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+    assert len(execution_result.put_event_entry_list) == 1
+    # Translated, then handed back to index the result and commit the ledger once the event is published
+    assert execution_result.task_call_count_by_key["lambda:convert_icav2_wes_event_to_wrsc_event"] == 2
+
+
+@pytest.fixture()
+def ledger_sqlite_path(tmp_path, monkeypatch):
+    ledger_sqlite_path = tmp_path / "wes-status-ledger.sqlite"
+    monkeypatch.setenv("WES_STATUS_LEDGER_SQLITE_PATH", str(ledger_sqlite_path))
+    return ledger_sqlite_path
+
+
+def get_icav2_wes_event(status: str) -> dict:
+    return {
+        "status": status,
+        "icav2AnalysisId": "analysis-1",
+        "tags": {"portalRunId": PORTAL_RUN_ID},
+    }
+
+
+def test_unpublished_state_change_is_translated_again(api_fixtures, load_handler, ledger_sqlite_path):
+    add_workflow_run_fixtures(api_fixtures)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+
+    # The first attempt fails before the event is published, the ledger is not advanced
+    first_output = convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("SUCCEEDED"), "executionArn": EXECUTION_ARN}, None
+    )
+    assert "workflowRunStateChangeEvent" in first_output
+    assert convert_module.get_ledger_status_rank(PORTAL_RUN_ID) is None
+
+    # So the retry (or redrive) of the execution is not dropped as a duplicate
+    retry_output = convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("SUCCEEDED"), "executionArn": EXECUTION_ARN}, None
+    )
+    assert "workflowRunStateChangeEvent" in retry_output
+
+    # The ledger is advanced once the event has been published
+    assert convert_module.handler(
+        {
+            "publishedEvent": {
+                "portalRunId": PORTAL_RUN_ID,
+                "status": "SUCCEEDED",
+                "inputFingerprint": None,
+                "outputUri": get_payload()['data']['engineParameters']['outputUri'],
+                "outputs": retry_output['workflowRunStateChangeEvent']['payload']['data']['outputs'],
+            }
+        },
+        None
+    ) == {"isLedgerAdvanced": True}
+    assert convert_module.get_ledger_status_rank(PORTAL_RUN_ID) == convert_module.TERMINAL_STATUS_RANK
+
+    # Later redeliveries (and late non-terminal state changes) are dropped
+    assert convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("SUCCEEDED")}, None
+    ) == {"isDropped": True}
+    assert convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("RUNNING")}, None
+    ) == {"isDropped": True}
+
+
+def test_duplicate_published_state_change_does_not_move_the_ledger(load_handler, ledger_sqlite_path):
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+
+    assert convert_module.advance_ledger_status(PORTAL_RUN_ID, "RUNNING")
+    assert convert_module.advance_ledger_status(PORTAL_RUN_ID, "FAILED")
+    assert not convert_module.advance_ledger_status(PORTAL_RUN_ID, "FAILED")
+    assert not convert_module.advance_ledger_status(PORTAL_RUN_ID, "RUNNING")
+    assert convert_module.get_ledger_status_rank(PORTAL_RUN_ID) == convert_module.TERMINAL_STATUS_RANK
+
+
+def get_failed_icav2_wes_event() -> dict:
+    return {
+        **get_icav2_wes_event("FAILED"),
+        "errorType": "RuntimeError",
+        "errorMessageUri": "s3://bucket/logs/analysis-1/error.txt",
+    }
+
+
+def test_concurrent_duplicate_terminal_state_changes_comment_and_emit_once(
+        api_fixtures, load_handler, ledger_sqlite_path, tmp_path, monkeypatch
+):
+    add_workflow_run_fixtures(api_fixtures)
+    outbox_sqlite_path = str(tmp_path / "comment-outbox.sqlite")
+    monkeypatch.setenv("COMMENT_OUTBOX_SQLITE_PATH", outbox_sqlite_path)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+
+    # Both executions pass the ledger check before either has published
+    ledger_check_barrier = Barrier(2)
+    is_stale_or_duplicate_status = convert_module.is_stale_or_duplicate_status
+
+    def is_stale_or_duplicate_status_at_once(portal_run_id, status):
+        is_stale_or_duplicate = is_stale_or_duplicate_status(portal_run_id, status)
+        ledger_check_barrier.wait(timeout=10)
+        return is_stale_or_duplicate
+
+    monkeypatch.setattr(convert_module, "is_stale_or_duplicate_status", is_stale_or_duplicate_status_at_once)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        output_list = list(executor.map(
+            lambda execution_arn_iter_: convert_module.handler(
+                {"icav2WesStateChangeEvent": get_failed_icav2_wes_event(), "executionArn": execution_arn_iter_},
+                None
+            ),
+            [f"{EXECUTION_ARN}-1", f"{EXECUTION_ARN}-2"]
+        ))
+
+    assert sorted(map(lambda output_iter_: "workflowRunStateChangeEvent" in output_iter_, output_list)) == [
+        False, True
+    ]
+    assert {"isDropped": True} in output_list
+    # The failure comments of one execution only
+    assert len(get_records_from_sqlite_outbox(outbox_sqlite_path)) == 2
+
+
+def test_timed_out_terminal_claim_is_taken_over(api_fixtures, load_handler, ledger_sqlite_path, monkeypatch):
+    add_workflow_run_fixtures(api_fixtures)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+
+    assert convert_module.claim_terminal_wes_state(PORTAL_RUN_ID, "FAILED", f"{EXECUTION_ARN}-1")
+    assert not convert_module.claim_terminal_wes_state(PORTAL_RUN_ID, "FAILED", f"{EXECUTION_ARN}-2")
+    # The claiming execution may retry
+    assert convert_module.claim_terminal_wes_state(PORTAL_RUN_ID, "FAILED", f"{EXECUTION_ARN}-1")
+
+    # The claiming execution never published the state change
+    monkeypatch.setattr(convert_module, "TERMINAL_CLAIM_TIMEOUT_SECONDS", -1)
+    assert "workflowRunStateChangeEvent" in convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("FAILED"), "executionArn": f"{EXECUTION_ARN}-2"}, None
+    )
+
+
+def test_redelivered_state_change_is_published_once(api_fixtures, ledger_sqlite_path):
+    add_workflow_run_fixtures(api_fixtures)
+
+    execution_result_list = list(map(
+        lambda _: LocalStateMachine("icav2WesEventToWrscEvent").start_execution(get_icav2_wes_event("SUCCEEDED")),
+        range(2)
+    ))
+
+    assert list(map(lambda execution_result_iter_: execution_result_iter_.status, execution_result_list)) == [
+        "SUCCEEDED", "SUCCEEDED"
+    ]
+    assert len(execution_result_list[0].put_event_entry_list) == 1
+    # Translated, then handed back to commit the ledger once the event is published
+    assert execution_result_list[0].task_call_count_by_key["lambda:convert_icav2_wes_event_to_wrsc_event"] == 2
+    assert execution_result_list[1].put_event_entry_list == []
+
+
+def count_workflow_run_fetches(convert_module, monkeypatch) -> list:
+    fetch_portal_run_id_list = []
+    get_cached_workflow_run_from_portal_run_id = convert_module.get_cached_workflow_run_from_portal_run_id
+
+    def get_counted_workflow_run_from_portal_run_id(portal_run_id, **kwargs):
+        fetch_portal_run_id_list.append(portal_run_id)
+        return get_cached_workflow_run_from_portal_run_id(portal_run_id, **kwargs)
+
+    monkeypatch.setattr(
+        convert_module, "get_cached_workflow_run_from_portal_run_id", get_counted_workflow_run_from_portal_run_id
+    )
+    return fetch_portal_run_id_list
+
+
+def test_only_the_latest_non_terminal_state_change_is_emitted(
+        api_fixtures, load_handler, ledger_sqlite_path, monkeypatch
+):
+    add_workflow_run_fixtures(api_fixtures)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+    fetch_portal_run_id_list = count_workflow_run_fetches(convert_module, monkeypatch)
+
+    # A burst of state changes, the second is built from the cached workflow run and payload
+    output_list = list(map(
+        lambda status_iter_: convert_module.handler(
+            {"icav2WesStateChangeEvent": get_icav2_wes_event(status_iter_)}, None
+        ),
+        ["INITIALIZING", "RUNNING"]
+    ))
+    assert fetch_portal_run_id_list == [PORTAL_RUN_ID]
+    assert list(map(
+        lambda output_iter_: output_iter_['workflowRunStateChangeEvent']['status'],
+        output_list
+    )) == ["INITIALIZING", "RUNNING"]
+    assert output_list[0]['coalesceWindowSeconds'] == convert_module.COALESCE_WINDOW_SECONDS
+
+    # After the window, the superseded state change is dropped
+    assert list(map(
+        lambda output_iter_: convert_module.handler(
+            {"coalescedEvent": {"portalRunId": PORTAL_RUN_ID, "coalesceId": output_iter_['coalesceId']}}, None
+        ),
+        output_list
+    )) == [{"isLatest": False}, {"isLatest": True}]
+
+    # A terminal state change drops the state change still waiting, and any late ones
+    assert "workflowRunStateChangeEvent" in convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("SUCCEEDED"), "executionArn": EXECUTION_ARN}, None
+    )
+    assert convert_module.handler(
+        {"coalescedEvent": {"portalRunId": PORTAL_RUN_ID, "coalesceId": output_list[1]['coalesceId']}}, None
+    ) == {"isLatest": False}
+    assert convert_module.handler(
+        {"icav2WesStateChangeEvent": get_icav2_wes_event("RUNNING")}, None
+    ) == {"isDropped": True}
+
+
+def test_expired_wes_state_is_fetched_again(api_fixtures, load_handler, ledger_sqlite_path, monkeypatch):
+    add_workflow_run_fixtures(api_fixtures)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+    fetch_portal_run_id_list = count_workflow_run_fetches(convert_module, monkeypatch)
+
+    monkeypatch.setattr(convert_module, "WES_STATE_CACHE_TABLE_TTL_SECONDS", -1)
+    for status_iter_ in ["INITIALIZING", "RUNNING"]:
+        assert "workflowRunStateChangeEvent" in convert_module.handler(
+            {"icav2WesStateChangeEvent": get_icav2_wes_event(status_iter_)}, None
+        )
+
+    assert fetch_portal_run_id_list == [PORTAL_RUN_ID, PORTAL_RUN_ID]
+
+
+def test_coalesced_state_changes_are_published_after_the_window(
+        api_fixtures, load_handler, ledger_sqlite_path, monkeypatch
+):
+    add_workflow_run_fixtures(api_fixtures)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+    fetch_portal_run_id_list = count_workflow_run_fetches(convert_module, monkeypatch)
+
+    execution_result_list = list(map(
+        lambda status_iter_: LocalStateMachine("icav2WesEventToWrscEvent").start_execution(
+            get_icav2_wes_event(status_iter_)
+        ),
+        ["RUNNING", "GENERATING_OUTPUTS"]
+    ))
+
+    assert list(map(lambda execution_result_iter_: execution_result_iter_.status, execution_result_list)) == [
+        "SUCCEEDED", "SUCCEEDED"
+    ]
+    assert list(map(
+        lambda execution_result_iter_: execution_result_iter_.put_event_entry_list[0]['Detail']['status'],
+        execution_result_list
+    )) == ["RUNNING", "GENERATING_OUTPUTS"]
+    # Translated, checked after the window, then handed back to commit the ledger
+    assert execution_result_list[0].task_call_count_by_key["lambda:convert_icav2_wes_event_to_wrsc_event"] == 3
+    # The second state change is built from the cached workflow run and payload
+    assert fetch_portal_run_id_list == [PORTAL_RUN_ID]
+
+
+@pytest.mark.parametrize(
+    "status, is_consistent_read",
+    [("SUCCEEDED", True), ("RUNNING", False)]
+)
+def test_terminal_state_changes_read_the_workflow_run_consistently(
+        api_fixtures, load_handler, status, is_consistent_read
+):
+    add_workflow_run_fixtures(api_fixtures)
+    convert_module = load_handler("convert_icav2_wes_event_to_wrsc_event")
+    event_list = []
+
+    def convert_icav2_wes_event_to_wrsc_event(event, context):
+        event_list.append(event)
+        return convert_module.handler(event, context)
+
+    execution_result = LocalStateMachine(
+        "icav2WesEventToWrscEvent",
+        handler_overrides={"convert_icav2_wes_event_to_wrsc_event": convert_icav2_wes_event_to_wrsc_event},
+    ).start_execution(get_icav2_wes_event(status))
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+    assert event_list[0]['consistentRead'] is is_consistent_read
+
+
+def test_icav2_event_fails_when_the_api_is_throttled(api_fixtures):
+    from api_stand_in import install, FaultInjector, REPLAY_MODE
+
+    add_workflow_run_fixtures(api_fixtures)
+    install(REPLAY_MODE, api_fixtures.fixtures_dir, FaultInjector(throttle_rate=1.0, seed=1))
+
+    execution_result = LocalStateMachine("icav2WesEventToWrscEvent").start_execution({
+        "status": "SUCCEEDED",
+        "tags": {"portalRunId": PORTAL_RUN_ID},
+    })
+
+    assert execution_result.status == "FAILED"
+    assert execution_result.error == "HTTPError"
+    assert execution_result.put_event_entry_list == []
+
+
+def get_ready_event_detail(portal_run_id: str, inputs: dict) -> dict:
+    return {
+        "orcabusId": f"wfr.{portal_run_id}",
+        "portalRunId": portal_run_id,
+        "status": "READY",
+        "workflowRunName": f"umccr--automated--oncoanalyser-wgts-dna-rna--2-2-0--{portal_run_id}",
+        "workflow": {"name": "oncoanalyser-wgts-dna-rna", "version": "2.2.0"},
+        "libraries": get_workflow_run()['libraries'],
+        "payload": {
+            "version": "2025.08.05",
+            "data": {
+                "inputs": inputs,
+                "engineParameters": {
+                    "pipelineId": "pipeline-1",
+                    "outputUri": f"s3://bucket/analysis/oncoanalyser-wgts-dna-rna/{portal_run_id}/",
+                },
+                "tags": {},
+            },
+        },
+    }
+
+
+def test_ready_events_are_converted_and_published_in_batches(tmp_path, monkeypatch):
+    inputs = {
+        "groupId": "SBJ00001",
+        "subjectId": "SBJ00001",
+        "tumorDnaSampleId": "L2300001",
+        "tumorDnaInputs": {"bamRedux": "s3://bucket/L2300001.redux.bam"},
+        "refDataHmfDataPath": "s3://bucket/hmf_pipeline_resources/",
+    }
+    ready_event_detail_list = list(map(
+        lambda index_iter_: get_ready_event_detail(f"2025010{index_iter_}abcdef99", inputs),
+        range(1, 4)
+    ))
+    # No inputs, the other ready events of the batch are still published
+    ready_event_detail_list[1]['payload']['data'].pop("inputs")
+
+    # The ready comments of the batch are queued from concurrent Map iterations
+    monkeypatch.setenv("COMMENT_OUTBOX_SQLITE_PATH", str(tmp_path / "comment-outbox.sqlite"))
+    execution_result = LocalStateMachine("readyEventToIcav2WesRequestEvent").start_execution(ready_event_detail_list)
+
+    assert execution_result.status == "FAILED"
+    assert execution_result.error == "ReadyEventConversionError"
+    assert "20250102abcdef99" in execution_result.cause
+    # A ready comment for each ready event, and one PutEvents call for the batch
+    assert sorted(map(
+        lambda record_iter_: record_iter_['workflowRunId'],
+        get_records_from_sqlite_outbox(str(tmp_path / "comment-outbox.sqlite"))
+    )) == sorted(map(
+        lambda ready_event_detail_iter_: ready_event_detail_iter_['orcabusId'],
+        ready_event_detail_list
+    ))
+    assert execution_result.task_call_count_by_key["events:putEvents"] == 1
+    assert list(map(
+        lambda entry_iter_: entry_iter_['Detail']['tags']['portalRunId'],
+        execution_result.put_event_entry_list
+    )) == ["20250101abcdef99", "20250103abcdef99"]
+
+
+def test_single_ready_event_is_published_as_a_list_of_entries(tmp_path, monkeypatch):
+    inputs = {
+        "groupId": "SBJ00001",
+        "subjectId": "SBJ00001",
+        "tumorDnaSampleId": "L2300001",
+        "tumorDnaInputs": {"bamRedux": "s3://bucket/L2300001.redux.bam"},
+        "refDataHmfDataPath": "s3://bucket/hmf_pipeline_resources/",
+    }
+
+    # A lone READY event (the common case through the pipe) is a batch of one
+    monkeypatch.setenv("COMMENT_OUTBOX_SQLITE_PATH", str(tmp_path / "comment-outbox.sqlite"))
+    execution_result = LocalStateMachine("readyEventToIcav2WesRequestEvent").start_execution([
+        get_ready_event_detail("20250104abcdef99", inputs)
+    ])
+
+    assert execution_result.status == "SUCCEEDED", execution_result.cause
+    assert execution_result.task_call_count_by_key["events:putEvents"] == 1
+    assert len(execution_result.put_event_entry_list) == 1
+    assert execution_result.put_event_entry_list[0]['Detail']['tags']['portalRunId'] == "20250104abcdef99"
+
+
+def test_run_load_reports_every_execution(api_fixtures):
+    add_workflow_run_fixtures(api_fixtures)
+
+    load_report = run_load(
+        LocalStateMachine(
+            "icav2WesEventToWrscEvent",
+            task_latency_model=KeyedLatencyModel({"events:putEvents": ConstantLatencyModel(0.001)}),
+        ),
+        [{"status": "SUCCEEDED", "tags": {"portalRunId": PORTAL_RUN_ID}}],
+        execution_count=4,
+        concurrency=2,
+    )
+
+    assert load_report.execution_count == 4
+    assert load_report.succeeded_count == 4
+    assert load_report.mean_task_call_count_by_key["events:putEvents"] == 1
+
+
+@pytest.mark.parametrize(
+    "spec,expected_median",
+    [
+        ("none", 0.0),
+        ("constant:0.25", 0.25),
+    ]
+)
+def test_parse_latency_model(spec, expected_median):
+    latency_model = parse_latency_model(spec, seed=1)
+    assert get_percentile(sorted(map(lambda _: latency_model.sample("any"), range(11))), 50) == expected_median
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+The payload store shared by the handlers that read the latest payload of a workflow run
+"""
+
+# Standard imports
+import gzip
+import json
+from threading import Thread
+
+import boto3
+import pytest
+from botocore.stub import Stubber, ANY
+
+# Layer imports
+from pipeline_manager_tools import aws_clients
+
+# Globals
+TABLE_NAME = "payloadStore"
+
+
+def get_workflow_run(portal_run_id: str, payload_orcabus_id: str) -> dict:
+    return {
+        "orcabusId": f"wfr.{portal_run_id}",
+        "portalRunId": portal_run_id,
+        "workflow": {"name": "oncoanalyser-wgts-dna-rna", "version": "2.2.0"},
+        "libraries": [],
+        "currentState": {
+            "orcabusId": "wfs.0001",
+            "status": "READY",
+            "timestamp": "2025-03-01T00:00:00Z",
+            "payload": payload_orcabus_id,
+        },
+    }
+
+
+def get_payload(payload_orcabus_id: str) -> dict:
+    return {
+        "orcabusId": payload_orcabus_id,
+        "payloadRefId": "00000000-0000-0000-0000-000000000000",
+        "version": "2025.06.04",
+        "data": {"inputs": {"genomes": {"GRCh38Umccr": {"fasta": "s3://refdata/genome.fa"}}}},
+    }
+
+
+@pytest.fixture()
+def dynamodb_stubber(monkeypatch):
+    """
+    The payload store table, stubbed
+    """
+    monkeypatch.setenv("PAYLOAD_STORE_TABLE_NAME", TABLE_NAME)
+    dynamodb_client = boto3.client("dynamodb")
+    monkeypatch.setattr(aws_clients, "_DYNAMODB_CLIENT", dynamodb_client)
+    with Stubber(dynamodb_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_stored_payload_body_skips_the_api(api_fixtures, load_handler, dynamodb_stubber):
+    portal_run_id = "20250301aaaaaaaa"
+    payload = get_payload("pld.01JTESTSTORE0000000000001")
+
+    # Only the pointer is looked up through the API, the payload body is in the table
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": portal_run_id},
+        response=get_workflow_run(portal_run_id, payload['orcabusId']),
+    )
+    dynamodb_stubber.add_response(
+        "get_item",
+        {"Item": {
+            "payload_orcabus_id": {"S": payload['orcabusId']},
+            "payload": {"B": gzip.compress(json.dumps(payload).encode())},
+        }},
+        {"TableName": TABLE_NAME, "Key": {"payload_orcabus_id": {"S": payload['orcabusId']}}},
+    )
+
+    output = load_handler("get_draft_payload").handler({"portalRunId": portal_run_id}, None)
+
+    assert output == {"payload": {
+        "version": "2025.06.04",
+        "data": {"inputs": {"genomes": {"GRCh38_umccr": {"fasta": "s3://refdata/genome.fa"}}}},
+    }}
+
+
+def test_downloaded_payload_is_stored_and_returned_as_a_copy(api_fixtures, dynamodb_stubber):
+    from pipeline_manager_tools.payload_store import get_stored_latest_payload_from_workflow_run
+
+    portal_run_id = "20250302bbbbbbbb"
+    payload = get_payload("pld.01JTESTSTORE0000000000002")
+    workflow_run = get_workflow_run(portal_run_id, payload['orcabusId'])
+
+    api_fixtures.add("workflow", "get_payload", arguments={"payload_id": payload['orcabusId']}, response=payload)
+    dynamodb_stubber.add_response(
+        "get_item", {},
+        {"TableName": TABLE_NAME, "Key": {"payload_orcabus_id": {"S": payload['orcabusId']}}},
+    )
+    dynamodb_stubber.add_response(
+        "put_item", {},
+        {
+            "TableName": TABLE_NAME,
+            "Item": {"payload_orcabus_id": {"S": payload['orcabusId']}, "payload": ANY, "ttl": ANY},
+        },
+    )
+
+    stored_payload = get_stored_latest_payload_from_workflow_run(workflow_run)
+    stored_payload['data'].clear()
+
+    # Served from the warm container store (no further table or api calls), unaffected by the caller's changes
+    assert get_stored_latest_payload_from_workflow_run(workflow_run) == payload
+
+
+def test_memory_store_is_bounded_under_concurrent_writes(monkeypatch):
+    from pipeline_manager_tools import payload_store
+
+    monkeypatch.setattr(payload_store, "PAYLOAD_STORE_MEMORY_MAX_SIZE", 8)
+
+    def put_payloads(thread_index: int):
+        for payload_index in range(200):
+            payload_store.put_payload_in_memory_store(
+                get_payload(f"pld.01JTESTTHREAD{thread_index:02d}{payload_index:011d}")
+            )
+            payload_store.get_payload_from_memory_store(f"pld.01JTESTTHREAD{thread_index:02d}{0:011d}")
+
+    thread_list = list(map(lambda thread_index_iter_: Thread(target=put_payloads, args=(thread_index_iter_,)), range(8)))
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+
+    assert len(payload_store._PAYLOAD_STORE) == 8
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+The helpers shared through the pipeline manager tools layer
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier, Event
+
+import pytest
+
+# Layer imports
+from pipeline_manager_tools.memoize import (
+    InvocationThreadPoolExecutor, memoized, memoized_invocation, get_invocation_call_counts
+)
+from pipeline_manager_tools.projection import get_projected_object
+
+
+def test_projection_keeps_only_the_requested_fields():
+    workflow_run = {
+        "orcabusId": "wfr.xxx",
+        "portalRunId": "20250101abcdef12",
+        "currentState": {"status": "READY", "timestamp": "2025-01-01T00:00:00Z"},
+        "libraries": [{"libraryId": "L2300001"}],
+    }
+
+    assert get_projected_object(workflow_run, ["portalRunId", "currentState.status", "missing.field"]) == {
+        "portalRunId": "20250101abcdef12",
+        "currentState": {"status": "READY"},
+    }
+    assert get_projected_object(workflow_run, None) is workflow_run
+
+
+def test_memoized_calls_share_one_request():
+    call_list = []
+
+    @memoized
+    def get_workflow_run(portal_run_id):
+        call_list.append(portal_run_id)
+        return {"portalRunId": portal_run_id, "libraries": []}
+
+    with memoized_invocation():
+        first_workflow_run = get_workflow_run("20250101abcdef12")
+        # Callers get their own copy
+        first_workflow_run['libraries'].append("L2300001")
+        assert get_workflow_run("20250101abcdef12") == {"portalRunId": "20250101abcdef12", "libraries": []}
+        get_workflow_run(portal_run_id="20250101abcdef12")
+
+    assert call_list == ["20250101abcdef12", "20250101abcdef12"]
+    # Positional and keyword calls are memoized separately
+    assert get_invocation_call_counts() == {"get_workflow_run": (3, 2)}
+
+    # Outside of an invocation, every call is made
+    get_workflow_run("20250101abcdef12")
+    assert len(call_list) == 3
+
+
+def test_memoized_in_flight_calls_are_shared():
+    call_list = []
+    call_started = Event()
+    release_call = Event()
+
+    @memoized
+    def list_files(prefix):
+        call_list.append(prefix)
+        call_started.set()
+        release_call.wait(timeout=5)
+        return [prefix + "file.txt"]
+
+    with memoized_invocation():
+        with InvocationThreadPoolExecutor(max_workers=2) as executor:
+            first_future = executor.submit(list_files, "s3://bucket/")
+            call_started.wait(timeout=5)
+            second_future = executor.submit(list_files, "s3://bucket/")
+            release_call.set()
+            assert first_future.result() == second_future.result() == ["s3://bucket/file.txt"]
+
+    assert call_list == ["s3://bucket/"]
+
+
+def test_concurrent_invocations_have_their_own_memo():
+    call_list = []
+    both_invocations_started = Barrier(2)
+
+    @memoized
+    def get_library(library_id):
+        call_list.append(library_id)
+        return {"libraryId": library_id}
+
+    def run_invocation(library_id):
+        with memoized_invocation():
+            both_invocations_started.wait(timeout=5)
+            get_library(library_id)
+            get_library(library_id)
+            get_library("L2500003")
+            return get_invocation_call_counts()
+
+    # i.e the executions of the local_sfn load driver
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        call_counts_list = list(executor.map(run_invocation, ["L2500001", "L2500002"]))
+
+    assert call_counts_list == [{"get_library": (3, 2)}, {"get_library": (3, 2)}]
+    assert sorted(call_list) == ["L2500001", "L2500002", "L2500003", "L2500003"]
+
+
+def get_memoized_get_workflow_run(api_module_name: str):
+    def get_workflow_run(portal_run_id):
+        return {"api": api_module_name, "portalRunId": portal_run_id}
+
+    # As if imported from the api module
+    get_workflow_run.__module__ = api_module_name
+    return memoized(get_workflow_run)
+
+
+def test_memoized_functions_of_the_same_name_are_kept_apart():
+    get_workflow_run = get_memoized_get_workflow_run("orcabus_api_tools.workflow")
+    get_other_workflow_run = get_memoized_get_workflow_run("other_api_tools.workflow")
+
+    with memoized_invocation():
+        assert get_workflow_run("20250101abcdef12")['api'] == "orcabus_api_tools.workflow"
+        assert get_other_workflow_run("20250101abcdef12")['api'] == "other_api_tools.workflow"
+
+
+def test_memoized_failures_are_retried():
+    call_list = []
+
+    @memoized
+    def get_payload(payload_id):
+        call_list.append(payload_id)
+        if len(call_list) == 1:
+            raise ConnectionError("Try again")
+        return {"orcabusId": payload_id}
+
+    with memoized_invocation():
+        with pytest.raises(ConnectionError):
+            get_payload("pld.xxx")
+        assert get_payload("pld.xxx") == {"orcabusId": "pld.xxx"}
+
+    assert len(call_list) == 2
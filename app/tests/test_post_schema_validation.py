@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+"""
+Post schema validation of the engine parameters of a draft that resumes from a FAILED run
+"""
+
+# Standard imports
+import pytest
+
+# Globals
+PORTAL_RUN_ID = "20250401abcdef12"
+RESUMED_PORTAL_RUN_ID = "20250301fedcba21"
+PROJECT_ID = "project-1"
+PIPELINE_ID = "pipeline-1"
+PROJECT_PREFIX = "s3://bucket/byob-icav2/project-1/"
+INPUTS = {
+    "groupId": "SBJ00001",
+    "subjectId": "SBJ00001",
+    "tumorDnaSampleId": "L2300001",
+    "tumorDnaInputs": {"bamRedux": "s3://bucket/L2300001.redux.bam"},
+}
+
+
+@pytest.fixture()
+def post_schema_validation(load_handler, monkeypatch):
+    monkeypatch.setenv("TEST_DATA_BUCKET_NAME", "test-data-bucket")
+    monkeypatch.setenv("REF_DATA_BUCKET_NAME", "ref-data-bucket")
+    return load_handler("post_schema_validation")
+
+
+def get_engine_parameters(cache_uri: str, resume_from_portal_run_id=None) -> dict:
+    return {
+        "projectId": PROJECT_ID,
+        "pipelineId": PIPELINE_ID,
+        "outputUri": f"{PROJECT_PREFIX}analysis/oncoanalyser-wgts-dna-rna/{PORTAL_RUN_ID}/",
+        "logsUri": f"{PROJECT_PREFIX}logs/oncoanalyser-wgts-dna-rna/{PORTAL_RUN_ID}/",
+        "cacheUri": cache_uri,
+        **(
+            {"resumeFromPortalRunId": resume_from_portal_run_id}
+            if resume_from_portal_run_id is not None
+            else {}
+        ),
+    }
+
+
+def add_project_fixtures(api_fixtures):
+    api_fixtures.add(
+        "icav2", "get_project_obj_from_project_id",
+        arguments={"project_id": PROJECT_ID},
+        response={"id": PROJECT_ID},
+    )
+    api_fixtures.add(
+        "icav2", "get_project_pipeline_obj",
+        arguments={"project_id": PROJECT_ID, "pipeline_id": PIPELINE_ID},
+        response={"id": PIPELINE_ID},
+    )
+
+
+def add_resumed_workflow_run_fixtures(api_fixtures, workflow_name: str, status: str, inputs: dict):
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": RESUMED_PORTAL_RUN_ID},
+        response={
+            "orcabusId": f"wfr.{RESUMED_PORTAL_RUN_ID}",
+            "portalRunId": RESUMED_PORTAL_RUN_ID,
+            "workflow": {"name": workflow_name},
+            "currentState": {"status": status},
+        },
+    )
+    api_fixtures.add(
+        "workflow", "get_latest_payload_from_workflow_run",
+        arguments={"workflow_run_id": f"wfr.{RESUMED_PORTAL_RUN_ID}"},
+        response={"data": {"inputs": inputs}},
+    )
+
+
+@pytest.mark.parametrize(
+    "cache_uri_portal_run_id, resume_from_portal_run_id, is_valid",
+    [
+        (PORTAL_RUN_ID, None, True),
+        (RESUMED_PORTAL_RUN_ID, RESUMED_PORTAL_RUN_ID, True),
+        # The cache of another run, without resuming it
+        (RESUMED_PORTAL_RUN_ID, None, False),
+        # A fresh cache, when resuming
+        (PORTAL_RUN_ID, RESUMED_PORTAL_RUN_ID, False),
+    ]
+)
+def test_cache_uri_is_the_cache_of_this_run_or_the_resumed_run(
+        api_fixtures, post_schema_validation, cache_uri_portal_run_id, resume_from_portal_run_id, is_valid
+):
+    add_project_fixtures(api_fixtures)
+
+    is_cache_uri_valid, failures = post_schema_validation.validate_engine_parameters(
+        get_engine_parameters(
+            f"{PROJECT_PREFIX}cache/oncoanalyser-wgts-dna-rna/{cache_uri_portal_run_id}/",
+            resume_from_portal_run_id,
+        ),
+        workflow_run_id=f"wfr.{PORTAL_RUN_ID}",
+        project_prefix=PROJECT_PREFIX,
+        portal_run_id=PORTAL_RUN_ID,
+    )
+
+    assert is_cache_uri_valid is is_valid
+    assert len(failures) == int(not is_valid)
+
+
+def test_cache_uri_outside_the_cache_midfix_is_rejected(api_fixtures, post_schema_validation):
+    add_project_fixtures(api_fixtures)
+
+    _, failures = post_schema_validation.validate_engine_parameters(
+        get_engine_parameters(f"{PROJECT_PREFIX}work/oncoanalyser-wgts-dna-rna/{PORTAL_RUN_ID}/"),
+        workflow_run_id=f"wfr.{PORTAL_RUN_ID}",
+        project_prefix=PROJECT_PREFIX,
+        portal_run_id=PORTAL_RUN_ID,
+    )
+
+    assert failures == [
+        f"cacheUri '{PROJECT_PREFIX}work/oncoanalyser-wgts-dna-rna/{PORTAL_RUN_ID}/' does not end with "
+        f"'/cache/oncoanalyser-wgts-dna-rna/{PORTAL_RUN_ID}/'"
+    ]
+
+
+def test_failed_run_with_the_same_inputs_is_resumable(api_fixtures, post_schema_validation):
+    add_resumed_workflow_run_fixtures(api_fixtures, "oncoanalyser-wgts-dna-rna", "FAILED", INPUTS)
+
+    assert post_schema_validation.validate_resume_from_portal_run_id(
+        RESUMED_PORTAL_RUN_ID, inputs=INPUTS, portal_run_id=PORTAL_RUN_ID
+    ) == (True, [])
+
+
+def test_run_cannot_resume_itself(post_schema_validation):
+    assert post_schema_validation.validate_resume_from_portal_run_id(
+        PORTAL_RUN_ID, inputs=INPUTS, portal_run_id=PORTAL_RUN_ID
+    ) == (False, [f"resumeFromPortalRunId '{PORTAL_RUN_ID}' is the portal run id of this run"])
+
+
+def test_missing_run_cannot_be_resumed(api_fixtures, post_schema_validation):
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": RESUMED_PORTAL_RUN_ID},
+        error=ValueError("Workflow run not found"),
+    )
+
+    assert post_schema_validation.validate_resume_from_portal_run_id(
+        RESUMED_PORTAL_RUN_ID, inputs=INPUTS, portal_run_id=PORTAL_RUN_ID
+    ) == (False, [f"Cannot find the workflow run to resume '{RESUMED_PORTAL_RUN_ID}'"])
+
+
+@pytest.mark.parametrize(
+    "workflow_name, status, failure_list",
+    [
+        (
+            "oncoanalyser-wgts-dna", "FAILED",
+            [
+                f"resumeFromPortalRunId '{RESUMED_PORTAL_RUN_ID}' is a 'oncoanalyser-wgts-dna' run, "
+                f"not a 'oncoanalyser-wgts-dna-rna' run"
+            ]
+        ),
+        (
+            "oncoanalyser-wgts-dna-rna", "SUCCEEDED",
+            [
+                f"resumeFromPortalRunId '{RESUMED_PORTAL_RUN_ID}' has status 'SUCCEEDED', "
+                f"only a FAILED run can be resumed"
+            ]
+        ),
+        (
+            "oncoanalyser-wgts-dna", "ABORTED",
+            [
+                f"resumeFromPortalRunId '{RESUMED_PORTAL_RUN_ID}' is a 'oncoanalyser-wgts-dna' run, "
+                f"not a 'oncoanalyser-wgts-dna-rna' run",
+                f"resumeFromPortalRunId '{RESUMED_PORTAL_RUN_ID}' has status 'ABORTED', "
+                f"only a FAILED run can be resumed",
+            ]
+        ),
+    ]
+)
+def test_run_of_another_workflow_or_status_cannot_be_resumed(
+        api_fixtures, post_schema_validation, workflow_name, status, failure_list
+):
+    add_resumed_workflow_run_fixtures(api_fixtures, workflow_name, status, INPUTS)
+
+    assert post_schema_validation.validate_resume_from_portal_run_id(
+        RESUMED_PORTAL_RUN_ID, inputs=INPUTS, portal_run_id=PORTAL_RUN_ID
+    ) == (False, failure_list)
+
+
+def test_failed_run_with_other_inputs_cannot_be_resumed(api_fixtures, post_schema_validation):
+    add_resumed_workflow_run_fixtures(
+        api_fixtures, "oncoanalyser-wgts-dna-rna", "FAILED", {**INPUTS, "tumorDnaSampleId": "L2300002"}
+    )
+
+    assert post_schema_validation.validate_resume_from_portal_run_id(
+        RESUMED_PORTAL_RUN_ID, inputs=INPUTS, portal_run_id=PORTAL_RUN_ID
+    ) == (
+        False,
+        [
+            f"The inputs differ from the inputs of resumeFromPortalRunId '{RESUMED_PORTAL_RUN_ID}', "
+            f"the cache of the resumed run cannot be reused"
+        ]
+    )
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+"""
+The result reuse index, read by the READY conversion and written once the SUCCEEDED (or FAILED) event has been published
+"""
+
+# Standard imports
+import json
+
+import boto3
+import pytest
+from botocore.stub import Stubber, ANY
+
+# Layer imports
+from pipeline_manager_tools import aws_clients
+
+# Globals
+TABLE_NAME = "resultReuseIndex"
+PRIOR_PORTAL_RUN_ID = "20250201abcdef12"
+PRIOR_OUTPUT_URI = f"s3://bucket/analysis/oncoanalyser-wgts-dna-rna/{PRIOR_PORTAL_RUN_ID}/"
+PRIOR_CACHE_URI = f"s3://bucket/cache/oncoanalyser-wgts-dna-rna/{PRIOR_PORTAL_RUN_ID}/"
+
+
+def get_ready_event_detail(portal_run_id: str) -> dict:
+    return {
+        "orcabusId": f"wfr.{portal_run_id}",
+        "portalRunId": portal_run_id,
+        "status": "READY",
+        "workflowRunName": f"umccr--automated--oncoanalyser-wgts-dna-rna--2-2-0--{portal_run_id}",
+        "workflow": {"name": "oncoanalyser-wgts-dna-rna", "version": "2.2.0"},
+        "libraries": [{"libraryId": "L2300001", "orcabusId": "lib.01JTESTLIBRARY0000000000001"}],
+        "payload": {
+            "version": "2025.08.05",
+            "data": {
+                "inputs": {
+                    "groupId": "SBJ00001",
+                    "subjectId": "SBJ00001",
+                    "tumorDnaSampleId": "L2300001",
+                    "tumorDnaInputs": {"bamRedux": "s3://bucket/L2300001.redux.bam"},
+                    "refDataHmfDataPath": "s3://bucket/hmf_pipeline_resources/",
+                },
+                "engineParameters": {
+                    "pipelineId": "pipeline-1",
+                    "outputUri": f"s3://bucket/analysis/oncoanalyser-wgts-dna-rna/{portal_run_id}/",
+                    "cacheUri": f"s3://bucket/cache/oncoanalyser-wgts-dna-rna/{portal_run_id}/",
+                },
+                "tags": {},
+            },
+        },
+    }
+
+
+@pytest.fixture()
+def dynamodb_stubber(monkeypatch):
+    """
+    The result reuse index table, stubbed
+    """
+    monkeypatch.setenv("RESULT_REUSE_INDEX_TABLE_NAME", TABLE_NAME)
+    dynamodb_client = boto3.client("dynamodb")
+    monkeypatch.setattr(aws_clients, "_DYNAMODB_CLIENT", dynamodb_client)
+    with Stubber(dynamodb_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def add_result_item_response(dynamodb_stubber):
+    dynamodb_stubber.add_response(
+        "get_item",
+        {
+            "Item": {
+                "input_fingerprint": {"S": "fingerprint"},
+                "portal_run_id": {"S": PRIOR_PORTAL_RUN_ID},
+                "output_uri": {"S": PRIOR_OUTPUT_URI},
+                "outputs": {"S": json.dumps({"dnaRnaOncoanalyserAnalysisRelPath": "SBJ00001/"})},
+            }
+        },
+        {"TableName": TABLE_NAME, "Key": {"input_fingerprint": {"S": ANY}}},
+    )
+
+
+def add_item_response(dynamodb_stubber, item=None):
+    dynamodb_stubber.add_response(
+        "get_item",
+        {"Item": item} if item is not None else {},
+        {"TableName": TABLE_NAME, "Key": {"input_fingerprint": {"S": ANY}}},
+    )
+
+
+def add_failed_run_item_responses(dynamodb_stubber):
+    failed_run_item = {
+        "input_fingerprint": {"S": "fingerprint"},
+        "failed_portal_run_id": {"S": PRIOR_PORTAL_RUN_ID},
+        "failed_cache_uri": {"S": PRIOR_CACHE_URI},
+    }
+    # Read for a result to reuse, then for a run to resume
+    add_item_response(dynamodb_stubber, failed_run_item)
+    add_item_response(dynamodb_stubber, failed_run_item)
+
+
+def add_output_files_fixture(api_fixtures, file_list):
+    api_fixtures.add(
+        "filemanager", "list_files_recursively",
+        arguments={
+            "bucket": "bucket",
+            "key": f"analysis/oncoanalyser-wgts-dna-rna/{PRIOR_PORTAL_RUN_ID}/SBJ00001/",
+        },
+        response=file_list,
+    )
+
+
+def test_result_with_outputs_is_reused(api_fixtures, load_handler, dynamodb_stubber):
+    add_result_item_response(dynamodb_stubber)
+    add_output_files_fixture(api_fixtures, [{"key": "SBJ00001/orange/SBJ00001.orange.json"}])
+
+    converted_ready_event_detail = load_handler(
+        "convert_ready_event_inputs_to_icav2_wes_event_inputs"
+    ).convert_ready_event_detail(get_ready_event_detail("20250301abcdef12"))
+
+    workflow_run_update_detail = converted_ready_event_detail['workflowRunUpdateDetail']
+    assert workflow_run_update_detail['status'] == "SUCCEEDED"
+    assert workflow_run_update_detail['portalRunId'] == "20250301abcdef12"
+    assert workflow_run_update_detail['payload']['data']['engineParameters']['outputUri'] == PRIOR_OUTPUT_URI
+    assert workflow_run_update_detail['payload']['data']['engineParameters']['reusedFromPortalRunId'] == (
+        PRIOR_PORTAL_RUN_ID
+    )
+
+
+def test_result_with_removed_outputs_is_not_reused(api_fixtures, load_handler, dynamodb_stubber):
+    add_result_item_response(dynamodb_stubber)
+    add_output_files_fixture(api_fixtures, [])
+    add_item_response(dynamodb_stubber, None)
+
+    converted_ready_event_detail = load_handler(
+        "convert_ready_event_inputs_to_icav2_wes_event_inputs"
+    ).convert_ready_event_detail(get_ready_event_detail("20250302abcdef12"))
+
+    assert "workflowRunUpdateDetail" not in converted_ready_event_detail
+    icav2_wes_request_detail = converted_ready_event_detail['icav2WesRequestDetail']
+    assert icav2_wes_request_detail['tags']['portalRunId'] == "20250302abcdef12"
+    assert icav2_wes_request_detail['tags']['inputFingerprint'] is not None
+
+
+def test_run_with_the_inputs_of_a_failed_run_resumes_from_its_cache(load_handler, dynamodb_stubber):
+    add_failed_run_item_responses(dynamodb_stubber)
+
+    converted_ready_event_detail = load_handler(
+        "convert_ready_event_inputs_to_icav2_wes_event_inputs"
+    ).convert_ready_event_detail(get_ready_event_detail("20250303abcdef12"))
+
+    icav2_wes_request_detail = converted_ready_event_detail['icav2WesRequestDetail']
+    assert icav2_wes_request_detail['engineParameters']['cacheUri'] == PRIOR_CACHE_URI
+    assert icav2_wes_request_detail['engineParameters']['nextflowConfig'] == "resume = true\n"
+    assert icav2_wes_request_detail['tags']['resumedFromPortalRunId'] == PRIOR_PORTAL_RUN_ID
+
+
+def test_failed_run_is_not_resumed_by_itself(load_handler, dynamodb_stubber):
+    add_failed_run_item_responses(dynamodb_stubber)
+
+    converted_ready_event_detail = load_handler(
+        "convert_ready_event_inputs_to_icav2_wes_event_inputs"
+    ).convert_ready_event_detail(get_ready_event_detail(PRIOR_PORTAL_RUN_ID))
+
+    icav2_wes_request_detail = converted_ready_event_detail['icav2WesRequestDetail']
+    assert "nextflowConfig" not in icav2_wes_request_detail['engineParameters']
+    assert "resumedFromPortalRunId" not in icav2_wes_request_detail['tags']
+
+
+def test_draft_resume_from_portal_run_id_is_sent_as_the_resume_config(load_handler, dynamodb_stubber):
+    add_item_response(dynamodb_stubber, None)
+
+    ready_event_detail = get_ready_event_detail("20250304abcdef12")
+    ready_event_detail['payload']['data']['engineParameters'].update({
+        "cacheUri": PRIOR_CACHE_URI,
+        "resumeFromPortalRunId": PRIOR_PORTAL_RUN_ID,
+    })
+
+    icav2_wes_request_detail = load_handler(
+        "convert_ready_event_inputs_to_icav2_wes_event_inputs"
+    ).convert_ready_event_detail(ready_event_detail)['icav2WesRequestDetail']
+
+    # The WES request has no resumeFromPortalRunId engine parameter
+    assert icav2_wes_request_detail['engineParameters'] == {
+        "pipelineId": "pipeline-1",
+        "outputUri": "s3://bucket/analysis/oncoanalyser-wgts-dna-rna/20250304abcdef12/",
+        "cacheUri": PRIOR_CACHE_URI,
+        "nextflowConfig": "resume = true\n",
+    }
+    assert icav2_wes_request_detail['tags']['resumedFromPortalRunId'] == PRIOR_PORTAL_RUN_ID
+
+
+@pytest.mark.parametrize(
+    "status, input_fingerprint, is_indexed",
+    [
+        ("SUCCEEDED", "fingerprint", True),
+        # Runs launched before the fingerprint tag have nothing to index under
+        ("SUCCEEDED", None, False),
+        ("FAILED", "fingerprint", False),
+    ]
+)
+def test_published_succeeded_result_is_indexed(load_handler, dynamodb_stubber, status, input_fingerprint, is_indexed):
+    outputs = {"dnaRnaOncoanalyserAnalysisRelPath": "SBJ00001/"}
+    if is_indexed:
+        dynamodb_stubber.add_response(
+            "put_item",
+            {},
+            {
+                "TableName": TABLE_NAME,
+                "Item": {
+                    "input_fingerprint": {"S": input_fingerprint},
+                    "portal_run_id": {"S": PRIOR_PORTAL_RUN_ID},
+                    "output_uri": {"S": PRIOR_OUTPUT_URI},
+                    "outputs": {"S": json.dumps(outputs)},
+                },
+            },
+        )
+
+    assert load_handler("convert_icav2_wes_event_to_wrsc_event").handler(
+        {
+            "publishedEvent": {
+                "portalRunId": PRIOR_PORTAL_RUN_ID,
+                "status": status,
+                "inputFingerprint": input_fingerprint,
+                "outputUri": PRIOR_OUTPUT_URI,
+                "outputs": outputs,
+            }
+        },
+        None
+    ) == {"isLedgerAdvanced": True}
+
+
+@pytest.mark.parametrize("has_result", [False, True])
+def test_published_failed_run_is_indexed_for_resume(load_handler, dynamodb_stubber, has_result):
+    update_item_expected_params = {
+        "TableName": TABLE_NAME,
+        "Key": {"input_fingerprint": {"S": "fingerprint"}},
+        "UpdateExpression": ANY,
+        "ConditionExpression": "attribute_not_exists(portal_run_id)",
+        "ExpressionAttributeValues": {
+            ":portal_run_id": {"S": PRIOR_PORTAL_RUN_ID},
+            ":cache_uri": {"S": PRIOR_CACHE_URI},
+        },
+    }
+    if has_result:
+        # A SUCCEEDED result is kept
+        dynamodb_stubber.add_client_error(
+            "update_item", "ConditionalCheckFailedException", expected_params=update_item_expected_params
+        )
+    else:
+        dynamodb_stubber.add_response("update_item", {}, update_item_expected_params)
+
+    assert load_handler("convert_icav2_wes_event_to_wrsc_event").handler(
+        {
+            "publishedEvent": {
+                "portalRunId": PRIOR_PORTAL_RUN_ID,
+                "status": "FAILED",
+                "inputFingerprint": "fingerprint",
+                "outputUri": PRIOR_OUTPUT_URI,
+                "cacheUri": PRIOR_CACHE_URI,
+                "outputs": None,
+            }
+        },
+        None
+    ) == {"isLedgerAdvanced": True}
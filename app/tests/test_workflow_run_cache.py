@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""
+The workflow run cache shared by the handlers that look up a workflow run by its portal run id
+"""
+
+# Standard imports
+import json
+
+import boto3
+import pytest
+from botocore.stub import Stubber, ANY
+
+# Layer imports
+from pipeline_manager_tools import aws_clients
+
+# Globals
+TABLE_NAME = "workflowRunCache"
+PORTAL_RUN_ID = "20250201abcdef12"
+
+
+def get_workflow_run() -> dict:
+    return {
+        "orcabusId": "wfr.01JTESTCACHE00000000000000",
+        "portalRunId": PORTAL_RUN_ID,
+        "workflow": {"name": "oncoanalyser-wgts-dna-rna", "version": "2.2.0"},
+        "libraries": [],
+        "currentState": {"orcabusId": "wfs.0001", "status": "READY", "timestamp": "2025-02-01T00:00:00Z"},
+    }
+
+
+@pytest.fixture()
+def dynamodb_stubber(monkeypatch):
+    """
+    The workflow run cache table, stubbed
+    """
+    monkeypatch.setenv("WORKFLOW_RUN_CACHE_TABLE_NAME", TABLE_NAME)
+    dynamodb_client = boto3.client("dynamodb")
+    monkeypatch.setattr(aws_clients, "_DYNAMODB_CLIENT", dynamodb_client)
+    with Stubber(dynamodb_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_cache_hit_skips_the_api(load_handler, dynamodb_stubber):
+    workflow_run = get_workflow_run()
+    dynamodb_stubber.add_response(
+        "get_item",
+        {"Item": {"portal_run_id": {"S": PORTAL_RUN_ID}, "workflow_run": {"S": json.dumps(workflow_run)}}},
+        {"TableName": TABLE_NAME, "Key": {"portal_run_id": {"S": PORTAL_RUN_ID}}},
+    )
+
+    output = load_handler("get_workflow_run_object").handler(
+        {"portalRunId": PORTAL_RUN_ID, "fields": ["orcabusId", "currentState.status"]}, None
+    )
+
+    assert output == {
+        "workflowRunObject": {"orcabusId": workflow_run['orcabusId'], "currentState": {"status": "READY"}}
+    }
+
+
+def test_invalidated_item_is_read_through(api_fixtures, load_handler, dynamodb_stubber):
+    workflow_run = get_workflow_run()
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": PORTAL_RUN_ID},
+        response=workflow_run,
+    )
+
+    # The invalidation marker has no workflow run
+    dynamodb_stubber.add_response(
+        "get_item",
+        {"Item": {"portal_run_id": {"S": PORTAL_RUN_ID}, "invalidated_state_timestamp": {"S": "2025-02-01"}}},
+        {"TableName": TABLE_NAME, "Key": {"portal_run_id": {"S": PORTAL_RUN_ID}}},
+    )
+    dynamodb_stubber.add_response(
+        "put_item", {},
+        {
+            "TableName": TABLE_NAME,
+            "Item": {
+                "portal_run_id": {"S": PORTAL_RUN_ID},
+                "state_timestamp": {"S": "2025-02-01T00:00:00.000000+00:00"},
+                "workflow_run": ANY,
+                "ttl": ANY,
+            },
+            "ConditionExpression": ANY,
+            "ExpressionAttributeValues": {":state_timestamp": {"S": "2025-02-01T00:00:00.000000+00:00"}},
+        },
+    )
+
+    output = load_handler("get_workflow_run_object").handler({"portalRunId": PORTAL_RUN_ID}, None)
+
+    assert output == {"workflowRunObject": workflow_run}
+
+
+def test_stale_invalidation_is_dropped(dynamodb_stubber):
+    from pipeline_manager_tools.workflow_run_cache import invalidate_workflow_run_in_cache
+
+    dynamodb_stubber.add_client_error("put_item", service_error_code="ConditionalCheckFailedException")
+
+    # A newer state change has already invalidated the cache, nothing to do
+    invalidate_workflow_run_in_cache(TABLE_NAME, PORTAL_RUN_ID, "2025-01-01T00:00:00.000000+00:00")
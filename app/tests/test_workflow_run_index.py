@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+The workflow run index (SQLite stand-in), written by update_workflow_run_index and findLatestWorkflow
+"""
+
+# Standard imports
+import boto3
+import pytest
+from botocore.stub import Stubber, ANY
+
+# Globals
+WORKFLOW_NAME = "oncoanalyser-wgts-dna"
+LIBRARY_ID_LIST = ["L2300001", "L2300002"]
+
+
+def get_workflow_run(portal_run_id: str, status: str, timestamp: str, state_orcabus_id: str) -> dict:
+    return {
+        "orcabusId": f"wfr.{portal_run_id}",
+        "portalRunId": portal_run_id,
+        "workflowRunName": f"umccr--automated--{WORKFLOW_NAME}--2-2-0--{portal_run_id}",
+        "workflow": {"name": WORKFLOW_NAME, "version": "2.2.0"},
+        "libraries": list(map(
+            lambda library_id_iter_: {"libraryId": library_id_iter_, "orcabusId": f"lib.{library_id_iter_}"},
+            LIBRARY_ID_LIST
+        )),
+        "currentState": {
+            "orcabusId": state_orcabus_id,
+            "status": status,
+            "timestamp": timestamp,
+        },
+    }
+
+
+def get_wrsc_event(workflow_run: dict) -> dict:
+    return {
+        "orcabusId": workflow_run['orcabusId'],
+        "portalRunId": workflow_run['portalRunId'],
+        "timestamp": workflow_run['currentState']['timestamp'],
+        "status": workflow_run['currentState']['status'],
+        "workflow": workflow_run['workflow'],
+        "workflowRunName": workflow_run['workflowRunName'],
+        # The event libraries may lack the orcabus id
+        "libraries": list(map(lambda library_iter_: {"libraryId": library_iter_['libraryId']}, workflow_run['libraries'])),
+    }
+
+
+def get_find_latest_workflow_event() -> dict:
+    return {
+        "workflowName": WORKFLOW_NAME,
+        "status": "SUCCEEDED",
+        "libraries": list(map(lambda library_id_iter_: {"libraryId": library_id_iter_}, LIBRARY_ID_LIST)),
+    }
+
+
+def add_workflow_runs_from_metadata_fixture(api_fixtures, workflow_run_list):
+    api_fixtures.add(
+        "workflow", "get_workflow_runs_from_metadata",
+        arguments={
+            "analysis_run_id": None,
+            "workflow_name": WORKFLOW_NAME,
+            "workflow_version": None,
+            "library_id_list": sorted(LIBRARY_ID_LIST),
+            "rgid_list": None,
+        },
+        response=workflow_run_list,
+    )
+
+
+@pytest.fixture()
+def workflow_run_index_environ(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKFLOW_RUN_INDEX_SQLITE_PATH", str(tmp_path / "workflow_run_index.db"))
+
+
+def test_partially_indexed_libraries_fall_back_to_the_api(
+        api_fixtures, load_handler, workflow_run_index_environ, monkeypatch
+):
+    indexed_workflow_run = get_workflow_run("20250102aaaaaaaa", "SUCCEEDED", "2025-01-02T00:00:00Z", "wfs.0002")
+    unindexed_workflow_run = get_workflow_run("20250101bbbbbbbb", "SUCCEEDED", "2025-01-01T00:00:00Z", "wfs.0001")
+
+    add_workflow_runs_from_metadata_fixture(api_fixtures, [indexed_workflow_run, unindexed_workflow_run])
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": indexed_workflow_run['portalRunId']},
+        response=indexed_workflow_run,
+    )
+
+    # Only the run since the index was deployed is indexed from its event
+    load_handler("update_workflow_run_index").handler(get_wrsc_event(indexed_workflow_run), None)
+
+    find_latest_workflow = load_handler("find_latest_workflow")
+
+    # The search has not been backfilled, so the run from before the index was deployed is found through the API
+    workflow_run_list = find_latest_workflow.handler(get_find_latest_workflow_event(), None)['workflowRunList']
+    assert sorted(map(lambda workflow_run_iter_: workflow_run_iter_['portalRunId'], workflow_run_list)) == [
+        "20250101bbbbbbbb", "20250102aaaaaaaa"
+    ]
+
+    # Now backfilled, so served from the index alone
+    def no_api_query(*args, **kwargs):
+        raise AssertionError("The backfilled search queried the Workflow Manager API")
+
+    monkeypatch.setattr(find_latest_workflow, "get_workflow_runs_from_metadata", no_api_query)
+    assert find_latest_workflow.handler(get_find_latest_workflow_event(), None)['workflowRunList'] == workflow_run_list
+
+
+def test_indexed_runs_carry_the_state_orcabus_id(api_fixtures, load_handler, workflow_run_index_environ):
+    workflow_run = get_workflow_run("20250103cccccccc", "SUCCEEDED", "2025-01-03T00:00:00Z", "wfs.0003")
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": workflow_run['portalRunId']},
+        response=workflow_run,
+    )
+
+    output = load_handler("update_workflow_run_index").handler(get_wrsc_event(workflow_run), None)
+    assert output == {"libraryIdList": LIBRARY_ID_LIST}
+
+    from pipeline_manager_tools.workflow_run_index import get_indexed_workflow_runs_for_library
+    for library_id in LIBRARY_ID_LIST:
+        indexed_workflow_run_list = get_indexed_workflow_runs_for_library(library_id, WORKFLOW_NAME)
+        assert len(indexed_workflow_run_list) == 1
+        assert indexed_workflow_run_list[0]['currentState']['orcabusId'] == "wfs.0003"
+        assert indexed_workflow_run_list[0]['libraries'][0]['orcabusId'] == f"lib.{LIBRARY_ID_LIST[0]}"
+
+
+def test_state_change_not_yet_in_the_api_is_retried(api_fixtures, load_handler, workflow_run_index_environ):
+    running_workflow_run = get_workflow_run("20250104dddddddd", "RUNNING", "2025-01-04T00:00:00Z", "wfs.0004")
+    succeeded_workflow_run = get_workflow_run("20250104dddddddd", "SUCCEEDED", "2025-01-04T01:00:00Z", "wfs.0005")
+    api_fixtures.add(
+        "workflow", "get_workflow_run_from_portal_run_id",
+        arguments={"portal_run_id": running_workflow_run['portalRunId']},
+        response=running_workflow_run,
+    )
+
+    update_workflow_run_index = load_handler("update_workflow_run_index")
+    with pytest.raises(update_workflow_run_index.StateChangeNotYetRecordedError):
+        update_workflow_run_index.handler(get_wrsc_event(succeeded_workflow_run), None)
+
+
+def test_out_of_order_state_changes_keep_the_newest(workflow_run_index_environ):
+    from pipeline_manager_tools.workflow_run_index import (
+        put_workflow_runs_in_index, get_indexed_workflow_runs_for_library
+    )
+
+    succeeded_workflow_run = get_workflow_run("20250105eeeeeeee", "SUCCEEDED", "2025-01-05T01:00:00Z", "wfs.0007")
+    running_workflow_run = get_workflow_run("20250105eeeeeeee", "RUNNING", "2025-01-05T00:00:00+00:00", "wfs.0006")
+
+    put_workflow_runs_in_index([succeeded_workflow_run])
+    put_workflow_runs_in_index([running_workflow_run])
+
+    indexed_workflow_run_list = get_indexed_workflow_runs_for_library(LIBRARY_ID_LIST[0], WORKFLOW_NAME)
+    assert list(map(lambda workflow_run_iter_: workflow_run_iter_['currentState']['status'], indexed_workflow_run_list)) == [
+        "SUCCEEDED"
+    ]
+
+
+def test_backfill_marker_is_per_library_set_and_version(workflow_run_index_environ):
+    from pipeline_manager_tools.workflow_run_index import is_backfilled, put_backfill_marker
+
+    assert not is_backfilled(WORKFLOW_NAME, "2.2.0", LIBRARY_ID_LIST)
+
+    put_backfill_marker(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+
+    # Any version covers every version, for the same library set only
+    assert is_backfilled(WORKFLOW_NAME, "2.2.0", list(reversed(LIBRARY_ID_LIST)))
+    assert not is_backfilled(WORKFLOW_NAME, None, LIBRARY_ID_LIST[:1])
+    assert not is_backfilled("oncoanalyser-wgts-rna", None, LIBRARY_ID_LIST)
+
+
+def test_backfill_marker_expires(workflow_run_index_environ, monkeypatch):
+    from pipeline_manager_tools import workflow_run_index
+
+    workflow_run_index.put_backfill_marker(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+    assert workflow_run_index.is_backfilled(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+
+    # State change events missed since the backfill are picked up by the next backfill
+    monkeypatch.setattr(workflow_run_index, "WORKFLOW_RUN_INDEX_BACKFILL_MAX_AGE_SECONDS", 0)
+    assert not workflow_run_index.is_backfilled(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+
+
+def test_backfill_marker_in_dynamodb_expires(monkeypatch):
+    from pipeline_manager_tools import aws_clients, workflow_run_index
+
+    monkeypatch.setenv("WORKFLOW_RUN_INDEX_TABLE_NAME", "workflowRunIndex")
+    dynamodb_client = boto3.client("dynamodb")
+    monkeypatch.setattr(aws_clients, "_DYNAMODB_CLIENT", dynamodb_client)
+
+    backfill_key = workflow_run_index.get_backfill_key(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+
+    with Stubber(dynamodb_client) as stubber:
+        stubber.add_response(
+            "put_item",
+            {},
+            {
+                "TableName": "workflowRunIndex",
+                "Item": {
+                    "library_id": {"S": LIBRARY_ID_LIST[0]},
+                    "workflow_run_key": {"S": backfill_key},
+                    "backfilled_at": {"S": ANY},
+                    "ttl": {"N": ANY},
+                },
+            },
+        )
+        # A marker past its ttl, not yet deleted by DynamoDB
+        stubber.add_response(
+            "get_item",
+            {"Item": {"backfilled_at": {"S": "2025-01-01T00:00:00.000000+00:00"}}},
+            {
+                "TableName": "workflowRunIndex",
+                "Key": {"library_id": {"S": LIBRARY_ID_LIST[0]}, "workflow_run_key": {"S": backfill_key}},
+                "ProjectionExpression": "backfilled_at",
+            },
+        )
+
+        workflow_run_index.put_backfill_marker(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+        assert not workflow_run_index.is_backfilled(WORKFLOW_NAME, None, LIBRARY_ID_LIST)
+        stubber.assert_no_pending_responses()
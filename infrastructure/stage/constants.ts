@@ -11,11 +11,14 @@ import {
   REFERENCE_DATA_BUCKET,
   TEST_DATA_BUCKET,
 } from '@orcabus/platform-cdk-constructs/shared-config/s3';
+import { DynamoDbTableName } from './dynamodb/interfaces';
+import { SqsQueueName } from './sqs/interfaces';
 
 export const APP_ROOT = path.join(__dirname, '../../app');
 export const LAMBDA_DIR = path.join(APP_ROOT, 'lambdas');
 export const STEP_FUNCTIONS_DIR = path.join(APP_ROOT, 'step-functions-templates');
 export const EVENT_SCHEMAS_DIR = path.join(APP_ROOT, 'event-schemas');
+export const LAYERS_DIR = path.join(APP_ROOT, 'layers');
 
 /* Workflow constants */
 export const WORKFLOW_NAME = 'oncoanalyser-wgts-dna-rna';
@@ -162,6 +165,8 @@ export const ICAV2_WES_REQUEST_DETAIL_TYPE = 'Icav2WesRequest';
 export const ICAV2_WES_STATE_CHANGE_DETAIL_TYPE = 'Icav2WesAnalysisStateChange';
 export const WORKFLOW_MANAGER_EVENT_SOURCE = 'orcabus.workflowmanager';
 export const ICAV2_WES_EVENT_SOURCE = 'orcabus.icav2wesmanager';
+export const METADATA_MANAGER_EVENT_SOURCE = 'orcabus.metadatamanager';
+export const METADATA_STATE_CHANGE_DETAIL_TYPE = 'MetadataStateChange';
 
 /* Event rule constants */
 export const DRAFT_STATUS = 'DRAFT';
@@ -177,6 +182,47 @@ export const SSM_SCHEMA_ROOT = path.join(SSM_PARAMETER_PATH_PREFIX, 'schemas');
 // Used to group event rules and step functions
 export const STACK_PREFIX = 'orca-onco-wgts-both';
 
+/* DynamoDB constants */
+// Table names are fixed so the stateless stack can reference tables built in the stateful stack
+export const DYNAMODB_TABLE_NAME_MAP: Record<DynamoDbTableName, string> = {
+  workflowRunIndex: `${STACK_PREFIX}--workflow-run-index`,
+  libraryMetadataCache: `${STACK_PREFIX}--library-metadata-cache`,
+  payloadStore: `${STACK_PREFIX}--payload-store`,
+  workflowRunCache: `${STACK_PREFIX}--workflow-run-cache`,
+  resultReuseIndex: `${STACK_PREFIX}--result-reuse-index`,
+  wesStateCache: `${STACK_PREFIX}--wes-state-cache`,
+  commentSuppressionIndex: `${STACK_PREFIX}--comment-suppression-index`,
+};
+export const DYNAMODB_TTL_ATTRIBUTE_NAME = 'ttl';
+// Identical populate comments are not posted again to a workflow run within this window
+export const COMMENT_SUPPRESSION_WINDOW_SECONDS = 6 * 60 * 60;
+
+/* SQS constants */
+// Queue names are fixed so the stateless stack can reference queues built in the stateful stack
+export const SQS_QUEUE_NAME_MAP: Record<SqsQueueName, string> = {
+  commentOutbox: `${STACK_PREFIX}--comment-outbox.fifo`,
+  readyEvents: `${STACK_PREFIX}--ready-events`,
+  workflowRunIndexDeadLetter: `${STACK_PREFIX}--workflow-run-index-dlq`,
+};
+// At least six times the lambda timeout, so a batch is not redelivered while it is being flushed
+export const SQS_VISIBILITY_TIMEOUT_SECONDS = 360;
+export const SQS_MAX_RECEIVE_COUNT = 5;
+export const SQS_DEAD_LETTER_RETENTION_DAYS = 14;
+// READY events are handed to the ready state machine in batches of up to ten (one PutEvents call)
+export const READY_EVENT_BATCH_SIZE = 10;
+export const READY_EVENT_BATCHING_WINDOW_SECONDS = 10;
+
+/* Event target constants */
+// Retries of events the rule could not deliver to the (throttled) lambda, and of the lambda's failed invocations
+export const EVENT_TARGET_RETRY_ATTEMPTS = 8;
+export const EVENT_TARGET_LAMBDA_RETRY_ATTEMPTS = 2;
+export const EVENT_TARGET_MAX_EVENT_AGE_HOURS = 6;
+
 /* Buckets */
 export const TEST_DATA_BUCKET_NAME = TEST_DATA_BUCKET;
 export const REF_DATA_BUCKET_NAME = REFERENCE_DATA_BUCKET;
+
+/* Tracing constants */
+// Tracing is cheap enough to leave on, set to false to skip instrumenting the lambdas entirely
+export const TRACING_ENABLED = true;
+export const TRACING_METRICS_NAMESPACE = 'OrcaBus/OncoanalyserWgtsBoth';
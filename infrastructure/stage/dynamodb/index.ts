@@ -0,0 +1,45 @@
+import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
+import { RemovalPolicy } from 'aws-cdk-lib';
+import { Construct } from 'constructs';
+import {
+  BuildDynamoDbTableProps,
+  dynamoDbTableKeysMap,
+  dynamoDbTableNameList,
+} from './interfaces';
+import { DYNAMODB_TABLE_NAME_MAP, DYNAMODB_TTL_ATTRIBUTE_NAME } from '../constants';
+
+function buildDynamoDbTable(scope: Construct, props: BuildDynamoDbTableProps): dynamodb.TableV2 {
+  const tableKeys = dynamoDbTableKeysMap[props.tableName];
+
+  return new dynamodb.TableV2(scope, props.tableName, {
+    tableName: DYNAMODB_TABLE_NAME_MAP[props.tableName],
+    partitionKey: {
+      name: tableKeys.partitionKey,
+      type: dynamodb.AttributeType.STRING,
+    },
+    sortKey: tableKeys.sortKey
+      ? {
+          name: tableKeys.sortKey,
+          type: dynamodb.AttributeType.STRING,
+        }
+      : undefined,
+    billing: dynamodb.Billing.onDemand(),
+    timeToLiveAttribute: DYNAMODB_TTL_ATTRIBUTE_NAME,
+    pointInTimeRecoverySpecification: {
+      pointInTimeRecoveryEnabled: true,
+    },
+    removalPolicy: RemovalPolicy.RETAIN_ON_UPDATE_OR_DELETE,
+  });
+}
+
+export function buildDynamoDbTables(scope: Construct) {
+  /**
+   * Read models and state stores used by the stateless lambdas
+   * Table names are constants so the stateless stack can reference them by name
+   */
+  for (const tableName of dynamoDbTableNameList) {
+    buildDynamoDbTable(scope, {
+      tableName: tableName,
+    });
+  }
+}
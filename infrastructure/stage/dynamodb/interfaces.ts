@@ -0,0 +1,70 @@
+/**
+ * DynamoDB Table Interfaces
+ */
+export type DynamoDbTableName =
+  // Library id -> workflow run read model, fed by WorkflowRunStateChange events
+  | 'workflowRunIndex'
+  // Library metadata records keyed by orcabus id and library id, invalidated by MetadataStateChange events
+  | 'libraryMetadataCache'
+  // Immutable workflow run payload bodies keyed by payload orcabus id
+  | 'payloadStore'
+  // Workflow run details keyed by portal run id, invalidated by WorkflowRunStateChange events
+  | 'workflowRunCache'
+  // SUCCEEDED run results keyed by the fingerprint of their WES inputs
+  | 'resultReuseIndex'
+  // Per portal run ICAv2 WES state, for coalescing intermediate state changes
+  | 'wesStateCache'
+  // Content hashes of the repetitive populate comments posted to each workflow run
+  | 'commentSuppressionIndex';
+
+export const dynamoDbTableNameList: DynamoDbTableName[] = [
+  // Library id -> workflow run read model
+  'workflowRunIndex',
+  // Library metadata cache
+  'libraryMetadataCache',
+  // Payload store
+  'payloadStore',
+  // Workflow run cache
+  'workflowRunCache',
+  // Result reuse index
+  'resultReuseIndex',
+  // WES state cache
+  'wesStateCache',
+  // Comment suppression index
+  'commentSuppressionIndex',
+];
+
+export interface DynamoDbTableKeys {
+  partitionKey: string;
+  sortKey?: string;
+}
+
+export const dynamoDbTableKeysMap: Record<DynamoDbTableName, DynamoDbTableKeys> = {
+  workflowRunIndex: {
+    partitionKey: 'library_id',
+    sortKey: 'workflow_run_key',
+  },
+  libraryMetadataCache: {
+    partitionKey: 'library_key',
+  },
+  payloadStore: {
+    partitionKey: 'payload_orcabus_id',
+  },
+  workflowRunCache: {
+    partitionKey: 'portal_run_id',
+  },
+  resultReuseIndex: {
+    partitionKey: 'input_fingerprint',
+  },
+  wesStateCache: {
+    partitionKey: 'portal_run_id',
+  },
+  commentSuppressionIndex: {
+    partitionKey: 'workflow_run_id',
+    sortKey: 'comment_type',
+  },
+};
+
+export interface BuildDynamoDbTableProps {
+  tableName: DynamoDbTableName;
+}
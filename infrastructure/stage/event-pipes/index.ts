@@ -0,0 +1,76 @@
+import * as cdk from 'aws-cdk-lib';
+import * as iam from 'aws-cdk-lib/aws-iam';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import { CfnPipe } from 'aws-cdk-lib/aws-pipes';
+import { Construct } from 'constructs';
+import {
+  BuildSqsToSfnPipeProps,
+  EventPipeObject,
+  eventPipeNameList,
+  eventPipeRequirementsMap,
+  EventPipesProps,
+} from './interfaces';
+import {
+  READY_EVENT_BATCH_SIZE,
+  READY_EVENT_BATCHING_WINDOW_SECONDS,
+  SQS_QUEUE_NAME_MAP,
+  STACK_PREFIX,
+} from '../constants';
+
+function buildSqsToSfnPipe(scope: Construct, props: BuildSqsToSfnPipeProps): CfnPipe {
+  // The queue is built in the stateful stack
+  const sourceQueue = sqs.Queue.fromQueueArn(
+    scope,
+    `${props.pipeName}-source-queue`,
+    `arn:aws:sqs:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:${SQS_QUEUE_NAME_MAP[props.sourceQueueName]}`
+  );
+
+  const pipeRole = new iam.Role(scope, `${props.pipeName}-pipe-role`, {
+    assumedBy: new iam.ServicePrincipal('pipes.amazonaws.com'),
+  });
+  sourceQueue.grantConsumeMessages(pipeRole);
+  props.stateMachineObj.grantStartExecution(pipeRole);
+
+  /*
+  Each batch of queued event details is handed to the state machine as a single list,
+  messages are removed from the queue once the execution has started
+   */
+  return new CfnPipe(scope, props.pipeName, {
+    name: `${STACK_PREFIX}--${props.pipeName}`,
+    roleArn: pipeRole.roleArn,
+    source: sourceQueue.queueArn,
+    sourceParameters: {
+      sqsQueueParameters: {
+        batchSize: READY_EVENT_BATCH_SIZE,
+        maximumBatchingWindowInSeconds: READY_EVENT_BATCHING_WINDOW_SECONDS,
+      },
+    },
+    target: props.stateMachineObj.stateMachineArn,
+    targetParameters: {
+      inputTemplate: '<$.body>',
+      stepFunctionStateMachineParameters: {
+        invocationType: 'FIRE_AND_FORGET',
+      },
+    },
+  });
+}
+
+export function buildAllEventPipes(scope: Construct, props: EventPipesProps): EventPipeObject[] {
+  const eventPipeObjects: EventPipeObject[] = [];
+
+  for (const pipeName of eventPipeNameList) {
+    const eventPipeRequirements = eventPipeRequirementsMap[pipeName];
+    eventPipeObjects.push({
+      pipeName: pipeName,
+      pipeObject: buildSqsToSfnPipe(scope, {
+        pipeName: pipeName,
+        sourceQueueName: eventPipeRequirements.sourceQueueName,
+        stateMachineObj: props.stepFunctionObjects.find(
+          (sfnObject) => sfnObject.stateMachineName === eventPipeRequirements.targetStateMachineName
+        )!.sfnObject,
+      }),
+    });
+  }
+
+  return eventPipeObjects;
+}
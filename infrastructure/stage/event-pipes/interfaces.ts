@@ -0,0 +1,41 @@
+import { CfnPipe } from 'aws-cdk-lib/aws-pipes';
+import { StateMachine } from 'aws-cdk-lib/aws-stepfunctions';
+import { StateMachineName, StepFunctionObject } from '../step-functions/interfaces';
+import { SqsQueueName } from '../sqs/interfaces';
+
+/**
+ * EventBridge Pipe Interfaces
+ */
+export type EventPipeName =
+  // Batches of READY events to the ICAv2 WES Submitted state machine
+  'readyEventsToIcav2WesRequestEvent';
+
+export const eventPipeNameList: EventPipeName[] = ['readyEventsToIcav2WesRequestEvent'];
+
+// Requirements interface for EventBridge pipes
+export interface EventPipeRequirements {
+  sourceQueueName: SqsQueueName;
+  targetStateMachineName: StateMachineName;
+}
+
+export const eventPipeRequirementsMap: Record<EventPipeName, EventPipeRequirements> = {
+  readyEventsToIcav2WesRequestEvent: {
+    sourceQueueName: 'readyEvents',
+    targetStateMachineName: 'readyEventToIcav2WesRequestEvent',
+  },
+};
+
+export interface BuildSqsToSfnPipeProps {
+  pipeName: EventPipeName;
+  sourceQueueName: SqsQueueName;
+  stateMachineObj: StateMachine;
+}
+
+export interface EventPipesProps {
+  stepFunctionObjects: StepFunctionObject[];
+}
+
+export interface EventPipeObject {
+  pipeName: EventPipeName;
+  pipeObject: CfnPipe;
+}
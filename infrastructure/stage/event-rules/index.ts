@@ -3,6 +3,8 @@ import {
   BuildDraftRuleProps,
   BuildReadyRuleProps,
   BuildIcav2AnalysisStateChangeRuleProps,
+  BuildMetadataLibraryStateChangeRuleProps,
+  BuildWorkflowRunIndexRuleProps,
   eventBridgeRuleNameList,
   EventBridgeRuleObject,
   EventBridgeRuleProps,
@@ -16,6 +18,8 @@ import {
   DRAFT_STATUS,
   ICAV2_WES_EVENT_SOURCE,
   ICAV2_WES_STATE_CHANGE_DETAIL_TYPE,
+  METADATA_MANAGER_EVENT_SOURCE,
+  METADATA_STATE_CHANGE_DETAIL_TYPE,
   ONCOANALYSER_WGTS_DNA_WORKFLOW_NAME,
   ONCOANALYSER_WGTS_RNA_WORKFLOW_NAME,
   READY_STATUS,
@@ -86,6 +90,36 @@ function buildWorkflowManagerReadyEventPattern(): EventPattern {
   };
 }
 
+function buildWorkflowManagerIndexEventPattern(): EventPattern {
+  // All statuses for this workflow and its upstream workflows
+  // These feed the library id -> workflow run read model
+  return {
+    detailType: [WORKFLOW_RUN_STATE_CHANGE_DETAIL_TYPE],
+    source: [WORKFLOW_MANAGER_EVENT_SOURCE],
+    detail: {
+      workflow: {
+        name: [
+          WORKFLOW_NAME,
+          ONCOANALYSER_WGTS_DNA_WORKFLOW_NAME,
+          ONCOANALYSER_WGTS_RNA_WORKFLOW_NAME,
+        ],
+      },
+    },
+  };
+}
+
+function buildMetadataLibraryStateChangeEventPattern(): EventPattern {
+  // Library updates and deletions invalidate the library metadata cache
+  return {
+    detailType: [METADATA_STATE_CHANGE_DETAIL_TYPE],
+    source: [METADATA_MANAGER_EVENT_SOURCE],
+    detail: {
+      model: ['LIBRARY'],
+      action: ['UPDATE', 'DELETE'],
+    },
+  };
+}
+
 function buildEventRule(scope: Construct, props: EventBridgeRuleProps): Rule {
   return new events.Rule(scope, props.ruleName, {
     ruleName: `${STACK_PREFIX}--${props.ruleName}`,
@@ -138,6 +172,28 @@ function buildWorkflowRunStateChangeReadyEventRule(
   });
 }
 
+function buildWorkflowRunStateChangeIndexEventRule(
+  scope: Construct,
+  props: BuildWorkflowRunIndexRuleProps
+): Rule {
+  return buildEventRule(scope, {
+    ruleName: props.ruleName,
+    eventPattern: buildWorkflowManagerIndexEventPattern(),
+    eventBus: props.eventBus,
+  });
+}
+
+function buildMetadataLibraryStateChangeEventRule(
+  scope: Construct,
+  props: BuildMetadataLibraryStateChangeRuleProps
+): Rule {
+  return buildEventRule(scope, {
+    ruleName: props.ruleName,
+    eventPattern: buildMetadataLibraryStateChangeEventPattern(),
+    eventBus: props.eventBus,
+  });
+}
+
 export function buildAllEventRules(
   scope: Construct,
   props: EventBridgeRulesProps
@@ -189,6 +245,29 @@ export function buildAllEventRules(
             eventBus: props.eventBus,
           }),
         });
+        break;
+      }
+      // Workflow run index
+      case 'wrscWorkflowRunIndex': {
+        eventBridgeRuleObjects.push({
+          ruleName: ruleName,
+          ruleObject: buildWorkflowRunStateChangeIndexEventRule(scope, {
+            ruleName: ruleName,
+            eventBus: props.eventBus,
+          }),
+        });
+        break;
+      }
+      // Library metadata cache invalidation
+      case 'metadataLibraryStateChange': {
+        eventBridgeRuleObjects.push({
+          ruleName: ruleName,
+          ruleObject: buildMetadataLibraryStateChangeEventRule(scope, {
+            ruleName: ruleName,
+            eventBus: props.eventBus,
+          }),
+        });
+        break;
       }
     }
   }
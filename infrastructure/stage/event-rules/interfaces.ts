@@ -11,7 +11,11 @@ export type EventBridgeRuleName =
   // ready
   | 'wrscReady'
   // Post-submitted
-  | 'icav2WesAnalysisStateChange';
+  | 'icav2WesAnalysisStateChange'
+  // Workflow run index (all statuses)
+  | 'wrscWorkflowRunIndex'
+  // Library metadata cache invalidation
+  | 'metadataLibraryStateChange';
 
 export const eventBridgeRuleNameList: EventBridgeRuleName[] = [
   // Upstream Succeeded (Oncoanalyser WGTS DNA | RNA)
@@ -22,6 +26,10 @@ export const eventBridgeRuleNameList: EventBridgeRuleName[] = [
   'wrscReady',
   // Post-submitted
   'icav2WesAnalysisStateChange',
+  // Workflow run index (all statuses)
+  'wrscWorkflowRunIndex',
+  // Library metadata cache invalidation
+  'metadataLibraryStateChange',
 ];
 
 export interface EventBridgeRuleProps {
@@ -42,3 +50,5 @@ export interface EventBridgeRuleObject {
 export type BuildIcav2AnalysisStateChangeRuleProps = Omit<EventBridgeRuleProps, 'eventPattern'>;
 export type BuildDraftRuleProps = Omit<EventBridgeRuleProps, 'eventPattern'>;
 export type BuildReadyRuleProps = Omit<EventBridgeRuleProps, 'eventPattern'>;
+export type BuildWorkflowRunIndexRuleProps = Omit<EventBridgeRuleProps, 'eventPattern'>;
+export type BuildMetadataLibraryStateChangeRuleProps = Omit<EventBridgeRuleProps, 'eventPattern'>;
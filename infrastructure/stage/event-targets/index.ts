@@ -1,10 +1,23 @@
 import {
+  AddLambdaAsEventBridgeTargetProps,
   AddSfnAsEventBridgeTargetProps,
+  AddSqsQueueAsEventBridgeTargetProps,
   eventBridgeTargetsNameList,
   EventBridgeTargetsProps,
 } from './interfaces';
 import * as eventsTargets from 'aws-cdk-lib/aws-events-targets';
 import * as events from 'aws-cdk-lib/aws-events';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as lambdaDestinations from 'aws-cdk-lib/aws-lambda-destinations';
+import * as cdk from 'aws-cdk-lib';
+import { Duration } from 'aws-cdk-lib';
+import { Construct } from 'constructs';
+import {
+  EVENT_TARGET_LAMBDA_RETRY_ATTEMPTS,
+  EVENT_TARGET_MAX_EVENT_AGE_HOURS,
+  EVENT_TARGET_RETRY_ATTEMPTS,
+  SQS_QUEUE_NAME_MAP,
+} from '../constants';
 
 export function buildWrscToSfnTarget(props: AddSfnAsEventBridgeTargetProps) {
   // We take in the event detail from the oncoanalyser wgts dna+rna ready event
@@ -27,7 +40,41 @@ export function buildIcav2WesEventStateChangeToWrscSfnTarget(
   );
 }
 
-export function buildAllEventBridgeTargets(props: EventBridgeTargetsProps) {
+export function buildWrscToLambdaTarget(props: AddLambdaAsEventBridgeTargetProps) {
+  // We take in the event detail from the workflow run state change event
+  props.eventBridgeRuleObj.addTarget(
+    new eventsTargets.LambdaFunction(props.lambdaFunctionObj, {
+      event: events.RuleTargetInput.fromEventPath('$.detail'),
+      // Events the rule could not deliver (i.e. the lambda is throttled) are retried, then dead lettered
+      deadLetterQueue: props.deadLetterQueueObj,
+      retryAttempts: props.deadLetterQueueObj ? EVENT_TARGET_RETRY_ATTEMPTS : undefined,
+      maxEventAge: props.deadLetterQueueObj
+        ? Duration.hours(EVENT_TARGET_MAX_EVENT_AGE_HOURS)
+        : undefined,
+    })
+  );
+
+  // The rule invokes the lambda asynchronously, failed invocations are retried by lambda, then dead lettered
+  if (props.deadLetterQueueObj) {
+    props.lambdaFunctionObj.configureAsyncInvoke({
+      retryAttempts: EVENT_TARGET_LAMBDA_RETRY_ATTEMPTS,
+      maxEventAge: Duration.hours(EVENT_TARGET_MAX_EVENT_AGE_HOURS),
+      onFailure: new lambdaDestinations.SqsDestination(props.deadLetterQueueObj),
+    });
+  }
+}
+
+export function buildWrscToSqsQueueTarget(props: AddSqsQueueAsEventBridgeTargetProps) {
+  // We take in the event detail from the workflow run state change event
+  // The queue policy (stateful stack) allows this rule to send messages
+  props.eventBridgeRuleObj.addTarget(
+    new eventsTargets.SqsQueue(props.queueObj, {
+      message: events.RuleTargetInput.fromEventPath('$.detail'),
+    })
+  );
+}
+
+export function buildAllEventBridgeTargets(scope: Construct, props: EventBridgeTargetsProps) {
   for (const eventBridgeTargetsName of eventBridgeTargetsNameList) {
     switch (eventBridgeTargetsName) {
       // Upstream Succeeded to Glue
@@ -69,15 +116,17 @@ export function buildAllEventBridgeTargets(props: EventBridgeTargetsProps) {
         break;
       }
 
-      // Ready to Icav2 Wes Submitted
-      case 'readyToIcav2WesSubmittedSfnTarget': {
-        buildWrscToSfnTarget(<AddSfnAsEventBridgeTargetProps>{
+      // Ready events queue, drained in batches by the ready events pipe
+      case 'readyToReadyEventsQueueTarget': {
+        buildWrscToSqsQueueTarget(<AddSqsQueueAsEventBridgeTargetProps>{
           eventBridgeRuleObj: props.eventBridgeRuleObjects.find(
             (eventBridgeObject) => eventBridgeObject.ruleName === 'wrscReady'
           )?.ruleObject,
-          stateMachineObj: props.stepFunctionObjects.find(
-            (sfnObject) => sfnObject.stateMachineName === 'readyEventToIcav2WesRequestEvent'
-          )?.sfnObject,
+          queueObj: sqs.Queue.fromQueueArn(
+            scope,
+            'ready-events-queue',
+            `arn:aws:sqs:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:${SQS_QUEUE_NAME_MAP.readyEvents}`
+          ),
         });
         break;
       }
@@ -94,6 +143,38 @@ export function buildAllEventBridgeTargets(props: EventBridgeTargetsProps) {
         });
         break;
       }
+
+      // Workflow run index
+      case 'wrscToWorkflowRunIndexLambdaTarget': {
+        buildWrscToLambdaTarget(<AddLambdaAsEventBridgeTargetProps>{
+          eventBridgeRuleObj: props.eventBridgeRuleObjects.find(
+            (eventBridgeObject) => eventBridgeObject.ruleName === 'wrscWorkflowRunIndex'
+          )?.ruleObject,
+          lambdaFunctionObj: props.lambdaObjects.find(
+            (lambdaObject) => lambdaObject.lambdaName === 'updateWorkflowRunIndex'
+          )?.lambdaFunction,
+          // A state change missed by the index is only picked up by the next backfill of its search
+          deadLetterQueueObj: sqs.Queue.fromQueueArn(
+            scope,
+            'workflow-run-index-dead-letter-queue',
+            `arn:aws:sqs:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:${SQS_QUEUE_NAME_MAP.workflowRunIndexDeadLetter}`
+          ),
+        });
+        break;
+      }
+
+      // Library metadata cache invalidation
+      case 'metadataLibraryStateChangeToLibraryMetadataCacheLambdaTarget': {
+        buildWrscToLambdaTarget(<AddLambdaAsEventBridgeTargetProps>{
+          eventBridgeRuleObj: props.eventBridgeRuleObjects.find(
+            (eventBridgeObject) => eventBridgeObject.ruleName === 'metadataLibraryStateChange'
+          )?.ruleObject,
+          lambdaFunctionObj: props.lambdaObjects.find(
+            (lambdaObject) => lambdaObject.lambdaName === 'invalidateLibraryMetadataCache'
+          )?.lambdaFunction,
+        });
+        break;
+      }
     }
   }
 }
@@ -2,6 +2,9 @@ import { StateMachine } from 'aws-cdk-lib/aws-stepfunctions';
 import { Rule } from 'aws-cdk-lib/aws-events';
 import { EventBridgeRuleObject } from '../event-rules/interfaces';
 import { StepFunctionObject } from '../step-functions/interfaces';
+import { LambdaObject } from '../lambda/interfaces';
+import { PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
+import { IQueue } from 'aws-cdk-lib/aws-sqs';
 
 /**
  * EventBridge Target Interfaces
@@ -13,10 +16,14 @@ export type EventBridgeTargetName =
   | 'draftToPopulateDraftDataSfnTarget'
   // Validate draft to ready
   | 'draftToValidateDraftSfnTarget'
-  // Ready to ICAv2 WES Submitted
-  | 'readyToIcav2WesSubmittedSfnTarget'
+  // Ready events are queued, and handed to the ICAv2 WES Submitted state machine in batches
+  | 'readyToReadyEventsQueueTarget'
   // Post submission
-  | 'icav2WesAnalysisStateChangeEventToWrscSfnTarget';
+  | 'icav2WesAnalysisStateChangeEventToWrscSfnTarget'
+  // Workflow run index
+  | 'wrscToWorkflowRunIndexLambdaTarget'
+  // Library metadata cache
+  | 'metadataLibraryStateChangeToLibraryMetadataCacheLambdaTarget';
 
 export const eventBridgeTargetsNameList: EventBridgeTargetName[] = [
   // Upstream WGTS Succeeded
@@ -25,10 +32,14 @@ export const eventBridgeTargetsNameList: EventBridgeTargetName[] = [
   'draftToPopulateDraftDataSfnTarget',
   // Validate draft to ready
   'draftToValidateDraftSfnTarget',
-  // Ready to ICAv2 WES Submitted
-  'readyToIcav2WesSubmittedSfnTarget',
+  // Ready events queue
+  'readyToReadyEventsQueueTarget',
   // Post submission
   'icav2WesAnalysisStateChangeEventToWrscSfnTarget',
+  // Workflow run index
+  'wrscToWorkflowRunIndexLambdaTarget',
+  // Library metadata cache
+  'metadataLibraryStateChangeToLibraryMetadataCacheLambdaTarget',
 ];
 
 export interface AddSfnAsEventBridgeTargetProps {
@@ -36,7 +47,20 @@ export interface AddSfnAsEventBridgeTargetProps {
   eventBridgeRuleObj: Rule;
 }
 
+export interface AddLambdaAsEventBridgeTargetProps {
+  lambdaFunctionObj: PythonUvFunction;
+  eventBridgeRuleObj: Rule;
+  // Undelivered events and failed invocations, retried first
+  deadLetterQueueObj?: IQueue;
+}
+
+export interface AddSqsQueueAsEventBridgeTargetProps {
+  queueObj: IQueue;
+  eventBridgeRuleObj: Rule;
+}
+
 export interface EventBridgeTargetsProps {
   eventBridgeRuleObjects: EventBridgeRuleObject[];
   stepFunctionObjects: StepFunctionObject[];
+  lambdaObjects: LambdaObject[];
 }
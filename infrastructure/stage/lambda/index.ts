@@ -1,18 +1,34 @@
-import { LambdaInput, lambdaNameList, LambdaObject, lambdaRequirementsMap } from './interfaces';
+import {
+  BuildLambdaProps,
+  LambdaName,
+  lambdaNameList,
+  LambdaObject,
+  LambdaRequirements,
+  lambdaRequirementsMap,
+  lambdaTableRequirementsMap,
+} from './interfaces';
 import { PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
 import {
   DEFAULT_PAYLOAD_VERSION,
   DEFAULT_WORKFLOW_VERSION,
+  DYNAMODB_TABLE_NAME_MAP,
   LAMBDA_DIR,
+  LAYERS_DIR,
   SCHEMA_REGISTRY_NAME,
   SSM_SCHEMA_ROOT,
   TEST_DATA_BUCKET_NAME,
   REF_DATA_BUCKET_NAME,
+  SQS_QUEUE_NAME_MAP,
+  TRACING_ENABLED,
+  TRACING_METRICS_NAMESPACE,
   WORKFLOW_NAME,
 } from '../constants';
 import { REPO_NAME } from '../../toolchain/constants';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as iam from 'aws-cdk-lib/aws-iam';
+import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
 import * as cdk from 'aws-cdk-lib';
 import { Duration } from 'aws-cdk-lib';
 import { NagSuppressions } from 'cdk-nag';
@@ -21,7 +37,53 @@ import { camelCaseToKebabCase, camelCaseToSnakeCase } from '../utils';
 import * as path from 'path';
 import { SchemaNames } from '../event-schemas/interfaces';
 
-function buildLambda(scope: Construct, props: LambdaInput): LambdaObject {
+function addTableAccess(
+  scope: Construct,
+  lambdaName: LambdaName,
+  lambdaFunction: PythonUvFunction,
+  lambdaRequirements: LambdaRequirements
+) {
+  let hasTableAccess = false;
+  for (const [requirementName, tableRequirement] of Object.entries(lambdaTableRequirementsMap)) {
+    if (!tableRequirement || !lambdaRequirements[requirementName as keyof LambdaRequirements]) {
+      continue;
+    }
+    const table = dynamodb.TableV2.fromTableName(
+      scope,
+      `${lambdaName}-${camelCaseToKebabCase(tableRequirement.tableName)}-table`,
+      DYNAMODB_TABLE_NAME_MAP[tableRequirement.tableName]
+    );
+    if (tableRequirement.readOnly) {
+      table.grantReadData(lambdaFunction);
+    } else {
+      table.grantReadWriteData(lambdaFunction);
+    }
+    lambdaFunction.addEnvironment(
+      tableRequirement.tableNameEnvVar,
+      DYNAMODB_TABLE_NAME_MAP[tableRequirement.tableName]
+    );
+    for (const [envVarName, envVarValue] of Object.entries(tableRequirement.environment ?? {})) {
+      lambdaFunction.addEnvironment(envVarName, envVarValue);
+    }
+    hasTableAccess = true;
+  }
+
+  if (hasTableAccess) {
+    NagSuppressions.addResourceSuppressions(
+      lambdaFunction,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason:
+            'The table grants include a wildcard for table indexes, generated by the CDK grantReadWriteData / grantReadData methods',
+        },
+      ],
+      true
+    );
+  }
+}
+
+function buildLambda(scope: Construct, props: BuildLambdaProps): LambdaObject {
   const lambdaNameToSnakeCase = camelCaseToSnakeCase(props.lambdaName);
   const lambdaRequirements = lambdaRequirementsMap[props.lambdaName];
 
@@ -39,6 +101,19 @@ function buildLambda(scope: Construct, props: LambdaInput): LambdaObject {
     includeIcav2Layer: lambdaRequirements.needsIcav2Tools,
   });
 
+  /*
+  Tracing, every lambda records the duration, payload size and outcome of its
+  orcabus api, icav2, aws sdk and jsonschema calls, and logs one EMF record per invocation
+   */
+  lambdaFunction.addLayers(props.tracingLayer);
+  lambdaFunction.addEnvironment('TRACING_ENABLED', TRACING_ENABLED ? 'true' : 'false');
+  lambdaFunction.addEnvironment('TRACING_METRICS_NAMESPACE', TRACING_METRICS_NAMESPACE);
+
+  /*
+  Pipeline manager tools, the caches, indexes and stores shared by the lambdas
+   */
+  lambdaFunction.addLayers(props.toolsLayer);
+
   // AwsSolutions-L1 - Python 3.14 is not yet in the cdk-nag approved list but is our target runtime
   // AwsSolutions-IAM4 - Basic execution role provides CloudWatch Logs permissions needed by all Lambdas
   NagSuppressions.addResourceSuppressions(
@@ -154,6 +229,42 @@ function buildLambda(scope: Construct, props: LambdaInput): LambdaObject {
     );
   }
 
+  /*
+  Tables, the caches, indexes and stores of the pipeline manager tools layer (see lambdaTableRequirementsMap)
+   */
+  addTableAccess(scope, props.lambdaName, lambdaFunction, lambdaRequirements);
+
+  /*
+  Comment outbox queue, workflow run comments are queued rather than posted on the critical path,
+  the flushCommentOutbox lambda merges the comments of each workflow run and posts them
+   */
+  if (
+    lambdaRequirements.needsCommentOutboxQueue ||
+    lambdaRequirements.needsCommentOutboxEventSource
+  ) {
+    const commentOutboxQueue = sqs.Queue.fromQueueArn(
+      scope,
+      `${props.lambdaName}-comment-outbox-queue`,
+      `arn:aws:sqs:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:${SQS_QUEUE_NAME_MAP.commentOutbox}`
+    );
+
+    if (lambdaRequirements.needsCommentOutboxQueue) {
+      commentOutboxQueue.grantSendMessages(lambdaFunction);
+      lambdaFunction.addEnvironment('COMMENT_OUTBOX_QUEUE_URL', commentOutboxQueue.queueUrl);
+    }
+
+    // Batch the outbox so the comments of a workflow run can be merged
+    // (FIFO queues take batches of up to ten messages, without a batching window)
+    if (lambdaRequirements.needsCommentOutboxEventSource) {
+      lambdaFunction.addEventSource(
+        new lambdaEventSources.SqsEventSource(commentOutboxQueue, {
+          batchSize: 10,
+          reportBatchItemFailures: true,
+        })
+      );
+    }
+  }
+
   /* Return the function */
   return {
     lambdaName: props.lambdaName,
@@ -161,13 +272,37 @@ function buildLambda(scope: Construct, props: LambdaInput): LambdaObject {
   };
 }
 
+function buildTracingLayer(scope: Construct): lambda.ILayerVersion {
+  return new lambda.LayerVersion(scope, 'lambdaTracingLayer', {
+    code: lambda.Code.fromAsset(path.join(LAYERS_DIR, 'lambda_tracing_layer')),
+    compatibleRuntimes: [lambda.Runtime.PYTHON_3_14],
+    compatibleArchitectures: [lambda.Architecture.ARM_64],
+    description: 'Spans around the external calls of the lambdas, logged as EMF records',
+  });
+}
+
+function buildPipelineManagerToolsLayer(scope: Construct): lambda.ILayerVersion {
+  return new lambda.LayerVersion(scope, 'pipelineManagerToolsLayer', {
+    code: lambda.Code.fromAsset(path.join(LAYERS_DIR, 'pipeline_manager_tools_layer')),
+    compatibleRuntimes: [lambda.Runtime.PYTHON_3_14],
+    compatibleArchitectures: [lambda.Architecture.ARM_64],
+    description: 'The caches, indexes and stores shared by the pipeline manager lambdas',
+  });
+}
+
 export function buildAllLambdas(scope: Construct): LambdaObject[] {
+  // Shared by all lambdas
+  const tracingLayer = buildTracingLayer(scope);
+  const toolsLayer = buildPipelineManagerToolsLayer(scope);
+
   // Iterate over lambdaLayerToMapping and create the lambda functions
   const lambdaObjects: LambdaObject[] = [];
   for (const lambdaName of lambdaNameList) {
     lambdaObjects.push(
       buildLambda(scope, {
         lambdaName: lambdaName,
+        tracingLayer: tracingLayer,
+        toolsLayer: toolsLayer,
       })
     );
   }
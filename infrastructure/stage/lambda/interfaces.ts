@@ -1,4 +1,7 @@
 import { PythonUvFunction } from '@orcabus/platform-cdk-constructs/lambda';
+import * as lambda from 'aws-cdk-lib/aws-lambda';
+import { DynamoDbTableName } from '../dynamodb/interfaces';
+import { COMMENT_SUPPRESSION_WINDOW_SECONDS } from '../constants';
 
 export type LambdaName =
   // Shared pre-ready lambdas
@@ -22,11 +25,15 @@ export type LambdaName =
   // Commentary lambdas
   | 'addPopulateDraftComment'
   | 'addReadyComment'
+  | 'flushCommentOutbox'
   // Ready to ICAv2 WES lambdas
   | 'convertReadyEventInputsToIcav2WesEventInputs'
   // ICAv2 WES to WRSC Event lambdas
   | 'convertIcav2WesEventToWrscEvent'
-  | 'addWesFailureComment';
+  | 'addWesFailureComment'
+  // Event-sourced read model lambdas
+  | 'updateWorkflowRunIndex'
+  | 'invalidateLibraryMetadataCache';
 
 export const lambdaNameList: LambdaName[] = [
   // Shared pre-ready lambdas
@@ -50,11 +57,15 @@ export const lambdaNameList: LambdaName[] = [
   // Commentary lambdas
   'addPopulateDraftComment',
   'addReadyComment',
+  'flushCommentOutbox',
   // Ready to ICAv2 WES lambdas
   'convertReadyEventInputsToIcav2WesEventInputs',
   // ICAv2 WES to WRSC Event lambdas
   'convertIcav2WesEventToWrscEvent',
   'addWesFailureComment',
+  // Event-sourced read model lambdas
+  'updateWorkflowRunIndex',
+  'invalidateLibraryMetadataCache',
 ];
 
 // Requirements interface for Lambda functions
@@ -67,6 +78,16 @@ export interface LambdaRequirements {
   needsExternalBucketInfo?: boolean;
   needsWorkflowInfo?: boolean;
   needsRepoUrl?: boolean;
+  needsWorkflowRunIndexTable?: boolean;
+  needsLibraryMetadataCacheTable?: boolean;
+  needsPayloadStoreTable?: boolean;
+  needsWorkflowRunCacheTable?: boolean;
+  needsResultReuseIndexTable?: boolean;
+  needsResultReuseIndexTableReadOnly?: boolean;
+  needsWesStateCacheTable?: boolean;
+  needsCommentSuppressionIndexTable?: boolean;
+  needsCommentOutboxQueue?: boolean;
+  needsCommentOutboxEventSource?: boolean;
 }
 
 // Lambda requirements mapping
@@ -75,18 +96,25 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
   comparePayload: {},
   getDraftPayload: {
     needsOrcabusApiTools: true,
+    needsPayloadStoreTable: true,
+    needsWorkflowRunCacheTable: true,
   },
   findLatestWorkflow: {
     needsOrcabusApiTools: true,
+    needsWorkflowRunIndexTable: true,
   },
   getOncoanalyserWgtsOutputsFromPortalRunId: {
     needsOrcabusApiTools: true,
+    needsPayloadStoreTable: true,
+    needsWorkflowRunCacheTable: true,
   },
   getWorkflowRunObject: {
     needsOrcabusApiTools: true,
+    needsWorkflowRunCacheTable: true,
   },
   generateWruEventObjectWithMergedData: {
     needsOrcabusApiTools: true,
+    needsWorkflowRunCacheTable: true,
   },
   getMissingSchemaFields: {
     needsSchemaRegistryAccess: true,
@@ -94,6 +122,8 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
   },
   getLatestPayloadFromPortalRunId: {
     needsOrcabusApiTools: true,
+    needsPayloadStoreTable: true,
+    needsWorkflowRunCacheTable: true,
   },
   // Glue lambdas
   // Draft Builder lambdas
@@ -105,9 +135,11 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
   },
   getLibraries: {
     needsOrcabusApiTools: true,
+    needsLibraryMetadataCacheTable: true,
   },
   getMetadataTags: {
     needsOrcabusApiTools: true,
+    needsLibraryMetadataCacheTable: true,
   },
   // Validation lambdas
   postSchemaValidation: {
@@ -115,33 +147,125 @@ export const lambdaRequirementsMap: Record<LambdaName, LambdaRequirements> = {
     needsWorkflowInfo: true,
     needsExternalBucketInfo: true,
     needsIcav2Tools: true,
+    needsCommentOutboxQueue: true,
+    needsLibraryMetadataCacheTable: true,
   },
   validateDraftDataCompleteSchema: {
     needsOrcabusApiTools: true,
     needsSchemaRegistryAccess: true,
     needsSsmParametersAccess: true,
     needsWorkflowInfo: true,
+    needsCommentOutboxQueue: true,
   },
   // Commentary lambdas
   addPopulateDraftComment: {
     needsOrcabusApiTools: true,
     needsWorkflowInfo: true,
     needsRepoUrl: true,
+    needsCommentOutboxQueue: true,
+    needsCommentSuppressionIndexTable: true,
   },
   addReadyComment: {
     needsOrcabusApiTools: true,
     needsWorkflowInfo: true,
+    needsCommentOutboxQueue: true,
+  },
+  flushCommentOutbox: {
+    needsOrcabusApiTools: true,
+    needsCommentOutboxEventSource: true,
   },
   // Ready to ICAv2 WES lambdas
-  convertReadyEventInputsToIcav2WesEventInputs: {},
+  convertReadyEventInputsToIcav2WesEventInputs: {
+    needsOrcabusApiTools: true,
+    needsResultReuseIndexTableReadOnly: true,
+  },
   // ICAv2 WES to WRSC Event lambdas
   convertIcav2WesEventToWrscEvent: {
     needsOrcabusApiTools: true,
     needsWorkflowInfo: true,
+    needsPayloadStoreTable: true,
+    needsWorkflowRunCacheTable: true,
+    needsResultReuseIndexTable: true,
+    needsWesStateCacheTable: true,
+    needsCommentOutboxQueue: true,
   },
   addWesFailureComment: {
     needsOrcabusApiTools: true,
     needsWorkflowInfo: true,
+    needsWorkflowRunCacheTable: true,
+    needsCommentOutboxQueue: true,
+  },
+  // Event-sourced read model lambdas
+  updateWorkflowRunIndex: {
+    needsOrcabusApiTools: true,
+    needsWorkflowRunIndexTable: true,
+    needsWorkflowRunCacheTable: true,
+  },
+  invalidateLibraryMetadataCache: {
+    needsLibraryMetadataCacheTable: true,
+  },
+};
+
+// Table access, each table requirement flag to the table the lambda is granted,
+// and the env var the table name is set in
+export interface LambdaTableRequirement {
+  tableName: DynamoDbTableName;
+  tableNameEnvVar: string;
+  readOnly?: boolean;
+  // Additional env vars for the lambdas with the requirement
+  environment?: Record<string, string>;
+}
+
+export const lambdaTableRequirementsMap: Partial<
+  Record<keyof LambdaRequirements, LambdaTableRequirement>
+> = {
+  // The library id -> workflow run read model, fed by WorkflowRunStateChange events
+  // and read by findLatestWorkflow
+  needsWorkflowRunIndexTable: {
+    tableName: 'workflowRunIndex',
+    tableNameEnvVar: 'WORKFLOW_RUN_INDEX_TABLE_NAME',
+  },
+  // Library records keyed by orcabus id and library id, invalidated by MetadataStateChange events
+  needsLibraryMetadataCacheTable: {
+    tableName: 'libraryMetadataCache',
+    tableNameEnvVar: 'LIBRARY_METADATA_CACHE_TABLE_NAME',
+  },
+  // Immutable payload bodies keyed by payload orcabus id
+  needsPayloadStoreTable: {
+    tableName: 'payloadStore',
+    tableNameEnvVar: 'PAYLOAD_STORE_TABLE_NAME',
+  },
+  // Workflow run details keyed by portal run id, invalidated by WorkflowRunStateChange events
+  needsWorkflowRunCacheTable: {
+    tableName: 'workflowRunCache',
+    tableNameEnvVar: 'WORKFLOW_RUN_CACHE_TABLE_NAME',
+  },
+  // SUCCEEDED run results (and FAILED runs to resume) keyed by the fingerprint of their WES inputs,
+  // only written by the ICAv2 WES translation lambda once the event is published
+  needsResultReuseIndexTable: {
+    tableName: 'resultReuseIndex',
+    tableNameEnvVar: 'RESULT_REUSE_INDEX_TABLE_NAME',
+  },
+  // The READY conversion lambda only reads the result reuse index
+  needsResultReuseIndexTableReadOnly: {
+    tableName: 'resultReuseIndex',
+    tableNameEnvVar: 'RESULT_REUSE_INDEX_TABLE_NAME',
+    readOnly: true,
+  },
+  // The workflow run, latest payload and latest non-terminal state change of each portal run,
+  // used to coalesce intermediate ICAv2 WES state changes
+  needsWesStateCacheTable: {
+    tableName: 'wesStateCache',
+    tableNameEnvVar: 'WES_STATE_CACHE_TABLE_NAME',
+  },
+  // Content hashes of the repetitive populate comments posted to each workflow run,
+  // identical comments are not posted again within the suppression window
+  needsCommentSuppressionIndexTable: {
+    tableName: 'commentSuppressionIndex',
+    tableNameEnvVar: 'COMMENT_SUPPRESSION_INDEX_TABLE_NAME',
+    environment: {
+      COMMENT_SUPPRESSION_WINDOW_SECONDS: COMMENT_SUPPRESSION_WINDOW_SECONDS.toString(),
+    },
   },
 };
 
@@ -149,6 +273,11 @@ export interface LambdaInput {
   lambdaName: LambdaName;
 }
 
+export interface BuildLambdaProps extends LambdaInput {
+  tracingLayer: lambda.ILayerVersion;
+  toolsLayer: lambda.ILayerVersion;
+}
+
 export interface LambdaObject extends LambdaInput {
   lambdaFunction: PythonUvFunction;
 }
@@ -0,0 +1,100 @@
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as iam from 'aws-cdk-lib/aws-iam';
+import * as cdk from 'aws-cdk-lib';
+import { Duration, RemovalPolicy } from 'aws-cdk-lib';
+import { NagSuppressions } from 'cdk-nag';
+import { Construct } from 'constructs';
+import { BuildSqsQueueProps, sqsQueueNameList, sqsQueueRequirementsMap } from './interfaces';
+import {
+  EVENT_BUS_NAME,
+  SQS_DEAD_LETTER_RETENTION_DAYS,
+  SQS_MAX_RECEIVE_COUNT,
+  SQS_QUEUE_NAME_MAP,
+  SQS_VISIBILITY_TIMEOUT_SECONDS,
+  STACK_PREFIX,
+} from '../constants';
+
+function buildDeadLetterQueue(scope: Construct, id: string, queueName: string, fifo?: boolean): sqs.Queue {
+  const deadLetterQueue = new sqs.Queue(scope, id, {
+    queueName: queueName,
+    fifo: fifo,
+    enforceSSL: true,
+    retentionPeriod: Duration.days(SQS_DEAD_LETTER_RETENTION_DAYS),
+    removalPolicy: RemovalPolicy.RETAIN_ON_UPDATE_OR_DELETE,
+  });
+
+  NagSuppressions.addResourceSuppressions(deadLetterQueue, [
+    {
+      id: 'AwsSolutions-SQS3',
+      reason: 'This is a dead letter queue, it does not need a dead letter queue itself',
+    },
+  ]);
+
+  return deadLetterQueue;
+}
+
+function buildSqsQueue(scope: Construct, props: BuildSqsQueueProps): sqs.Queue {
+  const sqsQueueRequirements = sqsQueueRequirementsMap[props.queueName];
+
+  const queue = sqsQueueRequirements.isDeadLetterQueue
+    ? buildDeadLetterQueue(
+        scope,
+        props.queueName,
+        SQS_QUEUE_NAME_MAP[props.queueName],
+        sqsQueueRequirements.fifo
+      )
+    : new sqs.Queue(scope, props.queueName, {
+        queueName: SQS_QUEUE_NAME_MAP[props.queueName],
+        fifo: sqsQueueRequirements.fifo,
+        // Messages are deduplicated by their body (enqueue time and sequence included)
+        contentBasedDeduplication: sqsQueueRequirements.fifo,
+        enforceSSL: true,
+        visibilityTimeout: Duration.seconds(SQS_VISIBILITY_TIMEOUT_SECONDS),
+        deadLetterQueue: {
+          // The dead letter queue of a FIFO queue must also be a FIFO queue
+          queue: buildDeadLetterQueue(
+            scope,
+            `${props.queueName}-dlq`,
+            sqsQueueRequirements.fifo
+              ? SQS_QUEUE_NAME_MAP[props.queueName].replace(/\.fifo$/, '-dlq.fifo')
+              : `${SQS_QUEUE_NAME_MAP[props.queueName]}-dlq`,
+            sqsQueueRequirements.fifo
+          ),
+          maxReceiveCount: SQS_MAX_RECEIVE_COUNT,
+        },
+        removalPolicy: RemovalPolicy.RETAIN_ON_UPDATE_OR_DELETE,
+      });
+
+  /*
+  The event rule is built in the stateless stack, so the queue policy is added here,
+  scoped to the rule by its (fixed) name
+   */
+  if (sqsQueueRequirements.eventBridgeRuleSource) {
+    queue.addToResourcePolicy(
+      new iam.PolicyStatement({
+        principals: [new iam.ServicePrincipal('events.amazonaws.com')],
+        actions: ['sqs:SendMessage'],
+        resources: [queue.queueArn],
+        conditions: {
+          ArnEquals: {
+            'aws:SourceArn': `arn:aws:events:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:rule/${EVENT_BUS_NAME}/${STACK_PREFIX}--${sqsQueueRequirements.eventBridgeRuleSource}`,
+          },
+        },
+      })
+    );
+  }
+
+  return queue;
+}
+
+export function buildSqsQueues(scope: Construct) {
+  /**
+   * Queues consumed by the stateless lambdas
+   * Queue names are constants so the stateless stack can reference them by name
+   */
+  for (const queueName of sqsQueueNameList) {
+    buildSqsQueue(scope, {
+      queueName: queueName,
+    });
+  }
+}
@@ -0,0 +1,50 @@
+import { EventBridgeRuleName } from '../event-rules/interfaces';
+
+/**
+ * SQS Queue Interfaces
+ */
+export type SqsQueueName =
+  // Workflow run comments waiting to be merged and posted by the flushCommentOutbox lambda
+  | 'commentOutbox'
+  // READY events waiting to be handed to the readyEventToIcav2WesRequestEvent state machine in batches
+  | 'readyEvents'
+  // WorkflowRunStateChange events the updateWorkflowRunIndex lambda could not index (after its retries)
+  | 'workflowRunIndexDeadLetter';
+
+export const sqsQueueNameList: SqsQueueName[] = [
+  // Comment outbox
+  'commentOutbox',
+  // Ready events
+  'readyEvents',
+  // Workflow run index dead letters
+  'workflowRunIndexDeadLetter',
+];
+
+// Requirements interface for SQS queues
+export interface SqsQueueRequirements {
+  // The (stateless) event rule that sends its events to the queue
+  eventBridgeRuleSource?: EventBridgeRuleName;
+  // Deliver the messages of each message group in order (the queue name must end in .fifo)
+  fifo?: boolean;
+  // The queue is itself a dead letter queue (of an event target), it is not given a dead letter queue
+  isDeadLetterQueue?: boolean;
+}
+
+export const sqsQueueRequirementsMap: Record<SqsQueueName, SqsQueueRequirements> = {
+  // One message group per workflow run, so its comments are posted (and retried) in order
+  commentOutbox: {
+    fifo: true,
+  },
+  readyEvents: {
+    eventBridgeRuleSource: 'wrscReady',
+  },
+  // Events the rule could not deliver, and events the lambda failed on after its async retries
+  workflowRunIndexDeadLetter: {
+    eventBridgeRuleSource: 'wrscWorkflowRunIndex',
+    isDeadLetterQueue: true,
+  },
+};
+
+export interface BuildSqsQueueProps {
+  queueName: SqsQueueName;
+}
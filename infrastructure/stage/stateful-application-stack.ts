@@ -3,6 +3,8 @@ import { Construct } from 'constructs';
 import { StatefulApplicationStackConfig } from './interfaces';
 import { buildSsmParameters } from './ssm';
 import { buildSchemas } from './event-schemas';
+import { buildDynamoDbTables } from './dynamodb';
+import { buildSqsQueues } from './sqs';
 import { GitStack } from '@orcabus/platform-cdk-constructs/deployment-stack-pipeline';
 
 export type StatefulApplicationStackProps = cdk.StackProps & StatefulApplicationStackConfig;
@@ -25,5 +27,11 @@ export class StatefulApplicationStack extends GitStack {
 
     // Add to the schema registry
     buildSchemas(this);
+
+    // Build the DynamoDB tables
+    buildDynamoDbTables(this);
+
+    // Build the SQS queues
+    buildSqsQueues(this);
   }
 }
@@ -6,6 +6,7 @@ import { buildAllLambdas } from './lambda';
 import { buildAllStepFunctions } from './step-functions';
 import { buildAllEventRules } from './event-rules';
 import { buildAllEventBridgeTargets } from './event-targets';
+import { buildAllEventPipes } from './event-pipes';
 import { StageName } from '@orcabus/platform-cdk-constructs/shared-config/accounts';
 import { GitStack } from '@orcabus/platform-cdk-constructs/deployment-stack-pipeline';
 
@@ -47,9 +48,15 @@ export class StatelessApplicationStack extends GitStack {
     });
 
     // Add event targets
-    buildAllEventBridgeTargets({
+    buildAllEventBridgeTargets(this, {
       eventBridgeRuleObjects: eventRules,
       stepFunctionObjects: stateMachines,
+      lambdaObjects: lambdas,
+    });
+
+    // Add event pipes (queued events to state machines, in batches)
+    buildAllEventPipes(this, {
+      stepFunctionObjects: stateMachines,
     });
   }
 }